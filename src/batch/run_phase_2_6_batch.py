@@ -8,16 +8,140 @@ Phase 3: トピック/エンティティ抽出（add_topics_entities.py）
 Phase 4: エンティティ解決（entity_resolution_llm.py）
 Phase 5: Vector DB構築（build_unified_vector_index.py）
 Phase 6: RAG検証（当面スキップ）
+
+各Phaseの処理関数を1回だけインポートしてプロセス内で実行する（ファイルごとにPythonを起動しない）。
+Phase 3はファイル単位でワーカープールに投入し、Gemini API呼び出しはプロセス共有の
+レートリミッター（src/shared/rate_limiter.py）で全ワーカー合計のRPM/RPDに収める。
+CLI実行時は batch ワークロードとして扱い、GEMINI_TIER_MODE=auto では FREE キーの
+interactive 用予約枠を残して PAID キーに振り分ける（src/shared/quota_scheduler.py）。
+
+使い方:
+    python -m src.batch.run_phase_2_6_batch [downloads_dir] [--workers 4] [--retries 3] [--force]
 """
 
+import argparse
+import json
 import os
 import glob
-import subprocess
+import random
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from src.shared.gemini_client import get_gemini_client
+from src.shared.quota_scheduler import get_quota_scheduler, set_default_workload
+from src.shared.rate_limiter import DailyQuotaExceeded, get_rate_limiter, is_rate_limit_error
+from src.topics.add_topics_entities import TOPICS_MODEL, enhance_structured_json, enhanced_json_path
+from src.topics.entity_resolution_llm import resolve_entities
+from src.vector_db.build_unified_vector_index import main as build_vector_index
+
+# 設定
+BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', '4'))
+BATCH_MAX_RETRIES = int(os.getenv('BATCH_MAX_RETRIES', '3'))
+BATCH_BACKOFF_BASE = float(os.getenv('BATCH_BACKOFF_BASE', '2.0'))
+
+
+def _format_duration(seconds: float) -> str:
+    """秒数を "1h02m" / "3m05s" / "12s" 形式にする"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def run_file_pool(files: List[str], func: Callable[[str], Any], max_workers: int = BATCH_MAX_WORKERS,
+                  max_retries: int = BATCH_MAX_RETRIES, backoff_base: float = BATCH_BACKOFF_BASE,
+                  rate_limiter=None, sleep=time.sleep) -> List[Dict[str, Any]]:
+    """
+    ファイル単位の処理をワーカープールで並行実行（ファイルごとに再試行）
 
-
-def run_phase_2_6_for_all_files(downloads_dir: str = "downloads"):
+    Args:
+        files: 処理対象ファイルパスのリスト
+        func: ファイル1件の処理関数（失敗時は例外を送出）
+        max_workers: 同時実行ファイル数
+        max_retries: 1ファイルあたりの最大再試行回数
+        backoff_base: 再試行の待機秒数の底（backoff_base ** 試行回数 + ジッター）
+        rate_limiter: 429受信時に全ワーカーを待機させるリミッター（penalize）
+        sleep: 待機関数（テスト用に差し替え可能）
+
+    Returns:
+        [{"file", "status": "success"/"failed"/"skipped", "attempts", "duration", "error"}]
+        （filesと同じ順序）
+    """
+    total = len(files)
+    results: Dict[str, Dict[str, Any]] = {}
+    quota_exhausted = threading.Event()
+    progress_lock = threading.Lock()
+    started_at = time.perf_counter()
+
+    def process(file_path: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        attempts = 0
+        error = None
+
+        while attempts <= max_retries:
+            if quota_exhausted.is_set():
+                return {"file": file_path, "status": "skipped", "attempts": attempts,
+                        "duration": time.perf_counter() - start, "error": "daily quota exhausted"}
+            attempts += 1
+            try:
+                func(file_path)
+                return {"file": file_path, "status": "success", "attempts": attempts,
+                        "duration": time.perf_counter() - start, "error": None}
+            except DailyQuotaExceeded as e:
+                quota_exhausted.set()
+                error = str(e)
+                break
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                if attempts > max_retries:
+                    break
+                delay = backoff_base ** attempts
+                delay += random.uniform(0, delay * 0.1)
+                if is_rate_limit_error(e) and rate_limiter is not None:
+                    rate_limiter.penalize(delay)
+                print(f"  ⚠️ {os.path.basename(file_path)}: {error[:120]} "
+                      f"(retry {attempts}/{max_retries} in {delay:.1f}s)")
+                sleep(delay)
+
+        return {"file": file_path, "status": "failed", "attempts": attempts,
+                "duration": time.perf_counter() - start, "error": error}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(process, file_path): file_path for file_path in files}
+        for future in as_completed(futures):
+            result = future.result()
+            results[result["file"]] = result
+
+            with progress_lock:
+                done = len(results)
+                elapsed = time.perf_counter() - started_at
+                eta = elapsed / done * (total - done)
+                mark = {"success": "✓", "failed": "✗", "skipped": "⏭"}[result["status"]]
+                retry_note = f", 試行{result['attempts']}回" if result["attempts"] > 1 else ""
+                print(f"[{done}/{total}] {mark} {os.path.basename(result['file'])} "
+                      f"({result['duration']:.1f}s{retry_note}) | 経過 {_format_duration(elapsed)} "
+                      f"ETA {_format_duration(eta)}")
+                if result["status"] == "failed":
+                    print(f"    {result['error'][:200]}")
+
+    return [results[file_path] for file_path in files]
+
+
+def _is_up_to_date(structured_path: str) -> bool:
+    """_enhanced.json が構造化JSONより新しければ処理済み"""
+    output = enhanced_json_path(structured_path)
+    return output.exists() and output.stat().st_mtime >= os.path.getmtime(structured_path)
+
+
+def run_phase_2_6_for_all_files(downloads_dir: str = "downloads", max_workers: int = BATCH_MAX_WORKERS,
+                                max_retries: int = BATCH_MAX_RETRIES, force: bool = False,
+                                summary_path: Optional[str] = None) -> Dict[str, Any]:
     """
     全ての構造化JSONファイルに対してPhase 3-6を実行
 
@@ -26,19 +150,38 @@ def run_phase_2_6_for_all_files(downloads_dir: str = "downloads"):
 
     Args:
         downloads_dir: 構造化JSONファイルが格納されているディレクトリ
+        max_workers: Phase 3の同時実行ファイル数
+        max_retries: Phase 3の1ファイルあたりの最大再試行回数
+        force: _enhanced.json が最新のファイルも再処理する
+        summary_path: 実行サマリーJSONの保存先（Noneなら downloads_dir/batch_summary_<日時>.json）
+
+    Returns:
+        実行サマリー（summary_pathに保存した内容と同じ）
     """
     print(f"\n{'='*70}")
     print(f"[Batch] Phase 2-6 バッチ処理開始")
     print(f"{'='*70}\n")
     print(f"対象ディレクトリ: {downloads_dir}")
 
+    started_at = datetime.now()
+    batch_start = time.perf_counter()
+
     # 構造化JSONファイルを取得
-    structured_files = glob.glob(os.path.join(downloads_dir, "*_structured.json"))
+    structured_files = sorted(glob.glob(os.path.join(downloads_dir, "*_structured.json")))
     print(f"対象ファイル数: {len(structured_files)}\n")
 
+    summary: Dict[str, Any] = {
+        "started_at": started_at.isoformat(),
+        "downloads_dir": downloads_dir,
+        "total_files": len(structured_files),
+        "phase3": {"results": []},
+        "phase4": {"status": "skipped"},
+        "phase5": {"status": "skipped"},
+    }
+
     if not structured_files:
         print("[Batch] 処理対象ファイルが見つかりません")
-        return
+        return summary
 
     # ========================
     # Phase 2: 話者推論（スキップ）
@@ -49,45 +192,40 @@ def run_phase_2_6_for_all_files(downloads_dir: str = "downloads"):
     print("⏭ スキップ（Phase 11-3 integrated_pipeline.py で既に実行済み）\n")
 
     # ========================
-    # Phase 3: トピック/エンティティ抽出
+    # Phase 3: トピック/エンティティ抽出（ワーカープール）
     # ========================
     print(f"{'='*70}")
     print(f"[Phase 3] トピック/エンティティ抽出")
     print(f"{'='*70}")
-    print("実行中...\n")
-
-    success_count = 0
-    error_count = 0
-
-    for i, file_path in enumerate(structured_files, 1):
-        file_name = os.path.basename(file_path)
-        print(f"[{i}/{len(structured_files)}] {file_name}")
 
-        try:
-            result = subprocess.run(
-                ["venv/bin/python3", "-m", "src.step3_topics.add_topics_entities", file_path],
-                capture_output=True,
-                text=True,
-                timeout=300  # 5分タイムアウト
-            )
-
-            if result.returncode == 0:
-                print(f"  ✓ 成功")
-                success_count += 1
-            else:
-                print(f"  ✗ エラー（exit code: {result.returncode}）")
-                if result.stderr:
-                    print(f"    stderr: {result.stderr[:200]}")
-                error_count += 1
-
-        except subprocess.TimeoutExpired:
-            print(f"  ✗ タイムアウト（5分経過）")
-            error_count += 1
-        except Exception as e:
-            print(f"  ✗ 例外: {e}")
-            error_count += 1
+    targets = structured_files if force else [f for f in structured_files if not _is_up_to_date(f)]
+    up_to_date = len(structured_files) - len(targets)
+    print(f"実行中...（{len(targets)}件、処理済み {up_to_date}件はスキップ、ワーカー {max_workers}）\n")
+
+    phase3_results = run_file_pool(
+        targets,
+        lambda path: enhance_structured_json(path, raise_errors=True),
+        max_workers=max_workers,
+        max_retries=max_retries,
+        rate_limiter=get_rate_limiter(TOPICS_MODEL)
+    )
+
+    success_count = sum(1 for r in phase3_results if r["status"] == "success")
+    error_count = sum(1 for r in phase3_results if r["status"] == "failed")
+    skipped_count = sum(1 for r in phase3_results if r["status"] == "skipped")
+    summary["phase3"] = {
+        "success": success_count,
+        "failed": error_count,
+        "skipped_quota": skipped_count,
+        "up_to_date": up_to_date,
+        "results": phase3_results,
+    }
+
+    print(f"\n[Phase 3] 完了: 成功 {success_count}件、エラー {error_count}件"
+          + (f"、クォータ超過で未処理 {skipped_count}件" if skipped_count else "") + "\n")
 
-    print(f"\n[Phase 3] 完了: 成功 {success_count}件、エラー {error_count}件\n")
+    # Phase 3で生成された _enhanced.json ファイルを取得
+    enhanced_files = sorted(glob.glob(os.path.join(downloads_dir, "*_structured_enhanced.json")))
 
     # ========================
     # Phase 4: エンティティ解決
@@ -97,41 +235,21 @@ def run_phase_2_6_for_all_files(downloads_dir: str = "downloads"):
     print(f"{'='*70}")
     print("実行中...\n")
 
-    # Phase 3で生成された _enhanced.json ファイルを取得
-    enhanced_files = glob.glob(os.path.join(downloads_dir, "*_structured_enhanced.json"))
     if not enhanced_files:
         print("  ⚠ 処理対象ファイルが見つかりません（_structured_enhanced.json）")
-        print(f"\n[Phase 4] 完了\n")
     else:
         print(f"  対象ファイル数: {len(enhanced_files)}")
-
+        phase_start = time.perf_counter()
         try:
-            # entity_resolution_llm.py は個別JSONファイルを引数として受け取る
-            result = subprocess.run(
-                ["venv/bin/python3", "-m", "src.step4_entities.entity_resolution_llm"] + enhanced_files,
-                capture_output=True,
-                text=True,
-                timeout=600  # 10分タイムアウト
-            )
-
-            if result.returncode == 0:
-                print(f"  ✓ 成功")
-                # 出力の最後の20行を表示
-                if result.stdout:
-                    lines = result.stdout.strip().split('\n')
-                    for line in lines[-20:]:
-                        print(f"    {line}")
-            else:
-                print(f"  ✗ エラー（exit code: {result.returncode}）")
-                if result.stderr:
-                    print(f"    stderr: {result.stderr[:500]}")
-
-        except subprocess.TimeoutExpired:
-            print(f"  ✗ タイムアウト（10分経過）")
+            resolve_entities(enhanced_files)
+            summary["phase4"] = {"status": "success", "files": len(enhanced_files)}
+            print(f"  ✓ 成功")
         except Exception as e:
+            summary["phase4"] = {"status": "failed", "files": len(enhanced_files), "error": f"{type(e).__name__}: {e}"}
             print(f"  ✗ 例外: {e}")
+        summary["phase4"]["duration"] = time.perf_counter() - phase_start
 
-        print(f"\n[Phase 4] 完了\n")
+    print(f"\n[Phase 4] 完了\n")
 
     # ========================
     # Phase 5: Vector DB構築
@@ -141,41 +259,21 @@ def run_phase_2_6_for_all_files(downloads_dir: str = "downloads"):
     print(f"{'='*70}")
     print("実行中...\n")
 
-    # Phase 4で処理済みの _enhanced.json ファイルを取得
-    enhanced_files = glob.glob(os.path.join(downloads_dir, "*_structured_enhanced.json"))
     if not enhanced_files:
         print("  ⚠ 処理対象ファイルが見つかりません（_structured_enhanced.json）")
-        print(f"\n[Phase 5] 完了\n")
     else:
         print(f"  対象ファイル数: {len(enhanced_files)}")
-
+        phase_start = time.perf_counter()
         try:
-            # build_unified_vector_index.py は個別JSONファイルを引数として受け取る
-            result = subprocess.run(
-                ["venv/bin/python3", "-m", "src.step5_vector_db.build_unified_vector_index"] + enhanced_files,
-                capture_output=True,
-                text=True,
-                timeout=900  # 15分タイムアウト
-            )
-
-            if result.returncode == 0:
-                print(f"  ✓ 成功")
-                # 出力の最後の30行を表示
-                if result.stdout:
-                    lines = result.stdout.strip().split('\n')
-                    for line in lines[-30:]:
-                        print(f"    {line}")
-            else:
-                print(f"  ✗ エラー（exit code: {result.returncode}）")
-                if result.stderr:
-                    print(f"    stderr: {result.stderr[:500]}")
-
-        except subprocess.TimeoutExpired:
-            print(f"  ✗ タイムアウト（15分経過）")
+            failed_ids = build_vector_index(json_files=enhanced_files) or []
+            summary["phase5"] = {"status": "success", "files": len(enhanced_files), "failed_ids": failed_ids}
+            print(f"  ✓ 成功")
         except Exception as e:
+            summary["phase5"] = {"status": "failed", "files": len(enhanced_files), "error": f"{type(e).__name__}: {e}"}
             print(f"  ✗ 例外: {e}")
+        summary["phase5"]["duration"] = time.perf_counter() - phase_start
 
-        print(f"\n[Phase 5] 完了\n")
+    print(f"\n[Phase 5] 完了\n")
 
     # ========================
     # Phase 6: RAG検証（スキップ）
@@ -188,24 +286,58 @@ def run_phase_2_6_for_all_files(downloads_dir: str = "downloads"):
     # ========================
     # 完了
     # ========================
+    summary["finished_at"] = datetime.now().isoformat()
+    summary["duration"] = time.perf_counter() - batch_start
+    summary["gemini"] = get_gemini_client().get_metrics()["models"]
+    summary["quota"] = get_quota_scheduler().forecast()
+
+    summary_path = summary_path or os.path.join(
+        downloads_dir, f"batch_summary_{started_at.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
     print(f"{'='*70}")
     print(f"[Batch] Phase 2-6 バッチ処理完了")
     print(f"{'='*70}\n")
     print(f"処理時刻: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"所要時間: {_format_duration(summary['duration'])}")
     print(f"対象ファイル数: {len(structured_files)}")
     print(f"Phase 3 成功: {success_count}件、エラー: {error_count}件")
+    print(f"Gemini API:\n{get_gemini_client().format_metrics()}")
+    print(f"サマリー: {summary_path}")
+
+    return summary
 
 
 if __name__ == "__main__":
-    downloads_dir = sys.argv[1] if len(sys.argv) > 1 else "downloads"
+    parser = argparse.ArgumentParser(description="Phase 2-6 バッチ処理")
+    parser.add_argument('downloads_dir', nargs='?', default="downloads")
+    parser.add_argument('--workers', type=int, default=BATCH_MAX_WORKERS, help="Phase 3の同時実行ファイル数")
+    parser.add_argument('--retries', type=int, default=BATCH_MAX_RETRIES, help="1ファイルあたりの最大再試行回数")
+    parser.add_argument('--force', action='store_true', help="処理済み（_enhanced.jsonが最新）のファイルも再処理")
+    parser.add_argument('--summary', default=None, help="実行サマリーJSONの保存先")
+    args = parser.parse_args()
+
+    # GEMINI_TIER_MODE=auto では FREE の予約枠を使わず、不足分は PAID キーに回す
+    set_default_workload("batch")
+
+    downloads_dir = args.downloads_dir
 
     if not os.path.exists(downloads_dir):
         print(f"エラー: ディレクトリが見つかりません: {downloads_dir}")
         sys.exit(1)
 
     try:
-        run_phase_2_6_for_all_files(downloads_dir)
+        summary = run_phase_2_6_for_all_files(
+            downloads_dir,
+            max_workers=args.workers,
+            max_retries=args.retries,
+            force=args.force,
+            summary_path=args.summary
+        )
         print("\n✅ バッチ処理完了")
+        if summary["phase3"].get("failed"):
+            sys.exit(1)
     except KeyboardInterrupt:
         print("\n\n⚠️  ユーザーによる中断")
         sys.exit(130)
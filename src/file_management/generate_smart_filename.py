@@ -7,31 +7,18 @@ Smart Filename Generator (Phase 10-1)
 前提条件: *_structured.json が既に存在すること
 """
 
-import os
 import sys
 import json
 import re
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+from src.shared.gemini_client import GeminiModel
 
 # .envファイルを読み込み
 load_dotenv()
 
-# Gemini API Key選択（デフォルト: 無料枠）
-USE_PAID_TIER = os.getenv("USE_PAID_TIER", "false").lower() == "true"
-if USE_PAID_TIER:
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY_PAID")
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY_PAID not set but USE_PAID_TIER=true")
-    print("ℹ️  Using PAID tier API key for filename generation")
-else:
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY_FREE")
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY_FREE not set")
-    print("ℹ️  Using FREE tier API key for filename generation")
-
 
 def generate_filename_from_transcription(json_path):
     """
@@ -62,8 +49,7 @@ def generate_filename_from_transcription(json_path):
         date_str = datetime.now().strftime('%Y%m%d')
 
     # Gemini APIで最適なファイル名生成
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel("gemini-2.5-flash")
+    model = GeminiModel("gemini-2.5-flash")
 
     # 要約が長すぎる場合は切り詰め
     summary_excerpt = summary[:500] if summary else "（要約なし）"
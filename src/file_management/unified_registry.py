@@ -5,51 +5,115 @@ Phase 10-3: 統合ファイルレジストリ（関数ベース）- ファイル
 Google Drive + iCloud Drive両方の処理履歴を一元管理
 - ユーザー表示名（user_display_name）で重複検知
 - file_id ↔ ファイル名マッピング
-- JSONL形式で追記型ログ
+- SQLite（WAL）に保存。user_display_name を主キー、file_id / original_name に索引を持つため、
+  検索・更新は履歴の件数によらず一定時間
+- Webhookサーバー・iCloud監視の複数プロセスから同時に読み書きできる
+  （各操作は単一トランザクション、ロック競合時は busy_timeout まで待機）
+- 旧形式の JSONL（PROCESSED_FILES_REGISTRY）は初回アクセス時に自動で取り込む
 """
 
 import json
 import os
+import sqlite3
+import threading
+from contextlib import closing
 from pathlib import Path
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any
 
 # 設定
+REGISTRY_DB = Path(os.getenv('PROCESSED_FILES_REGISTRY_DB', '.processed_files_registry.db'))
+# 旧形式（JSONL追記ログ）。REGISTRY_DB が空の場合のみ移行元として読み込む
 REGISTRY_FILE = Path(os.getenv('PROCESSED_FILES_REGISTRY', '.processed_files_registry.jsonl'))
 
-# グローバルキャッシュ
-_registry_cache = {}  # {user_display_name: entry}
-_cache_loaded = False
+SCHEMA_VERSION = 1
+COLUMNS = ('source', 'file_id', 'user_display_name', 'original_name',
+           'renamed_to', 'local_path', 'processed_at')
 
+_init_lock = threading.Lock()
+_initialized_path = None
 
-def _load_registry_cache():
-    """レジストリをメモリキャッシュにロード"""
-    global _registry_cache, _cache_loaded
 
-    if _cache_loaded:
-        return
+def _connect() -> sqlite3.Connection:
+    """レジストリDBに接続（初回はスキーマ作成と旧JSONLの移行を行う）"""
+    global _initialized_path
 
-    _registry_cache = {}
+    conn = sqlite3.connect(str(REGISTRY_DB), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout=30000")
 
-    if not REGISTRY_FILE.exists():
-        _cache_loaded = True
-        return
+    if _initialized_path != REGISTRY_DB:
+        with _init_lock:
+            if _initialized_path != REGISTRY_DB:
+                _init_schema(conn)
+                _initialized_path = REGISTRY_DB
+
+    return conn
 
-    try:
-        with open(REGISTRY_FILE, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
 
+def _init_schema(conn: sqlite3.Connection):
+    """スキーマ作成・旧JSONL移行（他プロセスと競合しないよう BEGIN IMMEDIATE で実行）"""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS registry (
+                user_display_name TEXT PRIMARY KEY,
+                source TEXT,
+                file_id TEXT,
+                original_name TEXT,
+                renamed_to TEXT,
+                local_path TEXT,
+                processed_at TEXT
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_registry_file_id ON registry(file_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_registry_original_name ON registry(original_name)")
+
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            migrated = _import_jsonl(conn)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            if migrated:
+                print(f"[Info] Migrated {migrated} entries from {REGISTRY_FILE} to {REGISTRY_DB}")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _import_jsonl(conn: sqlite3.Connection) -> int:
+    """旧形式JSONLを取り込み（同じ表示名は後の行が優先、壊れた行はスキップ）"""
+    if not REGISTRY_FILE.exists():
+        return 0
+
+    entries = {}
+    with open(REGISTRY_FILE, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
                 entry = json.loads(line)
-                if 'user_display_name' in entry and entry['user_display_name']:
-                    _registry_cache[entry['user_display_name']] = entry
+            except json.JSONDecodeError as e:
+                print(f"[Warning] Skipping invalid registry line {line_no}: {e}")
+                continue
+            if entry.get('user_display_name'):
+                entries[entry['user_display_name']] = entry
+
+    conn.executemany(
+        f"INSERT OR REPLACE INTO registry ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+        [tuple(entry.get(col) for col in COLUMNS) for entry in entries.values()]
+    )
+    return len(entries)
 
-        _cache_loaded = True
-    except Exception as e:
-        print(f"[Warning] Failed to load registry: {e}")
-        _cache_loaded = True
+
+def _fetch_one(where: str, params: tuple) -> Optional[Dict[str, Any]]:
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM registry WHERE {where} LIMIT 1", params
+        ).fetchone()
+    return dict(row) if row else None
 
 
 def is_processed(user_display_name: str) -> bool:
@@ -62,8 +126,11 @@ def is_processed(user_display_name: str) -> bool:
     Returns:
         bool: 処理済みならTrue
     """
-    _load_registry_cache()
-    return user_display_name in _registry_cache
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT 1 FROM registry WHERE user_display_name = ?", (user_display_name,)
+        ).fetchone()
+    return row is not None
 
 
 def get_by_display_name(user_display_name: str) -> Optional[Dict[str, Any]]:
@@ -76,8 +143,7 @@ def get_by_display_name(user_display_name: str) -> Optional[Dict[str, Any]]:
     Returns:
         dict or None: レジストリエントリ、存在しなければNone
     """
-    _load_registry_cache()
-    return _registry_cache.get(user_display_name)
+    return _fetch_one("user_display_name = ?", (user_display_name,))
 
 
 def get_by_file_id(file_id: str) -> Optional[Dict[str, Any]]:
@@ -90,20 +156,14 @@ def get_by_file_id(file_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         dict or None: レジストリエントリ、存在しなければNone
     """
-    _load_registry_cache()
-
-    for entry in _registry_cache.values():
-        if entry.get('file_id') == file_id:
-            return entry
-
-    return None
+    return _fetch_one("file_id = ?", (file_id,))
 
 
 def search(file_id: Optional[str] = None,
           original_name: Optional[str] = None,
           user_display_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """
-    柔軟な検索
+    柔軟な検索（file_id → original_name → user_display_name の順に索引で検索）
 
     Args:
         file_id: Google DriveのファイルID（オプション）
@@ -113,15 +173,16 @@ def search(file_id: Optional[str] = None,
     Returns:
         dict or None: レジストリエントリ、存在しなければNone
     """
-    _load_registry_cache()
-
-    for entry in _registry_cache.values():
-        if file_id and entry.get('file_id') == file_id:
-            return entry
-        if original_name and entry.get('original_name') == original_name:
+    if file_id:
+        entry = get_by_file_id(file_id)
+        if entry:
             return entry
-        if user_display_name and entry.get('user_display_name') == user_display_name:
+    if original_name:
+        entry = _fetch_one("original_name = ?", (original_name,))
+        if entry:
             return entry
+    if user_display_name:
+        return get_by_display_name(user_display_name)
 
     return None
 
@@ -133,7 +194,7 @@ def add_to_registry(source: str,
                    file_id: Optional[str] = None,
                    local_path: Optional[str] = None):
     """
-    新規エントリをレジストリに追加
+    新規エントリをレジストリに追加（同じ表示名のエントリがあれば置き換え）
 
     Args:
         source: ファイルソース（'google_drive' or 'icloud_drive'）
@@ -143,8 +204,6 @@ def add_to_registry(source: str,
         file_id: Google DriveファイルID（Google Driveのみ）
         local_path: ローカルファイルパス（オプション）
     """
-    _load_registry_cache()
-
     entry = {
         'source': source,
         'file_id': file_id,
@@ -155,43 +214,47 @@ def add_to_registry(source: str,
         'processed_at': datetime.now(timezone.utc).isoformat()
     }
 
-    # メモリキャッシュ更新
-    _registry_cache[user_display_name] = entry
-
-    # ファイルに追記（JSONL形式）
-    with open(REGISTRY_FILE, 'a', encoding='utf-8') as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    with closing(_connect()) as conn:
+        conn.execute(
+            f"INSERT OR REPLACE INTO registry ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            tuple(entry[col] for col in COLUMNS)
+        )
 
 
 def update_renamed(user_display_name: str, renamed_to: str):
     """
-    リネーム後のファイル名を更新
+    リネーム後のファイル名を更新（該当行のみ更新）
 
     Args:
         user_display_name: ユーザー設定の表示名
         renamed_to: リネーム後のファイル名
     """
-    _load_registry_cache()
+    with closing(_connect()) as conn:
+        cursor = conn.execute(
+            "UPDATE registry SET renamed_to = ? WHERE user_display_name = ?",
+            (renamed_to, user_display_name)
+        )
 
-    if user_display_name not in _registry_cache:
+    if cursor.rowcount == 0:
         print(f"[Warning] Display name not found in registry: {user_display_name}")
-        return
 
-    # メモリキャッシュ更新
-    _registry_cache[user_display_name]['renamed_to'] = renamed_to
 
-    # JSONL全体を再書き込み
-    _rewrite_registry()
+def compact():
+    """
+    WALをDB本体に書き戻して切り詰め、空き領域を回収（定期メンテナンス用）
 
+    Returns:
+        dict: 圧縮前後のファイルサイズ（bytes）
+    """
+    def total_size():
+        return sum(p.stat().st_size for p in (REGISTRY_DB, Path(f"{REGISTRY_DB}-wal"))
+                   if p.exists())
 
-def _rewrite_registry():
-    """レジストリ全体を再書き込み（更新用）"""
-    try:
-        with open(REGISTRY_FILE, 'w', encoding='utf-8') as f:
-            for entry in _registry_cache.values():
-                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
-    except Exception as e:
-        print(f"[Error] Failed to rewrite registry: {e}")
+    before = total_size()
+    with closing(_connect()) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+    return {'before_bytes': before, 'after_bytes': total_size()}
 
 
 def get_stats() -> Dict[str, Any]:
@@ -201,16 +264,13 @@ def get_stats() -> Dict[str, Any]:
     Returns:
         dict: 統計情報（総件数、Google Drive件数、iCloud件数）
     """
-    _load_registry_cache()
-
-    total = len(_registry_cache)
-    google_drive = sum(1 for e in _registry_cache.values() if e.get('source') == 'google_drive')
-    icloud_drive = sum(1 for e in _registry_cache.values() if e.get('source') == 'icloud_drive')
+    with closing(_connect()) as conn:
+        counts = dict(conn.execute("SELECT source, COUNT(*) FROM registry GROUP BY source").fetchall())
 
     return {
-        'total': total,
-        'google_drive': google_drive,
-        'icloud_drive': icloud_drive
+        'total': sum(counts.values()),
+        'google_drive': counts.get('google_drive', 0),
+        'icloud_drive': counts.get('icloud_drive', 0)
     }
 
 
@@ -220,9 +280,15 @@ if __name__ == "__main__":
 
     if len(sys.argv) < 2:
         print("Usage: python unified_registry.py <display_name>")
+        print("       python unified_registry.py --compact")
         print("\nTest: Check if display name is processed")
         sys.exit(1)
 
+    if sys.argv[1] == '--compact':
+        sizes = compact()
+        print(f"Compacted {REGISTRY_DB}: {sizes['before_bytes']:,} → {sizes['after_bytes']:,} bytes")
+        sys.exit(0)
+
     display_name = sys.argv[1]
 
     print(f"Checking display name: {display_name}")
@@ -8,10 +8,12 @@ iCloud Driveの音声ファイルを自動検知して文字起こし処理を
 - CloudRecordings.dbからユーザー表示名取得
 - ファイル名ベース重複検知
 - 統合レジストリと連携
+- 文字起こしは常駐ワーカープロセス（src/transcription/transcription_worker.py）で実行
+- 検知したファイルは永続ジョブキュー（src/monitoring/job_queue.py）に登録し、
+  固定数のワーカーが処理（失敗時は再試行、プロセス再起動後も未完了ジョブを再開）
 """
 
 import os
-import sys
 import time
 import subprocess
 import shutil
@@ -28,6 +30,9 @@ load_dotenv()
 
 # 自作モジュール
 from src.file_management import unified_registry as registry
+from src.monitoring.job_queue import JOB_WORKERS, JobQueue, JobWorkerPool
+from src.transcription import audio_normalization
+from src.transcription.transcription_worker import TranscriptionFailed, get_transcription_pool
 
 # 設定
 ICLOUD_PATH = Path(os.getenv('ICLOUD_DRIVE_PATH',
@@ -83,9 +88,19 @@ def get_user_display_name(file_path: Path) -> Optional[str]:
 
 class AudioFileHandler(FileSystemEventHandler):
     """
-    音声ファイル作成イベントを処理するハンドラ
+    音声ファイル作成イベントを処理するハンドラ（ジョブ登録のみ行い即座に戻る）
     """
 
+    def __init__(self, job_queue: JobQueue, worker_pool: Optional[JobWorkerPool] = None):
+        """
+        Args:
+            job_queue: 登録先のジョブキュー
+            worker_pool: 登録時に通知するワーカープール
+        """
+        super().__init__()
+        self.job_queue = job_queue
+        self.worker_pool = worker_pool
+
     def on_created(self, event):
         """
         ファイル作成イベント処理
@@ -113,8 +128,15 @@ class AudioFileHandler(FileSystemEventHandler):
 
         print(f"\n🔔 New audio file detected: {file_path.name}", flush=True)
 
-        # 非同期処理（別スレッドでファイル処理）
-        process_new_audio_file(file_path)
+        # ジョブキューに登録（処理はワーカーが実行）
+        job_id = self.job_queue.enqueue(
+            'icloud_file',
+            {'path': str(file_path)},
+            dedupe_key=f"icloud_file:{file_path}"
+        )
+        print(f"  📥 Queued as job {job_id}", flush=True)
+        if self.worker_pool is not None:
+            self.worker_pool.notify()
 
 
 def wait_for_file_stability(file_path: Path,
@@ -176,8 +198,14 @@ def process_new_audio_file(file_path: Path):
     """
     新規音声ファイルの処理メインフロー
 
+    失敗時は例外を送出する（ジョブキューが再試行）。途中で落ちた試行の再実行では、
+    同じ元ファイルのレジストリ登録を重複とみなさず処理を再開する。
+
     Args:
         file_path: 処理対象ファイル（iCloudボイスメモフォルダ内）
+
+    Raises:
+        RuntimeError: ファイル安定待機のタイムアウト・文字起こし失敗など
     """
     copied_file = None
     converted_file = None
@@ -185,8 +213,7 @@ def process_new_audio_file(file_path: Path):
     try:
         # 1. ファイル安定待機
         if not wait_for_file_stability(file_path):
-            print(f"  ⚠️ Skipping unstable file: {file_path.name}", flush=True)
-            return
+            raise RuntimeError(f"File did not become stable: {file_path.name}")
 
         # 2. downloadsフォルダにコピー
         DOWNLOAD_DIR.mkdir(exist_ok=True)
@@ -204,8 +231,11 @@ def process_new_audio_file(file_path: Path):
             user_display_name = file_path.stem
 
         # 4. 重複チェック（ユーザー表示名ベース）
-        if registry.is_processed(user_display_name):
-            existing = registry.get_by_display_name(user_display_name)
+        existing = registry.get_by_display_name(user_display_name) if registry.is_processed(user_display_name) else None
+        if existing and existing.get('source') == 'icloud_drive' and existing.get('original_name') == file_path.name:
+            # 前回の試行で登録済み（処理途中で失敗・中断）→ 再開
+            print(f"  ↻ Resuming earlier attempt (already registered)", flush=True)
+        elif existing:
             print(f"  ⚠️ DUPLICATE DETECTED - Already processed:", flush=True)
             print(f"    Source: {existing.get('source')}", flush=True)
             print(f"    Original: {existing.get('original_name')}", flush=True)
@@ -222,15 +252,16 @@ def process_new_audio_file(file_path: Path):
             return
 
         # 5. レジストリ登録（処理前）
-        print(f"  📝 Registering to unified registry...", flush=True)
-        registry.add_to_registry(
-            source='icloud_drive',
-            original_name=file_path.name,
-            user_display_name=user_display_name,
-            renamed_to=None,  # Phase 10-1で更新される
-            file_id=None,     # iCloudにはfile_id概念なし
-            local_path=str(copied_file)  # downloadsフォルダのパス
-        )
+        if not existing:
+            print(f"  📝 Registering to unified registry...", flush=True)
+            registry.add_to_registry(
+                source='icloud_drive',
+                original_name=file_path.name,
+                user_display_name=user_display_name,
+                renamed_to=None,  # Phase 10-1で更新される
+                file_id=None,     # iCloudにはfile_id概念なし
+                local_path=str(copied_file)  # downloadsフォルダのパス
+            )
 
         # 6. 文字起こし処理実行（downloadsフォルダのファイルで）
         print(f"  🎙️ Starting transcription...", flush=True)
@@ -267,12 +298,22 @@ def process_new_audio_file(file_path: Path):
         print(f"  ❌ Error processing file: {e}", flush=True)
         import traceback
         traceback.print_exc()
+        raise
+
+
+def handle_icloud_file(payload):
+    """'icloud_file' ジョブのハンドラ"""
+    process_new_audio_file(Path(payload['path']))
 
 
 def convert_qta_to_m4a(qta_path: Path) -> Path:
     """
     .qtaファイルを.m4aに変換（同じディレクトリ内）
 
+    AUDIO_NORMALIZE=true（デフォルト）の場合はモノラル・16kHz・低ビットレートAACで出力し、
+    文字起こし側はこの.m4aを再エンコードせずに送信する（qtaのデコードは1回のみ）。
+    AUDIO_NORMALIZE=false の場合は従来どおり128k AACに変換する。
+
     Args:
         qta_path: .qtaファイルパス
 
@@ -283,19 +324,22 @@ def convert_qta_to_m4a(qta_path: Path) -> Path:
 
     print(f"  🔄 Converting .qta to .m4a...", flush=True)
 
-    cmd = [
-        'ffmpeg',
-        '-i', str(qta_path),
-        '-c:a', 'aac',  # AACコーデック
-        '-b:a', '128k',  # ビットレート
-        '-y',  # 上書き
-        str(m4a_path)
-    ]
+    if audio_normalization.NORMALIZE_ENABLED:
+        audio_normalization.normalize_audio(qta_path, m4a_path, codec='aac')
+    else:
+        cmd = [
+            'ffmpeg',
+            '-i', str(qta_path),
+            '-c:a', 'aac',  # AACコーデック
+            '-b:a', '128k',  # ビットレート
+            '-y',  # 上書き
+            str(m4a_path)
+        ]
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
+        result = subprocess.run(cmd, capture_output=True, text=True)
 
-    if result.returncode != 0:
-        raise Exception(f"FFmpeg conversion failed: {result.stderr}")
+        if result.returncode != 0:
+            raise Exception(f"FFmpeg conversion failed: {result.stderr}")
 
     print(f"  ✅ Converted: {m4a_path.name}", flush=True)
 
@@ -309,7 +353,7 @@ def convert_qta_to_m4a(qta_path: Path) -> Path:
 
 def transcribe_audio_file(file_path: Path, user_display_name: str) -> Optional[Path]:
     """
-    structured_transcribe.pyを呼び出して文字起こし実行
+    常駐ワーカープールで文字起こし実行
 
     Args:
         file_path: 音声ファイルパス（downloadsフォルダ内）
@@ -317,6 +361,9 @@ def transcribe_audio_file(file_path: Path, user_display_name: str) -> Optional[P
 
     Returns:
         Optional[Path]: 変換後のファイルパス（.qta→.m4aの場合）
+
+    Raises:
+        RuntimeError: 変換・文字起こしの失敗またはタイムアウト（元ファイルを削除せずに再試行させる）
     """
     converted_file = None
 
@@ -327,84 +374,34 @@ def transcribe_audio_file(file_path: Path, user_display_name: str) -> Optional[P
             converted_file = convert_qta_to_m4a(file_path)
             actual_file_path = converted_file
 
-        # structured_transcribe.py実行
-        cmd = [
-            sys.executable,  # 現在のPythonインタプリタ
-            '-m',
-            'src.transcription.structured_transcribe',
-            str(actual_file_path)
-        ]
+        # 常駐ワーカープロセスで文字起こし（インポート済みのため起動コストなし）
+        print(f"  💬 Transcribing: {actual_file_path.name}", flush=True)
+        result = get_transcription_pool().transcribe(actual_file_path)
 
-        print(f"  💬 Executing: {' '.join(cmd)}", flush=True)
+        print(f"  ✅ Transcription successful: {result['segment_count']}セグメント, "
+              f"{result['speaker_count']}話者 ({result['elapsed_seconds']:.1f}秒)", flush=True)
+        if result.get('meeting_id'):
+            print(f"  📊 Phase 11-3: Meeting ID {result['meeting_id']}", flush=True)
 
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            env=os.environ.copy(),  # 環境変数を継承
-            timeout=3600  # 1時間タイムアウト
-        )
-
-        if result.returncode == 0:
-            print(f"  ✅ Transcription successful", flush=True)
-
-            # Phase 11-3のログ出力を表示
-            if "Phase 11-3" in result.stdout:
-                print("\n" + "=" * 70, flush=True)
-                print("📊 Phase 11-3 実行ログ:", flush=True)
-                print("=" * 70, flush=True)
-                # Phase 11-3セクションのみ抽出して表示
-                for line in result.stdout.split('\n'):
-                    if 'Phase 11-3' in line or 'Step' in line or 'Meeting ID' in line or '✓' in line or '⏭' in line:
-                        print(f"  {line}", flush=True)
-                print("=" * 70 + "\n", flush=True)
-
-            # Phase 10-1でリネームされた可能性があるのでレジストリ更新
-            # （structured_transcribe.py内でgenerate_smart_filenameが呼ばれる）
-            update_registry_after_rename(actual_file_path, user_display_name)
-        else:
-            print(f"  ❌ Transcription failed (exit code: {result.returncode})", flush=True)
-            print(f"  stderr: {result.stderr}", flush=True)
+        # Phase 10-1でリネームされた場合はレジストリ更新
+        if result.get('renamed'):
+            renamed_name = Path(result['audio_path']).name
+            print(f"  📝 Updating registry with renamed file: {renamed_name}", flush=True)
+            try:
+                registry.update_renamed(user_display_name, renamed_name)
+            except Exception as e:
+                print(f"  ⚠️ Registry update error (non-critical): {e}", flush=True)
 
         return converted_file
 
-    except subprocess.TimeoutExpired:
-        print(f"  ❌ Transcription timeout (>1 hour)", flush=True)
-        return converted_file
+    except TranscriptionFailed as e:
+        print(f"  ❌ Transcription failed: {e}", flush=True)
+        raise RuntimeError(f"Transcription failed: {e}") from e
+    except RuntimeError:
+        raise
     except Exception as e:
         print(f"  ❌ Transcription error: {e}", flush=True)
-        return converted_file
-
-
-def update_registry_after_rename(original_path: Path, user_display_name: str):
-    """
-    Phase 10-1によるリネーム後、レジストリを更新
-
-    Args:
-        original_path: オリジナルファイルパス
-        user_display_name: ユーザー表示名
-    """
-    try:
-        # リネーム後のファイル名を探す
-        # Phase 10-1は同じディレクトリ内でリネームする
-        parent_dir = original_path.parent
-
-        # 元のファイルが存在しない = リネームされた可能性
-        if not original_path.exists():
-            # 同じディレクトリ内で最新の音声ファイルを探す
-            audio_files = sorted(
-                [f for f in parent_dir.glob('*') if f.suffix.lower() in AUDIO_EXTENSIONS],
-                key=lambda x: x.stat().st_mtime,
-                reverse=True
-            )
-
-            if audio_files:
-                renamed_file = audio_files[0]
-                print(f"  📝 Updating registry with renamed file: {renamed_file.name}", flush=True)
-                registry.update_renamed(user_display_name, renamed_file.name)
-
-    except Exception as e:
-        print(f"  ⚠️ Registry update error (non-critical): {e}", flush=True)
+        raise RuntimeError(f"Transcription error: {e}") from e
 
 
 def start_monitoring():
@@ -433,12 +430,28 @@ def start_monitoring():
     print("=" * 60)
     print("Press Ctrl+C to stop monitoring\n")
 
+    # ジョブキューとワーカープール（前回の未完了ジョブも再開される）
+    job_queue = JobQueue()
+    worker_pool = JobWorkerPool(job_queue, {'icloud_file': handle_icloud_file},
+                                num_workers=JOB_WORKERS, name='icloud')
+    print(f"📥 Job queue: {job_queue.stats()}")
+
+    # レジストリのWAL書き戻し・空き領域回収（Webhookサーバーと共有）
+    try:
+        registry.compact()
+    except Exception as e:
+        print(f"⚠️ Registry compaction skipped: {e}", flush=True)
+
     # watchdog設定
-    event_handler = AudioFileHandler()
+    event_handler = AudioFileHandler(job_queue, worker_pool)
     observer = Observer()
     observer.schedule(event_handler, str(ICLOUD_PATH), recursive=True)
 
+    transcription_pool = get_transcription_pool()
+
     try:
+        transcription_pool.warm_up()
+        worker_pool.start()
         observer.start()
         print("✅ Monitoring active...\n", flush=True)
 
@@ -450,12 +463,16 @@ def start_monitoring():
         print("\n\n🛑 Stopping iCloud monitor...", flush=True)
         observer.stop()
         observer.join()
+        worker_pool.stop(timeout=5)
+        transcription_pool.shutdown(wait=False)
         print("✅ Monitor stopped gracefully", flush=True)
 
     except Exception as e:
         print(f"\n❌ Monitor error: {e}", flush=True)
         observer.stop()
         observer.join()
+        worker_pool.stop(timeout=5)
+        transcription_pool.shutdown(wait=False)
 
 
 if __name__ == "__main__":
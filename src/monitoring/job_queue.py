@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+永続ジョブキュー（SQLite）とワーカープール
+
+Webhook / iCloud監視はジョブを登録して即座に戻り、固定数のワーカーがダウンロード・文字起こし・
+クリーンアップを実行する。
+
+- 永続化: SQLiteファイル（WAL）。プロセスが落ちても未完了ジョブは残る
+- 可視性タイムアウト: 取得したジョブはリース期限まで他ワーカーに見えない。
+  ワーカーは実行中にリースを延長し、延長が途絶えた（クラッシュした）ジョブは期限後に再取得される
+- 再試行: 失敗時は指数バックオフで再キュー、max_attempts回失敗したら dead（デッドレター）
+- 重複排除: 同じ dedupe_key のジョブが未実行（queued）・実行中（running）の間は再登録しない
+  （通知バーストの集約）
+
+状態遷移: queued → running → done
+                 ↘ (失敗) queued（available_at まで待機） → ... → dead
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from typing import Any, Callable, Dict, List, Optional
+
+# 設定
+JOB_QUEUE_DB = os.getenv('JOB_QUEUE_DB', 'data/job_queue.db')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+JOB_VISIBILITY_TIMEOUT = float(os.getenv('JOB_VISIBILITY_TIMEOUT', '600'))  # 秒
+JOB_BACKOFF_BASE = float(os.getenv('JOB_BACKOFF_BASE', '30'))  # 秒（30, 60, 120, ...）
+JOB_BACKOFF_MAX = float(os.getenv('JOB_BACKOFF_MAX', '3600'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '2'))
+
+STATUSES = ("queued", "running", "done", "dead")
+
+
+class JobQueue:
+    """SQLiteベースの永続ジョブキュー（スレッド・プロセス間で共有可能）"""
+
+    def __init__(self, db_path: str = JOB_QUEUE_DB, clock=time.time):
+        """
+        Args:
+            db_path: SQLiteファイルパス
+            clock: 時刻取得関数（テスト用に差し替え可能）
+        """
+        self.db_path = db_path
+        self._clock = clock
+
+        data_dir = os.path.dirname(db_path)
+        if data_dir and not os.path.exists(data_dir):
+            os.makedirs(data_dir, exist_ok=True)
+
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    dedupe_key TEXT,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    available_at REAL NOT NULL,
+                    locked_until REAL,
+                    worker_id TEXT,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, available_at)")
+            # 未実行ジョブの dedupe_key は一意
+            conn.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs(dedupe_key)
+                WHERE dedupe_key IS NOT NULL AND status = 'queued'
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """呼び出しごとに接続（isolation_level=None でトランザクションを明示制御）"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], dedupe_key: Optional[str] = None,
+                max_attempts: int = JOB_MAX_ATTEMPTS, delay: float = 0.0,
+                dedupe_running: bool = True) -> int:
+        """
+        ジョブを登録
+
+        Args:
+            kind: ジョブ種別（ワーカーのハンドラ名）
+            payload: JSONシリアライズ可能な引数
+            dedupe_key: 同じキーの未完了ジョブがあれば登録せずそのIDを返す
+            max_attempts: 最大試行回数（超えたら dead）
+            delay: 実行可能になるまでの秒数
+            dedupe_running: Falseなら実行中の同一キーのジョブがあっても登録する
+                            （「変更を確認する」ジョブのように、実行開始後の通知を取りこぼさないため）
+
+        Returns:
+            int: ジョブID
+        """
+        now = self._clock()
+        statuses = "('queued', 'running')" if dedupe_running else "('queued')"
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if dedupe_key is not None:
+                row = conn.execute(
+                    f"SELECT id FROM jobs WHERE dedupe_key = ? AND status IN {statuses}",
+                    (dedupe_key,)
+                ).fetchone()
+                if row:
+                    conn.execute("COMMIT")
+                    return row["id"]
+
+            cursor = conn.execute(
+                """
+                INSERT INTO jobs (kind, payload, dedupe_key, status, attempts, max_attempts,
+                                  available_at, created_at, updated_at)
+                VALUES (?, ?, ?, 'queued', 0, ?, ?, ?, ?)
+                """,
+                (kind, json.dumps(payload, ensure_ascii=False), dedupe_key, max_attempts,
+                 now + delay, now, now)
+            )
+            conn.execute("COMMIT")
+            return cursor.lastrowid
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def claim(self, worker_id: str, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT,
+              kinds: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        実行可能なジョブを1件取得してリースする
+
+        実行可能: queued かつ available_at を過ぎたもの、または running のままリース期限切れのもの
+        （ワーカーがクラッシュしたジョブ）
+
+        Args:
+            worker_id: ワーカー識別子
+            visibility_timeout: リース秒数
+            kinds: 取得するジョブ種別（Noneなら全て）
+
+        Returns:
+            dict or None: ジョブ（attemptsは今回の試行を含む）
+        """
+        now = self._clock()
+        kind_filter = ""
+        params: List[Any] = [now, now]
+        if kinds:
+            kind_filter = f"AND kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # リース切れのまま試行回数を使い切ったジョブ（処理中にプロセスが落ち続ける）は dead
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'dead', locked_until = NULL, updated_at = ?,
+                                last_error = COALESCE(last_error, 'lease expired (worker crashed)')
+                WHERE status = 'running' AND locked_until < ? AND attempts >= max_attempts
+                """,
+                (now, now)
+            )
+            row = conn.execute(
+                f"""
+                SELECT * FROM jobs
+                WHERE ((status = 'queued' AND available_at <= ?)
+                       OR (status = 'running' AND locked_until < ?))
+                  {kind_filter}
+                ORDER BY available_at, id
+                LIMIT 1
+                """,
+                params
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_until = ?,
+                                worker_id = ?, updated_at = ?
+                WHERE id = ?
+                """,
+                (now + visibility_timeout, worker_id, now, row["id"])
+            )
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            conn.execute("COMMIT")
+            return self._to_dict(job)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def extend(self, job_id: int, worker_id: str, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT) -> bool:
+        """
+        リースを延長（実行中のワーカーが定期的に呼ぶ）
+
+        Returns:
+            bool: 延長できればTrue（他ワーカーに再取得されていればFalse）
+        """
+        now = self._clock()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET locked_until = ?, updated_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (now + visibility_timeout, now, job_id, worker_id)
+            )
+            return cursor.rowcount > 0
+
+    def complete(self, job_id: int, worker_id: str):
+        """ジョブを完了にする"""
+        now = self._clock()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', locked_until = NULL, last_error = NULL, updated_at = ? "
+                "WHERE id = ? AND worker_id = ?",
+                (now, job_id, worker_id)
+            )
+
+    def fail(self, job_id: int, worker_id: str, error: str, retry_delay: float) -> str:
+        """
+        ジョブの失敗を記録（試行回数が残っていれば再キュー、なければ dead）
+
+        Args:
+            job_id: ジョブID
+            worker_id: ワーカー識別子
+            error: エラーメッセージ
+            retry_delay: 再試行までの秒数
+
+        Returns:
+            str: 更新後のステータス（"queued" / "dead" / "superseded"）
+                 "superseded": 実行中に同じ dedupe_key のジョブが登録済み（dedupe_running=False）のため、
+                 再キューせず done にした（再試行は登録済みのジョブが兼ねる）
+        """
+        now = self._clock()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT attempts, max_attempts, dedupe_key FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return "dead"
+
+            status = "dead" if row["attempts"] >= row["max_attempts"] else "queued"
+            if status == "queued" and row["dedupe_key"] is not None:
+                pending = conn.execute(
+                    "SELECT id FROM jobs WHERE dedupe_key = ? AND status = 'queued' AND id != ?",
+                    (row["dedupe_key"], job_id)
+                ).fetchone()
+                if pending:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'done', locked_until = NULL, last_error = ?, updated_at = ? "
+                        "WHERE id = ? AND worker_id = ?",
+                        (f"{error[:1900]} (superseded by job {pending['id']})", now, job_id, worker_id)
+                    )
+                    conn.execute("COMMIT")
+                    return "superseded"
+
+            conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, locked_until = NULL, last_error = ?, updated_at = ? "
+                "WHERE id = ? AND worker_id = ?",
+                (status, now + retry_delay, error[:2000], now, job_id, worker_id)
+            )
+            conn.execute("COMMIT")
+            return status
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def retry_dead(self, job_id: Optional[int] = None) -> int:
+        """
+        dead のジョブを再キュー（試行回数はリセット）
+
+        Args:
+            job_id: 対象ジョブID（Noneなら全ての dead ジョブ）
+
+        Returns:
+            int: 再キューした件数（同じ dedupe_key の未実行ジョブが既にあるものはスキップ）
+        """
+        now = self._clock()
+        query = "SELECT id FROM jobs WHERE status = 'dead'"
+        params: List[Any] = []
+        if job_id is not None:
+            query += " AND id = ?"
+            params.append(job_id)
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            requeued = 0
+            # 1件ずつ更新し、一意制約に当たったジョブだけを飛ばす（一括UPDATEだと全件失敗する）
+            for row in conn.execute(query, params).fetchall():
+                try:
+                    requeued += conn.execute(
+                        "UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, updated_at = ? "
+                        "WHERE id = ? AND status = 'dead'",
+                        (now, now, row["id"])
+                    ).rowcount
+                except sqlite3.IntegrityError:
+                    continue
+            conn.execute("COMMIT")
+            return requeued
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """ジョブを取得"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return self._to_dict(row) if row else None
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """ジョブ一覧（新しい順）"""
+        with closing(self._connect()) as conn:
+            if status:
+                rows = conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?",
+                                    (status, limit)).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+            return [self._to_dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        """ステータス別の件数"""
+        counts = {status: 0 for status in STATUSES}
+        with closing(self._connect()) as conn:
+            for row in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+                counts[row["status"]] = row["n"]
+        return counts
+
+    def purge_done(self, older_than: float = 7 * 86400) -> int:
+        """完了から指定秒数以上経過した done ジョブを削除"""
+        with closing(self._connect()) as conn:
+            return conn.execute("DELETE FROM jobs WHERE status = 'done' AND updated_at < ?",
+                                (self._clock() - older_than,)).rowcount
+
+
+def retry_delay(attempts: int, base: float = JOB_BACKOFF_BASE, maximum: float = JOB_BACKOFF_MAX) -> float:
+    """試行回数に応じた再試行待機秒数（指数バックオフ + ジッター）"""
+    delay = min(maximum, base * (2 ** max(0, attempts - 1)))
+    return delay + random.uniform(0, delay * 0.1)
+
+
+class JobWorkerPool:
+    """JobQueue から取得したジョブを固定数のスレッドで実行する"""
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, Callable[[Dict[str, Any]], Any]],
+                 num_workers: int = JOB_WORKERS, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT,
+                 poll_interval: float = JOB_POLL_INTERVAL, name: str = "worker"):
+        """
+        Args:
+            queue: ジョブキュー
+            handlers: {kind: handler(payload)}（失敗時は例外を送出）
+            num_workers: ワーカースレッド数（スループットの調整値）
+            visibility_timeout: リース秒数（実行中は1/3ごとに延長）
+            poll_interval: キューが空のときのポーリング間隔（秒）
+            name: ワーカー名の接頭辞（ログ・worker_id用）
+        """
+        self.queue = queue
+        self.handlers = handlers
+        self.num_workers = num_workers
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.name = name
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._instance = uuid.uuid4().hex[:8]
+
+    def start(self):
+        """ワーカースレッドを起動"""
+        self._stop.clear()
+        for i in range(self.num_workers):
+            worker_id = f"{self.name}-{self._instance}-{i}"
+            thread = threading.Thread(target=self._run, args=(worker_id,), name=worker_id, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"[JobQueue] {self.num_workers} worker(s) started ({', '.join(self.handlers)})", flush=True)
+
+    def stop(self, timeout: Optional[float] = None):
+        """新規取得を止め、実行中のジョブの完了を待つ"""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """新規ジョブ登録を通知（ポーリング待機を打ち切る）"""
+        self._wakeup.set()
+
+    def _keep_alive(self, job_id: int, worker_id: str, done: threading.Event):
+        """実行中のジョブのリースを定期的に延長"""
+        while not done.wait(self.visibility_timeout / 3):
+            try:
+                self.queue.extend(job_id, worker_id, self.visibility_timeout)
+            except Exception as e:
+                print(f"[JobQueue] ⚠️ Lease extension failed for job {job_id}: {e}", flush=True)
+
+    def _run(self, worker_id: str):
+        kinds = list(self.handlers)
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(worker_id, self.visibility_timeout, kinds=kinds)
+            except Exception as e:
+                print(f"[JobQueue] ⚠️ Claim failed: {e}", flush=True)
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            self._execute(job, worker_id)
+
+    def _execute(self, job: Dict[str, Any], worker_id: str):
+        job_id = job["id"]
+        label = f"job {job_id} ({job['kind']}, attempt {job['attempts']}/{job['max_attempts']})"
+        print(f"[JobQueue] ▶ {label}", flush=True)
+
+        done = threading.Event()
+        keeper = threading.Thread(target=self._keep_alive, args=(job_id, worker_id, done), daemon=True)
+        keeper.start()
+        started = time.perf_counter()
+        try:
+            self.handlers[job["kind"]](job["payload"])
+        except Exception as e:
+            done.set()
+            error = f"{type(e).__name__}: {e}"
+            delay = retry_delay(job["attempts"])
+            try:
+                status = self.queue.fail(job_id, worker_id, error, delay)
+            except Exception as record_error:
+                # 記録に失敗してもワーカーは止めない（リース期限切れ後に再取得される）
+                print(f"[JobQueue] ⚠️ {label} failed ({error}), could not record failure: {record_error}",
+                      flush=True)
+            else:
+                if status == "dead":
+                    print(f"[JobQueue] ☠️ {label} moved to dead-letter: {error}", flush=True)
+                elif status == "superseded":
+                    print(f"[JobQueue] ✗ {label} failed: {error} (newer queued job will retry)", flush=True)
+                else:
+                    print(f"[JobQueue] ✗ {label} failed: {error} (retry in {delay:.0f}s)", flush=True)
+        else:
+            done.set()
+            try:
+                self.queue.complete(job_id, worker_id)
+            except Exception as record_error:
+                print(f"[JobQueue] ⚠️ {label} done, could not record completion: {record_error}", flush=True)
+            else:
+                print(f"[JobQueue] ✓ {label} done ({time.perf_counter() - started:.1f}s)", flush=True)
+        finally:
+            keeper.join()
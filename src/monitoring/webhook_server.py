@@ -6,7 +6,6 @@ Monitors My Drive root for audio files
 """
 
 import os
-import subprocess
 from pathlib import Path
 from fastapi import FastAPI, Request
 from google.oauth2.credentials import Credentials
@@ -14,14 +13,17 @@ from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 import io
 import json
-from datetime import datetime, timedelta
+import tempfile
 import threading
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from filelock import FileLock, Timeout
 import time
 
 # Phase 10-3: Unified registry for duplicate detection
 from src.file_management import unified_registry as registry
+from src.monitoring.job_queue import JOB_WORKERS, JobQueue, JobWorkerPool
+from src.transcription.transcription_worker import get_transcription_pool
 
 # Load environment variables
 load_dotenv()
@@ -41,6 +43,18 @@ LOCK_DIR.mkdir(exist_ok=True)
 # Webhook notification channel will expire after this duration
 CHANNEL_EXPIRATION_HOURS = int(os.getenv('CHANNEL_EXPIRATION_HOURS', '24'))
 
+# Notifications arriving within this window are answered by a single changes fetch
+DRIVE_CHANGES_DEBOUNCE = float(os.getenv('DRIVE_CHANGES_DEBOUNCE', '3'))
+CHANGES_PAGE_SIZE = 100
+
+# Serializes changes fetches so two workers never read from the same page token
+_changes_lock = threading.Lock()
+_folder_ids = {}  # {'root': actual folder ID}
+
+# Durable job queue shared by the webhook handler and the worker pool (started on startup)
+job_queue = JobQueue()
+worker_pool = None
+
 
 def cleanup_old_locks():
     """Remove stale lock files on startup (handles abnormal termination cases)"""
@@ -89,9 +103,70 @@ def get_start_page_token(service):
 
 
 def save_page_token(token):
-    """Save page token for next changes check"""
-    with open(PAGE_TOKEN_FILE, 'w') as f:
-        f.write(token)
+    """Save page token for next changes check (atomic: temp file + rename)"""
+    directory = os.path.dirname(os.path.abspath(PAGE_TOKEN_FILE))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.page_token_', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(token)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, PAGE_TOKEN_FILE)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def resolve_folder_id(service, folder_id):
+    """Resolve an alias such as 'root' to the real folder ID (as it appears in file parents)"""
+    if folder_id not in _folder_ids:
+        _folder_ids[folder_id] = service.files().get(fileId=folder_id, fields='id').execute()['id']
+    return _folder_ids[folder_id]
+
+
+def fetch_changes(service, page_token):
+    """
+    Read all changes since page_token, following nextPageToken pagination
+
+    Returns:
+        (changes, new_start_page_token)
+    """
+    changes = []
+    token = page_token
+    while True:
+        response = service.changes().list(
+            pageToken=token,
+            spaces='drive',
+            pageSize=CHANGES_PAGE_SIZE,
+            includeRemoved=False,
+            fields='nextPageToken, newStartPageToken, '
+                   'changes(fileId, removed, file(id, name, mimeType, parents, trashed))'
+        ).execute()
+        changes.extend(response.get('changes', []))
+
+        if 'nextPageToken' in response:
+            token = response['nextPageToken']
+            continue
+        return changes, response.get('newStartPageToken', token)
+
+
+def list_audio_files(service, folder_id):
+    """List every audio file in the folder (initial sync when no page token is saved yet)"""
+    files = []
+    page_token = None
+    while True:
+        response = service.files().list(
+            q=f"'{folder_id}' in parents and mimeType contains 'audio/' and trashed=false",
+            spaces='drive',
+            fields='nextPageToken, files(id, name, mimeType)',
+            orderBy='createdTime desc',
+            pageToken=page_token
+        ).execute()
+        files.extend(response.get('files', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return files
 
 
 def get_processed_files():
@@ -128,157 +203,181 @@ def download_file(service, file_id, file_name):
 
 
 def transcribe_file(audio_path):
-    """Call structured_transcribe.py to transcribe (Gemini Audio API)"""
-    cmd = [
-        'venv/bin/python',
-        '-m',
-        'src.transcription.structured_transcribe',
-        str(audio_path)
-    ]
-
-    result = subprocess.run(cmd, capture_output=True, text=True, env=os.environ.copy())
-
-    # Always log subprocess output for debugging (flush=True for thread safety)
-    print(f"[Debug] Transcription subprocess completed", flush=True)
-    print(f"[Debug] Exit code: {result.returncode}", flush=True)
-
-    if result.stdout:
-        print(f"[Debug] STDOUT:\n{result.stdout}", flush=True)
-
-    if result.stderr:
-        print(f"[Debug] STDERR:\n{result.stderr}", flush=True)
-
-    if result.returncode != 0:
-        error_msg = f"Transcription failed with exit code {result.returncode}\n"
-        error_msg += f"STDERR: {result.stderr}\n"
-        error_msg += f"STDOUT: {result.stdout}"
-        print(f"[Error] {error_msg}", flush=True)
-        raise Exception(error_msg)
-
-    return result.stdout
+    """
+    Transcribe via the resident worker pool (Gemini Audio API)
+
+    Returns the structured result of structured_transcribe.transcribe_file()
+    (json_path, audio_path after rename, segment/speaker counts, ...).
+    Raises TranscriptionFailed so the job is retried by the queue.
+    """
+    result = get_transcription_pool().transcribe(audio_path)
+    print(
+        f"  ✅ Transcribed: {Path(result['json_path']).name} "
+        f"({result['segment_count']} segments, {result['speaker_count']} speakers, "
+        f"{result['elapsed_seconds']:.1f}s)",
+        flush=True
+    )
+    return result
 
 
 def process_new_files(service, folder_id='root'):
-    """Process new audio files in My Drive root"""
-    print(f"[Debug] process_new_files called with folder_id={folder_id}", flush=True)
-    processed_files = get_processed_files()
-    print(f"[Debug] Loaded {len(processed_files)} processed files", flush=True)
-
-    # Get all audio files in My Drive root
-    query = f"'{folder_id}' in parents and mimeType contains 'audio/' and trashed=false"
-    print(f"[Debug] Query: {query}", flush=True)
-    results = service.files().list(
-        q=query,
-        spaces='drive',
-        fields='files(id, name, mimeType)',
-        orderBy='createdTime desc'
-    ).execute()
-
-    audio_files = results.get('files', [])
-    print(f"[Debug] Found {len(audio_files)} total audio files", flush=True)
-    new_files = [f for f in audio_files if f['id'] not in processed_files]
-    print(f"[Debug] Found {len(new_files)} new files after filtering", flush=True)
-
-    if not new_files:
-        print("[Debug] No new files to process, returning", flush=True)
-        return
-
+    """
+    Enqueue one 'drive_file' job per new audio file in the folder
+
+    Reads only what changed since the saved page token (changes().list), so the cost
+    of a notification is proportional to the number of changes, not to the size of
+    the Drive. Without a saved token the folder is listed once and a start token is
+    saved. The new token is saved only after the jobs are enqueued (at-least-once).
+    """
+    with _changes_lock:
+        if os.path.exists(PAGE_TOKEN_FILE):
+            page_token = get_start_page_token(service)
+            changes, new_token = fetch_changes(service, page_token)
+            parent_id = resolve_folder_id(service, folder_id)
+            audio_files = [
+                change['file'] for change in changes
+                if not change.get('removed') and change.get('file')
+                and change['file'].get('mimeType', '').startswith('audio/')
+                and not change['file'].get('trashed')
+                and parent_id in change['file'].get('parents', [])
+            ]
+            print(f"[Webhook] {len(changes)} change(s), {len(audio_files)} audio file(s) in folder", flush=True)
+        else:
+            # Initial sync: take the token first so nothing added during the listing is missed
+            new_token = service.changes().getStartPageToken().execute()['startPageToken']
+            audio_files = list_audio_files(service, folder_id)
+            print(f"[Webhook] Initial sync: {len(audio_files)} audio file(s) in folder", flush=True)
+
+        processed_files = get_processed_files()
+        new_files = list({f['id']: f for f in audio_files if f['id'] not in processed_files}.values())
+
+        if new_files:
+            _enqueue_drive_files(new_files)
+        save_page_token(new_token)
+
+
+def _enqueue_drive_files(new_files):
+    """Enqueue 'drive_file' jobs (deduplicated by file ID)"""
     print(f"\n[Webhook] Found {len(new_files)} new file(s)", flush=True)
 
     for file_info in new_files:
-        file_id = file_info['id']
-        file_name = file_info['name']
+        job_id = job_queue.enqueue(
+            'drive_file',
+            {'file_id': file_info['id'], 'file_name': file_info['name']},
+            dedupe_key=f"drive_file:{file_info['id']}"
+        )
+        print(f"[Queue] {file_info['name']} → job {job_id}", flush=True)
+
+    if worker_pool is not None:
+        worker_pool.notify()
+
+
+def process_drive_file(service, file_id, file_name):
+    """
+    Download, transcribe and clean up one Drive audio file (job handler body)
+
+    Raises on failure so the job queue retries with backoff. Safe to re-run after a
+    crash: a registry entry with the same file_id is treated as an unfinished attempt,
+    not as a duplicate.
+    """
+    if file_id in get_processed_files():
+        print(f"[Skip] {file_name} already processed", flush=True)
+        return
 
-        # Lock file path for this specific file
-        lock_path = LOCK_DIR / f"{file_id}.lock"
-        lock = FileLock(lock_path, timeout=1)
+    # Lock file path for this specific file
+    lock_path = LOCK_DIR / f"{file_id}.lock"
+    lock = FileLock(lock_path, timeout=1)
 
-        try:
-            # Try to acquire lock (non-blocking with 0.1s timeout)
-            with lock.acquire(timeout=0.1):
-                print(f"\n[Processing] {file_name} (ID: {file_id})", flush=True)
+    try:
+        # Try to acquire lock (non-blocking with 0.1s timeout)
+        with lock.acquire(timeout=0.1):
+            print(f"\n[Processing] {file_name} (ID: {file_id})", flush=True)
+
+            try:
+                # Download
+                print(f"[1/4] Downloading...", flush=True)
+                audio_path = download_file(service, file_id, file_name)
+                print(f"  Saved to: {audio_path}", flush=True)
+
+                # [Phase 10-3] Extract user display name (filename without extension) and check for duplicates
+                print(f"[2/4] Checking for duplicates...", flush=True)
+                user_display_name = Path(file_name).stem  # 拡張子なし
+                print(f"  User display name: {user_display_name}", flush=True)
+
+                existing = registry.get_by_display_name(user_display_name) if registry.is_processed(user_display_name) else None
+                if existing and existing.get('file_id') == file_id:
+                    # Registered by an earlier attempt of this job that did not finish: resume
+                    print(f"  ↻ Resuming earlier attempt (already registered)", flush=True)
+                elif existing:
+                    print(f"  ⚠️ DUPLICATE DETECTED - Already processed:", flush=True)
+                    print(f"    Source: {existing.get('source')}", flush=True)
+                    print(f"    Original: {existing.get('original_name')}", flush=True)
+                    print(f"    Display name: {user_display_name}", flush=True)
+                    print(f"    Processed at: {existing.get('processed_at')}", flush=True)
+                    print(f"  ➡️ Skipping transcription, deleting files (local + cloud)", flush=True)
+
+                    # Delete duplicate downloaded file
+                    if audio_path.exists():
+                        audio_path.unlink()
+                        print(f"  ✅ Local file deleted", flush=True)
+
+                    # [Phase 10-3.1] Delete duplicate file from Google Drive
+                    try:
+                        from src.file_management.cloud_file_manager import (
+                            delete_gdrive_file,
+                            log_deletion,
+                            get_file_size_mb
+                        )
 
-                try:
-                    # Download
-                    print(f"[1/4] Downloading...", flush=True)
-                    audio_path = download_file(service, file_id, file_name)
-                    print(f"  Saved to: {audio_path}", flush=True)
-
-                    # [Phase 10-3] Extract user display name (filename without extension) and check for duplicates
-                    print(f"[2/4] Checking for duplicates...", flush=True)
-                    user_display_name = Path(file_name).stem  # 拡張子なし
-                    print(f"  User display name: {user_display_name}", flush=True)
-
-                    if registry.is_processed(user_display_name):
-                        existing = registry.get_by_display_name(user_display_name)
-                        print(f"  ⚠️ DUPLICATE DETECTED - Already processed:", flush=True)
-                        print(f"    Source: {existing.get('source')}", flush=True)
-                        print(f"    Original: {existing.get('original_name')}", flush=True)
-                        print(f"    Display name: {user_display_name}", flush=True)
-                        print(f"    Processed at: {existing.get('processed_at')}", flush=True)
-                        print(f"  ➡️ Skipping transcription, deleting files (local + cloud)", flush=True)
-
-                        # Delete duplicate downloaded file
-                        if audio_path.exists():
-                            audio_path.unlink()
-                            print(f"  ✅ Local file deleted", flush=True)
-
-                        # [Phase 10-3.1] Delete duplicate file from Google Drive
+                        # Get file size for logging
+                        file_size_mb = get_file_size_mb(service, file_id)
+
+                        # Delete from Google Drive
+                        delete_gdrive_file(service, file_id, file_name)
+                        print(f"  ✅ Google Drive duplicate file deleted: {file_id}", flush=True)
+
+                        # Log deletion event (with duplicate flag)
+                        log_deletion(
+                            file_info={
+                                'file_id': file_id,
+                                'file_name': file_name,
+                                'original_name': file_name,
+                                'file_size_mb': file_size_mb,
+                                'renamed_to': None
+                            },
+                            validation_results={
+                                'duplicate': True,
+                                'original_source': existing.get('source'),
+                                'original_processed_at': existing.get('processed_at')
+                            },
+                            deleted=True,
+                            error=None
+                        )
+                    except Exception as delete_error:
+                        print(f"  ⚠️ Failed to delete duplicate from Google Drive: {delete_error}", flush=True)
+                        # Log deletion failure
                         try:
-                            from src.file_management.cloud_file_manager import (
-                                delete_gdrive_file,
-                                log_deletion,
-                                get_file_size_mb
-                            )
-
-                            # Get file size for logging
-                            file_size_mb = get_file_size_mb(service, file_id)
-
-                            # Delete from Google Drive
-                            delete_gdrive_file(service, file_id, file_name)
-                            print(f"  ✅ Google Drive duplicate file deleted: {file_id}", flush=True)
-
-                            # Log deletion event (with duplicate flag)
                             log_deletion(
                                 file_info={
                                     'file_id': file_id,
                                     'file_name': file_name,
                                     'original_name': file_name,
-                                    'file_size_mb': file_size_mb,
+                                    'file_size_mb': 0,
                                     'renamed_to': None
                                 },
-                                validation_results={
-                                    'duplicate': True,
-                                    'original_source': existing.get('source'),
-                                    'original_processed_at': existing.get('processed_at')
-                                },
-                                deleted=True,
-                                error=None
+                                validation_results={'duplicate': True},
+                                deleted=False,
+                                error=str(delete_error)
                             )
-                        except Exception as delete_error:
-                            print(f"  ⚠️ Failed to delete duplicate from Google Drive: {delete_error}", flush=True)
-                            # Log deletion failure
-                            try:
-                                log_deletion(
-                                    file_info={
-                                        'file_id': file_id,
-                                        'file_name': file_name,
-                                        'original_name': file_name,
-                                        'file_size_mb': 0,
-                                        'renamed_to': None
-                                    },
-                                    validation_results={'duplicate': True},
-                                    deleted=False,
-                                    error=str(delete_error)
-                                )
-                            except:
-                                pass  # Best effort logging
-
-                        # Mark as processed in old system too
-                        mark_as_processed(file_id)
-                        continue
-
-                    # [Phase 10-3] Register in unified registry before processing
+                        except:
+                            pass  # Best effort logging
+
+                    # Mark as processed in old system too
+                    mark_as_processed(file_id)
+                    return
+
+                # [Phase 10-3] Register in unified registry before processing
+                if not existing:
                     print(f"  📝 Registering to unified registry...", flush=True)
                     registry.add_to_registry(
                         source='google_drive',
@@ -289,110 +388,107 @@ def process_new_files(service, folder_id='root'):
                         local_path=str(audio_path)
                     )
 
-                    # Transcribe
-                    print(f"[3/4] Transcribing and summarizing...", flush=True)
-                    output = transcribe_file(audio_path)
-                    print(output, flush=True)
+                # Transcribe
+                print(f"[3/4] Transcribing and summarizing...", flush=True)
+                result = transcribe_file(audio_path)
 
-                    # Mark as processed (before renaming, to prevent duplicate processing)
-                    print(f"[4/4] Marking as processed...", flush=True)
-                    mark_as_processed(file_id)
-                    print(f"  Added to {PROCESSED_FILE}", flush=True)
+                # Mark as processed (before renaming, to prevent duplicate processing)
+                print(f"[4/4] Marking as processed...", flush=True)
+                mark_as_processed(file_id)
+                print(f"  Added to {PROCESSED_FILE}", flush=True)
 
-                    # [Phase 10-1] Local rename is handled by structured_transcribe.py
-                    # [Phase 10-2] Google Drive file will be deleted, so no need to rename on cloud
+                # [Phase 10-1] Local rename is handled by structured_transcribe.py
+                # [Phase 10-2] Google Drive file will be deleted, so no need to rename on cloud
 
-                    # [Phase 10-2] Auto-delete cloud files (after transcription completed)
-                    # Always delete cloud files after successful transcription
-                    try:
-                        from src.file_management.cloud_file_manager import (
-                            SafeDeletionValidator,
-                            delete_gdrive_file,
-                            log_deletion,
-                            get_file_size_mb
-                        )
+                # [Phase 10-2] Auto-delete cloud files (after transcription completed)
+                # Always delete cloud files after successful transcription
+                try:
+                    from src.file_management.cloud_file_manager import (
+                        SafeDeletionValidator,
+                        delete_gdrive_file,
+                        log_deletion,
+                        get_file_size_mb
+                    )
+
+                    # Structured JSON written for this file (path after any rename)
+                    latest_json = Path(result['json_path']) if result.get('json_path') else None
+                    if latest_json and latest_json.exists():
+
+                        print(f"[Delete] Validating JSON integrity: {latest_json.name}", flush=True)
+
+                        # Validate JSON integrity before deletion
+                        validator = SafeDeletionValidator(latest_json)
+                        validation_passed = validator.validate()
+                        validation_results = validator.get_validation_details()
 
-                        # Find the most recent structured JSON file
-                        json_files = list(audio_path.parent.glob("*_structured.json"))
-                        if json_files:
-                            # Sort by modification time (newest first)
-                            json_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-                            latest_json = json_files[0]
-
-                            print(f"[Delete] Validating JSON integrity: {latest_json.name}", flush=True)
-
-                            # Validate JSON integrity before deletion
-                            validator = SafeDeletionValidator(latest_json)
-                            validation_passed = validator.validate()
-                            validation_results = validator.get_validation_details()
-
-                            if validation_passed:
-                                print(f"[Delete] ✅ Validation passed, deleting cloud file...", flush=True)
-
-                                # Get file size for logging
-                                file_size_mb = get_file_size_mb(service, file_id)
-
-                                # Delete from Google Drive
-                                deleted = False
-                                error = None
-                                try:
-                                    delete_gdrive_file(service, file_id, file_name)
-                                    deleted = True
-                                    print(f"  ✅ Google Drive file deleted: {file_id}", flush=True)
-                                except Exception as delete_error:
-                                    error = str(delete_error)
-                                    print(f"  ❌ Deletion failed: {error}", flush=True)
-
-                                # Log deletion event
-                                log_deletion(
-                                    file_info={
-                                        'file_id': file_id,
-                                        'file_name': file_name,
-                                        'original_name': file_name,
-                                        'file_size_mb': file_size_mb,
-                                        'json_path': latest_json
-                                    },
-                                    validation_results=validation_results,
-                                    deleted=deleted,
-                                    error=error
-                                )
-
-                            else:
-                                print(f"[Delete] ❌ Validation failed, keeping cloud file", flush=True)
-                                print(f"  Validation details: {validation_results}", flush=True)
-
-                                # Log failed validation
-                                log_deletion(
-                                    file_info={
-                                        'file_id': file_id,
-                                        'file_name': file_name,
-                                        'original_name': file_name,
-                                        'json_path': latest_json
-                                    },
-                                    validation_results=validation_results,
-                                    deleted=False,
-                                    error="Validation failed"
-                                )
+                        if validation_passed:
+                            print(f"[Delete] ✅ Validation passed, deleting cloud file...", flush=True)
+
+                            # Get file size for logging
+                            file_size_mb = get_file_size_mb(service, file_id)
+
+                            # Delete from Google Drive
+                            deleted = False
+                            error = None
+                            try:
+                                delete_gdrive_file(service, file_id, file_name)
+                                deleted = True
+                                print(f"  ✅ Google Drive file deleted: {file_id}", flush=True)
+                            except Exception as delete_error:
+                                error = str(delete_error)
+                                print(f"  ❌ Deletion failed: {error}", flush=True)
+
+                            # Log deletion event
+                            log_deletion(
+                                file_info={
+                                    'file_id': file_id,
+                                    'file_name': file_name,
+                                    'original_name': file_name,
+                                    'file_size_mb': file_size_mb,
+                                    'json_path': latest_json
+                                },
+                                validation_results=validation_results,
+                                deleted=deleted,
+                                error=error
+                            )
 
                         else:
-                            print(f"[Delete] Skipped: No structured JSON files found", flush=True)
+                            print(f"[Delete] ❌ Validation failed, keeping cloud file", flush=True)
+                            print(f"  Validation details: {validation_results}", flush=True)
 
-                    except Exception as e:
-                        print(f"[Warning] Auto-delete failed: {e}", flush=True)
-                        print(f"  Cloud file is preserved", flush=True)
-                        import traceback
-                        print(f"  Traceback: {traceback.format_exc()}", flush=True)
+                            # Log failed validation
+                            log_deletion(
+                                file_info={
+                                    'file_id': file_id,
+                                    'file_name': file_name,
+                                    'original_name': file_name,
+                                    'json_path': latest_json
+                                },
+                                validation_results=validation_results,
+                                deleted=False,
+                                error="Validation failed"
+                            )
 
-                    print(f"[✓] Completed: {file_name}", flush=True)
+                    else:
+                        print(f"[Delete] Skipped: Structured JSON not found", flush=True)
 
                 except Exception as e:
-                    print(f"[✗] Error processing {file_name}: {e}", flush=True)
-                    continue
+                    print(f"[Warning] Auto-delete failed: {e}", flush=True)
+                    print(f"  Cloud file is preserved", flush=True)
+                    import traceback
+                    print(f"  Traceback: {traceback.format_exc()}", flush=True)
+
+                print(f"[✓] Completed: {file_name}", flush=True)
+
+            except Exception as e:
+                print(f"[✗] Error processing {file_name}: {e}", flush=True)
+                raise
+
+    except Timeout:
+        # Another process is already processing this file; let the queue retry later
+        raise RuntimeError(f"{file_name} is being processed by another worker")
+
 
-        except Timeout:
-            # Another thread is already processing this file
-            print(f"[Skip] {file_name} is being processed by another thread", flush=True)
-            continue
 
 
 def setup_webhook(service, folder_id, webhook_url):
@@ -409,8 +505,9 @@ def setup_webhook(service, folder_id, webhook_url):
     }
 
     # Watch for changes
+    # The saved page token is owned by process_new_files (initial sync runs when it is absent)
     response = service.changes().watch(
-        pageToken=get_start_page_token(service),
+        pageToken=service.changes().getStartPageToken().execute()['startPageToken'],
         body=body
     ).execute()
 
@@ -451,35 +548,29 @@ async def receive_webhook(request: Request):
         return {"status": "ok"}
 
     if resource_state in ['change', 'update']:
-        # Process changes in background using thread
-        print("[Debug] Starting background thread for checking changes...")
-        thread = threading.Thread(target=check_for_changes_sync)
-        thread.daemon = True
-        thread.start()
+        # Enqueue a change check and return immediately; a burst of notifications
+        # collapses into a single queued check (delayed by the debounce window)
+        job_id = job_queue.enqueue('drive_check', {}, dedupe_key='drive_check', dedupe_running=False,
+                                   delay=DRIVE_CHANGES_DEBOUNCE)
+        print(f"[Queue] Change check queued (job {job_id})")
+        if worker_pool is not None:
+            worker_pool.notify()
+        return {"status": "queued", "job_id": job_id}
 
     return {"status": "ok"}
 
 
-def check_for_changes_sync():
-    """Check for changes and process new files (synchronous version for threading)"""
-    try:
-        print("[Webhook] Checking for changes...", flush=True)
-        print("[Debug] Getting Drive service...", flush=True)
-        service = get_drive_service()
-        print("[Debug] Got Drive service successfully", flush=True)
-
-        folder_id = get_root_folder_id()
-        print(f"[Debug] Folder ID: {folder_id}", flush=True)
+def check_for_changes_sync(payload=None):
+    """Check for changes and enqueue new files ('drive_check' job handler)"""
+    print("[Webhook] Checking for changes...", flush=True)
+    service = get_drive_service()
+    folder_id = get_root_folder_id()
+    process_new_files(service, folder_id)
 
-        # Process new files
-        print("[Debug] Calling process_new_files...", flush=True)
-        process_new_files(service, folder_id)
-        print("[Debug] process_new_files completed", flush=True)
 
-    except Exception as e:
-        print(f"[Error] Exception in check_for_changes: {e}", flush=True)
-        import traceback
-        traceback.print_exc()
+def handle_drive_file(payload):
+    """'drive_file' job handler"""
+    process_drive_file(get_drive_service(), payload['file_id'], payload['file_name'])
 
 
 @app.on_event("startup")
@@ -495,15 +586,68 @@ async def startup_event():
     print("[Startup] Cleaning up stale lock files...")
     cleanup_old_locks()
 
+    # Checkpoint the registry WAL and reclaim free pages (registry is shared with the iCloud monitor)
+    try:
+        sizes = registry.compact()
+        print(f"[Startup] Registry compacted: {sizes['before_bytes']:,} -> {sizes['after_bytes']:,} bytes")
+    except Exception as e:
+        print(f"[Warning] Registry compaction skipped: {e}")
+
+    # Start the worker pool (jobs left over from a previous run are picked up again)
+    global worker_pool
+    worker_pool = JobWorkerPool(
+        job_queue,
+        {'drive_check': check_for_changes_sync, 'drive_file': handle_drive_file},
+        num_workers=JOB_WORKERS,
+        name='webhook'
+    )
+    worker_pool.start()
+    print(f"[Startup] Job queue: {job_queue.stats()}")
+
+    # Start transcription workers now so the first file doesn't pay the import cost
+    get_transcription_pool().warm_up()
+
     # Note: Webhook URL needs to be set manually after ngrok starts
     print("[Info] Webhook setup will be done manually after getting ngrok URL")
     print("[Info] Use /setup endpoint to register webhook")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop taking new jobs (running jobs are re-queued after their lease expires if interrupted)"""
+    if worker_pool is not None:
+        worker_pool.stop(timeout=5)
+    get_transcription_pool().shutdown(wait=False)
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
-    return {"status": "running", "service": "Google Drive Webhook Server"}
+    return {"status": "running", "service": "Google Drive Webhook Server", "jobs": job_queue.stats()}
+
+
+@app.get("/jobs")
+async def list_jobs(status: str = None, limit: int = 50):
+    """Job queue status: counts per state and the most recent jobs"""
+    return {"stats": job_queue.stats(), "jobs": job_queue.list_jobs(status=status, limit=limit)}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: int):
+    """Single job status"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return {"status": "error", "message": f"Job {job_id} not found"}
+    return job
+
+
+@app.post("/jobs/retry")
+async def retry_dead_jobs(job_id: int = None):
+    """Re-queue dead-lettered jobs (all, or a single job)"""
+    count = job_queue.retry_dead(job_id)
+    if count and worker_pool is not None:
+        worker_pool.notify()
+    return {"status": "ok", "requeued": count}
 
 
 @app.get("/setup")
@@ -8,34 +8,14 @@ Phase 11-3: カレンダー参加者情報を統合した話者推論
 """
 
 import json
-import sys
-import os
-import re
-from pathlib import Path
-from typing import List, Dict, Optional
-import google.generativeai as genai
-from datetime import datetime
+from typing import List, Dict
 from dotenv import load_dotenv
 
+from src.shared.gemini_client import GeminiModel
+
 # .envファイルを読み込み
 load_dotenv()
 
-# Gemini API Key選択（デフォルト: 無料枠）
-USE_PAID_TIER = os.getenv("USE_PAID_TIER", "false").lower() == "true"
-if USE_PAID_TIER:
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY_PAID")
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY_PAID not set but USE_PAID_TIER=true")
-    print("ℹ️  Using PAID tier API key")
-else:
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY_FREE")
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY_FREE not set")
-    print("ℹ️  Using FREE tier API key (enhanced_speaker_inference)")
-
-genai.configure(api_key=GEMINI_API_KEY)
-
-
 def infer_speakers_with_participants(
     segments: List[Dict],
     calendar_participants: List[Dict] = None,
@@ -185,7 +165,7 @@ def infer_speakers_with_participants(
 - participants_mappingは可能な範囲で埋めてください。不明な場合は "Other" としてください。
 - カレンダー参加者情報がある場合は、それを最優先で活用してください。"""
 
-    model = genai.GenerativeModel('gemini-2.5-pro')
+    model = GeminiModel('gemini-2.5-pro')
 
     response = model.generate_content(
         prompt,
@@ -7,21 +7,19 @@ Phase 11-3: カレンダーdescriptionからの参加者情報抽出
 参加者情報を抽出します。
 """
 
-import google.generativeai as genai
 import json
 import re
-import os
 from typing import List, Dict
 from dotenv import load_dotenv
 
+from src.shared.gemini_client import GeminiModel, get_gemini_client, resolve_api_key
+
+# 敬称・役職削除（ParticipantsDB の別名インデックスと共通）
+from src.participants.name_normalization import normalize_participant_name  # noqa: F401
+
 # 環境変数の読み込み
 load_dotenv()
 
-# Gemini API設定（無料枠を使用）
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY_FREE")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-
 
 def extract_participants_from_description(description: str) -> List[Dict[str, str]]:
     """
@@ -45,11 +43,16 @@ def extract_participants_from_description(description: str) -> List[Dict[str, st
     if not has_participant_info:
         return []
 
-    if not GEMINI_API_KEY:
-        print("警告: GEMINI_API_KEYが設定されていません")
-        return []
+    # Gemini APIキー確認（Tierに応じたキー。キー不要のバックエンド・autoモードはリクエストごとにキーを選ぶ）
+    client = get_gemini_client()
+    if client.backend.requires_api_key and client.scheduler.mode != "auto":
+        try:
+            resolve_api_key()
+        except ValueError as e:
+            print(f"警告: {e}")
+            return []
 
-    model = genai.GenerativeModel("gemini-2.0-flash-exp")
+    model = GeminiModel("gemini-2.0-flash-exp")
 
     prompt = f"""
 以下の会議メモから参加者の情報を抽出してください。
@@ -128,33 +131,6 @@ def extract_participants_from_description(description: str) -> List[Dict[str, st
         return []
 
 
-def normalize_participant_name(name: str) -> str:
-    """
-    参加者名の正規化（敬称・役職削除）
-
-    Args:
-        name: 元の名前（例: "田中部長"）
-
-    Returns:
-        正規化された名前（例: "田中"）
-    """
-    # 役職・敬称のパターン
-    suffixes = [
-        'さん', '様', '氏', '君',
-        '部長', '課長', '係長', '主任', '担当',
-        '社長', '専務', '常務', '取締役', '役員',
-        '室長', 'グループリーダー', 'リーダー', 'マネージャー',
-        'さま'  # 「様」の別表記
-    ]
-
-    normalized = name
-    for suffix in suffixes:
-        if normalized.endswith(suffix):
-            normalized = normalized[:-len(suffix)]
-
-    return normalized.strip()
-
-
 if __name__ == "__main__":
     # テスト用サンプル
     print("=== extract_participants.py テスト ===\n")
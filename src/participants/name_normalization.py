@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+参加者名の正規化・別名キー生成
+
+ParticipantsDB の別名インデックス（participant_aliases）で使うキーを生成する。
+依存ライブラリなし（extract_participants と違い Gemini SDK をインポートしない）。
+
+- 敬称・役職の除去（「田中部長」→「田中」、「Tanaka-san」→「tanaka」）
+- 全角/半角・大文字/小文字・空白・記号の統一（NFKC）
+- カタカナ → ひらがな
+- かな → ローマ字（ヘボン式）と長音・表記ゆれの畳み込み（「さとう」「Satoh」「Sato」→「sato」）
+- 類似度検索用の文字bigram
+"""
+
+import re
+import unicodedata
+from typing import List, Set
+
+# 役職・敬称のパターン（末尾から除去）
+HONORIFIC_SUFFIXES = [
+    'さん', '様', '氏', '君',
+    '部長', '課長', '係長', '主任', '担当',
+    '社長', '専務', '常務', '取締役', '役員',
+    '室長', 'グループリーダー', 'リーダー', 'マネージャー',
+    'さま'  # 「様」の別表記
+]
+
+# ローマ字表記の敬称（区切り文字の後ろにある場合のみ除去: "Tanaka-san", "Sato sama"）
+_ROMAJI_HONORIFIC = re.compile(r'[\s\-_]+(san|sama|kun|chan|sensei|shi|dono)$', re.IGNORECASE)
+# 英語の敬称（先頭）
+_ENGLISH_TITLE = re.compile(r'^(mr|mrs|ms|miss|dr|prof)\.?\s+', re.IGNORECASE)
+# 比較時に無視する空白・記号
+_IGNORED_CHARS = re.compile(r"[\s\-_.,'’・･()（）「」\[\]]")
+
+_KANA_ROMAJI = {
+    'あ': 'a', 'い': 'i', 'う': 'u', 'え': 'e', 'お': 'o',
+    'か': 'ka', 'き': 'ki', 'く': 'ku', 'け': 'ke', 'こ': 'ko',
+    'が': 'ga', 'ぎ': 'gi', 'ぐ': 'gu', 'げ': 'ge', 'ご': 'go',
+    'さ': 'sa', 'し': 'shi', 'す': 'su', 'せ': 'se', 'そ': 'so',
+    'ざ': 'za', 'じ': 'ji', 'ず': 'zu', 'ぜ': 'ze', 'ぞ': 'zo',
+    'た': 'ta', 'ち': 'chi', 'つ': 'tsu', 'て': 'te', 'と': 'to',
+    'だ': 'da', 'ぢ': 'ji', 'づ': 'zu', 'で': 'de', 'ど': 'do',
+    'な': 'na', 'に': 'ni', 'ぬ': 'nu', 'ね': 'ne', 'の': 'no',
+    'は': 'ha', 'ひ': 'hi', 'ふ': 'fu', 'へ': 'he', 'ほ': 'ho',
+    'ば': 'ba', 'び': 'bi', 'ぶ': 'bu', 'べ': 'be', 'ぼ': 'bo',
+    'ぱ': 'pa', 'ぴ': 'pi', 'ぷ': 'pu', 'ぺ': 'pe', 'ぽ': 'po',
+    'ま': 'ma', 'み': 'mi', 'む': 'mu', 'め': 'me', 'も': 'mo',
+    'や': 'ya', 'ゆ': 'yu', 'よ': 'yo',
+    'ら': 'ra', 'り': 'ri', 'る': 'ru', 'れ': 're', 'ろ': 'ro',
+    'わ': 'wa', 'ゐ': 'i', 'ゑ': 'e', 'を': 'o', 'ん': 'n', 'ゔ': 'vu',
+    'ぁ': 'a', 'ぃ': 'i', 'ぅ': 'u', 'ぇ': 'e', 'ぉ': 'o', 'ゎ': 'wa',
+}
+_SMALL_Y = {'ゃ': 'a', 'ゅ': 'u', 'ょ': 'o'}
+
+
+def normalize_participant_name(name: str) -> str:
+    """
+    参加者名の正規化（敬称・役職削除）
+
+    Args:
+        name: 元の名前（例: "田中部長"）
+
+    Returns:
+        正規化された名前（例: "田中"）
+    """
+    normalized = name
+    for suffix in HONORIFIC_SUFFIXES:
+        if normalized.endswith(suffix):
+            normalized = normalized[:-len(suffix)]
+
+    return normalized.strip()
+
+
+def normalize_alias(name: str) -> str:
+    """
+    別名インデックス用の正規化（敬称除去・NFKC・小文字化・記号除去・カタカナ→ひらがな）
+
+    Args:
+        name: 元の名前（例: "タナカ部長", "Mr. Tanaka", "Tanaka-san"）
+
+    Returns:
+        str: 正規化された名前（例: "たなか", "tanaka"）
+    """
+    s = unicodedata.normalize('NFKC', name or '').strip()
+    s = _ENGLISH_TITLE.sub('', s)
+    s = _ROMAJI_HONORIFIC.sub('', s)
+    s = normalize_participant_name(s)
+    s = _IGNORED_CHARS.sub('', s.lower())
+    return ''.join(chr(ord(c) - 0x60) if 'ァ' <= c <= 'ヶ' else c for c in s)
+
+
+def kana_to_romaji(text: str) -> str:
+    """
+    ひらがなをヘボン式ローマ字に変換（かな以外の文字はそのまま）
+
+    Args:
+        text: ひらがな文字列（normalize_alias() の結果）
+
+    Returns:
+        str: ローマ字（例: "さとう" → "satou", "きょうこ" → "kyouko"）
+    """
+    result = []
+    double_next = False
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == 'っ':
+            double_next = True
+            i += 1
+            continue
+        if c == 'ー':
+            i += 1
+            continue
+
+        romaji = _KANA_ROMAJI.get(c, c)
+        nxt = text[i + 1] if i + 1 < len(text) else ''
+        if nxt in _SMALL_Y and romaji.endswith('i') and len(romaji) > 1:
+            stem = romaji[:-1]
+            romaji = (stem if stem in ('sh', 'ch', 'j') else stem + 'y') + _SMALL_Y[nxt]
+            i += 1
+
+        if double_next and romaji[0].isalpha() and romaji[0] not in 'aiueon':
+            romaji = romaji[0] + romaji
+        double_next = False
+
+        result.append(romaji)
+        i += 1
+
+    return ''.join(result)
+
+
+def fold_romaji(text: str) -> str:
+    """
+    ローマ字の表記ゆれを畳み込む（長音・マクロン・撥音のm表記）
+
+    "satou" / "satoh" / "satō" / "sato" → "sato"、"namba" → "nanba"
+
+    Args:
+        text: 小文字ローマ字
+
+    Returns:
+        str: 畳み込んだローマ字
+    """
+    text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    text = re.sub(r'oh(?=[^aiueo]|$)', 'o', text)
+    text = re.sub(r'o[ou]', 'o', text)
+    text = text.replace('uu', 'u')
+    return re.sub(r'm(?=[bpm])', 'n', text)
+
+
+def alias_keys(name: str) -> Set[str]:
+    """
+    名前から別名インデックスのキー集合を生成
+
+    正規化名に加え、かな・ローマ字の名前は畳み込んだローマ字キーも含める
+    （「サトウ」と「Satoh-san」が同じキー "sato" を持つ）。漢字は読みが分からないため正規化名のみ。
+
+    Args:
+        name: 元の名前
+
+    Returns:
+        set: キー集合（空の名前なら空集合）
+    """
+    normalized = normalize_alias(name)
+    if not normalized:
+        return set()
+
+    keys = {normalized}
+    romaji = fold_romaji(kana_to_romaji(normalized))
+    if romaji.isascii() and romaji.isalpha():
+        keys.add(romaji)
+    return keys
+
+
+def bigrams(key: str) -> List[str]:
+    """
+    類似度検索用の文字bigram（先頭・末尾を含む、重複なし）
+
+    Args:
+        key: 別名キー
+
+    Returns:
+        list: bigramのリスト（例: "田中" → ["^田", "田中", "中$"]）
+    """
+    padded = f"^{key}$"
+    return sorted({padded[i:i + 2] for i in range(len(padded) - 1)})
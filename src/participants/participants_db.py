@@ -8,10 +8,79 @@ Phase 11-3: 参加者データベース操作API
 
 import sqlite3
 import json
+import threading
 import uuid
 import os
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.participants.name_normalization import alias_keys, bigrams
+
+# スキーマのバージョン（participants_db.sql を変更したら上げる。DBの PRAGMA user_version と比較）
+# 2: 別名インデックス（participant_aliases / participant_alias_ngrams）
+SCHEMA_VERSION = 2
+
+# find_participants() の類似度しきい値（bigramのDice係数、0〜1）
+ALIAS_MATCH_THRESHOLD = float(os.getenv('PARTICIPANT_ALIAS_THRESHOLD', '0.6'))
+
+# 接続ごとの設定（WAL + synchronous=NORMAL でコミット時のfsyncを削減）
+CONNECTION_PRAGMAS = (
+    "PRAGMA busy_timeout=30000",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",  # 約8MB
+)
+
+# 固定SQL（sqlite3 の文キャッシュで再利用される）
+SQL_SELECT_FOR_UPSERT = (
+    "SELECT participant_id, display_names, notes FROM participants WHERE canonical_name = ?"
+)
+SQL_UPDATE_PARTICIPANT = """
+    UPDATE participants
+    SET display_names = ?,
+        organization = COALESCE(?, organization),
+        role = COALESCE(?, role),
+        email = COALESCE(?, email),
+        notes = ?,
+        updated_at = ?
+    WHERE participant_id = ?
+"""
+SQL_INSERT_PARTICIPANT = """
+    INSERT INTO participants (
+        participant_id, canonical_name, display_names,
+        organization, role, email, notes,
+        meeting_count, first_seen_at, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)
+"""
+SQL_INSERT_MEETING = """
+    INSERT INTO meetings (meeting_id, structured_file_path, calendar_event_id, meeting_date, meeting_title)
+    VALUES (?, ?, ?, ?, ?)
+"""
+SQL_INSERT_ATTENDANCE = """
+    INSERT OR IGNORE INTO participant_meetings (participant_id, meeting_id, attended_at)
+    VALUES (?, ?, ?)
+"""
+SQL_INCREMENT_MEETING_COUNT = (
+    "UPDATE participants SET meeting_count = meeting_count + 1 WHERE participant_id = ?"
+)
+SQL_SELECT_INFO = """
+    SELECT participant_id, canonical_name, display_names, organization,
+           role, email, notes, meeting_count, first_seen_at, updated_at
+    FROM participants
+"""
+SQL_SELECT_ID_BY_CANONICAL = "SELECT participant_id FROM participants WHERE canonical_name = ?"
+SQL_SELECT_IDS_BY_ALIAS = "SELECT DISTINCT participant_id FROM participant_aliases WHERE alias = ?"
+SQL_INSERT_ALIAS = (
+    "INSERT OR IGNORE INTO participant_aliases (alias, participant_id, gram_count) VALUES (?, ?, ?)"
+)
+SQL_INSERT_ALIAS_NGRAM = "INSERT OR IGNORE INTO participant_alias_ngrams (gram, alias) VALUES (?, ?)"
+
+# スレッドごとの接続（{db_path: sqlite3.Connection}）
+_local = threading.local()
+# スキーマ確認済みのDBパス（プロセス内で1回だけ確認）
+_schema_checked = set()
+_schema_lock = threading.Lock()
 
 
 class ParticipantsDB:
@@ -21,6 +90,8 @@ class ParticipantsDB:
         """
         データベース初期化
 
+        接続はスレッドごとに1本をインスタンス間で共有する（同じスレッドで何度生成しても再接続しない）。
+
         Args:
             db_path: データベースファイルパス
         """
@@ -32,101 +103,167 @@ class ParticipantsDB:
         """dataディレクトリが存在することを確認"""
         data_dir = os.path.dirname(self.db_path)
         if data_dir and not os.path.exists(data_dir):
-            os.makedirs(data_dir)
+            os.makedirs(data_dir, exist_ok=True)
+
+    def _conn(self) -> sqlite3.Connection:
+        """このスレッドの接続を取得（なければ作成）"""
+        connections = getattr(_local, "connections", None)
+        if connections is None:
+            connections = _local.connections = {}
+
+        conn = connections.get(self.db_path)
+        if conn is None:
+            # isolation_level=None: トランザクションは BEGIN IMMEDIATE で明示的に開始する
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                   cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            connections[self.db_path] = conn
+        return conn
+
+    def _transaction(self):
+        """書き込みトランザクション（開始時に書き込みロックを取得し、並行ワーカー間の競合を防ぐ）"""
+        return _Transaction(self._conn())
 
     def _init_db(self):
-        """データベース初期化（スキーマ作成）"""
-        conn = sqlite3.connect(self.db_path)
-
-        # SQLファイルからスキーマを読み込んで実行
-        import os
-        sql_path = os.path.join(os.path.dirname(__file__), "participants_db.sql")
-        with open(sql_path, "r", encoding="utf-8") as f:
-            schema_sql = f.read()
-            conn.executescript(schema_sql)
-
-        conn.close()
+        """データベース初期化（スキーマのバージョンが古い場合のみDDLを実行）"""
+        key = os.path.abspath(self.db_path)
+        if key in _schema_checked:
+            return
+
+        with _schema_lock:
+            if key in _schema_checked:
+                return
+
+            conn = self._conn()
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                # SQLファイルからスキーマを読み込んで実行（CREATE ... IF NOT EXISTS のため既存DBにも安全）
+                sql_path = os.path.join(os.path.dirname(__file__), "participants_db.sql")
+                with open(sql_path, "r", encoding="utf-8") as f:
+                    schema_sql = f.read()
+                conn.executescript(schema_sql)
+
+                with self._transaction() as cursor:
+                    if version < 2:
+                        # 既存参加者の別名インデックスを構築
+                        rows = cursor.execute(
+                            "SELECT participant_id, canonical_name, display_names FROM participants"
+                        ).fetchall()
+                        for participant_id, canonical_name, display_names in rows:
+                            names = [canonical_name] + (json.loads(display_names) if display_names else [])
+                            self._index_aliases(cursor, participant_id, names)
+                    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+            _schema_checked.add(key)
+
+    def close(self):
+        """このスレッドの接続を閉じる（次回の操作で再接続）"""
+        connections = getattr(_local, "connections", {})
+        conn = connections.pop(self.db_path, None)
+        if conn is not None:
+            conn.close()
+
+    @staticmethod
+    def _index_aliases(cursor: sqlite3.Cursor, participant_id: str, names: Iterable[str]):
+        """名前（canonical_name / display_names）を別名インデックスに登録"""
+        for name in names:
+            for key in alias_keys(name):
+                grams = bigrams(key)
+                cursor.execute(SQL_INSERT_ALIAS, (key, participant_id, len(grams)))
+                cursor.executemany(SQL_INSERT_ALIAS_NGRAM, [(gram, key) for gram in grams])
+
+    @staticmethod
+    def _resolve_participant_id(cursor: sqlite3.Cursor, name: str) -> Optional[str]:
+        """
+        名前から参加者IDを解決（canonical_name 完全一致 → 別名キー一致の順）
 
-    def upsert_participant(
-        self,
+        別名キーが複数の参加者に該当する場合は曖昧なので None を返す。
+        """
+        cursor.execute(SQL_SELECT_ID_BY_CANONICAL, (name,))
+        row = cursor.fetchone()
+        if row:
+            return row[0]
+
+        matched = set()
+        for key in alias_keys(name):
+            cursor.execute(SQL_SELECT_IDS_BY_ALIAS, (key,))
+            matched.update(r[0] for r in cursor.fetchall())
+        return matched.pop() if len(matched) == 1 else None
+
+    @staticmethod
+    def _has_note(existing_notes: str, note: str) -> bool:
+        """notesに同じ内容の行があるか（追記時の "[日時] " 接頭辞は無視）"""
+        for line in existing_notes.splitlines():
+            if line == note or (line.startswith("[") and line.split("] ", 1)[-1] == note):
+                return True
+        return False
+
+    @classmethod
+    def _upsert(
+        cls,
+        cursor: sqlite3.Cursor,
         canonical_name: str,
-        display_names: List[str] = None,
-        organization: str = None,
-        role: str = None,
-        email: str = None,
-        notes: str = None
+        display_names: Optional[List[str]],
+        organization: Optional[str],
+        role: Optional[str],
+        email: Optional[str],
+        notes: Optional[str],
+        now: str
     ) -> str:
         """
-        参加者情報を新規作成または更新（UPSERT）
+        トランザクション内で1件UPSERT（participant_idを返す）
 
-        Args:
-            canonical_name: 正規化名（必須）
-            display_names: 表記バリエーションリスト
-            organization: 組織名
-            role: 役職
-            email: メールアドレス
-            notes: メモ
-
-        Returns:
-            participant_id: 参加者ID（UUID）
+        canonical_name が未登録でも別名（「田中部長」「タナカさん」など）が既存参加者1人に一致すれば、
+        新規作成せずその参加者を更新し、canonical_name を display_names に追加する。
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # 既存参加者を検索
-        cursor.execute(
-            "SELECT participant_id, display_names, notes, meeting_count FROM participants WHERE canonical_name = ?",
-            (canonical_name,)
-        )
+        cursor.execute(SQL_SELECT_FOR_UPSERT, (canonical_name,))
         existing = cursor.fetchone()
+        extra_names = []
+
+        if not existing:
+            participant_id = cls._resolve_participant_id(cursor, canonical_name)
+            if participant_id:
+                cursor.execute(
+                    "SELECT participant_id, display_names, notes FROM participants WHERE participant_id = ?",
+                    (participant_id,)
+                )
+                existing = cursor.fetchone()
+                extra_names = [canonical_name]
 
         if existing:
             # UPDATE: 既存参加者の情報更新
-            participant_id, existing_names, existing_notes, meeting_count = existing
+            participant_id, existing_names, existing_notes = existing
 
-            # display_names のマージ（重複排除）
+            # display_names のマージ（重複排除、既存の順序を維持）
             existing_names_list = json.loads(existing_names) if existing_names else []
-            if display_names:
-                merged_names = list(set(existing_names_list + display_names))
-            else:
-                merged_names = existing_names_list
+            merged_names = list(dict.fromkeys(existing_names_list + extra_names + (display_names or [])))
 
-            # notes の追記
-            if notes and existing_notes:
-                merged_notes = f"{existing_notes}\n[{datetime.now().isoformat()}] {notes}"
+            # notes の追記（同じ内容がすでにあれば追記しない: パイプライン再実行で重複させない）
+            if notes and existing_notes and cls._has_note(existing_notes, notes):
+                merged_notes = existing_notes
+            elif notes and existing_notes:
+                merged_notes = f"{existing_notes}\n[{now}] {notes}"
             elif notes:
                 merged_notes = notes
             else:
                 merged_notes = existing_notes
 
-            cursor.execute("""
-                UPDATE participants
-                SET display_names = ?,
-                    organization = COALESCE(?, organization),
-                    role = COALESCE(?, role),
-                    email = COALESCE(?, email),
-                    notes = ?,
-                    updated_at = ?
-                WHERE participant_id = ?
-            """, (
+            cursor.execute(SQL_UPDATE_PARTICIPANT, (
                 json.dumps(merged_names, ensure_ascii=False),
                 organization,
                 role,
                 email,
                 merged_notes,
-                datetime.now().isoformat(),
+                now,
                 participant_id
             ))
+            cls._index_aliases(cursor, participant_id, merged_names)
         else:
             # INSERT: 新規参加者作成
             participant_id = str(uuid.uuid4())
-            cursor.execute("""
-                INSERT INTO participants (
-                    participant_id, canonical_name, display_names,
-                    organization, role, email, notes,
-                    meeting_count, first_seen_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+            cursor.execute(SQL_INSERT_PARTICIPANT, (
                 participant_id,
                 canonical_name,
                 json.dumps(display_names or [canonical_name], ensure_ascii=False),
@@ -134,15 +271,72 @@ class ParticipantsDB:
                 role,
                 email,
                 notes,
-                0,  # meeting_count
-                datetime.now().isoformat(),
-                datetime.now().isoformat()
+                now,
+                now
             ))
+            cls._index_aliases(cursor, participant_id, [canonical_name] + (display_names or []))
 
-        conn.commit()
-        conn.close()
         return participant_id
 
+    def upsert_participant(
+        self,
+        canonical_name: str,
+        display_names: List[str] = None,
+        organization: str = None,
+        role: str = None,
+        email: str = None,
+        notes: str = None
+    ) -> str:
+        """
+        参加者情報を新規作成または更新（UPSERT）
+
+        Args:
+            canonical_name: 正規化名（必須）
+            display_names: 表記バリエーションリスト
+            organization: 組織名
+            role: 役職
+            email: メールアドレス
+            notes: メモ
+
+        Returns:
+            participant_id: 参加者ID（UUID）
+        """
+        with self._transaction() as cursor:
+            return self._upsert(cursor, canonical_name, display_names, organization, role,
+                                email, notes, datetime.now().isoformat())
+
+    def upsert_participants(self, participants: Iterable[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        複数の参加者を1トランザクションでUPSERT
+
+        Args:
+            participants: upsert_participant() と同じキーを持つ辞書のリスト
+                          （canonical_name 必須、display_names / organization / role / email / notes は任意）
+
+        Returns:
+            dict: {canonical_name: participant_id}（canonical_name が空の要素は無視）
+        """
+        now = datetime.now().isoformat()
+        participant_ids = {}
+
+        with self._transaction() as cursor:
+            for p in participants:
+                canonical_name = p.get("canonical_name")
+                if not canonical_name:
+                    continue
+                participant_ids[canonical_name] = self._upsert(
+                    cursor,
+                    canonical_name,
+                    p.get("display_names"),
+                    p.get("organization"),
+                    p.get("role"),
+                    p.get("email"),
+                    p.get("notes"),
+                    now
+                )
+
+        return participant_ids
+
     def get_participant_info(self, canonical_name: str) -> Optional[Dict]:
         """
         参加者の情報を取得
@@ -153,22 +347,11 @@ class ParticipantsDB:
         Returns:
             参加者情報の辞書、存在しない場合はNone
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT participant_id, canonical_name, display_names, organization,
-                   role, email, notes, meeting_count, first_seen_at, updated_at
-            FROM participants
-            WHERE canonical_name = ?
-        """, (canonical_name,))
-
-        row = cursor.fetchone()
-        conn.close()
-
-        if not row:
-            return None
+        row = self._conn().execute(SQL_SELECT_INFO + " WHERE canonical_name = ?", (canonical_name,)).fetchone()
+        return self._row_to_info(row) if row else None
 
+    @staticmethod
+    def _row_to_info(row: tuple) -> Dict:
         return {
             "participant_id": row[0],
             "canonical_name": row[1],
@@ -182,6 +365,60 @@ class ParticipantsDB:
             "updated_at": row[9]
         }
 
+    def find_participants(self, name: str, threshold: float = ALIAS_MATCH_THRESHOLD,
+                          limit: int = 5) -> List[Dict]:
+        """
+        別名インデックスで参加者を検索（表記ゆれ・敬称・かな/ローマ字の違いを吸収）
+
+        正規化した別名キーが一致すれば score=1.0、それ以外は文字bigramのDice係数で類似度を計算する。
+        候補は bigram 転置インデックスから取得するため、参加者テーブルは走査しない。
+
+        Args:
+            name: 検索する名前（例: "田中部長", "Tanaka-san"）
+            threshold: 類似度の下限（0〜1）
+            limit: 最大件数
+
+        Returns:
+            参加者情報の辞書のリスト（score 降順）。各要素に "score" と "matched_alias" を追加
+        """
+        conn = self._conn()
+        best = {}  # {participant_id: (score, alias)}
+
+        def consider(participant_id, score, alias):
+            if score >= threshold and score > best.get(participant_id, (-1.0, None))[0]:
+                best[participant_id] = (score, alias)
+
+        for key in alias_keys(name):
+            # 完全一致（正規化後）
+            for (participant_id,) in conn.execute(SQL_SELECT_IDS_BY_ALIAS, (key,)):
+                consider(participant_id, 1.0, key)
+
+            # bigram 類似度: Dice = 2 * 共通bigram数 / (|A| + |B|)
+            # しきい値を満たさない候補は SQL 側で除外
+            grams = bigrams(key)
+            rows = conn.execute(f"""
+                SELECT a.participant_id, a.alias, a.gram_count, COUNT(*) AS shared
+                FROM participant_alias_ngrams n
+                JOIN participant_aliases a ON a.alias = n.alias
+                WHERE n.gram IN ({', '.join('?' * len(grams))})
+                GROUP BY a.participant_id, a.alias
+                HAVING 2.0 * shared >= ? * (? + a.gram_count)
+            """, grams + [threshold, len(grams)]).fetchall()
+            for participant_id, alias, gram_count, shared in rows:
+                consider(participant_id, 2.0 * shared / (len(grams) + gram_count), alias)
+
+        ranked = sorted(best.items(), key=lambda item: -item[1][0])[:limit]
+        results = []
+        for participant_id, (score, alias) in ranked:
+            row = conn.execute(SQL_SELECT_INFO + " WHERE participant_id = ?", (participant_id,)).fetchone()
+            if row:
+                info = self._row_to_info(row)
+                info["score"] = round(score, 3)
+                info["matched_alias"] = alias
+                results.append(info)
+
+        return results
+
     def register_meeting(
         self,
         structured_file_path: str,
@@ -191,55 +428,41 @@ class ParticipantsDB:
         participants: List[str] = None
     ) -> str:
         """
-        会議を登録し、参加者とのリレーションを作成
+        会議を登録し、参加者とのリレーションを作成（1トランザクション）
 
         Args:
             structured_file_path: 構造化JSONファイルパス
             meeting_date: 会議日（YYYY-MM-DD形式）
             meeting_title: 会議タイトル
             calendar_event_id: カレンダーイベントID
-            participants: 参加者のcanonical_nameリスト
+            participants: 参加者のcanonical_nameリスト（登録済みの別名も可）
 
         Returns:
             meeting_id: 会議ID（UUID）
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
         meeting_id = str(uuid.uuid4())
+        now = datetime.now().isoformat()
+        names = list(dict.fromkeys(participants or []))
 
-        # 会議を登録
-        cursor.execute("""
-            INSERT INTO meetings (meeting_id, structured_file_path, calendar_event_id, meeting_date, meeting_title)
-            VALUES (?, ?, ?, ?, ?)
-        """, (meeting_id, structured_file_path, calendar_event_id, meeting_date, meeting_title))
+        with self._transaction() as cursor:
+            # 会議を登録
+            cursor.execute(SQL_INSERT_MEETING, (
+                meeting_id, structured_file_path, calendar_event_id, meeting_date, meeting_title
+            ))
+
+            # 参加者との関係を登録 + meeting_count更新（canonical_name / 別名で参加者IDを解決）
+            participant_ids = []
+            for canonical_name in names:
+                participant_id = self._resolve_participant_id(cursor, canonical_name)
+                if participant_id and participant_id not in participant_ids:
+                    participant_ids.append(participant_id)
+
+            if participant_ids:
+                cursor.executemany(SQL_INSERT_ATTENDANCE,
+                                   [(pid, meeting_id, now) for pid in participant_ids])
+                cursor.executemany(SQL_INCREMENT_MEETING_COUNT,
+                                   [(pid,) for pid in participant_ids])
 
-        # 参加者との関係を登録 + meeting_count更新
-        if participants:
-            for canonical_name in participants:
-                cursor.execute(
-                    "SELECT participant_id FROM participants WHERE canonical_name = ?",
-                    (canonical_name,)
-                )
-                result = cursor.fetchone()
-                if result:
-                    participant_id = result[0]
-
-                    # 中間テーブルに登録
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO participant_meetings (participant_id, meeting_id, attended_at)
-                        VALUES (?, ?, ?)
-                    """, (participant_id, meeting_id, datetime.now().isoformat()))
-
-                    # meeting_count をインクリメント
-                    cursor.execute("""
-                        UPDATE participants
-                        SET meeting_count = meeting_count + 1
-                        WHERE participant_id = ?
-                    """, (participant_id,))
-
-        conn.commit()
-        conn.close()
         return meeting_id
 
     def get_participant_meeting_history(self, canonical_name: str, limit: int = 10) -> List[Dict]:
@@ -253,8 +476,7 @@ class ParticipantsDB:
         Returns:
             会議履歴のリスト（最新順）
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn().cursor()
 
         cursor.execute("""
             SELECT m.meeting_date, m.meeting_title, m.structured_file_path, pm.attended_at
@@ -267,7 +489,6 @@ class ParticipantsDB:
         """, (canonical_name, limit))
 
         rows = cursor.fetchall()
-        conn.close()
 
         return [
             {
@@ -280,6 +501,21 @@ class ParticipantsDB:
         ]
 
 
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT / ROLLBACK のコンテキストマネージャ"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Cursor:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn.cursor()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
 if __name__ == "__main__":
     # 簡単な動作確認
     print("=== ParticipantsDB 動作確認 ===")
@@ -36,8 +36,26 @@ CREATE TABLE IF NOT EXISTS participant_meetings (
     FOREIGN KEY (meeting_id) REFERENCES meetings(meeting_id) ON DELETE CASCADE
 );
 
+-- 別名インデックス（正規化した canonical_name / display_names → 参加者）
+-- キーは name_normalization.alias_keys() で生成（敬称除去・かな/ローマ字の畳み込み）
+CREATE TABLE IF NOT EXISTS participant_aliases (
+    alias TEXT NOT NULL,
+    participant_id TEXT NOT NULL,
+    gram_count INTEGER NOT NULL,           -- alias の bigram 数（類似度計算用）
+    PRIMARY KEY (alias, participant_id),
+    FOREIGN KEY (participant_id) REFERENCES participants(participant_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- 別名の文字bigram転置インデックス（類似度検索で候補を絞り込む）
+CREATE TABLE IF NOT EXISTS participant_alias_ngrams (
+    gram TEXT NOT NULL,
+    alias TEXT NOT NULL,
+    PRIMARY KEY (gram, alias)
+) WITHOUT ROWID;
+
 -- インデックス作成
 CREATE INDEX IF NOT EXISTS idx_participants_canonical_name ON participants(canonical_name);
 CREATE INDEX IF NOT EXISTS idx_meetings_date ON meetings(meeting_date);
 CREATE INDEX IF NOT EXISTS idx_participant_meetings_participant ON participant_meetings(participant_id);
 CREATE INDEX IF NOT EXISTS idx_participant_meetings_meeting ON participant_meetings(meeting_id);
+CREATE INDEX IF NOT EXISTS idx_participant_aliases_participant ON participant_aliases(participant_id);
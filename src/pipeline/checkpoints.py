@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+パイプラインのステップ単位チェックポイント
+
+Step 8（要約）で失敗して再実行したときに、カレンダー照合・参加者抽出・トピック抽出・話者推論
+（有料のLLM呼び出し）を繰り返さないためのキャッシュ。
+
+- 保存先: PIPELINE_CHECKPOINT_DIR/<構造化JSONパスのハッシュ>/<ステップ名>.json
+- キー: SHA-256(ステップ名 + ステップバージョン + 入力値のJSON)
+  → 入力が変わったステップ（とその下流）だけが再実行される
+- 書き込みは一時ファイル経由でアトミックに行う
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# 設定
+CHECKPOINT_DIR = Path(os.getenv('PIPELINE_CHECKPOINT_DIR', '.pipeline_checkpoints'))
+
+
+def is_checkpoint_enabled() -> bool:
+    """環境変数PIPELINE_CHECKPOINTSでチェックポイントが無効化されていないか"""
+    return os.getenv('PIPELINE_CHECKPOINTS', 'true').lower() == 'true'
+
+
+class CheckpointStore:
+    """1つの入力ファイルに対するステップ出力のチェックポイント"""
+
+    def __init__(self, source_path: str, root: Path = None):
+        """
+        Args:
+            source_path: パイプラインの入力ファイル（構造化JSON）パス
+            root: チェックポイント保存先ルート（デフォルト: CHECKPOINT_DIR）
+        """
+        resolved = str(Path(source_path).resolve())
+        self.source_path = resolved
+        self.directory = Path(root or CHECKPOINT_DIR) / hashlib.sha256(resolved.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def hash_inputs(step_name: str, version: str, inputs: Dict[str, Any]) -> str:
+        """ステップ入力のハッシュ"""
+        payload = json.dumps(
+            {"step": step_name, "version": version, "inputs": inputs},
+            ensure_ascii=False, sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, step_name: str) -> Path:
+        return self.directory / f"{step_name}.json"
+
+    def load(self, step_name: str, input_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        入力ハッシュが一致するチェックポイントの出力を取得
+
+        Returns:
+            dict or None: ステップ出力（存在しない・入力が変わった場合はNone）
+        """
+        path = self._path(step_name)
+        if not path.exists():
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except Exception as e:
+            print(f"  ⚠️ Checkpoint read error (ignored): {e}")
+            return None
+
+        if checkpoint.get("input_hash") != input_hash:
+            return None
+        return checkpoint.get("outputs")
+
+    def save(self, step_name: str, input_hash: str, outputs: Dict[str, Any]):
+        """ステップ出力を保存（失敗してもパイプラインは止めない）"""
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            checkpoint = {
+                "step": step_name,
+                "source_path": self.source_path,
+                "input_hash": input_hash,
+                "created_at": datetime.now().isoformat(),
+                "outputs": outputs,
+            }
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(checkpoint, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, self._path(step_name))
+        except Exception as e:
+            print(f"  ⚠️ Checkpoint write error (ignored): {e}")
+
+    def clear(self):
+        """このファイルのチェックポイントを全て削除"""
+        shutil.rmtree(self.directory, ignore_errors=True)
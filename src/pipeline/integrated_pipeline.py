@@ -15,15 +15,30 @@ Step 7: 話者推論（entities.people活用） ★強化
 Step 8: 要約生成
 Step 9: 参加者DB更新
 Step 10: 会議情報登録
+
+各ステップは入力・出力を宣言した依存グラフとして実行され、独立したGemini API呼び出しは並行実行される
+（src/pipeline/step_graph.py）。
+
+副作用のないステップの出力は入力ハッシュをキーにチェックポイント保存され（src/pipeline/checkpoints.py）、
+再実行時は入力が変わったステップから再開する。
+
+使い方:
+    python -m src.pipeline.integrated_pipeline <structured_file_path>
+    python -m src.pipeline.integrated_pipeline <structured_file_path> --from-step 8   # Step 8以降を再実行
+    python -m src.pipeline.integrated_pipeline <structured_file_path> --only-step summary  # 要約のみ再生成
 """
 
+import argparse
 import os
 import json
 import sys
+import time
 from datetime import datetime
 from typing import Dict, List, Optional
 
 from src.participants.participants_db import ParticipantsDB
+from src.pipeline.checkpoints import CheckpointStore, is_checkpoint_enabled
+from src.pipeline.step_graph import PipelineStep, StepGraph, format_timings
 from src.participants.extract_participants import extract_participants_from_description
 from src.participants.enhanced_speaker_inference import infer_speakers_with_participants, apply_speaker_inference_to_structured_json
 from src.shared.calendar_integration import get_events_for_file_date, match_event_with_transcript
@@ -31,45 +46,19 @@ from src.shared.summary_generator import generate_summary_with_calendar
 from src.topics.add_topics_entities import extract_topics_and_entities
 
 
-def run_phase_11_3_pipeline(structured_file_path: str) -> Dict:
-    """
-    Phase 11-3 統合パイプライン
-
-    処理フロー:
-    1. 構造化JSONファイル読み込み
-    2. カレンダーイベントマッチング
-    3. 参加者情報抽出（description）
-    4. 参加者DB検索（過去情報取得）
-    5. 話者推論（参加者情報統合版）
-    6. 要約生成（参加者DB情報統合）※ 現在は省略、M4完成後に実装
-    7. 参加者DB更新（UPSERT）
-    8. 会議情報登録
-
-    Args:
-        structured_file_path: 構造化JSONファイルパス（Phase 1出力）
-
-    Returns:
-        {
-            "meeting_id": str,
-            "matched_event": dict or None,
-            "calendar_participants": list,
-            "inference_result": dict,
-            "success": bool
-        }
-    """
-    print(f"\n{'='*60}")
-    print(f"[Phase 11-3] パイプライン開始: {os.path.basename(structured_file_path)}")
-    print(f"{'='*60}\n")
+# ========================
+# ステップ定義（入力キー → 出力キー）
+# ========================
 
-    # ========================
-    # Step 1: 構造化JSON読み込み
-    # ========================
+def step_load(inputs: Dict) -> Dict:
+    """Step 1: 構造化JSON読み込み"""
+    structured_file_path = inputs["structured_file_path"]
     print("[Step 1] 構造化JSON読み込み中...")
     with open(structured_file_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
 
-    segments = data.get("segments", [])
-    metadata = data.get("metadata", {})
+    # Step 7 が書き戻す speaker_name は除外（再実行時に入力ハッシュが変わらないように）
+    segments = [{k: v for k, v in seg.items() if k != "speaker_name"} for seg in data.get("segments", [])]
 
     # meeting_dateを音声ファイルの作成日時から取得（修正1）
     audio_file_path = structured_file_path.replace('_structured.json', '.m4a')
@@ -83,13 +72,16 @@ def run_phase_11_3_pipeline(structured_file_path: str) -> Dict:
         print(f"  ✓ ファイル読み込み完了: {len(segments)} セグメント")
         print(f"  ⚠ 音声ファイル未発見、現在日時を使用: {file_date}")
 
-    # ========================
-    # Step 2: カレンダーイベントマッチング
-    # ========================
+    return {"segments": segments, "file_date": file_date}
+
+
+def step_calendar(inputs: Dict) -> Dict:
+    """Step 2: カレンダーイベントマッチング"""
+    segments = inputs["segments"]
     print("\n[Step 2] カレンダーイベントマッチング中...")
     matched_event = None
     try:
-        events = get_events_for_file_date(file_date)
+        events = get_events_for_file_date(inputs["file_date"])
         if events:
             # 会話の最初の部分を使ってマッチング
             transcript_text = "\n".join([seg["text"] for seg in segments[:20]])
@@ -103,9 +95,12 @@ def run_phase_11_3_pipeline(structured_file_path: str) -> Dict:
     except Exception as e:
         print(f"  ⚠ カレンダーAPI エラー: {e}")
 
-    # ========================
-    # Step 3: 参加者情報抽出
-    # ========================
+    return {"matched_event": matched_event}
+
+
+def step_participants(inputs: Dict) -> Dict:
+    """Step 3: 参加者情報抽出"""
+    matched_event = inputs["matched_event"]
     print("\n[Step 3] 参加者情報抽出中...")
     calendar_participants = []
     if matched_event:
@@ -126,9 +121,12 @@ def run_phase_11_3_pipeline(structured_file_path: str) -> Dict:
     else:
         print("  ⏭ スキップ（イベントマッチングなし）")
 
-    # ========================
-    # Step 4: 参加者DB検索（過去情報取得）
-    # ========================
+    return {"calendar_participants": calendar_participants}
+
+
+def step_participant_lookup(inputs: Dict) -> Dict:
+    """Step 4: 参加者DB検索（過去情報取得）"""
+    calendar_participants = inputs["calendar_participants"]
     print("\n[Step 4] 参加者DB検索中...")
     db = ParticipantsDB()
     participants_past_info = {}
@@ -136,18 +134,25 @@ def run_phase_11_3_pipeline(structured_file_path: str) -> Dict:
     if calendar_participants:
         for p in calendar_participants:
             canonical_name = p.get("canonical_name", "")
-            past_info = db.get_participant_info(canonical_name)
+            # 別名インデックスで検索（「田中部長」「Tanaka-san」なども既存参加者に一致）
+            matches = db.find_participants(canonical_name, limit=1)
+            past_info = matches[0] if matches else None
             if past_info:
                 participants_past_info[canonical_name] = past_info
-                print(f"  ✓ {canonical_name}: 過去 {past_info['meeting_count']} 回の会議参加")
+                alias_note = "" if past_info["canonical_name"] == canonical_name else \
+                    f" (→ {past_info['canonical_name']}, score={past_info['score']})"
+                print(f"  ✓ {canonical_name}{alias_note}: 過去 {past_info['meeting_count']} 回の会議参加")
             else:
                 print(f"  ℹ {canonical_name}: 初登場")
     else:
         print("  ⏭ スキップ（参加者情報なし）")
 
-    # ========================
-    # Step 5: トピック/エンティティ抽出 ★新規追加
-    # ========================
+    return {"participants_past_info": participants_past_info}
+
+
+def step_topics_entities(inputs: Dict) -> Dict:
+    """Step 5: トピック/エンティティ抽出"""
+    segments = inputs["segments"]
     print("\n[Step 5] トピック/エンティティ抽出中...")
     full_text = "\n".join([seg["text"] for seg in segments])
     topics_entities_result = extract_topics_and_entities(full_text)
@@ -161,13 +166,15 @@ def run_phase_11_3_pipeline(structured_file_path: str) -> Dict:
     if entities_people:
         print(f"    人物: {', '.join(entities_people[:5])}" + ("..." if len(entities_people) > 5 else ""))
 
-    # ========================
-    # Step 6: エンティティ解決 ★新規追加
-    # ========================
+    return {"entities_people": entities_people}
+
+
+def step_entity_resolution(inputs: Dict) -> Dict:
+    """Step 6: エンティティ解決"""
     print("\n[Step 6] エンティティ解決中...")
     # 単一ファイルのエンティティ解決は簡略化（正規化のみ）
     resolved_people = []
-    for person in entities_people:
+    for person in inputs["entities_people"]:
         # 敬称除去などの簡単な正規化
         normalized = person.replace('さん', '').replace('様', '').replace('氏', '').strip()
         if normalized and normalized not in resolved_people:
@@ -177,14 +184,17 @@ def run_phase_11_3_pipeline(structured_file_path: str) -> Dict:
     if resolved_people:
         print(f"    正規化後: {', '.join(resolved_people[:5])}" + ("..." if len(resolved_people) > 5 else ""))
 
-    # ========================
-    # Step 7: 話者推論（entities.people活用） ★強化
-    # ========================
+    return {"resolved_people": resolved_people}
+
+
+def step_speaker_inference(inputs: Dict) -> Dict:
+    """Step 7: 話者推論（entities.people活用）"""
+    structured_file_path = inputs["structured_file_path"]
     print("\n[Step 7] 話者推論実行中（エンティティ情報統合）...")
     inference_result = infer_speakers_with_participants(
-        segments=segments,
-        calendar_participants=calendar_participants,
-        entities={"people": resolved_people},  # エンティティ情報を追加
+        segments=inputs["segments"],
+        calendar_participants=inputs["calendar_participants"],
+        entities={"people": inputs["resolved_people"]},  # エンティティ情報を追加
         file_context=os.path.basename(structured_file_path)
     )
 
@@ -194,13 +204,19 @@ def run_phase_11_3_pipeline(structured_file_path: str) -> Dict:
     if inference_result.get('participants_mapping'):
         print(f"    マッピング: {inference_result['participants_mapping']}")
 
-    # 構造化JSONに話者推論結果を適用
-    apply_speaker_inference_to_structured_json(structured_file_path, inference_result)
+    return {"inference_result": inference_result}
+
+
+def step_apply_speaker_names(inputs: Dict) -> Dict:
+    """Step 7: 構造化JSONに話者推論結果を適用（チェックポイント復元時も毎回書き込む）"""
+    apply_speaker_inference_to_structured_json(inputs["structured_file_path"], inputs["inference_result"])
     print(f"  ✓ 構造化JSONに speaker_name 追加完了")
+    return {}
 
-    # ========================
-    # Step 8: 要約生成（参加者DB情報統合）
-    # ========================
+
+def step_summary(inputs: Dict) -> Dict:
+    """Step 8: 要約生成（参加者DB情報統合）"""
+    participants_past_info = inputs["participants_past_info"]
     print("\n[Step 8] 要約生成中...")
 
     # 参加者情報をコンテキストに追加
@@ -224,8 +240,8 @@ def run_phase_11_3_pipeline(structured_file_path: str) -> Dict:
     # 要約生成（既存関数を拡張版で使用）
     try:
         summary_data = generate_summary_with_calendar(
-            transcript_segments=segments,
-            matched_event=matched_event,
+            transcript_segments=inputs["segments"],
+            matched_event=inputs["matched_event"],
             participants_context=participants_context
         )
         print(f"  ✓ 要約生成完了")
@@ -233,45 +249,51 @@ def run_phase_11_3_pipeline(structured_file_path: str) -> Dict:
         print(f"  ⚠ 要約生成エラー: {e}")
         summary_data = None
 
-    # ========================
-    # Step 9: 参加者DB更新（UPSERT）
-    # ========================
+    return {"summary_data": summary_data}
+
+
+def step_participants_update(inputs: Dict) -> Dict:
+    """Step 9: 参加者DB更新（UPSERT）"""
+    calendar_participants = inputs["calendar_participants"]
+    matched_event = inputs["matched_event"]
     print("\n[Step 9] 参加者DB更新中...")
+    db = ParticipantsDB()
 
     participant_canonical_names = []
     if calendar_participants:
-        for p in calendar_participants:
-            canonical_name = p.get("canonical_name", "")
-            if not canonical_name:
-                continue
-
-            display_names = p.get("display_names", [])
-            organization = p.get("organization")
-            role = p.get("role")
-
-            # 要約から抽出した追加情報をnotesに追加（オプション）
-            notes = f"会議: {matched_event.get('summary', '無題') if matched_event else 'イベントなし'}"
-
-            participant_id = db.upsert_participant(
-                canonical_name=canonical_name,
-                display_names=display_names,
-                organization=organization,
-                role=role,
-                notes=notes
-            )
+        # 要約から抽出した追加情報をnotesに追加（オプション）
+        notes = f"会議: {matched_event.get('summary', '無題') if matched_event else 'イベントなし'}"
+
+        # 全参加者を1トランザクションでUPSERT
+        participant_ids = db.upsert_participants([
+            {
+                "canonical_name": p.get("canonical_name", ""),
+                "display_names": p.get("display_names", []),
+                "organization": p.get("organization"),
+                "role": p.get("role"),
+                "notes": notes,
+            }
+            for p in calendar_participants
+        ])
+        for canonical_name in participant_ids:
             participant_canonical_names.append(canonical_name)
             print(f"  ✓ {canonical_name}: DB更新完了")
     else:
         print("  ⏭ スキップ（参加者情報なし）")
 
-    # ========================
-    # Step 10: 会議情報登録
-    # ========================
+    return {"participant_canonical_names": participant_canonical_names}
+
+
+def step_register_meeting(inputs: Dict) -> Dict:
+    """Step 10: 会議情報登録"""
+    matched_event = inputs["matched_event"]
+    participant_canonical_names = inputs["participant_canonical_names"]
     print("\n[Step 10] 会議情報登録中...")
+    db = ParticipantsDB()
 
     meeting_id = db.register_meeting(
-        structured_file_path=structured_file_path,
-        meeting_date=file_date,
+        structured_file_path=inputs["structured_file_path"],
+        meeting_date=inputs["file_date"],
         meeting_title=matched_event.get('summary', '無題') if matched_event else 'カレンダーイベントなし',
         calendar_event_id=matched_event.get('id') if matched_event else None,
         participants=participant_canonical_names if participant_canonical_names else None
@@ -279,39 +301,203 @@ def run_phase_11_3_pipeline(structured_file_path: str) -> Dict:
 
     print(f"  ✓ 会議登録完了: meeting_id={meeting_id[:8]}...")
 
+    return {"meeting_id": meeting_id}
+
+
+# --from-step / --only-step で指定できるステップ番号
+STEP_NUMBERS = {
+    1: "load",
+    2: "calendar",
+    3: "participants",
+    4: "participant_lookup",
+    5: "topics_entities",
+    6: "entity_resolution",
+    7: "speaker_inference",
+    8: "summary",
+    9: "participants_update",
+    10: "register_meeting",
+}
+
+
+def build_pipeline_graph() -> StepGraph:
+    """
+    Phase 11-3 の依存グラフを構築
+
+    依存関係:
+        load ─┬─ calendar ── participants ─┬─ participant_lookup ─┬─ summary
+              │                            │                      └─ participants_update ── register_meeting
+              └─ topics_entities ── entity_resolution ─┴─ speaker_inference ── apply_speaker_names
+    （カレンダー照合とトピック抽出、要約と話者推論はそれぞれ並行実行される）
+
+    チェックポイント対象（cacheable）:
+        LLM/API呼び出しを含むステップと、再実行で会議が二重登録される register_meeting。
+        participant_lookup は初回実行時点の過去情報（今回の会議を含まない）を保持する。
+        load・participants_update（UPSERTで冪等）・apply_speaker_names（ファイル書き込み）は毎回実行する。
+    """
+    return StepGraph([
+        PipelineStep("load", step_load, label="Step 1: JSON読み込み",
+                     inputs=("structured_file_path",), outputs=("segments", "file_date")),
+        PipelineStep("calendar", step_calendar, label="Step 2: カレンダー照合",
+                     inputs=("segments", "file_date"), outputs=("matched_event",), cacheable=True),
+        PipelineStep("participants", step_participants, label="Step 3: 参加者抽出",
+                     inputs=("matched_event",), outputs=("calendar_participants",), cacheable=True),
+        PipelineStep("participant_lookup", step_participant_lookup, label="Step 4: 参加者DB検索",
+                     inputs=("calendar_participants",), outputs=("participants_past_info",), cacheable=True),
+        PipelineStep("topics_entities", step_topics_entities, label="Step 5: トピック/エンティティ",
+                     inputs=("segments",), outputs=("entities_people",), cacheable=True),
+        PipelineStep("entity_resolution", step_entity_resolution, label="Step 6: エンティティ解決",
+                     inputs=("entities_people",), outputs=("resolved_people",), cacheable=True),
+        PipelineStep("speaker_inference", step_speaker_inference, label="Step 7: 話者推論",
+                     inputs=("structured_file_path", "segments", "calendar_participants", "resolved_people"),
+                     outputs=("inference_result",), cacheable=True),
+        PipelineStep("apply_speaker_names", step_apply_speaker_names, label="Step 7: speaker_name書き込み",
+                     inputs=("structured_file_path", "inference_result")),
+        PipelineStep("summary", step_summary, label="Step 8: 要約生成",
+                     inputs=("segments", "matched_event", "participants_past_info"), outputs=("summary_data",),
+                     cacheable=True),
+        # 過去情報の読み込み（Step 4）より後にDBを更新する
+        PipelineStep("participants_update", step_participants_update, label="Step 9: 参加者DB更新",
+                     inputs=("calendar_participants", "matched_event"), outputs=("participant_canonical_names",),
+                     after=("participant_lookup",)),
+        PipelineStep("register_meeting", step_register_meeting, label="Step 10: 会議情報登録",
+                     inputs=("structured_file_path", "file_date", "matched_event", "participant_canonical_names"),
+                     outputs=("meeting_id",), cacheable=True),
+    ])
+
+
+def resolve_step_name(graph: StepGraph, step: str) -> str:
+    """
+    ステップ番号（"8"）またはステップ名（"summary"）をステップ名に変換
+
+    Raises:
+        ValueError: 該当するステップがない
+    """
+    if step.isdigit() and int(step) in STEP_NUMBERS:
+        return STEP_NUMBERS[int(step)]
+    if step in graph.steps:
+        return step
+    choices = ", ".join(f"{number}={name}" for number, name in STEP_NUMBERS.items())
+    raise ValueError(f"Unknown step '{step}' (choices: {choices})")
+
+
+def run_phase_11_3_pipeline(structured_file_path: str, max_workers: Optional[int] = None,
+                            use_checkpoints: Optional[bool] = None, from_step: Optional[str] = None,
+                            only_step: Optional[str] = None) -> Dict:
+    """
+    Phase 11-3 統合パイプライン
+
+    10ステップを依存グラフとして実行し、独立したステップ（カレンダー照合とトピック抽出、
+    要約生成と話者推論など）を並行実行する。依存関係は build_pipeline_graph() を参照。
+
+    Args:
+        structured_file_path: 構造化JSONファイルパス（Phase 1出力）
+        max_workers: 同時実行ステップ数（Noneなら制限なし）
+        use_checkpoints: チェックポイントを使うか（Noneなら環境変数PIPELINE_CHECKPOINTS）
+        from_step: 指定ステップ（番号または名前）とその下流をチェックポイントを無視して再実行
+        only_step: 指定ステップのみ再実行（上流はチェックポイントから復元、下流は実行しない）
+
+    Returns:
+        {
+            "meeting_id": str,
+            "matched_event": dict or None,
+            "calendar_participants": list,
+            "inference_result": dict,
+            "summary_data": dict or None,
+            "timings": {step_name: {"start", "end", "duration", "cached"}},
+            "success": bool
+        }
+        only_step 指定時は実行していないステップの値がNoneになる
+    """
+    print(f"\n{'='*60}")
+    print(f"[Phase 11-3] パイプライン開始: {os.path.basename(structured_file_path)}")
+    print(f"{'='*60}\n")
+
+    graph = build_pipeline_graph()
+    if use_checkpoints is None:
+        use_checkpoints = is_checkpoint_enabled()
+    if (from_step or only_step) and not use_checkpoints:
+        raise ValueError("--from-step / --only-step require checkpoints (PIPELINE_CHECKPOINTS=true)")
+    if from_step and only_step:
+        raise ValueError("--from-step and --only-step cannot be combined")
+
+    force: List[str] = []
+    targets = None
+    require_checkpoint: List[str] = []
+    if from_step:
+        name = resolve_step_name(graph, from_step)
+        force = [name] + graph.descendants(name)
+    if only_step:
+        name = resolve_step_name(graph, only_step)
+        # 番号のない補助ステップ（apply_speaker_names）は親ステップと一緒に実行する
+        targets = [name] + [d for d in graph.descendants(name)
+                           if d not in STEP_NUMBERS.values() and name in graph.dependencies(d)]
+        force = list(targets)
+        require_checkpoint = [dep for dep in graph.ancestors(name) if graph.steps[dep].cacheable]
+
+    checkpoints = CheckpointStore(structured_file_path) if use_checkpoints else None
+
+    started = time.perf_counter()
+    context, timings = graph.run(
+        {"structured_file_path": structured_file_path},
+        max_workers=max_workers,
+        checkpoints=checkpoints,
+        force=force,
+        targets=targets,
+        require_checkpoint=require_checkpoint
+    )
+    wall_time = time.perf_counter() - started
+
     # ========================
     # 完了
     # ========================
     print(f"\n{'='*60}")
-    print(f"[Phase 11-3] パイプライン完了")
+    print(f"[Phase 11-3] パイプライン完了 ({wall_time:.2f}s)")
+    print(format_timings(graph, timings, wall_time))
     print(f"{'='*60}\n")
 
     return {
-        "meeting_id": meeting_id,
-        "matched_event": matched_event,
-        "calendar_participants": calendar_participants,
-        "inference_result": inference_result,
-        "summary_data": summary_data,
+        "meeting_id": context.get("meeting_id"),
+        "matched_event": context.get("matched_event"),
+        "calendar_participants": context.get("calendar_participants") or [],
+        "inference_result": context.get("inference_result"),
+        "summary_data": context.get("summary_data"),
+        "timings": timings,
         "success": True
     }
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("使用方法: python3 integrated_pipeline.py <structured_file_path>")
-        print("例: python3 integrated_pipeline.py downloads/Shop_20250115_structured.json")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Phase 11-3 統合パイプライン",
+        epilog="ステップ: " + ", ".join(f"{number}={name}" for number, name in STEP_NUMBERS.items())
+    )
+    parser.add_argument('structured_file_path', help="構造化JSONファイルパス（例: downloads/Shop_20250115_structured.json）")
+    step_group = parser.add_mutually_exclusive_group()
+    step_group.add_argument('--from-step', help="指定ステップ（番号または名前）以降を再実行")
+    step_group.add_argument('--only-step', help="指定ステップのみ再実行（上流はチェックポイントから復元）")
+    parser.add_argument('--no-checkpoint', action='store_true', help="チェックポイントを使わずに全ステップ実行")
+    parser.add_argument('--clear-checkpoints', action='store_true', help="このファイルのチェックポイントを削除してから実行")
+    args = parser.parse_args()
 
-    structured_file_path = sys.argv[1]
+    structured_file_path = args.structured_file_path
 
     if not os.path.exists(structured_file_path):
         print(f"エラー: ファイルが見つかりません: {structured_file_path}")
         sys.exit(1)
 
+    if args.clear_checkpoints:
+        CheckpointStore(structured_file_path).clear()
+
     try:
-        result = run_phase_11_3_pipeline(structured_file_path)
+        result = run_phase_11_3_pipeline(
+            structured_file_path,
+            use_checkpoints=False if args.no_checkpoint else None,
+            from_step=args.from_step,
+            only_step=args.only_step
+        )
         print("\n✅ パイプライン実行成功")
-        print(f"Meeting ID: {result['meeting_id']}")
+        if result.get('meeting_id'):
+            print(f"Meeting ID: {result['meeting_id']}")
         if result.get('matched_event'):
             event_summary = result['matched_event'].get('summary', '無題')
             print(f"イベント: {event_summary}")
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+パイプラインステップの依存グラフ実行器
+
+各ステップは入力キー・出力キーを宣言し、入力を生成するステップが全て完了した時点で
+スレッドプールに投入される。独立したステップ（Gemini API呼び出し等）は並行実行されるため、
+全体の所要時間はクリティカルパス（最長依存経路）の長さまで短縮される。
+
+使い方:
+    steps = [
+        PipelineStep("load", load_fn, inputs=("path",), outputs=("segments",)),
+        PipelineStep("topics", topics_fn, inputs=("segments",), outputs=("topics",)),
+        PipelineStep("summary", summary_fn, inputs=("segments",), outputs=("summary",)),
+    ]
+    context, timings = StepGraph(steps).run({"path": "..."})
+
+ステップ関数は入力キーのみを含む辞書を受け取り、出力キーを含む辞書を返す。
+
+cacheable=True のステップは CheckpointStore（src/pipeline/checkpoints.py）を渡すと、
+入力ハッシュが一致するチェックポイントから出力を復元して実行を省略する。
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class PipelineStepError(Exception):
+    """ステップの実行に失敗した"""
+
+    def __init__(self, step_name: str, error: Exception):
+        super().__init__(f"Step '{step_name}' failed: {error}")
+        self.step_name = step_name
+        self.error = error
+
+
+class PipelineStep:
+    """依存グラフの1ステップ"""
+
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 inputs: Iterable[str] = (), outputs: Iterable[str] = (),
+                 after: Iterable[str] = (), label: Optional[str] = None,
+                 cacheable: bool = False, version: str = "1"):
+        """
+        Args:
+            name: ステップ名（一意）
+            func: ステップ関数 (inputs) -> outputs
+            inputs: 入力キー（初期コンテキストまたは他ステップの出力）
+            outputs: 出力キー（cacheableの場合はJSONシリアライズ可能な値）
+            after: データ依存以外で先に完了している必要があるステップ名（DBの読み込み→書き込み順序など）
+            label: 表示名（例: "Step 5: トピック/エンティティ抽出"）
+            cacheable: 入力ハッシュをキーに出力をチェックポイント保存・復元するか（副作用のないステップのみ）
+            version: ステップ実装のバージョン（プロンプト変更時に上げるとチェックポイントが無効になる）
+        """
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.after = tuple(after)
+        self.label = label or name
+        self.cacheable = cacheable
+        self.version = version
+
+
+class StepGraph:
+    """PipelineStepの依存グラフ"""
+
+    def __init__(self, steps: List[PipelineStep]):
+        self.steps = {step.name: step for step in steps}
+        if len(self.steps) != len(steps):
+            raise ValueError("Duplicate step names")
+
+        self.producers: Dict[str, str] = {}
+        for step in steps:
+            for key in step.outputs:
+                if key in self.producers:
+                    raise ValueError(f"Output '{key}' is produced by both '{self.producers[key]}' and '{step.name}'")
+                self.producers[key] = step.name
+
+        self.order = self._topological_order()
+
+    def dependencies(self, step_name: str) -> List[str]:
+        """ステップが依存するステップ名（データ依存 + after）"""
+        step = self.steps[step_name]
+        deps = [self.producers[key] for key in step.inputs if key in self.producers]
+        deps.extend(step.after)
+        return list(dict.fromkeys(deps))
+
+    def ancestors(self, step_name: str) -> List[str]:
+        """ステップが（間接的にも）依存する全ステップ名"""
+        found: List[str] = []
+        stack = self.dependencies(step_name)
+        while stack:
+            name = stack.pop()
+            if name not in found:
+                found.append(name)
+                stack.extend(self.dependencies(name))
+        return found
+
+    def descendants(self, step_name: str) -> List[str]:
+        """ステップに（間接的にも）依存する全ステップ名"""
+        return [name for name in self.order if step_name in self.ancestors(name)]
+
+    def _topological_order(self) -> List[str]:
+        for step in self.steps.values():
+            for name in step.after:
+                if name not in self.steps:
+                    raise ValueError(f"Step '{step.name}' depends on unknown step '{name}'")
+
+        order: List[str] = []
+        state: Dict[str, int] = {}  # 1: 探索中, 2: 完了
+
+        def visit(name: str, path: Tuple[str, ...]):
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + (name,))}")
+            state[name] = 1
+            for dep in self.dependencies(name):
+                visit(dep, path + (name,))
+            state[name] = 2
+            order.append(name)
+
+        for name in self.steps:
+            visit(name, ())
+        return order
+
+    def run(self, initial: Dict[str, Any], max_workers: Optional[int] = None,
+            checkpoints=None, force: Iterable[str] = (), targets: Optional[Iterable[str]] = None,
+            require_checkpoint: Iterable[str] = ()) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+        """
+        依存関係を満たしたステップから並行実行
+
+        Args:
+            initial: 初期コンテキスト（どのステップも生成しない入力キー）
+            max_workers: 同時実行数（Noneならステップ数）
+            checkpoints: CheckpointStore（Noneならチェックポイントを使わない）
+            force: チェックポイントを無視して再実行するステップ名
+            targets: 指定時はこれらのステップとその依存ステップのみ実行（下流は実行しない）
+            require_checkpoint: チェックポイントからの復元を必須とするステップ名（なければエラー）
+
+        Returns:
+            context: 初期コンテキスト + 全ステップの出力
+            timings: {step_name: {"start": 秒, "end": 秒, "duration": 秒, "cached": bool}}
+                     （パイプライン開始からの相対時刻）
+
+        Raises:
+            PipelineStepError: いずれかのステップが失敗（実行中のステップの完了を待ってから送出）
+        """
+        context = dict(initial)
+        forced = set(force)
+        required = set(require_checkpoint)
+
+        if targets is not None:
+            selected = set()
+            for name in targets:
+                selected.add(name)
+                selected.update(self.ancestors(name))
+        else:
+            selected = set(self.steps)
+
+        for name in self.order:
+            missing = [key for key in self.steps[name].inputs if key not in context and key not in self.producers]
+            if missing and name in selected:
+                raise ValueError(f"Step '{name}' has unresolved inputs: {', '.join(missing)}")
+
+        done = set()
+        pending = [name for name in self.order if name in selected]
+        timings: Dict[str, Dict[str, Any]] = {}
+        started_at = time.perf_counter()
+        failure: Optional[PipelineStepError] = None
+
+        def execute(step: PipelineStep, inputs: Dict[str, Any]) -> Dict[str, Any]:
+            start = time.perf_counter() - started_at
+            try:
+                return step.func(inputs) or {}
+            finally:
+                end = time.perf_counter() - started_at
+                timings[step.name] = {"start": start, "end": end, "duration": end - start, "cached": False}
+
+        def restore(step: PipelineStep, inputs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            """チェックポイントから出力を復元（ヒットしなければNone）"""
+            if checkpoints is None or not step.cacheable or step.name in forced:
+                return None
+            outputs = checkpoints.load(step.name, checkpoints.hash_inputs(step.name, step.version, inputs))
+            if outputs is not None and set(outputs) == set(step.outputs):
+                now = time.perf_counter() - started_at
+                timings[step.name] = {"start": now, "end": now, "duration": 0.0, "cached": True}
+                return outputs
+            return None
+
+        with ThreadPoolExecutor(max_workers=max_workers or max(1, len(pending))) as pool:
+            running = {}
+            while pending or running:
+                if failure is None:
+                    progressed = True
+                    while progressed:
+                        progressed = False
+                        for name in list(pending):
+                            if not all(dep in done for dep in self.dependencies(name)):
+                                continue
+                            step = self.steps[name]
+                            inputs = {key: context.get(key) for key in step.inputs}
+                            pending.remove(name)
+
+                            outputs = restore(step, inputs)
+                            if outputs is not None:
+                                print(f"[Checkpoint] {step.label}: 前回の結果を再利用")
+                                context.update(outputs)
+                                done.add(name)
+                                progressed = True
+                            elif name in required:
+                                failure = PipelineStepError(name, ValueError(
+                                    "no checkpoint for current inputs (run the full pipeline first)"))
+                                break
+                            else:
+                                running[pool.submit(execute, step, inputs)] = (name, inputs)
+                        if failure is not None:
+                            break
+                if failure is not None and not running:
+                    break
+
+                if not running:
+                    if not pending:
+                        break
+                    # 依存が満たせないステップが残っている
+                    raise ValueError(f"Steps cannot be scheduled: {', '.join(pending)}")
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name, inputs = running.pop(future)
+                    step = self.steps[name]
+                    try:
+                        outputs = future.result()
+                    except Exception as e:
+                        if failure is None:
+                            failure = PipelineStepError(name, e)
+                        continue
+
+                    unexpected = set(outputs) - set(step.outputs)
+                    if unexpected:
+                        failure = failure or PipelineStepError(
+                            name, ValueError(f"undeclared outputs: {', '.join(sorted(unexpected))}"))
+                        continue
+                    context.update(outputs)
+                    done.add(name)
+
+                    if checkpoints is not None and step.cacheable:
+                        checkpoints.save(name, checkpoints.hash_inputs(name, step.version, inputs), outputs)
+
+        if failure is not None:
+            raise failure
+        return context, timings
+
+    def critical_path(self, timings: Dict[str, Dict[str, float]]) -> Tuple[List[str], float]:
+        """
+        実測時間に基づくクリティカルパス（所要時間の合計が最大の依存経路）
+
+        Returns:
+            (ステップ名のリスト, 合計秒数)
+        """
+        best: Dict[str, Tuple[float, List[str]]] = {}
+        for name in self.order:
+            duration = timings.get(name, {}).get("duration", 0.0)
+            prev = max((best[dep] for dep in self.dependencies(name) if dep in best),
+                       key=lambda item: item[0], default=(0.0, []))
+            best[name] = (prev[0] + duration, prev[1] + [name])
+        if not best:
+            return [], 0.0
+        total, path = max(best.values(), key=lambda item: item[0])
+        return path, total
+
+
+def format_timings(graph: StepGraph, timings: Dict[str, Dict[str, float]], wall_time: float) -> str:
+    """ステップごとの所要時間とクリティカルパスを表形式の文字列にする"""
+    lines = [f"  {'ステップ':<28} {'開始':>7} {'終了':>7} {'所要':>7}"]
+    for name in sorted(timings, key=lambda n: timings[n]["start"]):
+        t = timings[name]
+        cached = " (checkpoint)" if t.get("cached") else ""
+        lines.append(f"  {graph.steps[name].label:<28} {t['start']:>6.2f}s {t['end']:>6.2f}s {t['duration']:>6.2f}s{cached}")
+
+    path, path_time = graph.critical_path(timings)
+    serial_time = sum(t["duration"] for t in timings.values())
+    lines.append(f"  合計（逐次実行相当）: {serial_time:.2f}s / 実時間: {wall_time:.2f}s")
+    lines.append(f"  クリティカルパス: {' → '.join(path)} ({path_time:.2f}s)")
+    return "\n".join(lines)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+日本語向けBM25語彙インデックス（文字n-gram、外部トークナイザ不要）
+
+使い方:
+    from src.search.lexical_index import load_lexical_index, lexical_index_path
+
+    path = lexical_index_path("chroma_db", "transcripts_unified")
+    index = load_lexical_index(path)
+    index.upsert("doc_1", "田中さんがABC-123の件を説明", content_hash="...")
+    index.save(path)
+    hits = index.search("ABC-123", n_results=10)  # [(doc_id, score), ...]
+
+設計:
+- NFKC正規化 + 小文字化した本文を記号・空白で区切り、各区間を文字bigramに分解
+  （1文字だけの区間はunigram）。人名・社名・型番などの完全一致クエリに強い
+- ポスティングは語ごとに array('I')（文書番号・出現回数）で保持しメモリを節約
+- 文書の削除は墓標方式（検索時にスキップ）、削除率が閾値を超えたら compact() で詰め直す
+- content_hashが同じ文書の再登録はスキップ（ChromaDBの差分更新と同じ判定で同期できる）
+- SemanticSearchEngine の mode="hybrid" でベクトル検索結果とRRFで融合
+"""
+
+import math
+import os
+import pickle
+import re
+import tempfile
+import unicodedata
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+INDEX_VERSION = 1
+NGRAM_SIZE = 2
+BM25_K1 = 1.2
+BM25_B = 0.75
+COMPACT_DELETED_RATIO = 0.25
+
+# 記号・空白（区間の区切り）
+_SEPARATOR_RE = re.compile(r"[\s　-〿！-／：-＠・!-/:-@\[-`{-~]+")
+
+
+def tokenize(text: str, n: int = NGRAM_SIZE) -> List[str]:
+    """
+    テキストを文字n-gramに分解
+
+    Args:
+        text: 入力テキスト
+        n: n-gramの長さ
+
+    Returns:
+        n-gramのリスト（重複あり）
+    """
+    normalized = unicodedata.normalize('NFKC', text).lower()
+    tokens = []
+    for run in _SEPARATOR_RE.split(normalized):
+        if not run:
+            continue
+        if len(run) < n:
+            tokens.append(run)
+            continue
+        tokens.extend(run[i:i + n] for i in range(len(run) - n + 1))
+    return tokens
+
+
+def lexical_index_path(chroma_path, collection_name: str) -> Path:
+    """ChromaDBディレクトリ内のBM25インデックスファイルパス"""
+    return Path(chroma_path) / f"bm25_{collection_name}.pkl"
+
+
+class BM25Index:
+    """文字n-gram BM25インデックス（差分更新対応）"""
+
+    def __init__(self, ngram: int = NGRAM_SIZE, k1: float = BM25_K1, b: float = BM25_B):
+        self.ngram = ngram
+        self.k1 = k1
+        self.b = b
+
+        self._doc_ids: List[Optional[str]] = []     # 文書番号 → 文書ID（削除済みはNone）
+        self._doc_lens = array('I')                 # 文書番号 → 文書長（n-gram数）
+        self._doc_nums: Dict[str, int] = {}         # 文書ID → 文書番号
+        self._hashes: Dict[str, str] = {}           # 文書ID → content_hash
+        self._postings: Dict[str, Tuple[array, array]] = {}  # 語 → (文書番号, 出現回数)
+        self._total_len = 0
+        self._deleted = 0
+
+    # ------------------------------------------------------------------
+    # 更新
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._doc_nums)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_nums
+
+    def get_hash(self, doc_id: str) -> Optional[str]:
+        return self._hashes.get(doc_id)
+
+    def upsert(self, doc_id: str, text: str, content_hash: Optional[str] = None) -> bool:
+        """
+        文書を追加・更新
+
+        Args:
+            doc_id: 文書ID（ChromaDBのIDと同じ）
+            text: 本文
+            content_hash: 差分判定用ハッシュ（同じなら何もしない）
+
+        Returns:
+            bool: インデックスを更新したか
+        """
+        if content_hash is not None and doc_id in self._doc_nums and self._hashes.get(doc_id) == content_hash:
+            return False
+
+        self.remove(doc_id)
+
+        counts = Counter(tokenize(text, self.ngram))
+        doc_num = len(self._doc_ids)
+        doc_len = sum(counts.values())
+
+        self._doc_ids.append(doc_id)
+        self._doc_lens.append(doc_len)
+        self._doc_nums[doc_id] = doc_num
+        if content_hash is not None:
+            self._hashes[doc_id] = content_hash
+        self._total_len += doc_len
+
+        for term, tf in counts.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = (array('I'), array('I'))
+                self._postings[term] = posting
+            posting[0].append(doc_num)
+            posting[1].append(tf)
+
+        return True
+
+    def remove(self, doc_id: str) -> bool:
+        """文書を削除（墓標方式、必要に応じて自動compact）"""
+        doc_num = self._doc_nums.pop(doc_id, None)
+        if doc_num is None:
+            return False
+
+        self._hashes.pop(doc_id, None)
+        self._doc_ids[doc_num] = None
+        self._total_len -= self._doc_lens[doc_num]
+        self._deleted += 1
+
+        if self._deleted > COMPACT_DELETED_RATIO * max(len(self._doc_ids), 1):
+            self.compact()
+        return True
+
+    def remove_many(self, doc_ids: Iterable[str]) -> int:
+        return sum(1 for doc_id in doc_ids if self.remove(doc_id))
+
+    def compact(self):
+        """削除済み文書をポスティングから取り除き、文書番号を詰め直す"""
+        remap = array('i', [-1]) * len(self._doc_ids)
+        doc_ids: List[Optional[str]] = []
+        doc_lens = array('I')
+        for old_num, doc_id in enumerate(self._doc_ids):
+            if doc_id is None:
+                continue
+            remap[old_num] = len(doc_ids)
+            doc_ids.append(doc_id)
+            doc_lens.append(self._doc_lens[old_num])
+
+        postings = {}
+        for term, (nums, tfs) in self._postings.items():
+            new_nums, new_tfs = array('I'), array('I')
+            for num, tf in zip(nums, tfs):
+                new_num = remap[num]
+                if new_num >= 0:
+                    new_nums.append(new_num)
+                    new_tfs.append(tf)
+            if new_nums:
+                postings[term] = (new_nums, new_tfs)
+
+        self._doc_ids = doc_ids
+        self._doc_lens = doc_lens
+        self._doc_nums = {doc_id: num for num, doc_id in enumerate(doc_ids)}
+        self._postings = postings
+        self._deleted = 0
+
+    # ------------------------------------------------------------------
+    # 検索
+    # ------------------------------------------------------------------
+
+    def search(self, query: str, n_results: int = 10,
+               allowed_ids: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """
+        BM25で検索
+
+        Args:
+            query: 検索クエリ
+            n_results: 返す件数
+            allowed_ids: 指定時はこのIDの文書のみ対象
+
+        Returns:
+            [(doc_id, score), ...]（スコア降順）
+        """
+        n_docs = len(self._doc_nums)
+        if n_docs == 0:
+            return []
+
+        avg_len = self._total_len / n_docs if n_docs else 0.0
+        scores: Dict[int, float] = {}
+
+        for term, qtf in Counter(tokenize(query, self.ngram)).items():
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            nums, tfs = posting
+            # 削除済みを含むdfで近似（compactまでの誤差は小さい）
+            df = min(len(nums), n_docs)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+            for num, tf in zip(nums, tfs):
+                doc_id = self._doc_ids[num]
+                if doc_id is None or (allowed_ids is not None and doc_id not in allowed_ids):
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lens[num] / avg_len) if avg_len else self.k1
+                scores[num] = scores.get(num, 0.0) + qtf * idf * tf * (self.k1 + 1) / (tf + norm)
+
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+        return [(self._doc_ids[num], score) for num, score in top]
+
+    # ------------------------------------------------------------------
+    # 永続化
+    # ------------------------------------------------------------------
+
+    def save(self, path):
+        """インデックスを保存（一時ファイル経由でアトミックに書き込み）"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self._deleted:
+            self.compact()
+
+        state = {
+            "version": INDEX_VERSION,
+            "ngram": self.ngram,
+            "k1": self.k1,
+            "b": self.b,
+            "doc_ids": self._doc_ids,
+            "doc_lens": self._doc_lens,
+            "hashes": self._hashes,
+            "postings": self._postings,
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path) -> "BM25Index":
+        """保存済みインデックスを読み込み"""
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if state.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported lexical index version: {state.get('version')}")
+
+        index = cls(ngram=state["ngram"], k1=state["k1"], b=state["b"])
+        index._doc_ids = state["doc_ids"]
+        index._doc_lens = state["doc_lens"]
+        index._hashes = state["hashes"]
+        index._postings = state["postings"]
+        index._doc_nums = {doc_id: num for num, doc_id in enumerate(index._doc_ids) if doc_id is not None}
+        index._total_len = sum(index._doc_lens[num] for num in index._doc_nums.values())
+        index._deleted = len(index._doc_ids) - len(index._doc_nums)
+        return index
+
+
+def load_lexical_index(path) -> BM25Index:
+    """インデックスを読み込み（存在しない・読めない場合は空のインデックス）"""
+    if not Path(path).exists():
+        return BM25Index()
+    try:
+        return BM25Index.load(path)
+    except Exception as e:
+        print(f"⚠️  Lexical index could not be loaded, starting empty: {e}")
+        return BM25Index()
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    複数のランキングをRRFで融合
+
+    Args:
+        rankings: 文書IDのランキング（上位順）のリスト
+        k: RRF定数
+
+    Returns:
+        [(doc_id, rrf_score), ...]（スコア降順）
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
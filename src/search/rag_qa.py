@@ -10,54 +10,41 @@ ChromaDBとGemini APIを使用したRAG (Retrieval Augmented Generation) Q&Aシ
 - 回答の信頼性と関連性を評価
 """
 
-import os
 import sys
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
-import chromadb
-from chromadb.config import Settings
-import google.generativeai as genai
+
+from src.search.semantic_search import SemanticSearchEngine, configure_gemini
+from src.shared.gemini_client import GeminiModel
 
 # 環境変数の読み込み
 load_dotenv()
 
-# Gemini APIキー選択（FREE/PAID tier）
-use_paid_tier = os.getenv("USE_PAID_TIER", "").lower() == "true"
-api_key = os.getenv("GEMINI_API_KEY_PAID") if use_paid_tier else os.getenv("GEMINI_API_KEY")
-
-if not api_key:
-    print("❌ Error: GEMINI_API_KEY not found in environment variables")
-    sys.exit(1)
-
-genai.configure(api_key=api_key)
-print(f"✅ Using Gemini API: {'PAID' if use_paid_tier else 'FREE'} tier")
 
 
 class RAGQASystem:
     """RAG Q&Aシステムクラス"""
 
-    def __init__(self, chroma_path: str = "chroma_db"):
+    def __init__(self, chroma_path: str = "chroma_db", search_engine: Optional[SemanticSearchEngine] = None):
         """
         Args:
             chroma_path: ChromaDBの保存先ディレクトリ
+            search_engine: 既存の検索エンジン（常駐サーバーでクライアント・コレクションを共有する場合）
         """
         self.chroma_path = Path(chroma_path)
 
-        if not self.chroma_path.exists():
+        if search_engine is None and not self.chroma_path.exists():
             raise FileNotFoundError(f"ChromaDB not found at: {self.chroma_path}")
 
-        # ChromaDB クライアント初期化
-        self.client = chromadb.PersistentClient(
-            path=str(self.chroma_path),
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=False
-            )
-        )
+        configure_gemini()
+
+        # 検索エンジン（ChromaDBクライアント・コレクションハンドルを保持）
+        self.search_engine = search_engine or SemanticSearchEngine(chroma_path=str(self.chroma_path))
+        self.client = self.search_engine.client
 
         # Gemini LLM 初期化
-        self.llm = genai.GenerativeModel("gemini-2.0-flash-exp")
+        self.llm = GeminiModel("gemini-2.0-flash-exp")
 
         print(f"✅ RAG Q&A System initialized")
         print(f"   ChromaDB: {self.chroma_path}")
@@ -68,7 +55,8 @@ class RAGQASystem:
         self,
         query: str,
         collection_name: str = "transcripts_unified",
-        n_results: int = 5
+        n_results: int = 5,
+        mode: str = "dense"
     ) -> List[Dict[str, Any]]:
         """
         質問に関連するコンテキストをChromaDBから検索（デフォルト: 統合コレクション）
@@ -77,43 +65,21 @@ class RAGQASystem:
             query: ユーザーの質問
             collection_name: ChromaDBコレクション名（デフォルト: transcripts_unified）
             n_results: 検索する結果数
+            mode: "dense" or "hybrid"（BM25との融合）
 
         Returns:
             関連セグメントのリスト
         """
         print(f"\n🔍 Retrieving context for: '{query}'")
 
-        collection = self.client.get_collection(name=collection_name)
-
         # クエリをベクトル化して検索
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=query,
-            task_type="retrieval_query"
-        )
-        query_embedding = result['embedding']
-
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
-        )
+        search_results = self.search_engine.search_batch([query], collection_name, n_results, mode=mode)[0]
 
         # 結果を整形
-        contexts = []
-        for doc, metadata, distance in zip(
-            results['documents'][0],
-            results['metadatas'][0],
-            results['distances'][0]
-        ):
-            similarity_score = 1 / (1 + distance)
-
-            context = {
-                "text": doc,
-                "metadata": metadata,
-                "similarity_score": similarity_score,
-                "distance": distance
-            }
-            contexts.append(context)
+        contexts = [
+            {key: result[key] for key in ("text", "metadata", "similarity_score", "distance")}
+            for result in search_results["results"]
+        ]
 
         print(f"   Retrieved {len(contexts)} relevant segments")
 
@@ -182,7 +148,8 @@ class RAGQASystem:
         self,
         query: str,
         collection_name: str = "transcripts_unified",
-        n_contexts: int = 5
+        n_contexts: int = 5,
+        mode: str = "dense"
     ) -> Dict[str, Any]:
         """
         質問に回答する（メイン関数）（デフォルト: 統合コレクション）
@@ -191,12 +158,13 @@ class RAGQASystem:
             query: ユーザーの質問
             collection_name: ChromaDBコレクション名（デフォルト: transcripts_unified）
             n_contexts: 使用するコンテキスト数
+            mode: コンテキスト検索モード（"dense" or "hybrid"）
 
         Returns:
             回答と引用情報
         """
         # 1. コンテキスト検索
-        contexts = self.retrieve_context(query, collection_name, n_contexts)
+        contexts = self.retrieve_context(query, collection_name, n_contexts, mode=mode)
 
         # 2. 回答生成
         result = self.generate_answer(query, contexts)
@@ -243,28 +211,43 @@ class RAGQASystem:
         self,
         questions: List[str],
         collection_name: str = "transcripts_unified",
-        n_contexts: int = 5
+        n_contexts: int = 5,
+        display: bool = True,
+        mode: str = "dense"
     ) -> List[Dict[str, Any]]:
         """
         複数の質問に一括で回答（デフォルト: 統合コレクション）
+        コンテキスト検索は全質問まとめて1回で行う
 
         Args:
             questions: 質問のリスト
             collection_name: ChromaDBコレクション名（デフォルト: transcripts_unified）
             n_contexts: 使用するコンテキスト数
+            display: 回答を表示するか
+            mode: コンテキスト検索モード（"dense" or "hybrid"）
 
         Returns:
             回答結果のリスト
         """
         results = []
+        if not questions:
+            return results
+
+        batch_results = self.search_engine.search_batch(questions, collection_name, n_contexts, mode=mode)
 
-        for i, question in enumerate(questions, 1):
-            print(f"\n{'='*70}")
-            print(f"Question {i}/{len(questions)}")
-            print(f"{'='*70}")
+        for i, (question, search_results) in enumerate(zip(questions, batch_results), 1):
+            if display:
+                print(f"\n{'='*70}")
+                print(f"Question {i}/{len(questions)}")
+                print(f"{'='*70}")
 
-            result = self.ask(question, collection_name, n_contexts)
-            self.display_answer(result)
+            contexts = [
+                {key: result[key] for key in ("text", "metadata", "similarity_score", "distance")}
+                for result in search_results["results"]
+            ]
+            result = self.generate_answer(question, contexts)
+            if display:
+                self.display_answer(result)
 
             results.append(result)
 
@@ -278,7 +261,11 @@ def main():
     print("=" * 70)
 
     # RAG Q&Aシステム初期化
-    rag_system = RAGQASystem(chroma_path="chroma_db")
+    try:
+        rag_system = RAGQASystem(chroma_path="chroma_db")
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
 
     # 利用可能なコレクション表示
     collections = [col.name for col in rag_system.client.list_collections()]
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+常駐検索サーバーのCLIクライアント（標準ライブラリのみ、chromadb/genaiをインポートしない）
+
+使い方:
+    python -m src.search.search_client search "プロダクト開発について" [-n 5]
+    python -m src.search.search_client topic "採用"
+    python -m src.search.search_client search "ABC-123" --mode hybrid   # BM25との融合（固有名詞・型番向け）
+    python -m src.search.search_client ask "営業とAIについてどのような議論がありましたか？"
+    python -m src.search.search_client search "質問1" "質問2" ...   # 複数指定でバッチ検索
+    python -m src.search.search_client ask "質問1" "質問2" ... --json
+
+サーバー: python -m src.search.search_server（SEARCH_SERVER_URLで接続先を変更可能）
+"""
+
+import argparse
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+from typing import Any, Dict
+
+SEARCH_SERVER_URL = os.getenv(
+    'SEARCH_SERVER_URL',
+    f"http://{os.getenv('SEARCH_SERVER_HOST', '127.0.0.1')}:{os.getenv('SEARCH_SERVER_PORT', '8100')}"
+)
+REQUEST_TIMEOUT = float(os.getenv('SEARCH_CLIENT_TIMEOUT', '120'))
+
+
+def post(path: str, payload: Dict[str, Any], base_url: str = SEARCH_SERVER_URL) -> Dict[str, Any]:
+    """
+    検索サーバーにJSONをPOST
+
+    Raises:
+        RuntimeError: 接続失敗・HTTPエラー
+    """
+    request = urllib.request.Request(
+        base_url.rstrip('/') + path,
+        data=json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        detail = e.read().decode('utf-8', errors='replace')
+        raise RuntimeError(f"HTTP {e.code}: {detail}")
+    except urllib.error.URLError as e:
+        raise RuntimeError(f"Search server not reachable at {base_url} ({e.reason}). "
+                           f"Start it with: python -m src.search.search_server")
+
+
+def print_search_results(search_results: Dict[str, Any]):
+    """検索結果を表示"""
+    print(f"\n🔍 {search_results.get('query', '')} ({search_results.get('total_results', 0)} results)")
+    for result in search_results.get('results', []):
+        meta = result.get('metadata', {})
+        text = result['text'] if len(result['text']) <= 200 else result['text'][:200] + "..."
+        score = result.get('rrf_score', result['similarity_score'])
+        print(f"\n#{result['rank']} ({score:.4f}) "
+              f"{meta.get('source_file', 'N/A')} {meta.get('timestamp', '')} {meta.get('speaker', '')}")
+        print(f"   {text}")
+
+
+def print_answer(result: Dict[str, Any]):
+    """RAG回答を表示"""
+    print(f"\n❓ {result['query']}")
+    print(f"\n💡 {result['answer']}")
+    print(f"\n📚 Sources:")
+    for i, ctx in enumerate(result.get('contexts', []), 1):
+        meta = ctx.get('metadata', {})
+        print(f"   [セグメント {i}] {meta.get('source_file', 'N/A')} {meta.get('timestamp', '')} "
+              f"({ctx['similarity_score']:.4f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search server client")
+    parser.add_argument('command', choices=['search', 'topic', 'ask'])
+    parser.add_argument('texts', nargs='+', help="クエリ / トピック / 質問（複数指定でバッチ）")
+    parser.add_argument('-n', type=int, default=5, help="結果数 / コンテキスト数")
+    parser.add_argument('--collection', default=None)
+    parser.add_argument('--mode', choices=['dense', 'hybrid'], default=None, help="検索モード")
+    parser.add_argument('--json', action='store_true', help="JSONをそのまま出力")
+    args = parser.parse_args()
+
+    common = {'collection': args.collection} if args.collection else {}
+    if args.mode:
+        common['mode'] = args.mode
+
+    try:
+        if args.command == 'ask':
+            if len(args.texts) == 1:
+                results = [post('/ask', {'question': args.texts[0], 'n_contexts': args.n, **common})]
+            else:
+                results = post('/ask/batch', {'questions': args.texts, 'n_contexts': args.n, **common})['results']
+            printer = print_answer
+        elif args.command == 'topic':
+            results = [post('/search/topic', {'topic': text, 'n_results': args.n, **common})
+                       for text in args.texts]
+            printer = print_search_results
+        else:
+            if len(args.texts) == 1:
+                results = [post('/search', {'query': args.texts[0], 'n_results': args.n, **common})]
+            else:
+                results = post('/search/batch', {'queries': args.texts, 'n_results': args.n, **common})['results']
+            printer = print_search_results
+    except RuntimeError as e:
+        print(f"❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(results if len(results) > 1 else results[0], ensure_ascii=False, indent=2))
+    else:
+        for result in results:
+            printer(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+常駐検索サーバー（セマンティック検索・RAG Q&A）
+
+ChromaDBクライアント・コレクションハンドル・埋め込みキャッシュ・Gemini設定を
+プロセス起動時に1回だけ初期化し、以降のクエリは埋め込み + 近傍検索の時間のみで応答する。
+
+起動:
+    python -m src.search.search_server
+
+エンドポイント:
+    GET  /               ヘルスチェック（コレクション一覧・件数）
+    POST /search         {"query": "...", "n_results": 5, "mode": "hybrid",
+                          "person": "person_001", "date_from": "2025-10-01", "start_seconds": 600, ...}
+    POST /search/topic   {"topic": "...", "n_results": 5}
+    POST /search/batch   {"queries": ["...", ...], "n_results": 5}
+    POST /ask            {"question": "...", "n_contexts": 5}
+    POST /ask/batch      {"questions": ["...", ...], "n_contexts": 5}
+
+modeは "dense"（デフォルト、SEARCH_MODEで変更可）または "hybrid"（BM25とのRRF融合）。
+CLIクライアント: src/search/search_client.py
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from src.search.rag_qa import RAGQASystem
+from src.search.semantic_search import SEARCH_MODES, SemanticSearchEngine
+from src.vector_db.metadata_schema import build_where
+
+# 環境変数の読み込み
+load_dotenv()
+
+CHROMA_PATH = os.getenv('CHROMA_PATH', 'chroma_db')
+DEFAULT_COLLECTION = os.getenv('SEARCH_COLLECTION', 'transcripts_unified')
+DEFAULT_MODE = os.getenv('SEARCH_MODE', 'dense')  # "dense" or "hybrid"
+SEARCH_SERVER_HOST = os.getenv('SEARCH_SERVER_HOST', '127.0.0.1')
+SEARCH_SERVER_PORT = int(os.getenv('SEARCH_SERVER_PORT', '8100'))
+
+
+class SearchFilters(BaseModel):
+    """型付きメタデータによる絞り込み（src/vector_db/metadata_schema.build_where）"""
+    speaker: Optional[str] = None
+    person: Optional[str] = None
+    organization: Optional[str] = None
+    topic: Optional[str] = None
+    source_file: Optional[str] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    start_seconds: Optional[float] = None
+    end_seconds: Optional[float] = None
+
+    def to_where(self, raw_filter: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        where = build_where(
+            speaker=self.speaker, person=self.person, organization=self.organization, topic=self.topic,
+            source_file=self.source_file, date_from=self.date_from, date_to=self.date_to,
+            start_seconds=self.start_seconds, end_seconds=self.end_seconds
+        )
+        if where and raw_filter:
+            return {"$and": [raw_filter, where]}
+        return where or raw_filter
+
+
+class SearchRequest(SearchFilters):
+    query: str
+    collection: str = DEFAULT_COLLECTION
+    n_results: int = 5
+    filter: Optional[Dict[str, Any]] = None
+    mode: str = DEFAULT_MODE
+
+
+class TopicSearchRequest(BaseModel):
+    topic: str
+    collection: str = DEFAULT_COLLECTION
+    n_results: int = 5
+    mode: str = DEFAULT_MODE
+
+
+class BatchSearchRequest(SearchFilters):
+    queries: List[str]
+    collection: str = DEFAULT_COLLECTION
+    n_results: int = 5
+    filter: Optional[Dict[str, Any]] = None
+    mode: str = DEFAULT_MODE
+
+
+class AskRequest(BaseModel):
+    question: str
+    collection: str = DEFAULT_COLLECTION
+    n_contexts: int = 5
+    mode: str = DEFAULT_MODE
+
+
+class BatchAskRequest(BaseModel):
+    questions: List[str]
+    collection: str = DEFAULT_COLLECTION
+    n_contexts: int = 5
+    mode: str = DEFAULT_MODE
+
+
+# 起動時に初期化する常駐オブジェクト
+_state: Dict[str, Any] = {}
+
+# FastAPI app
+app = FastAPI()
+
+
+def get_engine() -> SemanticSearchEngine:
+    engine = _state.get('engine')
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Search engine is not initialized")
+    return engine
+
+
+def get_rag() -> RAGQASystem:
+    rag = _state.get('rag')
+    if rag is None:
+        raise HTTPException(status_code=503, detail="RAG system is not initialized")
+    return rag
+
+
+def _check_mode(mode: str):
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown mode '{mode}' (expected one of {', '.join(SEARCH_MODES)})")
+
+
+def _require_collection(engine: SemanticSearchEngine, collection_name: str):
+    """コレクションハンドルを取得（存在しなければ404）"""
+    try:
+        return engine.get_collection(collection_name)
+    except Exception:
+        raise HTTPException(status_code=404, detail=f"Collection '{collection_name}' not found")
+
+
+@app.on_event("startup")
+def startup_event():
+    """ChromaDBクライアント・コレクション・Gemini設定を1回だけ初期化"""
+    print("=" * 60)
+    print("Search Server (Semantic Search / RAG Q&A)")
+    print("=" * 60)
+
+    engine = SemanticSearchEngine(chroma_path=CHROMA_PATH)
+    _state['engine'] = engine
+    _state['rag'] = RAGQASystem(chroma_path=CHROMA_PATH, search_engine=engine)
+
+    # デフォルトコレクションのハンドルを事前に開いておく
+    try:
+        collection = engine.get_collection(DEFAULT_COLLECTION)
+        print(f"✅ Collection warmed up: {DEFAULT_COLLECTION} ({collection.count()} docs)")
+    except Exception as e:
+        print(f"⚠️  Default collection not available yet: {e}")
+
+
+@app.get("/")
+def root():
+    """Health check endpoint"""
+    engine = get_engine()
+    return {
+        "status": "running",
+        "service": "Search Server",
+        "collections": engine.list_collections(),
+    }
+
+
+@app.post("/search")
+def search(request: SearchRequest):
+    engine = get_engine()
+    _check_mode(request.mode)
+    _require_collection(engine, request.collection)
+    return engine.search(
+        query=request.query,
+        collection_name=request.collection,
+        n_results=request.n_results,
+        filter_metadata=request.to_where(request.filter),
+        mode=request.mode
+    )
+
+
+@app.post("/search/topic")
+def search_by_topic(request: TopicSearchRequest):
+    engine = get_engine()
+    _check_mode(request.mode)
+    _require_collection(engine, request.collection)
+    return engine.search_by_topic(
+        topic=request.topic,
+        collection_name=request.collection,
+        n_results=request.n_results,
+        mode=request.mode
+    )
+
+
+@app.post("/search/batch")
+def search_batch(request: BatchSearchRequest):
+    engine = get_engine()
+    _check_mode(request.mode)
+    _require_collection(engine, request.collection)
+    return {
+        "results": engine.search_batch(
+            queries=request.queries,
+            collection_name=request.collection,
+            n_results=request.n_results,
+            filter_metadata=request.to_where(request.filter),
+            mode=request.mode
+        )
+    }
+
+
+@app.post("/ask")
+def ask(request: AskRequest):
+    rag = get_rag()
+    _check_mode(request.mode)
+    _require_collection(rag.search_engine, request.collection)
+    return rag.ask(request.question, request.collection, request.n_contexts, mode=request.mode)
+
+
+@app.post("/ask/batch")
+def ask_batch(request: BatchAskRequest):
+    rag = get_rag()
+    _check_mode(request.mode)
+    _require_collection(rag.search_engine, request.collection)
+    return {
+        "results": rag.batch_ask(request.questions, request.collection, request.n_contexts,
+                                 display=False, mode=request.mode)
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=SEARCH_SERVER_HOST, port=SEARCH_SERVER_PORT)
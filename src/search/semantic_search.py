@@ -5,56 +5,91 @@ ChromaDBに保存されたベクトルインデックスを使用してセマン
 
 機能:
 - 自然言語クエリによるセマンティック検索
-- トピック、エンティティ、時間範囲によるフィルタリング
+- トピック、人物・組織、会議日、時間範囲によるフィルタリング（型付きメタデータへの完全一致・範囲条件）
 - タイムスタンプ付き結果表示
 - 類似度スコア表示
+- ハイブリッド検索（mode="hybrid"）: 文字n-gram BM25とベクトル検索をRRFで融合し、人名・社名・型番の完全一致に強くする
+
+常駐サーバーから使う場合は src/search/search_server.py を参照
+（インポート時にはAPIキー設定・DB接続を行わず、SemanticSearchEngine初期化時に1回だけ行う）
 """
 
-import os
 import sys
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
 from dotenv import load_dotenv
-import google.generativeai as genai
 import chromadb
 from chromadb.config import Settings
 
+from src.search.lexical_index import (
+    BM25Index,
+    lexical_index_path,
+    load_lexical_index,
+    reciprocal_rank_fusion,
+)
+from src.shared.embedding_service import get_embedding_service
+from src.shared.gemini_client import get_gemini_client, resolve_api_key
+from src.shared.rate_limiter import get_tier
+from src.vector_db.metadata_schema import build_where
+
 # 環境変数の読み込み
 load_dotenv()
 
-# Gemini APIキー選択（FREE/PAID tier）
-use_paid_tier = os.getenv("USE_PAID_TIER", "").lower() == "true"
-api_key = os.getenv("GEMINI_API_KEY_PAID") if use_paid_tier else os.getenv("GEMINI_API_KEY")
+# 検索モード
+SEARCH_MODES = ("dense", "hybrid")
+HYBRID_CANDIDATE_FACTOR = 4   # hybrid時、各ランキングから n_results * 4 件を候補にする
+HYBRID_MIN_CANDIDATES = 20
+RRF_K = 60
+
+_gemini_configured = False
+
 
-if not api_key:
-    print("❌ Error: GEMINI_API_KEY not found in environment variables")
-    sys.exit(1)
+def configure_gemini():
+    """
+    Gemini APIキーの存在を確認（FREE/PAID tier、プロセス内で1回だけ）
 
-genai.configure(api_key=api_key)
-print(f"✅ Using Gemini API: {'PAID' if use_paid_tier else 'FREE'} tier")
+    キーは共通クライアント（src/shared/gemini_client.py）が呼び出し時に解決する。
+    キー不要のバックエンド（GEMINI_BACKEND=fake）では確認しない。
+
+    Raises:
+        ValueError: APIキーが環境変数に設定されていない
+    """
+    global _gemini_configured
+    if _gemini_configured:
+        return
+
+    if get_gemini_client().backend.requires_api_key:
+        resolve_api_key()
+        print(f"✅ Using Gemini API: {get_tier().upper()} tier")
+    _gemini_configured = True
 
 
 class SemanticSearchEngine:
     """セマンティック検索エンジンクラス"""
 
-    def __init__(self, chroma_path: str = "chroma_db"):
+    def __init__(self, chroma_path: str = "chroma_db", client=None):
         """
         Args:
             chroma_path: ChromaDBの保存先ディレクトリ
+            client: 既存のChromaDBクライアント（常駐サーバーでRAGと共有する場合）
         """
         self.chroma_path = Path(chroma_path)
 
-        if not self.chroma_path.exists():
+        if client is None and not self.chroma_path.exists():
             raise FileNotFoundError(f"ChromaDB not found at: {self.chroma_path}")
 
+        configure_gemini()
+
         # ChromaDB クライアント初期化
-        self.client = chromadb.PersistentClient(
+        self.client = client or chromadb.PersistentClient(
             path=str(self.chroma_path),
             settings=Settings(
                 anonymized_telemetry=False,
                 allow_reset=False
             )
         )
+        self._collections = {}
+        self._lexical = {}
 
         print(f"✅ Semantic Search Engine initialized")
         print(f"   ChromaDB path: {self.chroma_path}")
@@ -65,12 +100,155 @@ class SemanticSearchEngine:
         collections = self.client.list_collections()
         return [col.name for col in collections]
 
+    def get_collection(self, collection_name: str):
+        """コレクションハンドルを取得（2回目以降は再利用）"""
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            collection = self.client.get_collection(name=collection_name)
+            self._collections[collection_name] = collection
+        return collection
+
+    def get_lexical_index(self, collection_name: str) -> BM25Index:
+        """
+        コレクションに対応するBM25インデックスを取得
+        （ファイルが更新されていれば再読み込み: 常駐サーバー稼働中のインデックス再構築に追従）
+        """
+        path = lexical_index_path(self.chroma_path, collection_name)
+        mtime = path.stat().st_mtime if path.exists() else None
+
+        cached = self._lexical.get(collection_name)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, load_lexical_index(path))
+            self._lexical[collection_name] = cached
+        return cached[1]
+
+    @staticmethod
+    def _format_results(results: Dict[str, Any], query_index: int = 0) -> List[Dict[str, Any]]:
+        """collection.queryの結果（query_index番目のクエリ分）を整形"""
+        formatted_results = []
+        for i, (doc_id, doc, metadata, distance) in enumerate(
+            zip(results['ids'][query_index], results['documents'][query_index],
+                results['metadatas'][query_index], results['distances'][query_index]),
+            1
+        ):
+            # 類似度スコア計算（距離から変換: 小さいほど類似）
+            similarity_score = 1 / (1 + distance)
+
+            formatted_results.append({
+                "rank": i,
+                "id": doc_id,
+                "text": doc,
+                "metadata": metadata,
+                "similarity_score": similarity_score,
+                "distance": distance
+            })
+        return formatted_results
+
+    def _fuse_hybrid(
+        self,
+        collection,
+        collection_name: str,
+        query: str,
+        dense_results: List[Dict[str, Any]],
+        n_results: int,
+        n_candidates: int,
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        allowed_ids: Optional[Set[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        ベクトル検索結果とBM25結果をRRFで融合
+
+        allowed_ids（フィルター条件に一致する文書ID）を指定すると、BM25の候補もその中から選ぶ
+        （絞り込みの強いフィルターでも字句側の候補が空にならないように）
+        """
+        lexical_hits = self.get_lexical_index(collection_name).search(
+            query, n_results=n_candidates, allowed_ids=allowed_ids
+        )
+        lexical_scores = dict(lexical_hits)
+        by_id = {result["id"]: result for result in dense_results}
+
+        # BM25のみでヒットした文書は本文・メタデータを取得（フィルター条件もここで適用）
+        missing = [doc_id for doc_id, _ in lexical_hits if doc_id not in by_id]
+        if missing:
+            get_kwargs = {"ids": missing, "include": ["documents", "metadatas"]}
+            if filter_metadata:
+                get_kwargs["where"] = filter_metadata
+            fetched = collection.get(**get_kwargs)
+            for doc_id, doc, metadata in zip(fetched['ids'], fetched['documents'], fetched['metadatas']):
+                by_id[doc_id] = {
+                    "id": doc_id,
+                    "text": doc,
+                    "metadata": metadata,
+                    "similarity_score": 0.0,
+                    "distance": None
+                }
+
+        dense_ranking = [result["id"] for result in dense_results]
+        lexical_ranking = [doc_id for doc_id, _ in lexical_hits if doc_id in by_id]
+
+        fused_results = []
+        for rank, (doc_id, rrf_score) in enumerate(
+            reciprocal_rank_fusion([dense_ranking, lexical_ranking], k=RRF_K)[:n_results], 1
+        ):
+            result = dict(by_id[doc_id])
+            result["rank"] = rank
+            result["rrf_score"] = rrf_score
+            result["bm25_score"] = lexical_scores.get(doc_id, 0.0)
+            fused_results.append(result)
+        return fused_results
+
+    def _run_queries(
+        self,
+        collection,
+        collection_name: str,
+        queries: List[str],
+        n_results: int,
+        filter_metadata: Optional[Dict[str, Any]],
+        mode: str
+    ) -> List[Dict[str, Any]]:
+        """複数クエリを埋め込み1リクエスト + ChromaDBクエリ1回で検索"""
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode} (expected one of {', '.join(SEARCH_MODES)})")
+
+        n_candidates = max(n_results * HYBRID_CANDIDATE_FACTOR, HYBRID_MIN_CANDIDATES) if mode == "hybrid" else n_results
+        query_embeddings = get_embedding_service().embed_texts(queries, task_type="retrieval_query")
+
+        search_kwargs = {
+            "query_embeddings": query_embeddings,
+            "n_results": n_candidates
+        }
+        if filter_metadata:
+            search_kwargs["where"] = filter_metadata
+
+        results = collection.query(**search_kwargs)
+
+        # フィルター指定時はBM25の対象を条件に一致する文書に限定（全クエリ共通で1回だけ取得）
+        allowed_ids = None
+        if mode == "hybrid" and filter_metadata:
+            allowed_ids = set(collection.get(where=filter_metadata, include=[])['ids'])
+
+        batch_results = []
+        for i, query in enumerate(queries):
+            formatted_results = self._format_results(results, i)
+            if mode == "hybrid":
+                formatted_results = self._fuse_hybrid(collection, collection_name, query, formatted_results,
+                                                      n_results, n_candidates, filter_metadata, allowed_ids)
+            batch_results.append({
+                "query": query,
+                "collection": collection_name,
+                "mode": mode,
+                "total_results": len(formatted_results),
+                "results": formatted_results
+            })
+        return batch_results
+
     def search(
         self,
         query: str,
         collection_name: str = "transcripts_unified",
         n_results: int = 5,
-        filter_metadata: Optional[Dict[str, Any]] = None
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        mode: str = "dense"
     ) -> Dict[str, Any]:
         """
         セマンティック検索を実行（デフォルト: 統合コレクション）
@@ -79,7 +257,8 @@ class SemanticSearchEngine:
             query: 検索クエリ（自然言語）
             collection_name: ChromaDBコレクション名（デフォルト: transcripts_unified）
             n_results: 返す結果の数
-            filter_metadata: メタデータフィルター（例: {"source_file": {"$contains": "09-22"}}）
+            filter_metadata: メタデータフィルター（例: build_where(person="person_001", date_from="2025-10-01")）
+            mode: "dense"（ベクトル検索のみ）or "hybrid"（ベクトル + BM25をRRFで融合）
 
         Returns:
             検索結果のディクショナリ
@@ -87,58 +266,44 @@ class SemanticSearchEngine:
         print(f"\n🔍 Searching for: '{query}'")
         print(f"   Collection: {collection_name}")
         print(f"   Max results: {n_results}")
+        print(f"   Mode: {mode}")
 
         # コレクション取得
         try:
-            collection = self.client.get_collection(name=collection_name)
+            collection = self.get_collection(collection_name)
         except Exception as e:
             print(f"❌ Error: Collection '{collection_name}' not found")
             print(f"   Available collections: {', '.join(self.list_collections())}")
             return {"results": []}
 
-        # クエリをベクトル化
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=query,
-            task_type="retrieval_query"
-        )
-        query_embedding = result['embedding']
-
-        # 検索実行
-        search_kwargs = {
-            "query_embeddings": [query_embedding],
-            "n_results": n_results
-        }
+        return self._run_queries(collection, collection_name, [query], n_results, filter_metadata, mode)[0]
 
-        if filter_metadata:
-            search_kwargs["where"] = filter_metadata
+    def search_batch(
+        self,
+        queries: List[str],
+        collection_name: str = "transcripts_unified",
+        n_results: int = 5,
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        mode: str = "dense"
+    ) -> List[Dict[str, Any]]:
+        """
+        複数クエリをまとめて検索（埋め込み1リクエスト + ChromaDBクエリ1回）
 
-        results = collection.query(**search_kwargs)
+        Args:
+            queries: 検索クエリのリスト
+            collection_name: ChromaDBコレクション名
+            n_results: クエリごとに返す結果の数
+            filter_metadata: 全クエリ共通のメタデータフィルター
+            mode: "dense" or "hybrid"
 
-        # 結果整形
-        formatted_results = []
-        for i, (doc, metadata, distance) in enumerate(
-            zip(results['documents'][0], results['metadatas'][0], results['distances'][0]),
-            1
-        ):
-            # 類似度スコア計算（距離から変換: 小さいほど類似）
-            similarity_score = 1 / (1 + distance)
+        Returns:
+            クエリと同順の検索結果リスト（各要素はsearch()の戻り値と同じ形式）
+        """
+        if not queries:
+            return []
 
-            result = {
-                "rank": i,
-                "text": doc,
-                "metadata": metadata,
-                "similarity_score": similarity_score,
-                "distance": distance
-            }
-            formatted_results.append(result)
-
-        return {
-            "query": query,
-            "collection": collection_name,
-            "total_results": len(formatted_results),
-            "results": formatted_results
-        }
+        collection = self.get_collection(collection_name)
+        return self._run_queries(collection, collection_name, queries, n_results, filter_metadata, mode)
 
     def display_results(self, search_results: Dict[str, Any]) -> None:
         """検索結果を見やすく表示"""
@@ -154,7 +319,11 @@ class SemanticSearchEngine:
 
         for result in search_results['results']:
             print(f"{'─'*70}")
-            print(f"Rank #{result['rank']} (Similarity: {result['similarity_score']:.4f})")
+            if 'rrf_score' in result:
+                print(f"Rank #{result['rank']} (RRF: {result['rrf_score']:.4f}, "
+                      f"Similarity: {result['similarity_score']:.4f}, BM25: {result['bm25_score']:.2f})")
+            else:
+                print(f"Rank #{result['rank']} (Similarity: {result['similarity_score']:.4f})")
             print(f"{'─'*70}")
 
             # テキスト表示（長い場合は省略）
@@ -195,23 +364,57 @@ class SemanticSearchEngine:
         self,
         topic: str,
         collection_name: str = "transcripts_unified",
-        n_results: int = 5
+        n_results: int = 5,
+        mode: str = "dense"
     ) -> Dict[str, Any]:
         """トピックで検索（デフォルト: 統合コレクション）"""
         print(f"\n🏷️  Searching by topic: '{topic}'")
 
-        filter_metadata = {
-            "$or": [
-                {"segment_topics": {"$contains": topic}},
-                {"global_topics": {"$contains": topic}}
-            ]
-        }
-
         return self.search(
             query=topic,
             collection_name=collection_name,
             n_results=n_results,
-            filter_metadata=filter_metadata
+            filter_metadata=build_where(topic=topic),
+            mode=mode
+        )
+
+    def search_by_person(
+        self,
+        query: str,
+        person: str,
+        collection_name: str = "transcripts_unified",
+        n_results: int = 5,
+        mode: str = "dense"
+    ) -> Dict[str, Any]:
+        """人物（entity_id または canonical_name）が登場する会議に絞って検索"""
+        print(f"\n👥 Searching with person: '{person}'")
+
+        return self.search(
+            query=query,
+            collection_name=collection_name,
+            n_results=n_results,
+            filter_metadata=build_where(person=person),
+            mode=mode
+        )
+
+    def search_by_date_range(
+        self,
+        query: str,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        collection_name: str = "transcripts_unified",
+        n_results: int = 5,
+        mode: str = "dense"
+    ) -> Dict[str, Any]:
+        """会議日の範囲（"2025-10-01" / "20251001"、両端含む）で検索"""
+        print(f"\n📅 Searching in date range: {date_from or '-'} - {date_to or '-'}")
+
+        return self.search(
+            query=query,
+            collection_name=collection_name,
+            n_results=n_results,
+            filter_metadata=build_where(date_from=date_from, date_to=date_to),
+            mode=mode
         )
 
     def search_by_time_range(
@@ -220,23 +423,18 @@ class SemanticSearchEngine:
         collection_name: str = "transcripts_unified",
         start_time: float = 0,
         end_time: float = 99999,
-        n_results: int = 5
+        n_results: int = 5,
+        mode: str = "dense"
     ) -> Dict[str, Any]:
-        """時間範囲で検索（デフォルト: 統合コレクション）"""
+        """録音内の時間範囲（秒）で検索（範囲と重なるセグメントが対象、デフォルト: 統合コレクション）"""
         print(f"\n⏱️  Searching in time range: {start_time}s - {end_time}s")
 
-        filter_metadata = {
-            "$and": [
-                {"start_time": {"$gte": start_time}},
-                {"start_time": {"$lte": end_time}}
-            ]
-        }
-
         return self.search(
             query=query,
             collection_name=collection_name,
             n_results=n_results,
-            filter_metadata=filter_metadata
+            filter_metadata=build_where(start_seconds=start_time, end_seconds=end_time),
+            mode=mode
         )
 
 
@@ -247,7 +445,11 @@ def main():
     print("=" * 70)
 
     # 検索エンジン初期化
-    engine = SemanticSearchEngine(chroma_path="chroma_db")
+    try:
+        engine = SemanticSearchEngine(chroma_path="chroma_db")
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
 
     # 利用可能なコレクション表示
     collections = engine.list_collections()
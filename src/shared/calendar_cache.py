@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+カレンダー予定のローカルストア（SQLite + Calendar API同期トークン）
+
+使い方:
+    from src.shared.calendar_cache import get_calendar_store
+
+    events = get_calendar_store().get_events_for_day('20251016', calendar_id='primary')
+
+機能:
+- 直近 CALENDAR_SYNC_PAST_DAYS 日以降の予定を events().list の syncToken で差分同期し、SQLiteに保存
+  （同期は CALENDAR_SYNC_TTL 秒に1回まで。それ以内の問い合わせはローカル読み込みのみ）
+- 同期範囲より前の日付（過去録音のバックフィル）は日単位で取得して保存し、CALENDAR_DAY_TTL 秒再利用
+- syncToken が失効（HTTP 410）した場合は全件同期し直す
+- 日付範囲の問い合わせは (calendar_id, start_ts) 索引で処理し、API呼び出しと同じ並び（開始時刻順）で返す
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+# 設定
+CALENDAR_CACHE_DB = os.getenv('CALENDAR_CACHE_DB', 'data/calendar_cache.db')
+CALENDAR_SYNC_TTL = float(os.getenv('CALENDAR_SYNC_TTL', '300'))  # 秒
+CALENDAR_DAY_TTL = float(os.getenv('CALENDAR_DAY_TTL', '86400'))  # 秒
+CALENDAR_SYNC_PAST_DAYS = int(os.getenv('CALENDAR_SYNC_PAST_DAYS', '30'))
+
+EVENT_FIELDS = 'id,status,summary,start,end,description,attendees'
+SYNC_FIELDS = f'items({EVENT_FIELDS}),nextPageToken,nextSyncToken'
+DAY_FIELDS = f'items({EVENT_FIELDS}),nextPageToken'
+
+
+def _parse_event_time(value: Dict[str, str]) -> Optional[float]:
+    """start / end（dateTime または終日予定の date）をUNIX時刻に変換"""
+    if not value:
+        return None
+    if 'dateTime' in value:
+        return datetime.fromisoformat(value['dateTime'].replace('Z', '+00:00')).timestamp()
+    if 'date' in value:
+        return datetime.strptime(value['date'], '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp()
+    return None
+
+
+def day_range(file_date: str) -> tuple:
+    """
+    YYYYMMDD → (time_min, time_max) のUNIX時刻
+
+    従来の events().list 呼び出し（当日 00:00:00Z 〜 23:59:59Z）と同じ範囲
+    """
+    day = datetime.strptime(file_date, '%Y%m%d').replace(tzinfo=timezone.utc)
+    return day.timestamp(), (day + timedelta(hours=23, minutes=59, seconds=59)).timestamp()
+
+
+def _is_sync_token_expired(error: Exception) -> bool:
+    """syncToken 失効（410 Gone）か"""
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    return str(status) == '410'
+
+
+class CalendarEventStore:
+    """カレンダー予定のローカルストア（スレッドセーフ）"""
+
+    def __init__(self, db_path: str = CALENDAR_CACHE_DB,
+                 service_factory: Optional[Callable[[], Any]] = None,
+                 sync_ttl: float = CALENDAR_SYNC_TTL, day_ttl: float = CALENDAR_DAY_TTL,
+                 sync_past_days: int = CALENDAR_SYNC_PAST_DAYS, clock=time.time):
+        """
+        Args:
+            db_path: SQLiteファイルパス
+            service_factory: Calendar APIサービスを返す関数（Noneなら calendar_integration.get_calendar_service）
+            sync_ttl: 差分同期の最小間隔（秒）
+            day_ttl: 同期範囲外の日の取得結果を再利用する秒数
+            sync_past_days: 差分同期の対象とする過去日数
+            clock: 時刻取得関数（テスト用に差し替え可能）
+        """
+        self.service_factory = service_factory
+        self.sync_ttl = sync_ttl
+        self.day_ttl = day_ttl
+        self.sync_past_days = sync_past_days
+        self._clock = clock
+        self._lock = threading.RLock()
+        self.stats = {"local_reads": 0, "syncs": 0, "full_syncs": 0, "day_fetches": 0}
+
+        data_dir = os.path.dirname(db_path)
+        if data_dir and not os.path.exists(data_dir):
+            os.makedirs(data_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                calendar_id TEXT NOT NULL,
+                event_id TEXT NOT NULL,
+                start_ts REAL,
+                end_ts REAL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (calendar_id, event_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_events_start ON events(calendar_id, start_ts);
+
+            -- 差分同期の状態（window_start_ts 以降の予定は同期トークンで最新に保たれる）
+            CREATE TABLE IF NOT EXISTS sync_state (
+                calendar_id TEXT PRIMARY KEY,
+                sync_token TEXT,
+                window_start_ts REAL NOT NULL,
+                synced_at REAL NOT NULL
+            );
+
+            -- 同期範囲外で日単位に取得した日
+            CREATE TABLE IF NOT EXISTS fetched_days (
+                calendar_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (calendar_id, day)
+            );
+        """)
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # Calendar API
+    # ------------------------------------------------------------------
+
+    def _service(self):
+        if self.service_factory is None:
+            from src.shared.calendar_integration import get_calendar_service
+            self.service_factory = get_calendar_service
+        service = self.service_factory()
+        if service is None:
+            raise RuntimeError("Calendar API認証に失敗しました")
+        return service
+
+    def _list_pages(self, **params) -> tuple:
+        """events().list を全ページ取得 → (items, nextSyncToken)"""
+        service = self._service()
+        items = []
+        page_token = None
+        while True:
+            result = service.events().list(pageToken=page_token, **params).execute()
+            items.extend(result.get('items', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return items, result.get('nextSyncToken')
+
+    # ------------------------------------------------------------------
+    # 保存
+    # ------------------------------------------------------------------
+
+    def _apply_items(self, calendar_id: str, items: List[Dict]):
+        """取得した予定を保存（status=cancelled は削除）"""
+        upserts, deletes = [], []
+        for item in items:
+            if item.get('status') == 'cancelled':
+                deletes.append((calendar_id, item['id']))
+            else:
+                upserts.append((calendar_id, item['id'], _parse_event_time(item.get('start')),
+                                _parse_event_time(item.get('end')), json.dumps(item, ensure_ascii=False)))
+        self._conn.executemany("DELETE FROM events WHERE calendar_id = ? AND event_id = ?", deletes)
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO events (calendar_id, event_id, start_ts, end_ts, data) VALUES (?, ?, ?, ?, ?)",
+            upserts
+        )
+
+    # ------------------------------------------------------------------
+    # 同期
+    # ------------------------------------------------------------------
+
+    def _full_sync(self, calendar_id: str):
+        """直近 sync_past_days 日以降を全件取得し、同期トークンを保存"""
+        now = self._clock()
+        window_start = now - self.sync_past_days * 86400
+        items, sync_token = self._list_pages(
+            calendarId=calendar_id,
+            singleEvents=True,
+            timeMin=datetime.fromtimestamp(window_start, tz=timezone.utc).isoformat().replace('+00:00', 'Z'),
+            fields=SYNC_FIELDS
+        )
+        with self._conn:
+            self._conn.execute("DELETE FROM events WHERE calendar_id = ? AND end_ts > ?",
+                               (calendar_id, window_start))
+            self._apply_items(calendar_id, items)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (calendar_id, sync_token, window_start_ts, synced_at) "
+                "VALUES (?, ?, ?, ?)",
+                (calendar_id, sync_token, window_start, now)
+            )
+        self.stats["full_syncs"] += 1
+        print(f"🗓️  カレンダー全件同期: {len(items)}件（過去{self.sync_past_days}日以降）")
+
+    def sync(self, calendar_id: str = 'primary', force: bool = False):
+        """
+        差分同期（前回同期から sync_ttl 秒以内ならスキップ）
+
+        Args:
+            calendar_id: カレンダーID
+            force: TTLに関係なく同期する
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sync_token, synced_at FROM sync_state WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()
+            now = self._clock()
+
+            if row is None or not row[0]:
+                self._full_sync(calendar_id)
+                return
+            if not force and now - row[1] < self.sync_ttl:
+                return
+
+            try:
+                items, sync_token = self._list_pages(calendarId=calendar_id, singleEvents=True,
+                                                     syncToken=row[0], fields=SYNC_FIELDS)
+            except Exception as e:
+                if not _is_sync_token_expired(e):
+                    raise
+                print("⚠️  カレンダー同期トークンが失効したため全件同期します")
+                self._full_sync(calendar_id)
+                return
+
+            with self._conn:
+                self._apply_items(calendar_id, items)
+                self._conn.execute(
+                    "UPDATE sync_state SET sync_token = ?, synced_at = ? WHERE calendar_id = ?",
+                    (sync_token or row[0], now, calendar_id)
+                )
+            self.stats["syncs"] += 1
+
+    def _fetch_day(self, calendar_id: str, file_date: str, time_min: float, time_max: float):
+        """同期範囲外の1日分を取得して保存"""
+        items, _ = self._list_pages(
+            calendarId=calendar_id,
+            singleEvents=True,
+            timeMin=datetime.fromtimestamp(time_min, tz=timezone.utc).isoformat().replace('+00:00', 'Z'),
+            timeMax=datetime.fromtimestamp(time_max, tz=timezone.utc).isoformat().replace('+00:00', 'Z'),
+            fields=DAY_FIELDS
+        )
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM events WHERE calendar_id = ? AND start_ts < ? AND end_ts > ?",
+                (calendar_id, time_max, time_min)
+            )
+            self._apply_items(calendar_id, items)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fetched_days (calendar_id, day, fetched_at) VALUES (?, ?, ?)",
+                (calendar_id, file_date, self._clock())
+            )
+        self.stats["day_fetches"] += 1
+
+    # ------------------------------------------------------------------
+    # 問い合わせ
+    # ------------------------------------------------------------------
+
+    def get_events_for_day(self, file_date: str, calendar_id: str = 'primary') -> List[Dict]:
+        """
+        指定日の予定を取得（必要な場合のみAPIと同期し、結果はローカルから読む）
+
+        Args:
+            file_date: YYYYMMDD形式の日付
+            calendar_id: カレンダーID
+
+        Returns:
+            その日の予定リスト（開始時刻順、Calendar APIの items と同じ形式）
+        """
+        time_min, time_max = day_range(file_date)
+
+        with self._lock:
+            state = self._conn.execute(
+                "SELECT window_start_ts FROM sync_state WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()
+            window_start = state[0] if state else self._clock() - self.sync_past_days * 86400
+
+            if time_min >= window_start:
+                self.sync(calendar_id)
+            else:
+                fetched = self._conn.execute(
+                    "SELECT fetched_at FROM fetched_days WHERE calendar_id = ? AND day = ?",
+                    (calendar_id, file_date)
+                ).fetchone()
+                if fetched is None or self._clock() - fetched[0] >= self.day_ttl:
+                    self._fetch_day(calendar_id, file_date, time_min, time_max)
+
+            rows = self._conn.execute(
+                "SELECT data FROM events WHERE calendar_id = ? AND start_ts < ? AND end_ts > ? "
+                "ORDER BY start_ts",
+                (calendar_id, time_max, time_min)
+            ).fetchall()
+            self.stats["local_reads"] += 1
+
+        return [json.loads(data) for (data,) in rows]
+
+    def clear(self, calendar_id: Optional[str] = None):
+        """保存済みの予定・同期状態を削除（次回は全件同期）"""
+        with self._lock, self._conn:
+            for table in ("events", "sync_state", "fetched_days"):
+                if calendar_id is None:
+                    self._conn.execute(f"DELETE FROM {table}")
+                else:
+                    self._conn.execute(f"DELETE FROM {table} WHERE calendar_id = ?", (calendar_id,))
+
+
+_store: Optional[CalendarEventStore] = None
+_store_lock = threading.Lock()
+
+
+def get_calendar_store() -> CalendarEventStore:
+    """プロセス内共有のカレンダーストアを取得"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CalendarEventStore()
+        return _store
@@ -11,13 +11,16 @@ Google Calendar Integration Module (Phase 11-1)
 
 機能:
 - Google Calendar API認証（token.jsonにCalendar.readonly追加）
-- 音声ファイル作成日の予定を全件取得
+- 認証済みサービスはプロセス内で再利用（スレッドごとに1つ）
+- 音声ファイル作成日の予定を全件取得（ローカルストア src/shared/calendar_cache.py 経由。
+  同期トークンで差分同期し、同じ日の問い合わせはローカル読み込みのみ）
 - LLMによる内容ベースの予定マッチング
 """
 
 import os
 import re
 import json
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -26,19 +29,26 @@ from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-import google.generativeai as genai
+
+from src.shared.gemini_client import GeminiModel, get_gemini_client, resolve_api_key
 
 # 環境変数読み込み
 load_dotenv()
 
 # 設定
 TOKEN_PATH = 'token.json'
+CALENDAR_CACHE = os.getenv('CALENDAR_CACHE', 'true').lower() == 'true'
 SCOPES = [
     'https://www.googleapis.com/auth/drive.file',
     'https://www.googleapis.com/auth/documents',
     'https://www.googleapis.com/auth/calendar.readonly'
 ]
 
+# get_calendar_service() のキャッシュ（認証情報は共有、サービスはスレッドごと）
+_service_lock = threading.Lock()
+_service_local = threading.local()
+_cached_creds = None
+
 
 def authenticate_calendar_service():
     """
@@ -48,6 +58,20 @@ def authenticate_calendar_service():
     Returns:
         Calendar APIサービスオブジェクト
     """
+    creds = _load_credentials()
+    if not creds:
+        return None
+
+    try:
+        service = build('calendar', 'v3', credentials=creds)
+        return service
+    except HttpError as error:
+        print(f"❌ Calendar API初期化エラー: {error}")
+        return None
+
+
+def _load_credentials():
+    """token.jsonから認証情報を読み込み（期限切れならリフレッシュ、なければOAuth2フロー）"""
     creds = None
 
     if os.path.exists(TOKEN_PATH):
@@ -83,13 +107,41 @@ def authenticate_calendar_service():
             token.write(creds.to_json())
             print(f"✅ トークンを保存しました: {TOKEN_PATH}")
 
-    try:
-        service = build('calendar', 'v3', credentials=creds)
+    return creds
+
+
+def get_calendar_service():
+    """
+    認証済みCalendar APIサービスを取得（プロセス内で再利用）
+
+    初回のみtoken.jsonを読み込み（authenticate_calendar_service() と同じ処理）、以降は同じ認証情報を使う
+    （アクセストークンの更新は google-auth が自動で行う）。
+    httplib2 はスレッドセーフではないため、サービスオブジェクトはスレッドごとに1つ作成する。
+
+    Returns:
+        Calendar APIサービスオブジェクト（認証失敗時はNone）
+    """
+    global _cached_creds
+
+    service = getattr(_service_local, 'service', None)
+    if service is not None:
         return service
+
+    with _service_lock:
+        if _cached_creds is None:
+            _cached_creds = _load_credentials()
+            if not _cached_creds:
+                return None
+
+    try:
+        service = build('calendar', 'v3', credentials=_cached_creds)
     except HttpError as error:
         print(f"❌ Calendar API初期化エラー: {error}")
         return None
 
+    _service_local.service = service
+    return service
+
 
 def get_file_date(file_path: str) -> str:
     """
@@ -132,30 +184,25 @@ def get_events_for_file_date(file_date: str, calendar_id: str = 'primary') -> li
     Returns:
         その日の予定リスト（タイトル、開始時刻、終了時刻、メモ、参加者）
     """
-    service = authenticate_calendar_service()
-    if not service:
-        print("⚠️  Calendar API認証に失敗しました")
-        return []
+    print(f"🔍 {file_date}の予定を検索中...")
 
     try:
-        # YYYYMMDD → datetime変換
-        date_obj = datetime.strptime(file_date, '%Y%m%d')
-        time_min = date_obj.replace(hour=0, minute=0, second=0).isoformat() + 'Z'
-        time_max = date_obj.replace(hour=23, minute=59, second=59).isoformat() + 'Z'
-
-        print(f"🔍 {file_date}の予定を検索中...")
-
-        # Calendar API呼び出し（descriptionも明示的に取得）
-        events_result = service.events().list(
-            calendarId=calendar_id,
-            timeMin=time_min,
-            timeMax=time_max,
-            singleEvents=True,
-            orderBy='startTime',
-            fields='items(id,summary,start,end,description,attendees)'
-        ).execute()
+        if CALENDAR_CACHE:
+            from src.shared.calendar_cache import get_calendar_store
+            try:
+                events = get_calendar_store().get_events_for_day(file_date, calendar_id)
+            except HttpError:
+                raise
+            except Exception as e:
+                # ローカルストアが使えない場合は直接APIから取得
+                print(f"⚠️  カレンダーストア利用不可、APIから直接取得: {e}")
+                events = _list_events_from_api(file_date, calendar_id)
+        else:
+            events = _list_events_from_api(file_date, calendar_id)
 
-        events = events_result.get('items', [])
+        if events is None:
+            print("⚠️  Calendar API認証に失敗しました")
+            return []
 
         if not events:
             print(f"📭 {file_date}には予定がありません")
@@ -179,6 +226,30 @@ def get_events_for_file_date(file_date: str, calendar_id: str = 'primary') -> li
         return []
 
 
+def _list_events_from_api(file_date: str, calendar_id: str):
+    """Calendar APIから指定日の予定を直接取得（認証失敗時はNone）"""
+    service = get_calendar_service()
+    if not service:
+        return None
+
+    # YYYYMMDD → datetime変換
+    date_obj = datetime.strptime(file_date, '%Y%m%d')
+    time_min = date_obj.replace(hour=0, minute=0, second=0).isoformat() + 'Z'
+    time_max = date_obj.replace(hour=23, minute=59, second=59).isoformat() + 'Z'
+
+    # Calendar API呼び出し（descriptionも明示的に取得）
+    events_result = service.events().list(
+        calendarId=calendar_id,
+        timeMin=time_min,
+        timeMax=time_max,
+        singleEvents=True,
+        orderBy='startTime',
+        fields='items(id,summary,start,end,description,attendees)'
+    ).execute()
+
+    return events_result.get('items', [])
+
+
 def format_events(events: list) -> str:
     """
     予定リストをLLM入力用フォーマットに変換
@@ -237,28 +308,17 @@ def match_event_with_transcript(transcript_text: str, calendar_events: list) ->
             "reasoning": "予定なし"
         }
 
-    # Gemini API設定（既存の仕組みに合わせる）
-    use_paid = os.getenv('USE_PAID_TIER', 'false').lower() == 'true'
-    if use_paid:
-        api_key = os.getenv('GEMINI_API_KEY_PAID')
-        if not api_key:
-            print("❌ GEMINI_API_KEY_PAIDが設定されていません")
+    # Gemini APIキー確認（Tierに応じたキー。キー不要のバックエンドでは確認しない）
+    if get_gemini_client().backend.requires_api_key:
+        try:
+            resolve_api_key()
+        except ValueError as e:
+            print(f"❌ {e}")
             return {
                 "matched_event": None,
                 "confidence_score": 0.0,
                 "reasoning": "API KEY未設定"
             }
-    else:
-        api_key = os.getenv('GEMINI_API_KEY_FREE')
-        if not api_key:
-            print("❌ GEMINI_API_KEY_FREEが設定されていません")
-            return {
-                "matched_event": None,
-                "confidence_score": 0.0,
-                "reasoning": "API KEY未設定"
-            }
-
-    genai.configure(api_key=api_key)
 
     # 文字起こし全文（長い場合は冒頭3000文字のみ）
     transcript_sample = transcript_text[:3000] if len(transcript_text) > 3000 else transcript_text
@@ -295,7 +355,7 @@ def match_event_with_transcript(transcript_text: str, calendar_events: list) ->
 
     try:
         # Gemini 2.0 Flash（軽量・安価）
-        model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        model = GeminiModel('gemini-2.0-flash-exp')
         response = model.generate_content(prompt)
 
         # JSONパース
@@ -358,7 +418,7 @@ if __name__ == '__main__':
     print("=== Calendar Integration Test ===")
 
     # テスト1: 認証
-    service = authenticate_calendar_service()
+    service = get_calendar_service()
     if service:
         print("✅ Calendar API認証成功")
 
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+埋め込みベクトル生成サービス（永続キャッシュ付き）
+
+使い方:
+    from src.shared.embedding_service import get_embedding_service
+
+    service = get_embedding_service()
+    vectors = service.embed_texts(texts, task_type="retrieval_document")
+    query_vector = service.embed_query("プロダクト開発について")
+
+機能:
+- Vector DB構築・セマンティック検索・RAGで共通のtext-embedding-004呼び出し窓口
+- SQLite永続キャッシュ（キー: SHA-256(モデル + task_type + テキスト)、値: float32配列）
+- プロセス内LRUキャッシュ（繰り返しのクエリを即時返却）
+- バッチ単位で照会し、キャッシュミスのテキストのみAPIに送信
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from src.shared.gemini_client import get_gemini_client
+
+# 設定
+EMBEDDING_MODEL = "models/text-embedding-004"
+EMBEDDING_CACHE_DB = os.getenv('EMBEDDING_CACHE_DB', 'data/embedding_cache.db')
+EMBEDDING_LRU_SIZE = int(os.getenv('EMBEDDING_LRU_SIZE', '2048'))
+API_BATCH_SIZE = 100  # Gemini batch embedding: 最大100テキスト/リクエスト
+SQLITE_IN_LIMIT = 500  # IN句1回あたりのキー数
+
+
+def make_embedding_key(text: str, model: str, task_type: str) -> str:
+    """キャッシュキー（SHA-256）を生成"""
+    raw = f"{model}\n{task_type}\n{text}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _normalize_embeddings(embeddings_data) -> List[List[float]]:
+    """
+    embed_contentの結果を [[float, ...], ...] に正規化
+    バッチ呼び出し時に [[[emb]]] 形式で返る場合があるため最初の次元を取り除く
+    """
+    return [emb[0] if isinstance(emb, list) and emb and isinstance(emb[0], list) else emb
+            for emb in embeddings_data]
+
+
+def _gemini_embed(texts: List[str], model: str, task_type: str) -> List[List[float]]:
+    """
+    Gemini Embeddings APIで複数テキストをベクトル化（共通クライアント経由）
+
+    再試行・レート制限は呼び出し側（embedding_executor）が行うため、クライアントでは再試行しない
+    """
+    vectors = get_gemini_client().embed(texts, model, task_type, max_retries=0, label="embedding")
+    return _normalize_embeddings(vectors)
+
+
+class EmbeddingService:
+    """永続キャッシュ付き埋め込み生成サービス（スレッドセーフ）"""
+
+    def __init__(self, db_path: str = EMBEDDING_CACHE_DB, model: str = EMBEDDING_MODEL,
+                 lru_size: int = EMBEDDING_LRU_SIZE,
+                 embed_fn: Optional[Callable[[List[str], str, str], List[List[float]]]] = None):
+        """
+        Args:
+            db_path: SQLiteキャッシュファイルパス（Noneならメモリ上のLRUのみ）
+            model: 埋め込みモデル名
+            lru_size: プロセス内LRUの最大件数
+            embed_fn: 埋め込み関数 (texts, model, task_type) -> vectors（テスト用に差し替え可能）
+        """
+        self.model = model
+        self.lru_size = lru_size
+        self.embed_fn = embed_fn or _gemini_embed
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"lru_hits": 0, "db_hits": 0, "misses": 0, "api_calls": 0}
+
+        self._conn = None
+        if db_path:
+            data_dir = os.path.dirname(db_path)
+            if data_dir and not os.path.exists(data_dir):
+                os.makedirs(data_dir)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    task_type TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at TIMESTAMP
+                )
+            """)
+            self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # キャッシュ操作
+    # ------------------------------------------------------------------
+
+    def _lru_get(self, key: str) -> Optional[List[float]]:
+        vector = self._lru.get(key)
+        if vector is not None:
+            self._lru.move_to_end(key)
+        return vector
+
+    def _lru_put(self, key: str, vector: List[float]):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _db_get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if self._conn is None or not keys:
+            return {}
+
+        found = {}
+        for i in range(0, len(keys), SQLITE_IN_LIMIT):
+            batch = keys[i:i + SQLITE_IN_LIMIT]
+            placeholders = ','.join('?' * len(batch))
+            rows = self._conn.execute(
+                f"SELECT cache_key, vector FROM embeddings WHERE cache_key IN ({placeholders})",
+                batch
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = array('f', blob).tolist()
+        return found
+
+    def _db_put_many(self, items: List[tuple]):
+        """items: [(key, task_type, vector), ...]"""
+        if self._conn is None or not items:
+            return
+
+        now = datetime.now().isoformat()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (cache_key, model, task_type, dim, vector, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(key, self.model, task_type, len(vector), array('f', vector).tobytes(), now)
+             for key, task_type, vector in items]
+        )
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # 公開API
+    # ------------------------------------------------------------------
+
+    def lookup(self, texts: List[str], task_type: str) -> List[Optional[List[float]]]:
+        """
+        キャッシュのみを参照（APIは呼ばない）
+
+        Returns:
+            テキストと同順のベクトルリスト（キャッシュミスはNone）
+        """
+        keys = [make_embedding_key(text, self.model, task_type) for text in texts]
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+
+        with self._lock:
+            db_keys = []
+            for i, key in enumerate(keys):
+                vector = self._lru_get(key)
+                if vector is not None:
+                    vectors[i] = vector
+                    self.stats["lru_hits"] += 1
+                else:
+                    db_keys.append(key)
+
+            found = self._db_get_many(list(dict.fromkeys(db_keys)))
+            for i, key in enumerate(keys):
+                if vectors[i] is None and key in found:
+                    vectors[i] = found[key]
+                    self._lru_put(key, found[key])
+                    self.stats["db_hits"] += 1
+
+        return vectors
+
+    def store(self, texts: List[str], vectors: List[List[float]], task_type: str):
+        """APIで取得したベクトルをキャッシュに保存"""
+        items = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = make_embedding_key(text, self.model, task_type)
+                self._lru_put(key, vector)
+                items.append((key, task_type, vector))
+            self._db_put_many(items)
+
+    def embed_texts(self, texts: List[str], task_type: str = "retrieval_document") -> List[List[float]]:
+        """
+        複数テキストをベクトル化（キャッシュミスのみAPIに送信）
+
+        Args:
+            texts: テキストのリスト
+            task_type: "retrieval_document" or "retrieval_query"
+
+        Returns:
+            テキストと同順のベクトルリスト
+
+        Raises:
+            Exception: API呼び出しに失敗した場合（失敗分はキャッシュされない）
+        """
+        vectors = self.lookup(texts, task_type)
+
+        # キャッシュミス（同一テキストは1回だけ送信）
+        missing: Dict[str, List[int]] = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(texts[i], []).append(i)
+
+        missing_texts = list(missing.keys())
+        self.stats["misses"] += len(missing_texts)
+
+        for start in range(0, len(missing_texts), API_BATCH_SIZE):
+            batch = missing_texts[start:start + API_BATCH_SIZE]
+            batch_vectors = self.embed_fn(batch, self.model, task_type)
+            self.stats["api_calls"] += 1
+
+            if len(batch_vectors) != len(batch):
+                raise ValueError(f"Embedding count mismatch: {len(batch_vectors)} != {len(batch)}")
+
+            self.store(batch, batch_vectors, task_type)
+            for text, vector in zip(batch, batch_vectors):
+                for i in missing[text]:
+                    vectors[i] = vector
+
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """検索クエリをベクトル化（task_type=retrieval_query）"""
+        return self.embed_texts([text], task_type="retrieval_query")[0]
+
+
+# プロセス内で共有するインスタンス
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """共有EmbeddingServiceを取得（初回呼び出し時に生成）"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService()
+        return _service
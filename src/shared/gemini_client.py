@@ -0,0 +1,973 @@
+#!/usr/bin/env python3
+"""
+Gemini API 共通クライアント
+
+使い方:
+    from src.shared.gemini_client import get_gemini_client, GeminiModel
+
+    client = get_gemini_client()
+    response = client.generate(prompt, model="gemini-2.5-flash",
+                               generation_config={"response_mime_type": "application/json"})
+    print(response.text, response.total_tokens, response.latency)
+
+    # genai.GenerativeModel の置き換え
+    model = GeminiModel("gemini-2.5-pro")
+    response = model.generate_content(prompt)
+
+機能:
+- 全モジュール共通の generate_content / embed_content 呼び出し窓口（APIキーは呼び出し時に解決）
+- 応答の永続キャッシュ（SQLite、キー: SHA-256(モデル + プロンプト + generation_config)）
+  テキストのみのプロンプトが対象（音声などのバイナリを含む呼び出しはキャッシュしない）
+- モデルごとの同時実行数制限（GEMINI_MAX_CONCURRENCY）とRPM/RPD制限（rate_limiter）
+- FREE/PAID キーの選択と使用量の記録（quota_scheduler、GEMINI_TIER_MODE=auto でリクエストごとに振り分け）
+- 429 / 5xx / タイムアウトは指数バックオフで再試行（429はバケットにペナルティを課し全スレッドで待機）
+- 呼び出しごとのレイテンシ・トークン数を記録（get_metrics()、GEMINI_METRICS_LOG でJSONL出力）
+- File API（upload_file()）: 音声をディスクから再開可能アップロードし、ハンドルを複数の呼び出しで再利用
+  同じ内容・同じキーのファイルは有効期限内なら再アップロードしない（GEMINI_CACHE_DB に記録）
+- バックエンド差し替え: GEMINI_BACKEND=fake でAPIを呼ばずに動作（テスト・ベンチマーク用）
+  GEMINI_FAKE_RESPONSES=<json> で応答ルールを指定可能（FakeBackend 参照）
+"""
+
+import hashlib
+import json
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from src.shared.quota_scheduler import get_quota_scheduler, tier_api_key
+from src.shared.rate_limiter import (
+    DailyQuotaExceeded,  # noqa: F401  呼び出し側で捕捉できるよう再エクスポート
+    get_tier,
+    is_rate_limit_error,
+    is_transient_error,
+)
+
+# 設定
+GEMINI_BACKEND = os.getenv('GEMINI_BACKEND', 'genai')  # genai / fake
+GEMINI_RESPONSE_CACHE = os.getenv('GEMINI_RESPONSE_CACHE', 'true').lower() == 'true'
+GEMINI_CACHE_DB = os.getenv('GEMINI_CACHE_DB', 'data/gemini_cache.db')
+GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', '5'))
+GEMINI_BACKOFF_BASE = float(os.getenv('GEMINI_BACKOFF_BASE', '5'))  # 秒（5, 10, 20, ...）
+GEMINI_BACKOFF_MAX = float(os.getenv('GEMINI_BACKOFF_MAX', '60'))
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '4'))  # モデルごと
+GEMINI_METRICS_LOG = os.getenv('GEMINI_METRICS_LOG')  # 設定時は呼び出しごとにJSONL追記
+RECENT_CALLS = 200  # get_metrics() で返す直近の呼び出し数
+GEMINI_FILE_PROCESSING_TIMEOUT = float(os.getenv('GEMINI_FILE_PROCESSING_TIMEOUT', '300'))  # アップロード後の処理待ち（秒）
+FILE_REUSE_MARGIN = timedelta(hours=1)  # 有効期限までこれ以上残っているファイルのみ再利用
+FILE_POLL_INTERVAL = 2.0
+
+
+def resolve_api_key(use_paid_tier: Optional[bool] = None) -> str:
+    """
+    Tierに応じたGemini APIキーを取得
+
+    Args:
+        use_paid_tier: Trueなら GEMINI_API_KEY_PAID、Falseなら GEMINI_API_KEY_FREE（Noneなら USE_PAID_TIER）
+
+    Returns:
+        str: APIキー
+
+    Raises:
+        ValueError: キーが設定されていない
+    """
+    if use_paid_tier is None:
+        use_paid_tier = get_tier() == "paid"
+
+    api_key = tier_api_key("paid" if use_paid_tier else "free")
+    if not api_key:
+        if use_paid_tier:
+            raise ValueError("GEMINI_API_KEY_PAID not set but USE_PAID_TIER=true")
+        raise ValueError("GEMINI_API_KEY_FREE not set")
+    return api_key
+
+
+def _model_name(model: str) -> str:
+    """モデル名の "models/" 接頭辞を除去"""
+    return model.split("/")[-1]
+
+
+def _synthetic_raw(text: str):
+    """キャッシュ・フェイク応答用の最小限のレスポンス（candidates / prompt_feedback を参照する呼び出し側向け）"""
+    candidate = SimpleNamespace(finish_reason="STOP", safety_ratings=[])
+    return SimpleNamespace(text=text, candidates=[candidate], prompt_feedback=None)
+
+
+class GeminiResponse:
+    """generate() の結果（.text に加え、元レスポンスの属性は委譲で参照できる）"""
+
+    def __init__(self, text: str, model: str, raw=None, prompt_tokens: int = 0, output_tokens: int = 0,
+                 latency: float = 0.0, cached: bool = False, attempts: int = 1):
+        self.text = text
+        self.model = model
+        self.raw = raw if raw is not None else _synthetic_raw(text)
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+        self.latency = latency
+        self.cached = cached
+        self.attempts = attempts
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.output_tokens
+
+    def __getattr__(self, name):
+        # candidates / prompt_feedback / usage_metadata など
+        return getattr(self.__dict__["raw"], name)
+
+
+class GeminiFile:
+    """File API にアップロードしたファイルのハンドル（アップロードに使ったキーの呼び出しでのみ参照できる）"""
+
+    def __init__(self, name: str, uri: str, mime_type: str, size_bytes: int = 0,
+                 api_key: Optional[str] = None, expires_at: Optional[str] = None, reused: bool = False):
+        self.name = name
+        self.uri = uri
+        self.mime_type = mime_type
+        self.size_bytes = size_bytes
+        self.api_key = api_key
+        self.expires_at = expires_at
+        self.reused = reused
+
+    def as_part(self) -> Dict[str, Any]:
+        """generate_content の contents に渡すパーツ"""
+        return {"file_data": {"mime_type": self.mime_type, "file_uri": self.uri}}
+
+    def __repr__(self):
+        return f"GeminiFile({self.name!r}, {self.mime_type}, {self.size_bytes} bytes)"
+
+
+# ----------------------------------------------------------------------
+# バックエンド
+# ----------------------------------------------------------------------
+
+class GenaiBackend:
+    """
+    google.generativeai を使う本番バックエンド
+
+    SDKのAPIキーはプロセス全体で1つ（genai.configure）のため、キーの切り替えと呼び出しを
+    _use_key() でまとめて排他する。同じキーの呼び出しは並行して実行し、別のキーの呼び出しは
+    実行中の呼び出しが終わってから切り替える（FREE/PAID を混在させても別キーで送信されない）。
+    """
+
+    name = "genai"
+    requires_api_key = True
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._configured_key = None
+        self._active = 0  # 設定中のキーで実行中の呼び出し数
+        self._waiting: Dict[str, int] = {}  # キーごとの切り替え待ち数
+
+    @contextmanager
+    def _use_key(self, api_key: str):
+        """api_key が設定された状態で呼び出しを実行（終了まで他のキーへの切り替えを待たせる）"""
+        import google.generativeai as genai
+
+        with self._cond:
+            self._waiting[api_key] = self._waiting.get(api_key, 0) + 1
+            try:
+                # 別キーの待ちがある間は同じキーの新規呼び出しも待たせる（切り替えが飢餓状態にならないように）
+                while self._active and (
+                    api_key != self._configured_key
+                    or any(n for key, n in self._waiting.items() if key != api_key)
+                ):
+                    self._cond.wait()
+                if api_key != self._configured_key:
+                    genai.configure(api_key=api_key)
+                    self._configured_key = api_key
+                self._active += 1
+            finally:
+                self._waiting[api_key] -= 1
+                if not self._waiting[api_key]:
+                    del self._waiting[api_key]
+        try:
+            yield genai
+        finally:
+            with self._cond:
+                self._active -= 1
+                if not self._active:
+                    self._cond.notify_all()
+
+    def generate(self, model: str, contents, generation_config: Optional[Dict], api_key: str,
+                 request_options: Optional[Dict] = None):
+        kwargs = {}
+        if generation_config:
+            kwargs["generation_config"] = generation_config
+        if request_options:
+            kwargs["request_options"] = request_options
+        with self._use_key(api_key) as genai:
+            return genai.GenerativeModel(model).generate_content(contents, **kwargs)
+
+    def embed(self, model: str, texts: List[str], task_type: str, api_key: str) -> List[List[float]]:
+        with self._use_key(api_key) as genai:
+            result = genai.embed_content(model=model, content=texts, task_type=task_type)
+        return result['embedding']
+
+    @staticmethod
+    def _file_info(file) -> Dict[str, Any]:
+        expires = getattr(file, "expiration_time", None)
+        state = getattr(file, "state", None)
+        return {
+            "name": file.name,
+            "uri": file.uri,
+            "state": getattr(state, "name", None) or str(state or "ACTIVE"),
+            "expires_at": expires.isoformat() if hasattr(expires, "isoformat") else None,
+        }
+
+    def upload_file(self, path: str, mime_type: str, display_name: str, api_key: str) -> Dict[str, Any]:
+        """再開可能アップロード（SDKがディスクから分割送信するため、ファイル全体をメモリに読み込まない）"""
+        with self._use_key(api_key) as genai:
+            return self._file_info(genai.upload_file(path=path, mime_type=mime_type, display_name=display_name))
+
+    def get_file(self, name: str, api_key: str) -> Dict[str, Any]:
+        with self._use_key(api_key) as genai:
+            return self._file_info(genai.get_file(name))
+
+    def delete_file(self, name: str, api_key: str):
+        with self._use_key(api_key) as genai:
+            genai.delete_file(name)
+
+    @staticmethod
+    def response_text(raw) -> str:
+        """ブロックされた応答では .text が ValueError になるため空文字にする"""
+        try:
+            return raw.text or ""
+        except (ValueError, AttributeError, IndexError):
+            return ""
+
+    @staticmethod
+    def usage(raw) -> tuple:
+        usage = getattr(raw, "usage_metadata", None)
+        if usage is None:
+            return 0, 0
+        return (getattr(usage, "prompt_token_count", 0) or 0,
+                getattr(usage, "candidates_token_count", 0) or 0)
+
+
+class FakeAPIError(Exception):
+    """FakeBackend が注入するAPIエラー（.code のHTTPステータスで is_rate_limit_error / is_transient_error が判定する）"""
+
+    def __init__(self, code: int, message: Optional[str] = None):
+        super().__init__(message or f"{code} Fake API error")
+        self.code = code
+
+
+class FakeBackend:
+    """
+    APIを呼ばないバックエンド（テスト・ベンチマーク・オフライン実行用）
+
+    応答の決め方（先に一致したもの）:
+    1. responder(model, prompt_text, generation_config) が None 以外を返せばその文字列
+    2. rules: [{"match": 部分文字列, "model": モデル名（任意）, "response": 文字列 or JSON}, ...]
+    3. default（未指定なら JSON指定時は "{}"、それ以外は固定テキスト）
+
+    照合対象はプロンプトのテキストと、インラインデータをUTF-8として読める部分（テスト用の擬似音声ファイル）。
+
+    エラー注入:
+        errors: [{"match": 部分文字列, "status": 429, "times": 2, "kind": "generate", "model": ..., "message": ...}, ...]
+        一致した呼び出しで FakeAPIError(status) を送出する（先に一致したルールのみ）。
+        times 回送出した後は通常応答（省略時は毎回）。kind は generate / embed / upload（省略時は全て）。
+        match は generate ではプロンプト（とインラインデータ）、embed では各テキスト、upload ではファイルパスと照合する。
+
+    GEMINI_FAKE_RESPONSES に {"rules": [...], "default": ..., "errors": [...]} 形式のJSONファイルを指定するとそれを使う。
+    埋め込みはテキストのハッシュから決定的に生成した単位ベクトル。
+    """
+
+    name = "fake"
+    requires_api_key = False
+
+    def __init__(self, responder: Optional[Callable[[str, str, Optional[Dict]], Optional[str]]] = None,
+                 rules: Optional[List[Dict]] = None, default: Optional[str] = None,
+                 embedding_dim: int = 768, latency: float = 0.0, errors: Optional[List[Dict]] = None):
+        self.responder = responder
+        self.rules = rules or []
+        self.default = default
+        self.embedding_dim = embedding_dim
+        self.latency = latency
+        self.errors = errors or []
+        self.calls: List[Dict] = []
+        self.injected: List[Dict] = []  # 送出したエラー [{"kind", "model", "status"}]
+        self.files: Dict[str, Dict[str, Any]] = {}  # name -> {"uri", "mime_type", "size", "sha256", "chunks"}
+        self._error_counts = [0] * len(self.errors)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str) -> "FakeBackend":
+        with open(path, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+        return cls(rules=spec.get("rules"), default=spec.get("default"), errors=spec.get("errors"))
+
+    @staticmethod
+    def _as_text(value) -> str:
+        return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+    def _maybe_fail(self, kind: str, model: Optional[str], texts: List[str]):
+        """errors のルールに一致すれば FakeAPIError を送出"""
+        with self._lock:
+            for i, rule in enumerate(self.errors):
+                if rule.get("kind") and rule["kind"] != kind:
+                    continue
+                if rule.get("model") and (model is None or _model_name(rule["model"]) != _model_name(model)):
+                    continue
+                if not any(rule.get("match", "") in text for text in texts):
+                    continue
+                times = rule.get("times")
+                if times is not None and self._error_counts[i] >= times:
+                    continue
+                self._error_counts[i] += 1
+                status = int(rule.get("status", 429))
+                self.injected.append({"kind": kind, "model": model, "status": status})
+                raise FakeAPIError(status, rule.get("message"))
+
+    def generate(self, model: str, contents, generation_config: Optional[Dict], api_key: Optional[str],
+                 request_options: Optional[Dict] = None):
+        prompt_text = _contents_text(contents)
+        file_uris = _contents_file_uris(contents)
+        # インライン送信されたデータ（テスト用のテキストを書いた音声ファイル等）も照合対象にする
+        inline_text = _contents_inline_text(contents)
+        match_text = f"{prompt_text}\n{inline_text}" if inline_text else prompt_text
+        with self._lock:
+            missing = [uri for uri in file_uris if uri not in {f["uri"] for f in self.files.values()}]
+            self.calls.append({"model": model, "prompt": prompt_text, "generation_config": generation_config,
+                               "files": file_uris, "inline": inline_text})
+        if missing:
+            raise ValueError(f"File not found: {missing[0]}")
+        if self.latency:
+            time.sleep(self.latency)
+        self._maybe_fail("generate", model, [match_text])
+
+        text = self.responder(model, match_text, generation_config) if self.responder else None
+        if text is None:
+            for rule in self.rules:
+                if rule.get("model") and _model_name(rule["model"]) != _model_name(model):
+                    continue
+                if rule.get("match", "") in match_text:
+                    text = self._as_text(rule["response"])
+                    break
+        if text is None:
+            if self.default is not None:
+                text = self._as_text(self.default)
+            elif (generation_config or {}).get("response_mime_type") == "application/json":
+                text = "{}"
+            else:
+                text = f"[fake {_model_name(model)} response]"
+
+        raw = _synthetic_raw(text)
+        raw.usage_metadata = SimpleNamespace(prompt_token_count=max(1, len(prompt_text) // 4),
+                                             candidates_token_count=max(1, len(text) // 4))
+        return raw
+
+    def embed(self, model: str, texts: List[str], task_type: str, api_key: Optional[str]) -> List[List[float]]:
+        self._maybe_fail("embed", model, texts)
+        vectors = []
+        for text in texts:
+            seed = hashlib.sha256(f"{task_type}\n{text}".encode('utf-8')).digest()
+            rng = random.Random(seed)
+            vector = [rng.gauss(0.0, 1.0) for _ in range(self.embedding_dim)]
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            vectors.append([v / norm for v in vector])
+        return vectors
+
+    def upload_file(self, path: str, mime_type: str, display_name: str, api_key: Optional[str],
+                    chunk_size: int = 8 * 1024 * 1024) -> Dict[str, Any]:
+        """ローカルのフェイクアップロード先（再開可能アップロードと同じく固定長チャンクで読み出して送る）"""
+        self._maybe_fail("upload", None, [path, display_name or ""])
+        digest = hashlib.sha256()
+        size = chunks = 0
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+                size += len(chunk)
+                chunks += 1
+        with self._lock:
+            name = f"files/fake-{len(self.files) + 1}"
+            self.files[name] = {"uri": f"fake://{name}", "mime_type": mime_type, "size": size,
+                                "sha256": digest.hexdigest(), "chunks": chunks, "display_name": display_name}
+        expires = datetime.now(timezone.utc) + timedelta(hours=48)
+        return {"name": name, "uri": f"fake://{name}", "state": "ACTIVE", "expires_at": expires.isoformat()}
+
+    def get_file(self, name: str, api_key: Optional[str]) -> Dict[str, Any]:
+        with self._lock:
+            info = self.files.get(name)
+        if info is None:
+            raise ValueError(f"File not found: {name}")
+        expires = datetime.now(timezone.utc) + timedelta(hours=48)
+        return {"name": name, "uri": info["uri"], "state": "ACTIVE", "expires_at": expires.isoformat()}
+
+    def delete_file(self, name: str, api_key: Optional[str]):
+        with self._lock:
+            self.files.pop(name, None)
+
+    response_text = staticmethod(GenaiBackend.response_text)
+    usage = staticmethod(GenaiBackend.usage)
+
+
+def _contents_text(contents) -> str:
+    """プロンプト中のテキスト部分を連結（フェイク応答のルール照合用）"""
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(_contents_text(part) for part in contents)
+    if isinstance(contents, dict) and isinstance(contents.get("text"), str):
+        return contents["text"]
+    return ""
+
+
+def _contents_inline_text(contents) -> str:
+    """プロンプト中のインラインデータ（{"mime_type", "data"}）をUTF-8として読める範囲で連結（フェイク応答の照合用）"""
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(filter(None, (_contents_inline_text(part) for part in contents)))
+    if isinstance(contents, dict) and isinstance(contents.get("data"), (bytes, bytearray)):
+        return bytes(contents["data"]).decode('utf-8', errors='ignore')
+    return ""
+
+
+def _contents_file_uris(contents) -> List[str]:
+    """プロンプト中の File API 参照（file_data.file_uri）の一覧"""
+    if isinstance(contents, (list, tuple)):
+        return [uri for part in contents for uri in _contents_file_uris(part)]
+    if isinstance(contents, dict) and isinstance(contents.get("file_data"), dict):
+        return [contents["file_data"].get("file_uri")]
+    return []
+
+
+def _file_sha256(path: str, chunk_size: int = 8 * 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cacheable_payload(contents) -> Optional[Any]:
+    """テキストのみのプロンプトならJSON化可能な形で返す（バイナリを含む場合はNone）"""
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (list, tuple)):
+        parts = [_cacheable_payload(part) for part in contents]
+        return None if any(part is None for part in parts) else parts
+    if isinstance(contents, dict) and set(contents) <= {"text", "role", "parts"}:
+        payload = {key: _cacheable_payload(value) if key == "parts" else value for key, value in contents.items()}
+        return None if payload.get("parts", "") is None else payload
+    return None
+
+
+def make_response_cache_key(model: str, contents, generation_config: Optional[Dict]) -> Optional[str]:
+    """応答キャッシュのキー（SHA-256）。キャッシュできない呼び出しはNone"""
+    payload = _cacheable_payload(contents)
+    if payload is None:
+        return None
+    try:
+        config = json.dumps(generation_config or {}, sort_keys=True, ensure_ascii=False)
+    except TypeError:
+        return None
+    prompt_hash = hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()
+    raw = f"{_model_name(model)}\n{prompt_hash}\n{config}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def create_backend(name: str = GEMINI_BACKEND):
+    """バックエンド名から生成（fake は GEMINI_FAKE_RESPONSES があれば読み込む）"""
+    if name == "fake":
+        responses_path = os.getenv('GEMINI_FAKE_RESPONSES')
+        return FakeBackend.from_file(responses_path) if responses_path else FakeBackend()
+    if name == "genai":
+        return GenaiBackend()
+    raise ValueError(f"Unknown GEMINI_BACKEND: {name}")
+
+
+# ----------------------------------------------------------------------
+# クライアント
+# ----------------------------------------------------------------------
+
+class GeminiClient:
+    """Gemini API 呼び出し窓口（スレッドセーフ）"""
+
+    def __init__(self, backend=None, cache_db: Optional[str] = GEMINI_CACHE_DB,
+                 use_cache: bool = GEMINI_RESPONSE_CACHE, max_retries: int = GEMINI_MAX_RETRIES,
+                 backoff_base: float = GEMINI_BACKOFF_BASE, backoff_max: float = GEMINI_BACKOFF_MAX,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY, metrics_log: Optional[str] = GEMINI_METRICS_LOG,
+                 scheduler=None, sleep=time.sleep):
+        """
+        Args:
+            backend: GenaiBackend / FakeBackend（Noneなら GEMINI_BACKEND から生成）
+            cache_db: 応答キャッシュのSQLiteパス（Noneならキャッシュなし）
+            use_cache: 応答キャッシュのデフォルト有効/無効（呼び出しごとに上書き可能）
+            max_retries: 一時的エラー時の最大再試行回数
+            backoff_base: バックオフ初期秒数
+            backoff_max: バックオフ上限秒数
+            max_concurrency: モデルごとの同時実行数
+            metrics_log: 呼び出しごとの計測値を追記するJSONLパス
+            scheduler: QuotaScheduler（Noneなら共有インスタンス）
+            sleep: 待機関数（テスト用に差し替え可能）
+        """
+        self.backend = backend or create_backend()
+        self.use_cache = use_cache
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.metrics_log = metrics_log
+        self.scheduler = scheduler or get_quota_scheduler()
+        self._sleep = sleep
+
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._metrics: Dict[str, Dict[str, float]] = {}
+        self._recent = deque(maxlen=RECENT_CALLS)
+
+        self._conn = None
+        if cache_db:
+            data_dir = os.path.dirname(cache_db)
+            if data_dir and not os.path.exists(data_dir):
+                os.makedirs(data_dir, exist_ok=True)
+            self._conn = sqlite3.connect(cache_db, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA busy_timeout=30000")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    prompt_tokens INTEGER,
+                    output_tokens INTEGER,
+                    created_at TIMESTAMP
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    file_key TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    uri TEXT NOT NULL,
+                    mime_type TEXT NOT NULL,
+                    size_bytes INTEGER,
+                    expires_at TEXT,
+                    created_at TIMESTAMP
+                )
+            """)
+            self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # 内部
+    # ------------------------------------------------------------------
+
+    def _semaphore(self, model: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(model)
+            if semaphore is None:
+                semaphore = self._semaphores[model] = threading.BoundedSemaphore(self.max_concurrency)
+            return semaphore
+
+    def _api_key(self, api_key: Optional[str]) -> Optional[str]:
+        if api_key or not self.backend.requires_api_key:
+            return api_key
+        return resolve_api_key()
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (0.8 + 0.4 * random.random())
+
+    def _cache_get(self, key: str) -> Optional[tuple]:
+        if self._conn is None:
+            return None
+        with self._lock:
+            return self._conn.execute(
+                "SELECT text, prompt_tokens, output_tokens FROM responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+
+    def _cache_put(self, key: str, model: str, response: GeminiResponse):
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (cache_key, model, text, prompt_tokens, output_tokens, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response.text, response.prompt_tokens, response.output_tokens,
+                 datetime.now().isoformat())
+            )
+            self._conn.commit()
+
+    def _record(self, model: str, label: str, latency: float, prompt_tokens: int = 0, output_tokens: int = 0,
+                cached: bool = False, retries: int = 0, error: Optional[str] = None, kind: str = "generate"):
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "kind": kind,
+            "model": model,
+            "label": label,
+            "latency": round(latency, 3),
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "cached": cached,
+            "retries": retries,
+            "error": error,
+        }
+        with self._lock:
+            stats = self._metrics.setdefault(model, {
+                "calls": 0, "cache_hits": 0, "errors": 0, "retries": 0,
+                "latency_total": 0.0, "latency_max": 0.0, "prompt_tokens": 0, "output_tokens": 0,
+            })
+            stats["calls"] += 1
+            stats["cache_hits"] += int(cached)
+            stats["errors"] += int(error is not None)
+            stats["retries"] += retries
+            stats["prompt_tokens"] += prompt_tokens
+            stats["output_tokens"] += output_tokens
+            if not cached:
+                stats["latency_total"] += latency
+                stats["latency_max"] = max(stats["latency_max"], latency)
+            self._recent.append(entry)
+
+            if self.metrics_log:
+                try:
+                    with open(self.metrics_log, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                except OSError:
+                    pass
+
+    def _call_with_retry(self, model: str, call: Callable[[], Any], label: str, rate_limiter,
+                         max_retries: Optional[int]) -> tuple:
+        """レート制限・同時実行数制限の下で call() を実行し、一時的エラーは再試行 → (結果, 再試行回数)"""
+        max_retries = self.max_retries if max_retries is None else max_retries
+        for attempt in range(max_retries + 1):
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            try:
+                with self._semaphore(model):
+                    return call(), attempt
+            except Exception as e:
+                if not is_transient_error(e) or attempt == max_retries:
+                    raise
+
+                wait = self._backoff(attempt)
+                if is_rate_limit_error(e) and rate_limiter is not None:
+                    # 429: バケットにペナルティを課し、全スレッドをまとめて待機させる（次の acquire で待つ）
+                    print(f"  ⚠️ Rate limited{label} (429), retrying in {wait:.0f}s "
+                          f"({attempt + 1}/{max_retries})", flush=True)
+                    rate_limiter.penalize(wait)
+                    on_rate_limited = getattr(rate_limiter, "on_rate_limited", None)
+                    if on_rate_limited is not None:
+                        on_rate_limited(e)
+                else:
+                    print(f"  ⚠️ Gemini error{label}: {e} — retrying in {wait:.0f}s "
+                          f"({attempt + 1}/{max_retries})", flush=True)
+                    self._sleep(wait)
+
+    # ------------------------------------------------------------------
+    # 公開API
+    # ------------------------------------------------------------------
+
+    def generate(self, contents, model: str, generation_config: Optional[Dict] = None, *,
+                 use_cache: Optional[bool] = None, api_key: Optional[str] = None, label: str = "",
+                 rate_limiter=None, max_retries: Optional[int] = None,
+                 request_options: Optional[Dict] = None, workload: Optional[str] = None) -> GeminiResponse:
+        """
+        generate_content を呼び出す
+
+        Args:
+            contents: プロンプト（文字列、またはパーツのリスト）
+            model: モデル名（例: "gemini-2.5-flash"）
+            generation_config: 生成設定（dict）
+            use_cache: 応答キャッシュを使うか（Noneならクライアントの既定値）
+            api_key: APIキー（Noneなら quota_scheduler がTierを選択。指定時はそのキーのTierに固定）
+            label: ログ・計測用ラベル（例: " [chunk 3]"）
+            rate_limiter: 使用するリミッター（Noneなら quota_scheduler が選んだTierの共有リミッター）
+            max_retries: 最大再試行回数（Noneならクライアントの既定値）
+            request_options: generate_content の request_options（timeout等）
+            workload: "interactive" or "batch"（Noneならプロセスのデフォルト、Tier選択に使用）
+
+        Returns:
+            GeminiResponse
+
+        Raises:
+            ValueError: APIキー未設定
+            DailyQuotaExceeded: RPD上限に到達
+            Exception: 再試行しても失敗した、または再試行対象外のエラー
+        """
+        model = _model_name(model)
+        use_cache = self.use_cache if use_cache is None else use_cache
+        cache_key = make_response_cache_key(model, contents, generation_config) if use_cache else None
+
+        if cache_key:
+            hit = self._cache_get(cache_key)
+            if hit is not None:
+                text, prompt_tokens, output_tokens = hit
+                self._record(model, label, 0.0, prompt_tokens or 0, output_tokens or 0, cached=True)
+                return GeminiResponse(text, model, prompt_tokens=prompt_tokens or 0,
+                                      output_tokens=output_tokens or 0, cached=True)
+
+        if rate_limiter is None:
+            # Tier（キー）は acquire のたびに選び直す（再試行時に FREE が枯渇していれば PAID に切り替わる）
+            rate_limiter = self.scheduler.schedule(model, workload, api_key=api_key,
+                                                   require_key=self.backend.requires_api_key)
+            resolve_key = lambda: rate_limiter.api_key  # noqa: E731
+        else:
+            key = self._api_key(api_key)
+            resolve_key = lambda: key  # noqa: E731
+
+        started = time.perf_counter()
+        try:
+            raw, retries = self._call_with_retry(
+                model,
+                lambda: self.backend.generate(model, contents, generation_config, resolve_key(), request_options),
+                label, rate_limiter, max_retries
+            )
+        except Exception as e:
+            self._record(model, label, time.perf_counter() - started, error=f"{type(e).__name__}: {e}")
+            raise
+
+        latency = time.perf_counter() - started
+        prompt_tokens, output_tokens = self.backend.usage(raw)
+        response = GeminiResponse(self.backend.response_text(raw), model, raw=raw,
+                                  prompt_tokens=prompt_tokens, output_tokens=output_tokens,
+                                  latency=latency, attempts=retries + 1)
+        self._record(model, label, latency, prompt_tokens, output_tokens, retries=retries)
+
+        # 空応答（ブロック等）はキャッシュしない
+        if cache_key and response.text:
+            self._cache_put(cache_key, model, response)
+
+        return response
+
+    def generate_text(self, contents, model: str, generation_config: Optional[Dict] = None, **kwargs) -> str:
+        """generate() の応答テキスト（前後の空白を除去）"""
+        return self.generate(contents, model, generation_config, **kwargs).text.strip()
+
+    def embed(self, texts: List[str], model: str, task_type: str, *, api_key: Optional[str] = None,
+              rate_limiter=None, max_retries: Optional[int] = None, label: str = "") -> List[List[float]]:
+        """
+        embed_content を呼び出す（結果のキャッシュは embedding_service 側で行う）
+
+        Args:
+            texts: テキストのリスト
+            model: 埋め込みモデル名
+            task_type: "retrieval_document" / "retrieval_query" など
+            api_key: APIキー（Noneなら USE_PAID_TIER に応じて解決）
+            rate_limiter: 使用するリミッター（Noneなら制限しない。呼び出し側で制御する場合）
+            max_retries: 最大再試行回数（Noneならクライアントの既定値）
+            label: ログ・計測用ラベル
+
+        Returns:
+            list: ベクトルのリスト
+        """
+        key = self._api_key(api_key)
+        started = time.perf_counter()
+        try:
+            vectors, retries = self._call_with_retry(
+                _model_name(model), lambda: self.backend.embed(model, texts, task_type, key),
+                label, rate_limiter, max_retries
+            )
+        except Exception as e:
+            self._record(_model_name(model), label, time.perf_counter() - started,
+                         error=f"{type(e).__name__}: {e}", kind="embed")
+            raise
+
+        self._record(_model_name(model), label, time.perf_counter() - started,
+                     prompt_tokens=sum(len(t) for t in texts) // 4, retries=retries, kind="embed")
+        return vectors
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        計測値のスナップショット
+
+        Returns:
+            dict: {"models": {モデル名: {calls, cache_hits, errors, retries, latency_avg, latency_max,
+                                       prompt_tokens, output_tokens}}, "recent": [直近の呼び出し]}
+        """
+        with self._lock:
+            models = {}
+            for model, stats in self._metrics.items():
+                api_calls = stats["calls"] - stats["cache_hits"]
+                models[model] = {
+                    key: value for key, value in stats.items() if key != "latency_total"
+                }
+                models[model]["latency_avg"] = round(stats["latency_total"] / api_calls, 3) if api_calls else 0.0
+            return {"models": models, "recent": list(self._recent)}
+
+    def format_metrics(self) -> str:
+        """計測値のサマリ文字列（バッチ終了時のログ用）"""
+        lines = []
+        for model, stats in sorted(self.get_metrics()["models"].items()):
+            lines.append(
+                f"{model}: {stats['calls']} calls ({stats['cache_hits']} cached, {stats['errors']} errors, "
+                f"{stats['retries']} retries), avg {stats['latency_avg']:.2f}s / max {stats['latency_max']:.2f}s, "
+                f"tokens in {stats['prompt_tokens']:,} / out {stats['output_tokens']:,}"
+            )
+        return "\n".join(lines) if lines else "(no Gemini calls)"
+
+    def reset_metrics(self):
+        with self._lock:
+            self._metrics.clear()
+            self._recent.clear()
+
+    def _file_key(self, content_hash: str, api_key: Optional[str]) -> str:
+        """アップロード済みファイルの再利用キー（内容 + バックエンド + キー。キー自体は保存しない）"""
+        key_hash = hashlib.sha256((api_key or "").encode('utf-8')).hexdigest()[:16]
+        return hashlib.sha256(f"{self.backend.name}\n{key_hash}\n{content_hash}".encode('utf-8')).hexdigest()
+
+    def _reusable_file(self, file_key: str, api_key: Optional[str]) -> Optional[GeminiFile]:
+        if self._conn is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, uri, mime_type, size_bytes, expires_at FROM files WHERE file_key = ?", (file_key,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        name, uri, mime_type, size_bytes, expires_at = row
+        if expires_at and datetime.fromisoformat(expires_at) < datetime.now(timezone.utc) + FILE_REUSE_MARGIN:
+            return None
+        try:
+            if self.backend.get_file(name, api_key)["state"] != "ACTIVE":
+                return None
+        except Exception:
+            return None  # 削除済み・期限切れ
+        return GeminiFile(name, uri, mime_type, size_bytes, api_key=api_key, expires_at=expires_at, reused=True)
+
+    def upload_file(self, path: str, mime_type: str, *, api_key: Optional[str] = None,
+                    model: Optional[str] = None, workload: Optional[str] = None, reuse: bool = True,
+                    label: str = "", max_retries: Optional[int] = None) -> GeminiFile:
+        """
+        File API にアップロードし、処理完了（ACTIVE）まで待ってハンドルを返す
+
+        ファイルはディスクから分割して送信する（メモリに全体を読み込まない）。
+        同じ内容を同じキーでアップロード済みで有効期限内なら、アップロードせずに既存のハンドルを返す。
+
+        Args:
+            path: ファイルパス
+            mime_type: MIMEタイプ（例: "audio/mp4"）
+            api_key: APIキー（Noneなら quota_scheduler が model のTierを選択）
+            model: このファイルを使うモデル（Tier選択用）
+            workload: "interactive" or "batch"（Tier選択用）
+            reuse: アップロード済みのハンドルを再利用するか
+            label: ログ・計測用ラベル
+            max_retries: 最大再試行回数（Noneならクライアントの既定値）
+
+        Returns:
+            GeminiFile: generate() にはこのハンドルの api_key を指定して使う
+
+        Raises:
+            ValueError: APIキー未設定
+            RuntimeError: アップロード後の処理が失敗・タイムアウトした
+        """
+        if api_key is None and self.backend.requires_api_key:
+            tier = self.scheduler.select_tier(model, workload) if model else get_tier()
+            api_key = resolve_api_key(tier == "paid")
+
+        file_key = self._file_key(_file_sha256(path), api_key)
+        if reuse:
+            handle = self._reusable_file(file_key, api_key)
+            if handle is not None:
+                self._record("files", label, 0.0, cached=True, kind="upload")
+                return handle
+
+        started = time.perf_counter()
+        try:
+            info, retries = self._call_with_retry(
+                "files",
+                lambda: self.backend.upload_file(path, mime_type, os.path.basename(path), api_key),
+                label, None, max_retries
+            )
+            deadline = time.monotonic() + GEMINI_FILE_PROCESSING_TIMEOUT
+            while info["state"] == "PROCESSING":
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"File processing timed out: {info['name']}")
+                self._sleep(FILE_POLL_INTERVAL)
+                info = self.backend.get_file(info["name"], api_key)
+            if info["state"] != "ACTIVE":
+                raise RuntimeError(f"File processing failed: {info['name']} (state={info['state']})")
+        except Exception as e:
+            self._record("files", label, time.perf_counter() - started,
+                         error=f"{type(e).__name__}: {e}", kind="upload")
+            raise
+
+        self._record("files", label, time.perf_counter() - started, retries=retries, kind="upload")
+        size_bytes = os.path.getsize(path)
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files (file_key, name, uri, mime_type, size_bytes, expires_at, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (file_key, info["name"], info["uri"], mime_type, size_bytes, info.get("expires_at"),
+                     datetime.now().isoformat())
+                )
+                self._conn.commit()
+
+        return GeminiFile(info["name"], info["uri"], mime_type, size_bytes, api_key=api_key,
+                          expires_at=info.get("expires_at"))
+
+    def delete_file(self, handle: GeminiFile):
+        """アップロードしたファイルを削除（失敗しても例外を上げない。期限切れで自動削除される）"""
+        try:
+            self.backend.delete_file(handle.name, handle.api_key)
+        except Exception as e:
+            print(f"  ⚠️ Failed to delete {handle.name}: {e}")
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM files WHERE name = ?", (handle.name,))
+                self._conn.commit()
+
+    def clear_cache(self):
+        """応答キャッシュを全削除"""
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+class GeminiModel:
+    """
+    GenerativeModel 互換の薄いラッパー（model_name と generate_content を持ち、共通クライアント経由で呼び出す）
+
+    既存コードの genai.GenerativeModel(...) をそのまま置き換えられる。
+    """
+
+    def __init__(self, model_name: str, api_key: Optional[str] = None, client: Optional[GeminiClient] = None,
+                 **defaults):
+        """
+        Args:
+            model_name: モデル名
+            api_key: APIキー（Noneなら呼び出し時に解決）
+            client: 使用するクライアント（Noneなら共有クライアント）
+            **defaults: generate() に毎回渡す既定の引数（use_cache, label 等）
+        """
+        self.model_name = _model_name(model_name)
+        self.api_key = api_key
+        self._client = client
+        self.defaults = defaults
+
+    def generate_content(self, contents, generation_config: Optional[Dict] = None, **kwargs) -> GeminiResponse:
+        options = dict(self.defaults, **kwargs)
+        options.setdefault("api_key", self.api_key)
+        client = self._client or get_gemini_client()
+        return client.generate(contents, self.model_name, generation_config, **options)
+
+
+_client: Optional[GeminiClient] = None
+_client_lock = threading.Lock()
+
+
+def get_gemini_client() -> GeminiClient:
+    """プロセス内共有のクライアントを取得"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GeminiClient()
+        return _client
+
+
+def set_gemini_client(client: Optional[GeminiClient]):
+    """共有クライアントを差し替え（テスト・ベンチマークで FakeBackend を使う場合。Noneで既定に戻す）"""
+    global _client
+    with _client_lock:
+        _client = client
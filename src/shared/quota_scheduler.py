@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Gemini API クォータ管理（FREE/PAID キーの振り分けと残量予測）
+
+使い方:
+    from src.shared.quota_scheduler import get_quota_scheduler, set_default_workload
+
+    set_default_workload("batch")                 # バッチ処理のエントリポイントで1回
+    scheduler = get_quota_scheduler()
+    request = scheduler.schedule("gemini-2.5-flash")
+    request.acquire()                             # Tierを選んでRPM枠を取得、使用量を記録
+    backend.generate(..., api_key=request.api_key)
+
+    python -m src.shared.quota_scheduler          # 本日の使用量と残量予測を表示
+
+機能:
+- キー（Tier）・モデルごとの使用リクエスト数を SQLite（GEMINI_USAGE_DB）に時間単位で記録
+  webhook_server・iCloud監視・バッチなど複数プロセスの使用量を合算して判断する
+- GEMINI_TIER_MODE=static: 従来どおり USE_PAID_TIER のキーのみを使用（使用量の記録のみ行う）
+- GEMINI_TIER_MODE=auto: リクエストごとにキーを選択
+  - interactive（新規録音の処理・検索）: FREE の残りがあれば FREE、なければ PAID
+  - batch（バックフィル等）: FREE の残りが予約枠（GEMINI_FREE_RESERVE）を上回り、かつ
+    FREE のRPM待ちが GEMINI_SPILL_WAIT 秒以内なら FREE、それ以外は PAID に回す
+    PAID キーがない場合は予約枠に達した時点で DailyQuotaExceeded（interactive 用に残す）
+- 日次上限の429（"PerDay"）を受けたキーは当日中は使い切ったものとして扱う
+- 残量予測（forecast()）: 本日の使用数、残り、直近1時間のペースから見た枯渇時刻
+"""
+
+import math
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from src.shared.rate_limiter import DailyQuotaExceeded, get_rate_limiter, get_tier, get_tier_limits
+
+# 設定
+GEMINI_TIER_MODE = os.getenv('GEMINI_TIER_MODE', 'static')  # static / auto
+GEMINI_USAGE_DB = os.getenv('GEMINI_USAGE_DB', 'data/gemini_usage.db')
+GEMINI_FREE_RESERVE = float(os.getenv('GEMINI_FREE_RESERVE', '0.3'))  # FREE の日次枠のうち interactive 用に残す割合
+GEMINI_SPILL_WAIT = float(os.getenv('GEMINI_SPILL_WAIT', '10'))  # batch: FREE のRPM待ちがこれを超えたら PAID へ（秒）
+
+WORKLOADS = ("interactive", "batch")
+TIERS = ("free", "paid")
+
+_default_workload = os.getenv('GEMINI_WORKLOAD', 'interactive')
+
+
+def set_default_workload(workload: str):
+    """
+    プロセス内のデフォルトのワークロード種別を設定（バッチ処理のエントリポイントで呼ぶ）
+
+    Args:
+        workload: "interactive" or "batch"
+
+    Raises:
+        ValueError: 不明なワークロード種別
+    """
+    global _default_workload
+    if workload not in WORKLOADS:
+        raise ValueError(f"Unknown workload: {workload} (expected one of {WORKLOADS})")
+    _default_workload = workload
+
+
+def get_default_workload() -> str:
+    """プロセス内のデフォルトのワークロード種別"""
+    return _default_workload
+
+
+def tier_api_key(tier: str) -> Optional[str]:
+    """
+    Tierに対応するAPIキー（未設定ならNone）
+
+    Args:
+        tier: "free" or "paid"
+
+    Returns:
+        str or None: FREE は GEMINI_API_KEY_FREE（なければ GEMINI_API_KEY）、PAID は GEMINI_API_KEY_PAID
+    """
+    if tier == "paid":
+        return os.getenv("GEMINI_API_KEY_PAID") or None
+    return os.getenv("GEMINI_API_KEY_FREE") or os.getenv("GEMINI_API_KEY") or None
+
+
+def is_daily_quota_error(error: Exception) -> bool:
+    """429のうち日次上限（RPD）によるものか（quota_id に "PerDay" を含む）"""
+    return "PerDay" in str(error) or "per day" in str(error).lower()
+
+
+def _model_key(model: str) -> str:
+    return model.split("/")[-1]
+
+
+class UsageLedger:
+    """Tier・モデルごとの使用リクエスト数（時間単位、複数プロセスで共有）"""
+
+    def __init__(self, db_path: Optional[str] = GEMINI_USAGE_DB):
+        """
+        Args:
+            db_path: SQLiteファイルパス（Noneならメモリ上のみ。プロセス間で共有されない）
+        """
+        if db_path:
+            data_dir = os.path.dirname(db_path)
+            if data_dir and not os.path.exists(data_dir):
+                os.makedirs(data_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path or ":memory:", timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        if db_path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS usage (
+                day TEXT NOT NULL,
+                hour INTEGER NOT NULL,
+                tier TEXT NOT NULL,
+                model TEXT NOT NULL,
+                requests INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, hour, tier, model)
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS exhausted (
+                day TEXT NOT NULL,
+                tier TEXT NOT NULL,
+                model TEXT NOT NULL,
+                reported_at TEXT,
+                PRIMARY KEY (day, tier, model)
+            )
+        """)
+        self._conn.commit()
+
+    def record(self, tier: str, model: str, now: Optional[datetime] = None):
+        """リクエスト1件を記録"""
+        now = now or datetime.now()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO usage (day, hour, tier, model, requests) VALUES (?, ?, ?, ?, 1) "
+                "ON CONFLICT (day, hour, tier, model) DO UPDATE SET requests = requests + 1",
+                (now.date().isoformat(), now.hour, tier, _model_key(model))
+            )
+            self._conn.commit()
+
+    def used_today(self, tier: str, model: str, now: Optional[datetime] = None) -> int:
+        """本日の使用リクエスト数"""
+        now = now or datetime.now()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(requests), 0) FROM usage WHERE day = ? AND tier = ? AND model = ?",
+                (now.date().isoformat(), tier, _model_key(model))
+            ).fetchone()
+        return row[0]
+
+    def hourly(self, tier: str, model: str, now: Optional[datetime] = None) -> Dict[int, int]:
+        """本日の時間別使用リクエスト数 {hour: requests}"""
+        now = now or datetime.now()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hour, requests FROM usage WHERE day = ? AND tier = ? AND model = ?",
+                (now.date().isoformat(), tier, _model_key(model))
+            ).fetchall()
+        return dict(rows)
+
+    def models_today(self, now: Optional[datetime] = None) -> List[str]:
+        """本日使用したモデルの一覧"""
+        now = now or datetime.now()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT model FROM usage WHERE day = ? ORDER BY model", (now.date().isoformat(),)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def mark_exhausted(self, tier: str, model: str, now: Optional[datetime] = None):
+        """日次上限の429を受けたキーを当日中は使い切ったものとして記録"""
+        now = now or datetime.now()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO exhausted (day, tier, model, reported_at) VALUES (?, ?, ?, ?)",
+                (now.date().isoformat(), tier, _model_key(model), now.isoformat(timespec="seconds"))
+            )
+            self._conn.commit()
+
+    def is_exhausted(self, tier: str, model: str, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM exhausted WHERE day = ? AND tier = ? AND model = ?",
+                (now.date().isoformat(), tier, _model_key(model))
+            ).fetchone()
+        return row is not None
+
+
+class ScheduledRequest:
+    """
+    1回のAPI呼び出しのためのキー選択（rate_limiter と同じ acquire / penalize を持つ）
+
+    acquire() のたびにTierを選び直すため、再試行時に FREE が枯渇していれば PAID に切り替わる。
+    """
+
+    def __init__(self, scheduler: "QuotaScheduler", model: str, workload: str,
+                 pinned_tier: Optional[str] = None, api_key: Optional[str] = None, require_key: bool = True):
+        self.scheduler = scheduler
+        self.model = _model_key(model)
+        self.workload = workload
+        self.pinned_tier = pinned_tier
+        self.require_key = require_key
+        self.tier: Optional[str] = pinned_tier
+        self.api_key: Optional[str] = api_key
+        self._explicit_key = api_key
+        self._limiter = None
+
+    def acquire(self):
+        """
+        Tierを選択してそのTierのRPM枠を取得し、使用量を記録
+
+        Raises:
+            ValueError: 選択したTierのAPIキーが未設定
+            DailyQuotaExceeded: 使用できるTierの日次上限に到達
+        """
+        tier = self.pinned_tier or self.scheduler.select_tier(self.model, self.workload)
+        api_key = self._explicit_key or tier_api_key(tier)
+        if api_key is None and self.require_key:
+            if tier == "paid":
+                raise ValueError("GEMINI_API_KEY_PAID not set but USE_PAID_TIER=true")
+            raise ValueError("GEMINI_API_KEY_FREE not set")
+
+        limiter = get_rate_limiter(self.model, tier)
+        limiter.acquire()
+        self.tier, self.api_key, self._limiter = tier, api_key, limiter
+        self.scheduler.ledger.record(tier, self.model)
+        return True
+
+    def penalize(self, seconds: float):
+        """429受信時: 直前に使ったTierのバケットにペナルティ"""
+        if self._limiter is not None:
+            self._limiter.penalize(seconds)
+
+    def on_rate_limited(self, error: Exception):
+        """429受信時: 日次上限によるものなら当日中はそのTierを使い切ったものとして扱う"""
+        if self.tier is not None and is_daily_quota_error(error):
+            self.scheduler.ledger.mark_exhausted(self.tier, self.model)
+            print(f"  ⚠️ Daily quota reached for {self.model} ({self.tier.upper()} tier)", flush=True)
+
+
+class QuotaScheduler:
+    """FREE/PAID キーの振り分け（スレッドセーフ）"""
+
+    def __init__(self, mode: str = GEMINI_TIER_MODE, ledger: Optional[UsageLedger] = None,
+                 free_reserve: float = GEMINI_FREE_RESERVE, spill_wait: float = GEMINI_SPILL_WAIT):
+        """
+        Args:
+            mode: "static"（USE_PAID_TIER 固定）or "auto"（リクエストごとに選択）
+            ledger: 使用量の記録先（Noneなら GEMINI_USAGE_DB）
+            free_reserve: FREE の日次枠のうち interactive 用に残す割合（0.0〜1.0）
+            spill_wait: batch で FREE のRPM待ちがこの秒数を超えたら PAID に回す
+        """
+        if mode not in ("static", "auto"):
+            raise ValueError(f"Unknown GEMINI_TIER_MODE: {mode}")
+        self.mode = mode
+        self.ledger = ledger or UsageLedger()
+        self.free_reserve = free_reserve
+        self.spill_wait = spill_wait
+
+    def free_remaining(self, model: str) -> int:
+        """FREE キーの本日の残りリクエスト数（日次上限の429を受けていれば0）"""
+        if self.ledger.is_exhausted("free", model):
+            return 0
+        rpd = get_tier_limits("free", model)["rpd"]
+        return max(0, rpd - self.ledger.used_today("free", model))
+
+    def free_reserved(self, model: str) -> int:
+        """FREE キーのうち interactive 用に予約するリクエスト数"""
+        return math.ceil(get_tier_limits("free", model)["rpd"] * self.free_reserve)
+
+    def select_tier(self, model: str, workload: Optional[str] = None) -> str:
+        """
+        リクエストに使うTierを選択
+
+        Args:
+            model: モデル名
+            workload: "interactive" or "batch"（Noneならプロセスのデフォルト）
+
+        Returns:
+            "free" or "paid"
+
+        Raises:
+            DailyQuotaExceeded: PAID キーがなく、FREE の残りがない（batch では予約枠以下）
+        """
+        if self.mode == "static":
+            return get_tier()
+
+        workload = workload or get_default_workload()
+        has_free = tier_api_key("free") is not None
+        has_paid = tier_api_key("paid") is not None
+        if not has_free and has_paid:
+            return "paid"
+        if not has_paid:
+            remaining = self.free_remaining(model)
+            if remaining == 0:
+                raise DailyQuotaExceeded(f"FREE tier daily quota for {model} is exhausted and no PAID key is configured")
+            if workload == "batch":
+                reserved = self.free_reserved(model)
+                if remaining <= reserved:
+                    raise DailyQuotaExceeded(
+                        f"FREE tier budget for {model} is reserved for interactive work "
+                        f"({remaining} left, {reserved} reserved) and no PAID key is configured"
+                    )
+            return "free"
+
+        remaining = self.free_remaining(model)
+        if workload == "interactive":
+            return "free" if remaining > 0 else "paid"
+
+        if remaining <= self.free_reserved(model):
+            return "paid"
+        if get_rate_limiter(model, "free").wait_time() > self.spill_wait:
+            return "paid"
+        return "free"
+
+    def schedule(self, model: str, workload: Optional[str] = None, api_key: Optional[str] = None,
+                 require_key: bool = True) -> ScheduledRequest:
+        """
+        1回のAPI呼び出し用のキー選択を作成
+
+        Args:
+            model: モデル名
+            workload: "interactive" or "batch"（Noneならプロセスのデフォルト）
+            api_key: 呼び出し側が指定したAPIキー（指定時はそのキーのTierに固定）
+            require_key: APIキー必須か（キー不要のバックエンドではFalse）
+
+        Returns:
+            ScheduledRequest
+        """
+        pinned_tier = None
+        if api_key:
+            pinned_tier = "paid" if api_key == tier_api_key("paid") else "free"
+        elif self.mode == "static":
+            pinned_tier = get_tier()
+        return ScheduledRequest(self, model, workload or get_default_workload(),
+                                pinned_tier=pinned_tier, api_key=api_key, require_key=require_key)
+
+    def forecast(self, models: Optional[List[str]] = None, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Tier・モデルごとの本日の使用量と残量予測
+
+        直近1時間のペース（現在の時間帯 + 前の時間帯を経過分で按分）が続いた場合の
+        本日の見込み使用数と、日次上限に達する時刻を求める。
+
+        Args:
+            models: 対象モデル（Noneなら本日使用したモデル）
+            now: 基準時刻（テスト用）
+
+        Returns:
+            list: [{"model", "tier", "used", "rpd", "remaining", "reserved", "last_hour",
+                    "projected", "exhausts_at"}, ...]
+        """
+        now = now or datetime.now()
+        models = [_model_key(m) for m in models] if models else self.ledger.models_today(now)
+        hours_left = 24 - now.hour - now.minute / 60
+        minute_fraction = now.minute / 60
+
+        rows = []
+        for model in models:
+            for tier in TIERS:
+                rpd = get_tier_limits(tier, model)["rpd"]
+                used = self.ledger.used_today(tier, model, now)
+                hourly = self.ledger.hourly(tier, model, now)
+                last_hour = hourly.get(now.hour, 0) + hourly.get(now.hour - 1, 0) * (1 - minute_fraction)
+                exhausted = self.ledger.is_exhausted(tier, model, now)
+                remaining = 0 if exhausted else max(0, rpd - used)
+                projected = used + last_hour * hours_left
+
+                exhausts_at = None
+                if exhausted or remaining == 0:
+                    exhausts_at = now.isoformat(timespec="minutes")
+                elif last_hour > 0 and projected >= rpd:
+                    exhausts_at = (now + timedelta(hours=remaining / last_hour)).isoformat(timespec="minutes")
+
+                rows.append({
+                    "model": model,
+                    "tier": tier,
+                    "used": used,
+                    "rpd": rpd,
+                    "remaining": remaining,
+                    "reserved": self.free_reserved(model) if tier == "free" and self.mode == "auto" else 0,
+                    "last_hour": round(last_hour, 1),
+                    "projected": round(projected),
+                    "exhausts_at": exhausts_at,
+                })
+        return rows
+
+
+_scheduler: Optional[QuotaScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_quota_scheduler() -> QuotaScheduler:
+    """プロセス内共有のスケジューラを取得"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = QuotaScheduler()
+        return _scheduler
+
+
+def set_quota_scheduler(scheduler: Optional[QuotaScheduler]):
+    """共有スケジューラを差し替え（テスト用。Noneで既定に戻す）"""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
+
+
+if __name__ == "__main__":
+    import sys
+
+    scheduler = get_quota_scheduler()
+    rows = scheduler.forecast(sys.argv[1:] or None)
+    print(f"Gemini API usage today (mode: {scheduler.mode}, workload default: {get_default_workload()})")
+    if not rows:
+        print("  (no requests recorded today)")
+    for row in rows:
+        reserved = f", {row['reserved']} reserved" if row["reserved"] else ""
+        exhausts = f", exhausts ~{row['exhausts_at'][11:]}" if row["exhausts_at"] else ""
+        print(f"  {row['model']:<24} {row['tier'].upper():<4} {row['used']:>6}/{row['rpd']:<6} "
+              f"({row['remaining']} left{reserved}) last hour {row['last_hour']:g}, "
+              f"projected {row['projected']}{exhausts}")
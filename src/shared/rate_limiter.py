@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Gemini API レート制限（トークンバケット方式）
+
+使い方:
+    from src.shared.rate_limiter import get_rate_limiter
+
+    limiter = get_rate_limiter("gemini-2.5-flash")
+    limiter.acquire()  # RPM枠が空くまでブロック
+    response = model.generate_content(...)
+
+機能:
+- RPM（requests per minute）をトークンバケットで制御（スレッドセーフ）
+- RPD（requests per day）を日付単位でカウント、超過時は例外
+- Tier（FREE/PAID）ごとのデフォルト制限値、環境変数で上書き可能
+- 同一キーのリミッターはプロセス内で共有（並列ワーカー間で枠を共有）
+"""
+
+import os
+import threading
+import time
+from datetime import date
+from typing import Dict, Optional
+
+
+# Tier別デフォルト制限（memory-bank/gemini-api-tier-management.md 参照）
+# 環境変数 GEMINI_FREE_RPM / GEMINI_FREE_RPD / GEMINI_PAID_RPM / GEMINI_PAID_RPD で上書き可能
+TIER_LIMITS = {
+    "free": {"rpm": 5, "rpd": 25},
+    "paid": {"rpm": 1000, "rpd": 10000},
+}
+
+# モデル別の制限（TIER_LIMITSより優先、tools/calculate_free_tier_capacity.py 参照）
+# 環境変数 <KEY>_<TIER>_RPM / <KEY>_<TIER>_RPD で上書き可能（例: TEXT_EMBEDDING_004_FREE_RPM）
+MODEL_LIMITS = {
+    "text-embedding-004": {
+        "free": {"rpm": 1500, "rpd": 1500},
+        "paid": {"rpm": 1500, "rpd": 100000},
+    },
+}
+
+
+class DailyQuotaExceeded(Exception):
+    """1日あたりのリクエスト上限（RPD）を超過した"""
+
+
+def get_tier() -> str:
+    """
+    現在のTierを取得（USE_PAID_TIER環境変数）
+
+    Returns:
+        "paid" or "free"
+    """
+    return "paid" if os.getenv("USE_PAID_TIER", "false").lower() == "true" else "free"
+
+
+def _model_key(key: str) -> str:
+    """モデル名の "models/" 接頭辞を除去（"models/text-embedding-004" → "text-embedding-004"）"""
+    return key.split("/")[-1]
+
+
+def get_tier_limits(tier: Optional[str] = None, key: Optional[str] = None) -> Dict[str, int]:
+    """
+    Tier（とモデル）ごとの制限値を取得（環境変数による上書きを反映）
+
+    Args:
+        tier: "free" or "paid"（Noneの場合はUSE_PAID_TIERから判定）
+        key: モデル名（MODEL_LIMITSに定義があればそちらを使用）
+
+    Returns:
+        {"rpm": int, "rpd": int}
+    """
+    tier = tier or get_tier()
+    model = _model_key(key) if key else None
+
+    if model in MODEL_LIMITS:
+        defaults = MODEL_LIMITS[model][tier]
+        prefix = f"{model.upper().replace('-', '_').replace('.', '_')}_{tier.upper()}"
+    else:
+        defaults = TIER_LIMITS[tier]
+        prefix = f"GEMINI_{tier.upper()}"
+
+    return {
+        "rpm": int(os.getenv(f"{prefix}_RPM", defaults["rpm"])),
+        "rpd": int(os.getenv(f"{prefix}_RPD", defaults["rpd"])),
+    }
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    429（RESOURCE_EXHAUSTED）エラーかどうか判定
+    google.api_core.exceptions.ResourceExhausted と、テスト用フェイククライアントの両方に対応
+    """
+    if getattr(error, "code", None) == 429:
+        return True
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    return "429" in str(error)
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    再試行で回復しうるエラー（429 / 5xx / タイムアウト / 接続エラー）かどうか判定
+    """
+    if is_rate_limit_error(error):
+        return True
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and 500 <= code < 600:
+        return True
+    if type(error).__name__ in ("InternalServerError", "ServiceUnavailable", "DeadlineExceeded",
+                                "GatewayTimeout", "TimeoutError", "ConnectionError"):
+        return True
+    return any(marker in str(error) for marker in ("500", "502", "503", "504", "timed out", "Timeout"))
+
+
+class TokenBucketRateLimiter:
+    """RPM/RPD制限付きトークンバケット（スレッドセーフ）"""
+
+    def __init__(self, rpm: int, rpd: Optional[int] = None, burst: Optional[int] = None,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            rpm: 1分あたりの最大リクエスト数
+            rpd: 1日あたりの最大リクエスト数（Noneなら無制限）
+            burst: バケット容量（デフォルト: rpm）
+            clock: 時刻取得関数（テスト用に差し替え可能）
+            sleep: 待機関数（テスト用に差し替え可能）
+        """
+        if rpm <= 0:
+            raise ValueError(f"rpm must be positive: {rpm}")
+
+        self.rpm = rpm
+        self.rpd = rpd
+        self.capacity = float(burst or rpm)
+        self.refill_per_second = rpm / 60.0
+
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._last_refill = clock()
+        self._day = date.today()
+        self._day_count = 0
+
+    def _refill(self):
+        """経過時間に応じてトークンを補充（ロック保持中に呼ぶ）"""
+        now = self._clock()
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+            self._last_refill = now
+
+    def _check_day(self):
+        """日付が変わっていればRPDカウンタをリセット（ロック保持中に呼ぶ）"""
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self._day_count = 0
+
+    def try_acquire(self) -> float:
+        """
+        トークンを1つ取得を試みる（ブロックしない）
+
+        Returns:
+            0.0: 取得成功
+            >0: 次のトークンが補充されるまでの待機秒数
+
+        Raises:
+            DailyQuotaExceeded: RPD上限に到達済み
+        """
+        with self._lock:
+            self._check_day()
+            if self.rpd is not None and self._day_count >= self.rpd:
+                raise DailyQuotaExceeded(f"Daily quota exhausted ({self._day_count}/{self.rpd} requests)")
+
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self._day_count += 1
+                return 0.0
+
+            return (1 - self._tokens) / self.refill_per_second
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        トークンを1つ取得（枠が空くまでブロック）
+
+        Args:
+            timeout: 最大待機秒数（Noneなら無制限）
+
+        Returns:
+            bool: 取得できればTrue、タイムアウトならFalse
+
+        Raises:
+            DailyQuotaExceeded: RPD上限に到達済み
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+
+        while True:
+            wait = self.try_acquire()
+            if wait == 0.0:
+                return True
+
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+
+            self._sleep(wait)
+
+    def penalize(self, seconds: float):
+        """
+        429受信時にバケットを空にして補充を遅らせる（全ワーカーが一斉に待機）
+
+        Args:
+            seconds: 追加で待機させる秒数
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0) - seconds * self.refill_per_second
+
+    def wait_time(self) -> float:
+        """次のトークンを取得できるまでの秒数（トークンは消費しない。0.0なら即時取得可能）"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                return 0.0
+            return (1 - self._tokens) / self.refill_per_second
+
+    def remaining_today(self) -> Optional[int]:
+        """本日の残りリクエスト数（RPD無制限ならNone）"""
+        with self._lock:
+            self._check_day()
+            if self.rpd is None:
+                return None
+            return max(0, self.rpd - self._day_count)
+
+
+# プロセス内共有リミッター {(key, tier): TokenBucketRateLimiter}
+_limiters: Dict[tuple, TokenBucketRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(key: str = "gemini", tier: Optional[str] = None) -> TokenBucketRateLimiter:
+    """
+    キー（モデル名など）とTierに対応する共有リミッターを取得
+
+    Args:
+        key: リミッターの識別子（例: "gemini-2.5-flash"）
+        tier: "free" or "paid"（Noneの場合はUSE_PAID_TIERから判定）
+
+    Returns:
+        TokenBucketRateLimiter
+    """
+    tier = tier or get_tier()
+    key = _model_key(key)
+    with _limiters_lock:
+        limiter = _limiters.get((key, tier))
+        if limiter is None:
+            limits = get_tier_limits(tier, key)
+            limiter = TokenBucketRateLimiter(rpm=limits["rpm"], rpd=limits["rpd"])
+            _limiters[(key, tier)] = limiter
+        return limiter
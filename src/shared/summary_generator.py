@@ -13,10 +13,10 @@ Summary Generator Module (Phase 11-1)
 - フォールバック処理（予定なし時は予定情報なしで要約生成）
 """
 
-import os
 import json
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+from src.shared.gemini_client import GeminiModel, get_gemini_client, resolve_api_key
 
 # 環境変数読み込み
 load_dotenv()
@@ -39,30 +39,18 @@ def generate_summary_with_calendar(transcript_segments: list, matched_event: dic
             "keywords": ["キーワード1", ...]
         }
     """
-    # Gemini API設定（既存の仕組みに合わせる）
-    use_paid = os.getenv('USE_PAID_TIER', 'false').lower() == 'true'
-    if use_paid:
-        api_key = os.getenv('GEMINI_API_KEY_PAID')
-        if not api_key:
-            print("❌ GEMINI_API_KEY_PAIDが設定されていません")
+    # Gemini APIキー確認（Tierに応じたキー。キー不要のバックエンドでは確認しない）
+    if get_gemini_client().backend.requires_api_key:
+        try:
+            resolve_api_key()
+        except ValueError as e:
+            print(f"❌ {e}")
             return {
                 "summary": "（エラー: API KEY未設定）",
                 "topics": [],
                 "action_items": [],
                 "keywords": []
             }
-    else:
-        api_key = os.getenv('GEMINI_API_KEY_FREE')
-        if not api_key:
-            print("❌ GEMINI_API_KEY_FREEが設定されていません")
-            return {
-                "summary": "（エラー: API KEY未設定）",
-                "topics": [],
-                "action_items": [],
-                "keywords": []
-            }
-
-    genai.configure(api_key=api_key)
 
     # 文字起こし全文を結合
     full_text = "\n".join([seg.get('text', '') for seg in transcript_segments])
@@ -144,7 +132,7 @@ def generate_summary_with_calendar(transcript_segments: list, matched_event: dic
 
     try:
         # Gemini 2.5 Flash（既存の要約生成と同じモデル）
-        model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        model = GeminiModel('gemini-2.0-flash-exp')
         response = model.generate_content(prompt)
 
         # JSONパース
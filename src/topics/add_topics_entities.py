@@ -10,28 +10,20 @@ import sys
 import json
 from pathlib import Path
 from dotenv import load_dotenv
-import google.generativeai as genai
 
-load_dotenv()
-
-# Gemini APIキー選択（FREE/PAID tier）
-use_paid_tier = os.getenv("USE_PAID_TIER", "").lower() == "true"
-api_key = os.getenv("GEMINI_API_KEY_PAID") if use_paid_tier else os.getenv("GEMINI_API_KEY_FREE")
-
-if not api_key:
-    print("❌ Error: GEMINI_API_KEY_FREE not found in environment variables")
-    sys.exit(1)
+from src.shared.gemini_client import GeminiModel
 
-genai.configure(api_key=api_key)
-print(f"✅ Using Gemini API: {'PAID' if use_paid_tier else 'FREE'} tier")
+load_dotenv()
 
+TOPICS_MODEL = "gemini-2.0-flash-exp"
 
-def extract_topics_and_entities(full_text):
+def extract_topics_and_entities(full_text, raise_errors=False):
     """
     Gemini APIを使用してトピック抽出とエンティティ抽出
 
     Args:
         full_text: 全文テキスト
+        raise_errors: Trueなら失敗時に空の結果を返さず例外を送出（バッチ側で再試行する場合）
 
     Returns:
         dict: {
@@ -41,7 +33,7 @@ def extract_topics_and_entities(full_text):
     """
     print(f"[1/3] トピック・エンティティ抽出中...")
 
-    model = genai.GenerativeModel("gemini-2.0-flash-exp")
+    model = GeminiModel(TOPICS_MODEL)
 
     prompt = f"""
 以下の文字起こしテキストを分析し、以下のJSON形式で出力してください：
@@ -85,6 +77,8 @@ def extract_topics_and_entities(full_text):
         return result
 
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"  Error: {e}")
         return {
             "topics": [],
@@ -113,12 +107,11 @@ def assign_topics_to_segments(segments, topics):
     return segments_enhanced
 
 
-def generate_enhanced_summary(full_text, topics, entities):
-    """構造化データを活用した要約生成"""
+def generate_enhanced_summary(full_text, topics, entities, raise_errors=False):
+    """構造化データを活用した要約生成（raise_errors=Trueなら失敗時に例外を送出）"""
     print(f"[2/3] 構造化要約生成中...")
 
-    # API key is already configured at the top of the script
-    model = genai.GenerativeModel("gemini-2.0-flash-exp")
+    model = GeminiModel(TOPICS_MODEL)
 
     # トピック情報を文字列化
     topics_info = "\n".join([
@@ -164,30 +157,34 @@ def generate_enhanced_summary(full_text, topics, entities):
         response = model.generate_content(prompt)
         return response.text.strip()
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"  Error: {e}")
         return "要約生成に失敗しました"
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python add_topics_entities.py <structured_json>")
-        sys.exit(1)
+def enhanced_json_path(json_path):
+    """_structured.json に対応する _structured_enhanced.json のパス"""
+    return Path(json_path).parent / (Path(json_path).stem + "_enhanced.json")
 
-    json_path = sys.argv[1]
 
-    if not os.path.exists(json_path):
-        print(f"Error: JSON file not found: {json_path}")
-        sys.exit(1)
+def enhance_structured_json(json_path, raise_errors=False):
+    """
+    構造化JSONにトピック・エンティティ・構造化要約を追加して _enhanced.json を保存
 
-    print(f"🎙️ Phase 6-2処理開始（トピック・エンティティ抽出）")
-    print(f"  入力JSON: {json_path}")
+    Args:
+        json_path: 構造化JSONファイルパス（_structured.json）
+        raise_errors: Trueなら API エラー時に例外を送出（空の結果で保存しない）
 
+    Returns:
+        Path: 出力ファイルパス
+    """
     # 既存のJSONを読み込み
     with open(json_path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
     # トピック・エンティティ抽出
-    topics_result = extract_topics_and_entities(data["full_text"])
+    topics_result = extract_topics_and_entities(data["full_text"], raise_errors=raise_errors)
 
     # セグメントにトピック割り当て
     print(f"[3/3] セグメントにトピック割り当て中...")
@@ -200,7 +197,8 @@ def main():
     summary = generate_enhanced_summary(
         data["full_text"],
         topics_result["topics"],
-        topics_result["entities"]
+        topics_result["entities"],
+        raise_errors=raise_errors
     )
 
     # 拡張JSONを作成
@@ -211,14 +209,32 @@ def main():
     enhanced_data["summary"] = summary
 
     # 出力
-    output_path = Path(json_path).stem + "_enhanced.json"
-    output_dir = Path(json_path).parent
-    output_file = output_dir / output_path
+    output_file = enhanced_json_path(json_path)
 
     with open(output_file, "w", encoding="utf-8") as f:
         json.dump(enhanced_data, f, ensure_ascii=False, indent=2)
 
     print(f"\n✅ JSON保存完了: {output_file}")
+    return output_file
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python add_topics_entities.py <structured_json>")
+        sys.exit(1)
+
+    json_path = sys.argv[1]
+
+    if not os.path.exists(json_path):
+        print(f"Error: JSON file not found: {json_path}")
+        sys.exit(1)
+
+    print(f"🎙️ Phase 6-2処理開始（トピック・エンティティ抽出）")
+    print(f"  入力JSON: {json_path}")
+
+    output_file = enhance_structured_json(json_path)
+    with open(output_file, "r", encoding="utf-8") as f:
+        enhanced_data = json.load(f)
 
     print(f"\n📊 処理統計:")
     print(f"  トピック数: {len(enhanced_data['topics'])}")
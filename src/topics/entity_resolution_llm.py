@@ -10,35 +10,24 @@ Phase 6-3 Stage 4-2: LLM-Based Entity Resolution
 """
 
 import json
-import os
 import sys
 from pathlib import Path
 from typing import List, Dict, Any, Tuple
 from collections import defaultdict
-import google.generativeai as genai
 from dotenv import load_dotenv
 
+from src.shared.gemini_client import GeminiModel
+
 # Load environment variables
 load_dotenv()
 
-# Gemini APIキー選択（FREE/PAID tier）
-use_paid_tier = os.getenv("USE_PAID_TIER", "").lower() == "true"
-api_key = os.getenv("GEMINI_API_KEY_PAID") if use_paid_tier else os.getenv("GEMINI_API_KEY_FREE")
-
-if not api_key:
-    print("❌ Error: GEMINI_API_KEY_FREE or GEMINI_API_KEY_PAID not found in environment variables")
-    sys.exit(1)
-
-genai.configure(api_key=api_key)
-print(f"✅ Using Gemini API: {'PAID' if use_paid_tier else 'FREE'} tier")
-
 
 class EntityResolver:
     """LLMベースのエンティティ解決システム"""
 
     def __init__(self):
         """初期化"""
-        self.model = genai.GenerativeModel('gemini-2.5-pro')
+        self.model = GeminiModel('gemini-2.5-pro')
 
         print("=" * 70)
         print("Phase 8-2: LLM-Based Entity Resolution (2.5 Pro)")
@@ -543,14 +532,16 @@ class EntityResolver:
         print(f"\n✅ All _enhanced.json files updated with resolved entities\n")
 
 
-def main():
-    """メイン処理"""
-    if len(sys.argv) < 2:
-        print("Usage: python entity_resolution_llm.py <json_file1> <json_file2> ...")
-        sys.exit(1)
+def resolve_entities(json_files: List[str]) -> Tuple[Dict, Dict]:
+    """
+    複数の_enhanced.jsonにまたがる人物・組織を名寄せし、各ファイルに反映
 
-    json_files = sys.argv[1:]
+    Args:
+        json_files: _enhanced.jsonファイルパスのリスト
 
+    Returns:
+        (people_result, org_result)
+    """
     # EntityResolver初期化
     resolver = EntityResolver()
 
@@ -569,6 +560,17 @@ def main():
     # _enhanced.json更新
     resolver.update_enhanced_json(json_files, people_result, org_result)
 
+    return people_result, org_result
+
+
+def main():
+    """メイン処理"""
+    if len(sys.argv) < 2:
+        print("Usage: python entity_resolution_llm.py <json_file1> <json_file2> ...")
+        sys.exit(1)
+
+    resolve_entities(sys.argv[1:])
+
     print("=" * 70)
     print("✅ Entity resolution completed!")
     print("   Cost: Free (Gemini 2.5 Pro)")
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+無音検出ベースの音声チャンク分割（長時間録音用）
+
+固定長（600秒）分割は発話の途中で切れ、チャンクごとに話者を推定し直す必要があった。
+このモジュールは以下を行う:
+- ffmpeg silencedetectで無音区間を検出し、無音位置でチャンクを切る
+- 20MB制限から逆算した最大長に収まる範囲で、なるべく長いチャンクにする（API呼び出し削減）
+- 無音が見つからず強制分割した境界のみ数秒オーバーラップさせ、結合時に重複テキストを除去
+- チャンク相対の"MM:SS"タイムスタンプを録音全体の絶対時刻に書き換え
+"""
+
+import os
+import re
+import subprocess
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+# 設定
+CHUNK_TARGET_SECONDS = float(os.getenv('TRANSCRIBE_CHUNK_SECONDS', '900'))
+CHUNK_OVERLAP_SECONDS = float(os.getenv('TRANSCRIBE_CHUNK_OVERLAP', '3'))
+SILENCE_NOISE_DB = os.getenv('SILENCE_NOISE_DB', '-35dB')
+SILENCE_MIN_DURATION = float(os.getenv('SILENCE_MIN_DURATION', '0.5'))
+
+# 無音を探す範囲（チャンク最大長に対する割合）
+SILENCE_SEARCH_RATIO = 0.75
+# チャンクサイズの安全率（ビットレートの揺らぎ・オーバーラップ分）
+SIZE_SAFETY_RATIO = 0.85
+# 重複判定のテキスト類似度しきい値
+DEDUP_SIMILARITY = 0.8
+
+
+def probe_duration(file_path) -> Optional[float]:
+    """
+    ffprobeで音声長（秒）を取得
+
+    Returns:
+        float or None: 取得失敗時はNone
+    """
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        str(file_path)
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        return float(result.stdout.strip()) if result.returncode == 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def parse_silencedetect_output(stderr: str, duration: Optional[float] = None) -> List[Tuple[float, float]]:
+    """
+    ffmpeg silencedetectのログから無音区間を抽出
+
+    Args:
+        stderr: ffmpegのstderr出力
+        duration: 音声長（末尾で終わらない無音区間の補完用）
+
+    Returns:
+        [(無音開始秒, 無音終了秒), ...]
+    """
+    silences = []
+    start = None
+    for line in stderr.splitlines():
+        match = re.search(r'silence_start:\s*(-?[\d.]+)', line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = re.search(r'silence_end:\s*([\d.]+)', line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+
+    # 録音末尾まで続く無音
+    if start is not None and duration is not None:
+        silences.append((start, duration))
+
+    return silences
+
+
+def detect_silences(file_path, noise: str = SILENCE_NOISE_DB,
+                    min_duration: float = SILENCE_MIN_DURATION,
+                    duration: Optional[float] = None) -> List[Tuple[float, float]]:
+    """
+    ffmpeg silencedetectで無音区間を検出（デコードのみ、ファイル出力なし）
+
+    Args:
+        file_path: 音声ファイルパス
+        noise: 無音とみなす音量しきい値（例: "-35dB"）
+        min_duration: 無音とみなす最短時間（秒）
+        duration: 音声長
+
+    Returns:
+        [(無音開始秒, 無音終了秒), ...]
+    """
+    cmd = [
+        'ffmpeg',
+        '-hide_banner',
+        '-nostats',
+        '-i', str(file_path),
+        '-af', f'silencedetect=noise={noise}:d={min_duration}',
+        '-f', 'null',
+        '-'
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg silencedetect failed: {result.stderr[-500:]}")
+
+    return parse_silencedetect_output(result.stderr, duration)
+
+
+def plan_chunks(duration: float, silences: List[Tuple[float, float]], max_seconds: float,
+                overlap: float = CHUNK_OVERLAP_SECONDS) -> List[Dict]:
+    """
+    無音区間を考慮してチャンク境界を決定
+
+    各チャンクは max_seconds 以下。[max_seconds × 0.75, max_seconds] の範囲で最も長い無音の中央で切る。
+    無音がない場合は max_seconds で強制分割し、次チャンクを overlap 秒前から開始する。
+
+    Args:
+        duration: 音声長（秒）
+        silences: detect_silences()の結果
+        max_seconds: チャンク最大長（秒）
+        overlap: 強制分割時のオーバーラップ（秒）
+
+    Returns:
+        [{"index": 0, "start": 秒, "end": 秒, "overlap": 前チャンクとの重複秒数}, ...]
+    """
+    plan = []
+    start = 0.0
+    overlap_before = 0.0
+
+    while start < duration:
+        limit = start + max_seconds
+        if limit >= duration:
+            plan.append({"index": len(plan), "start": start, "end": duration, "overlap": overlap_before})
+            break
+
+        window_start = start + max_seconds * SILENCE_SEARCH_RATIO
+        candidates = [
+            (s_end - s_start, s_start, s_end) for s_start, s_end in silences
+            if window_start <= (s_start + s_end) / 2 <= limit
+        ]
+
+        if candidates:
+            # 最も長い無音（同じ長さなら後ろ）の中央で切る
+            _, s_start, s_end = max(candidates)
+            cut = (s_start + s_end) / 2
+            next_start = cut
+            next_overlap = 0.0
+        else:
+            cut = limit
+            next_start = max(start + 1.0, cut - overlap)
+            next_overlap = cut - next_start
+
+        plan.append({"index": len(plan), "start": start, "end": cut, "overlap": overlap_before})
+        start = next_start
+        overlap_before = next_overlap
+
+    return plan
+
+
+def compute_max_chunk_seconds(duration: float, file_size: int, max_bytes: int,
+                              target_seconds: float = CHUNK_TARGET_SECONDS) -> float:
+    """
+    インライン上限（max_bytes）に収まるチャンク最大長を算出
+
+    Args:
+        duration: 音声長（秒）
+        file_size: ファイルサイズ（バイト）
+        max_bytes: 1チャンクの最大バイト数
+        target_seconds: チャンク長の上限（出力トークン上限対策）
+
+    Returns:
+        float: チャンク最大長（秒）
+    """
+    bytes_per_second = file_size / duration if duration > 0 else 0
+    if bytes_per_second <= 0:
+        return target_seconds
+    size_limited = max_bytes * SIZE_SAFETY_RATIO / bytes_per_second
+    return max(30.0, min(target_seconds, size_limited))
+
+
+def plan_chunks_for_file(file_path, max_bytes: int) -> Optional[List[Dict]]:
+    """
+    音声ファイルのチャンク分割計画を作成
+
+    Args:
+        file_path: 音声ファイルパス
+        max_bytes: 1チャンクの最大バイト数
+
+    Returns:
+        plan_chunks()の結果、音声長が取得できない場合はNone（固定長分割にフォールバック）
+    """
+    duration = probe_duration(file_path)
+    if not duration:
+        return None
+
+    max_seconds = compute_max_chunk_seconds(duration, os.path.getsize(file_path), max_bytes)
+    return plan_windows_for_file(file_path, duration, max_seconds)
+
+
+def plan_windows_for_file(file_path, duration: float, max_seconds: float) -> List[Dict]:
+    """
+    無音位置で区切った max_seconds 以下の区間の計画を作成（ファイルは切り出さない）
+
+    Args:
+        file_path: 音声ファイルパス
+        duration: 音声長（秒）
+        max_seconds: 1区間の最大長（秒）
+
+    Returns:
+        plan_chunks()の結果
+    """
+    try:
+        silences = detect_silences(file_path, duration=duration)
+    except Exception as e:
+        print(f"  ⚠️ Silence detection failed, using fixed-length cuts: {e}")
+        silences = []
+
+    plan = plan_chunks(duration, silences, max_seconds)
+    silence_cuts = sum(1 for c in plan[1:] if c["overlap"] == 0)
+    print(f"  Chunk plan: {len(plan)} chunks (max {max_seconds:.0f}s, "
+          f"{silence_cuts}/{max(0, len(plan) - 1)} cuts at silence, {len(silences)} silences detected)")
+    return plan
+
+
+def cut_chunk(file_path, start: float, end: float, output_path) -> Path:
+    """
+    指定区間を切り出し（再エンコードなし）
+
+    Returns:
+        Path: 出力ファイルパス
+    """
+    cmd = [
+        'ffmpeg',
+        '-loglevel', 'error',
+        '-y',
+        '-ss', f"{start:.3f}",
+        '-i', str(file_path),
+        '-t', f"{end - start:.3f}",
+        '-c', 'copy',
+        str(output_path)
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg failed: {result.stderr}")
+    return Path(output_path)
+
+
+def stream_planned_chunks(file_path, plan: List[Dict], output_dir):
+    """
+    分割計画に従ってチャンクを順に切り出し、切り出し完了ごとにyield
+
+    Args:
+        file_path: 音声ファイルパス
+        plan: plan_chunks()の結果
+        output_dir: チャンク出力ディレクトリ
+
+    Yields:
+        dict: {"index", "start", "end", "overlap", "path"}
+    """
+    file_path = Path(file_path)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(exist_ok=True)
+
+    for chunk in plan:
+        output_path = output_dir / f"chunk_{chunk['index']:03d}{file_path.suffix}"
+        cut_chunk(file_path, chunk["start"], chunk["end"], output_path)
+        yield {**chunk, "path": output_path}
+
+
+def parse_timestamp(timestamp) -> Optional[float]:
+    """
+    "MM:SS" / "HH:MM:SS" / "M:SS.s" 形式のタイムスタンプを秒に変換
+
+    Returns:
+        float or None: 解析できない場合はNone
+    """
+    if timestamp is None:
+        return None
+    parts = str(timestamp).strip().split(':')
+    try:
+        values = [float(p) for p in parts]
+    except ValueError:
+        return None
+    if not 1 <= len(values) <= 3:
+        return None
+
+    seconds = 0.0
+    for value in values:
+        seconds = seconds * 60 + value
+    return seconds
+
+
+def format_timestamp(seconds: float) -> str:
+    """秒を"MM:SS"形式に変換（60分以上は"75:30"のように分を繰り上げない）"""
+    total = max(0, int(round(seconds)))
+    return f"{total // 60:02d}:{total % 60:02d}"
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r'[\s、。,.!?！？「」]', '', text or '')
+
+
+def _is_duplicate_text(a: str, b: str) -> bool:
+    """オーバーラップ区間で同じ発話を二重に文字起こししたか判定"""
+    a, b = _normalize_text(a), _normalize_text(b)
+    if not a or not b:
+        return False
+    if a == b:
+        return True
+    # 相槌など短い発話は部分一致で誤判定しやすいので4文字以上のみ
+    if min(len(a), len(b)) >= 4 and (a in b or b in a):
+        return True
+    return SequenceMatcher(None, a, b).ratio() >= DEDUP_SIMILARITY
+
+
+def merge_chunk_segments(chunk_results: List[Dict]) -> List[List[Dict]]:
+    """
+    チャンクごとのセグメントを絶対時刻に変換し、オーバーラップ区間の重複を除去
+
+    Args:
+        chunk_results: [{"chunk": {"start", "overlap", ...}, "segments": [生セグメント]}, ...]（チャンク順）
+
+    Returns:
+        [[チャンク1のセグメント], [チャンク2のセグメント], ...]（タイムスタンプは録音全体の絶対時刻）
+    """
+    merged = []
+    previous = []  # 直前チャンクの (絶対秒 or None, セグメント)
+
+    for result in chunk_results:
+        chunk = result.get("chunk") or {}
+        offset = chunk.get("start") or 0.0
+        overlap = chunk.get("overlap") or 0.0
+
+        current = []
+        for seg in result.get("segments", []):
+            relative = parse_timestamp(seg.get("timestamp"))
+            absolute = offset + relative if relative is not None else None
+            seg = dict(seg)
+            if absolute is not None:
+                seg["timestamp"] = format_timestamp(absolute)
+            current.append((absolute, seg))
+
+        if overlap > 0 and previous:
+            current = _drop_overlap_duplicates(current, previous, offset, overlap)
+
+        merged.append([seg for _, seg in current])
+        previous = current
+
+    return merged
+
+
+def _drop_overlap_duplicates(current, previous, offset: float, overlap: float, slack: float = 2.0):
+    """
+    チャンク先頭のオーバーラップ区間にあるセグメントのうち、直前チャンク末尾と重複するものを除去
+
+    タイムスタンプが解析できない場合は先頭3セグメントと直前チャンク末尾3セグメントを比較する
+    """
+    overlap_end = offset + overlap + slack
+    tail = [seg for t, seg in previous if t is None or t >= offset - slack] or [seg for _, seg in previous[-3:]]
+
+    result = []
+    for i, (absolute, seg) in enumerate(current):
+        in_overlap = absolute <= overlap_end if absolute is not None else i < 3
+        if in_overlap and any(_is_duplicate_text(seg.get("text", ""), t.get("text", "")) for t in tail):
+            continue
+        result.append((absolute, seg))
+    return result
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+文字起こし前の音声正規化（ffmpeg 1パス）
+
+録音は .qta / .m4a / .mp3 / .wav のまま（ステレオ・44.1kHz・128kbps前後）Geminiに送られており、
+1時間の録音で20MBのインライン上限を超えて分割・アップロードが必要になっていた。
+このモジュールは以下を行う:
+- 1回のffmpeg呼び出しで任意の入力をデコードし、音声認識向けの軽量エンコード
+  （モノラル・16kHz・低ビットレートのOpus/AAC）に変換
+- 変換前後のサイズと削減率を表示
+- すでに正規化済みのファイル（iCloud監視で変換済みの.m4aなど）は再エンコードしない
+
+使い方:
+    from src.transcription import audio_normalization
+
+    normalized = audio_normalization.prepare_for_transcription("downloads/foo.qta")
+    if normalized:
+        send(normalized["path"], normalized["mime_type"])   # 使用後は一時ファイルを削除
+"""
+
+import json
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+# 設定
+NORMALIZE_ENABLED = os.getenv('AUDIO_NORMALIZE', 'true').lower() == 'true'
+NORMALIZE_CODEC = os.getenv('AUDIO_NORMALIZE_CODEC', 'opus').lower()
+NORMALIZE_SAMPLE_RATE = int(os.getenv('AUDIO_NORMALIZE_SAMPLE_RATE', '16000'))
+
+# コーデック別の出力設定（ビットレートは環境変数で上書き可能）
+CODECS = {
+    "opus": {
+        "encoder": "libopus",
+        "bitrate": os.getenv('AUDIO_NORMALIZE_OPUS_BITRATE', '24k'),
+        "suffix": ".ogg",
+        "mime_type": "audio/ogg",
+        "options": ['-application', 'voip'],
+    },
+    "aac": {
+        "encoder": "aac",
+        "bitrate": os.getenv('AUDIO_NORMALIZE_AAC_BITRATE', '32k'),
+        "suffix": ".aac",
+        "mime_type": "audio/aac",
+        "options": [],
+    },
+}
+
+# 正規化済みとみなすビットレートの上限（目標ビットレートに対する倍率、VBRの揺らぎ分）
+BITRATE_TOLERANCE = 1.5
+
+
+def _parse_bitrate(bitrate: str) -> int:
+    """"24k" / "32000" 形式のビットレートをbpsに変換"""
+    bitrate = str(bitrate).strip().lower()
+    if bitrate.endswith('k'):
+        return int(float(bitrate[:-1]) * 1000)
+    return int(float(bitrate))
+
+
+def get_codec(codec: Optional[str] = None) -> Dict:
+    """
+    コーデック設定を取得
+
+    Args:
+        codec: "opus" or "aac"（Noneなら環境変数AUDIO_NORMALIZE_CODEC）
+
+    Raises:
+        ValueError: 未対応のコーデック
+    """
+    codec = (codec or NORMALIZE_CODEC).lower()
+    if codec not in CODECS:
+        raise ValueError(f"Unsupported AUDIO_NORMALIZE_CODEC: {codec} (expected one of {', '.join(CODECS)})")
+    return CODECS[codec]
+
+
+def build_normalize_command(input_path, output_path, codec: Optional[str] = None,
+                            bitrate: Optional[str] = None) -> list:
+    """
+    正規化用のffmpegコマンドを組み立てる（デコード・ダウンミックス・リサンプル・エンコードを1パスで実行）
+
+    出力はbitexactにして同じ入力から同じバイト列を生成する（File APIの再アップロード判定が効くように）。
+    """
+    return [
+        'ffmpeg',
+        '-loglevel', 'error',
+        '-y',
+        '-i', str(input_path),
+        '-vn',  # カバーアート等の映像ストリームを除外
+        '-map_metadata', '-1',
+        *_encode_options(codec, bitrate),
+        str(output_path)
+    ]
+
+
+def _encode_options(codec: Optional[str] = None, bitrate: Optional[str] = None) -> list:
+    """出力側のffmpegオプション（モノラル・リサンプル・エンコーダ・bitexact）"""
+    spec = get_codec(codec)
+    return [
+        '-ac', '1',
+        '-ar', str(NORMALIZE_SAMPLE_RATE),
+        '-c:a', spec["encoder"],
+        '-b:a', bitrate or spec["bitrate"],
+        *spec["options"],
+        '-fflags', '+bitexact',
+        '-flags:a', '+bitexact',
+    ]
+
+
+def normalize_audio(input_path, output_path, codec: Optional[str] = None,
+                    bitrate: Optional[str] = None) -> Dict:
+    """
+    音声をモノラル・16kHz・低ビットレートに変換（ffmpeg 1回）
+
+    Args:
+        input_path: 入力音声ファイルパス（qta / m4a / mp3 / wav など ffmpeg がデコードできる形式）
+        output_path: 出力ファイルパス（コンテナは拡張子で決まる）
+        codec: "opus" or "aac"（Noneなら環境変数AUDIO_NORMALIZE_CODEC）
+        bitrate: ビットレート（例: "24k"、Noneならコーデック別のデフォルト）
+
+    Returns:
+        dict: {"path": Path, "mime_type": str, "input_bytes": int, "output_bytes": int, "ratio": 出力/入力}
+
+    Raises:
+        Exception: ffmpegの変換失敗
+    """
+    spec = get_codec(codec)
+    input_bytes = os.path.getsize(input_path)
+
+    result = subprocess.run(build_normalize_command(input_path, output_path, codec, bitrate),
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg normalization failed: {result.stderr[-500:]}")
+
+    output_bytes = os.path.getsize(output_path)
+    ratio = output_bytes / input_bytes if input_bytes else 1.0
+    print(f"  🎚️ Normalized audio: {input_bytes / 1024 / 1024:.1f}MB → {output_bytes / 1024 / 1024:.1f}MB "
+          f"({(1 - ratio) * 100:.0f}% smaller, mono {NORMALIZE_SAMPLE_RATE // 1000}kHz "
+          f"{bitrate or spec['bitrate']} {spec['encoder']})", flush=True)
+
+    return {
+        "path": Path(output_path),
+        "mime_type": spec["mime_type"],
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "ratio": ratio,
+    }
+
+
+def probe_audio_stream(file_path) -> Optional[Dict]:
+    """
+    ffprobeで先頭の音声ストリーム情報を取得
+
+    Returns:
+        dict or None: {"channels": int, "sample_rate": int, "bit_rate": int or None}、取得失敗時はNone
+    """
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=channels,sample_rate,bit_rate:format=bit_rate',
+        '-of', 'json',
+        str(file_path)
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        info = json.loads(result.stdout)
+        stream = info["streams"][0]
+    except (OSError, ValueError, KeyError, IndexError):
+        return None
+
+    # ストリームにビットレートがないコンテナ（ogg等）はフォーマット全体の値を使う
+    bit_rate = stream.get("bit_rate") or info.get("format", {}).get("bit_rate")
+    try:
+        return {
+            "channels": int(stream.get("channels", 0)),
+            "sample_rate": int(stream.get("sample_rate", 0)),
+            "bit_rate": int(bit_rate) if bit_rate not in (None, "N/A") else None,
+        }
+    except ValueError:
+        return None
+
+
+def is_normalized(file_path) -> bool:
+    """
+    すでに正規化済み（モノラル・16kHz以下・目標ビットレート程度）かどうか判定
+
+    コーデックは問わない（iCloud監視がAACで変換した.m4aも対象）。
+    """
+    stream = probe_audio_stream(file_path)
+    if not stream or stream["channels"] != 1 or not 0 < stream["sample_rate"] <= NORMALIZE_SAMPLE_RATE:
+        return False
+    if stream["bit_rate"] is None:
+        return False
+    target = max(_parse_bitrate(spec["bitrate"]) for spec in CODECS.values())
+    return stream["bit_rate"] <= target * BITRATE_TOLERANCE
+
+
+def prepare_for_transcription(file_path) -> Optional[Dict]:
+    """
+    文字起こし送信用に正規化した一時ファイルを作成
+
+    無効化されている場合・正規化済みの場合・変換に失敗した場合はNoneを返し、
+    呼び出し側は元ファイルをそのまま送信する。
+
+    Args:
+        file_path: 音声ファイルパス
+
+    Returns:
+        normalize_audio()の結果（"path" は呼び出し側が削除する一時ファイル）or None
+    """
+    if not NORMALIZE_ENABLED:
+        return None
+
+    if is_normalized(file_path):
+        print(f"  ✓ Audio already normalized, sending as is")
+        return None
+
+    try:
+        spec = get_codec()
+        fd, temp_path = tempfile.mkstemp(prefix=f"{Path(file_path).stem}_", suffix=spec["suffix"])
+        os.close(fd)
+    except (ValueError, OSError) as e:
+        print(f"  ⚠️ Audio normalization skipped: {e}")
+        return None
+
+    try:
+        return normalize_audio(file_path, temp_path)
+    except Exception as e:
+        Path(temp_path).unlink(missing_ok=True)
+        print(f"  ⚠️ Audio normalization failed, sending original file: {e}")
+        return None
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+文字起こし前の無音カット（VAD）とタイムスタンプの逆変換
+
+ボイスメモには録音しっぱなし・休憩などの長い無音が含まれ、無音もそのまま送信されて
+音声トークンとして課金されていた。このモジュールは以下を行う:
+- ffmpegでモノラル16kHz PCMにデコードしながらブロックごとに読み、NumPyでフレームごとのエネルギー・
+  ゼロ交差率から発話区間を判定（録音全体をメモリに載せない、外部モデル不要、ノイズフロアから閾値を自動決定）
+- SILENCE_TRIM_MIN_SECONDS 以上の無音を前後 SILENCE_TRIM_PADDING 秒だけ残して削除
+  （ffmpegのフィルタで元ファイルから残す区間を切り出し、正規化と同じ設定でエンコード）
+- カット後の時刻 → 元の録音時刻の区分的オフセット表（OffsetMap）を作成し、
+  Geminiが返した"MM:SS"タイムスタンプを元の録音時刻に書き換え
+
+使い方:
+    from src.transcription import silence_trimming
+
+    trimmed = silence_trimming.prepare_trimmed_audio("downloads/foo.m4a")
+    if trimmed:
+        result = transcribe(trimmed["path"], trimmed["mime_type"])   # 使用後は一時ファイルを削除
+        trimmed["offset_map"].remap_segments(result["segments"])
+"""
+
+import bisect
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.transcription import audio_chunking, audio_normalization
+
+# 設定
+TRIM_ENABLED = os.getenv('SILENCE_TRIM', 'true').lower() == 'true'
+# これ以上続く無音を削除（秒）
+TRIM_MIN_SILENCE = float(os.getenv('SILENCE_TRIM_MIN_SECONDS', '3.0'))
+# 削除する無音の前後に残す秒数（語頭・語尾の欠け防止、間があったことをモデルに残す）
+TRIM_PADDING = float(os.getenv('SILENCE_TRIM_PADDING', '0.5'))
+# 削除量が録音長のこの割合未満なら無音カットせず通常の正規化のみ
+TRIM_MIN_SAVING = float(os.getenv('SILENCE_TRIM_MIN_SAVING', '0.05'))
+# ノイズフロアからの閾値マージン（dB）
+VAD_ENERGY_MARGIN_DB = float(os.getenv('VAD_ENERGY_MARGIN_DB', '12'))
+
+VAD_SAMPLE_RATE = 16000
+VAD_FRAME_SECONDS = 0.03
+# 閾値の下限（デジタル無音の録音でわずかな雑音を発話と誤判定しない）
+VAD_MIN_THRESHOLD_DB = -50.0
+# ノイズフロアとみなすエネルギーのパーセンタイル
+VAD_NOISE_PERCENTILE = 10
+# 閾値付近の弱いフレームでも、ゼロ交差率がこれ以上なら摩擦音（サ行など）として発話扱い
+VAD_FRICATIVE_ZCR = 0.3
+# 一度に読み込んで特徴量を計算するフレーム数（デコード結果とfloat変換のメモリを抑える、約10分）
+VAD_BLOCK_FRAMES = 20000
+# 切り出しフィルタのフレーム長（秒）。区間の境界はこの単位で丸められる
+TRIM_FILTER_FRAME_SECONDS = 0.01
+
+
+def iter_pcm_blocks(file_path, block_samples: int, sample_rate: int = VAD_SAMPLE_RATE) -> Iterator[np.ndarray]:
+    """
+    ffmpegでモノラル16bit PCMにデコードし、block_samplesサンプルずつ返す（全体をメモリに載せない）
+
+    Args:
+        file_path: 音声ファイルパス
+        block_samples: 1ブロックのサンプル数
+        sample_rate: デコード後のサンプルレート
+
+    Yields:
+        np.ndarray: int16のサンプル列（最後のブロックは短い場合がある）
+
+    Raises:
+        Exception: ffmpegのデコード失敗
+    """
+    cmd = [
+        'ffmpeg',
+        '-loglevel', 'error',
+        '-i', str(file_path),
+        '-vn',
+        '-ac', '1',
+        '-ar', str(sample_rate),
+        '-f', 's16le',
+        '-'
+    ]
+    # stderrはファイルに逃がす（パイプだと大量のエラー出力でffmpegが止まる）
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+        try:
+            while True:
+                data = process.stdout.read(block_samples * 2)
+                if not data:
+                    break
+                yield np.frombuffer(data[:len(data) - len(data) % 2], dtype='<i2')
+        except BaseException:
+            # 途中で読むのをやめた（例外・ジェネレータの破棄）
+            process.kill()
+            raise
+        finally:
+            process.stdout.close()
+            process.wait()
+
+        if process.returncode != 0:
+            stderr.seek(0)
+            raise Exception(f"ffmpeg decode failed: {stderr.read().decode(errors='replace')[-500:]}")
+
+
+def frame_features(samples: np.ndarray, frame_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    フレームごとのエネルギー（dBFS）とゼロ交差率を計算（末尾の端数フレームは除外）
+
+    Returns:
+        (energy_db, zcr): いずれもフレーム数の長さのnp.ndarray
+    """
+    frame_count = len(samples) // frame_length
+    energy_db = np.empty(frame_count, dtype=np.float32)
+    zcr = np.empty(frame_count, dtype=np.float32)
+
+    for start in range(0, frame_count, VAD_BLOCK_FRAMES):
+        end = min(frame_count, start + VAD_BLOCK_FRAMES)
+        frames = samples[start * frame_length:end * frame_length].reshape(-1, frame_length)
+        frames = frames.astype(np.float32) / 32768.0
+
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        energy_db[start:end] = 20.0 * np.log10(rms + 1e-10)
+
+        signs = np.signbit(frames)
+        zcr[start:end] = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+    return energy_db, zcr
+
+
+def stream_frame_features(blocks: Iterable[np.ndarray],
+                          frame_length: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    サンプル列のブロックから順にフレーム特徴量を計算（ブロック境界をまたぐフレームも連結して計算）
+
+    Args:
+        blocks: iter_pcm_blocks()などのint16サンプル列
+        frame_length: 1フレームのサンプル数
+
+    Returns:
+        (energy_db, zcr, sample_count): frame_features()と同じ特徴量と総サンプル数
+    """
+    energy_parts, zcr_parts = [], []
+    leftover = np.zeros(0, dtype='<i2')
+    sample_count = 0
+
+    for block in blocks:
+        sample_count += len(block)
+        if len(leftover):
+            block = np.concatenate((leftover, block))
+        usable = len(block) - len(block) % frame_length
+        energy_db, zcr = frame_features(block[:usable], frame_length)
+        energy_parts.append(energy_db)
+        zcr_parts.append(zcr)
+        leftover = block[usable:]
+
+    if not energy_parts:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32), 0
+    return np.concatenate(energy_parts), np.concatenate(zcr_parts), sample_count
+
+
+def detect_speech(energy_db: np.ndarray, zcr: np.ndarray,
+                  margin_db: float = VAD_ENERGY_MARGIN_DB) -> Tuple[np.ndarray, float]:
+    """
+    エネルギーとゼロ交差率から発話フレームを判定
+
+    閾値はノイズフロア（エネルギーの下位パーセンタイル）+ margin_db。
+    閾値に届かなくても、その半分のマージンを超えゼロ交差率が高いフレームは摩擦音として発話扱いにする。
+
+    Returns:
+        (mask, threshold_db): 発話フレームのbool配列と使用した閾値
+    """
+    if len(energy_db) == 0:
+        return np.zeros(0, dtype=bool), VAD_MIN_THRESHOLD_DB
+
+    noise_floor = float(np.percentile(energy_db, VAD_NOISE_PERCENTILE))
+    threshold = max(noise_floor + margin_db, VAD_MIN_THRESHOLD_DB)
+    weak_threshold = max(noise_floor + margin_db / 2, VAD_MIN_THRESHOLD_DB)
+
+    voiced = energy_db >= threshold
+    fricative = (energy_db >= weak_threshold) & (zcr >= VAD_FRICATIVE_ZCR)
+    return voiced | fricative, threshold
+
+
+def plan_keep_segments(mask: np.ndarray, frame_seconds: float, duration: float,
+                       min_silence: float = TRIM_MIN_SILENCE,
+                       padding: float = TRIM_PADDING) -> List[Tuple[float, float]]:
+    """
+    発話フレームから残す区間を決定（min_silence 以上の無音を前後 padding 秒残して削除）
+
+    Args:
+        mask: detect_speech()の発話フレーム
+        frame_seconds: 1フレームの秒数
+        duration: 音声長（秒）
+        min_silence: 削除対象とする無音の最短長（秒）
+        padding: 無音の前後に残す秒数
+
+    Returns:
+        [(開始秒, 終了秒), ...]（元の録音時刻、昇順）。発話がない場合は空リスト
+    """
+    if not mask.any():
+        return []
+
+    # 無音フレームの連続区間 [start, end)（フレーム番号）
+    padded = np.concatenate(([True], mask, [True]))
+    changes = np.flatnonzero(padded[1:] != padded[:-1])
+    silent_runs = changes.reshape(-1, 2)
+
+    keep = []
+    cursor = 0.0
+    for start_frame, end_frame in silent_runs:
+        start = float(start_frame) * frame_seconds
+        end = min(duration, float(end_frame) * frame_seconds)
+        if end_frame >= len(mask):
+            end = duration  # 末尾の端数フレームも無音に含める
+        if end - start < min_silence:
+            continue
+
+        cut_start = start + padding if start > 0 else 0.0
+        cut_end = end - padding if end < duration else duration
+        if cut_end - cut_start <= 0:
+            continue
+        if cut_start > cursor:
+            keep.append((cursor, cut_start))
+        cursor = cut_end
+
+    if cursor < duration:
+        keep.append((cursor, duration))
+    return keep
+
+
+def worth_trimming(duration: float, kept_seconds: float, min_silence: float = TRIM_MIN_SILENCE,
+                   min_saving: float = TRIM_MIN_SAVING) -> bool:
+    """
+    無音カットする価値があるか（削除量が min_silence 秒以上かつ録音長の min_saving 割合以上）
+
+    削除量が少ない場合は再エンコードとタイムスタンプ変換の手間に見合わないため、通常の正規化のみ行う。
+    """
+    removed = duration - kept_seconds
+    return kept_seconds > 0 and removed >= max(min_silence, duration * min_saving)
+
+
+def build_trim_filter(keep_segments: List[Tuple[float, float]],
+                      frame_seconds: float = TRIM_FILTER_FRAME_SECONDS) -> str:
+    """
+    残す区間だけを連結するffmpegオーディオフィルタ
+
+    frame_seconds 単位のフレームに分け、中央の時刻が残す区間に入るフレームを選んでタイムスタンプを詰め直す。
+
+    Args:
+        keep_segments: plan_keep_segments()の結果
+        frame_seconds: 選択単位のフレーム長（秒）
+
+    Returns:
+        str: フィルタグラフ（-af 用）
+    """
+    half = frame_seconds / 2
+    spans = "+".join(f"between(t,{start - half:.4f},{end - half:.4f})" for start, end in keep_segments)
+    return (
+        f"aresample={VAD_SAMPLE_RATE},"
+        f"asetnsamples=n={int(round(VAD_SAMPLE_RATE * frame_seconds))}:p=0,"
+        f"aselect='{spans}',"
+        f"asetpts=N/SR/TB"
+    )
+
+
+def build_trim_command(input_path, output_path, keep_segments: List[Tuple[float, float]],
+                       codec: Optional[str] = None, bitrate: Optional[str] = None) -> list:
+    """元ファイルから残す区間を切り出してエンコードするffmpegコマンド（正規化と同じ出力設定）"""
+    return [
+        'ffmpeg',
+        '-loglevel', 'error',
+        '-y',
+        '-i', str(input_path),
+        '-vn',
+        '-map_metadata', '-1',
+        '-af', build_trim_filter(keep_segments),
+        *audio_normalization._encode_options(codec, bitrate),
+        str(output_path)
+    ]
+
+
+def cut_keep_segments(input_path, output_path, keep_segments: List[Tuple[float, float]],
+                      codec: Optional[str] = None, bitrate: Optional[str] = None) -> Dict:
+    """
+    元ファイルから残す区間を切り出して連結・エンコード（ffmpeg 1回、PCMを経由しない）
+
+    Args:
+        input_path: 元の音声ファイルパス
+        output_path: 出力ファイルパス
+        keep_segments: plan_keep_segments()の結果
+
+    Returns:
+        dict: {"path": Path, "mime_type": str, "output_bytes": int}
+
+    Raises:
+        Exception: ffmpegの変換失敗
+    """
+    spec = audio_normalization.get_codec(codec)
+    result = subprocess.run(build_trim_command(input_path, output_path, keep_segments, codec, bitrate),
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg trimming failed: {result.stderr[-500:]}")
+
+    return {
+        "path": Path(output_path),
+        "mime_type": spec["mime_type"],
+        "output_bytes": os.path.getsize(output_path),
+    }
+
+
+class OffsetMap:
+    """無音カット後の時刻 → 元の録音時刻の区分的な対応表"""
+
+    def __init__(self, keep_segments: List[Tuple[float, float]]):
+        """
+        Args:
+            keep_segments: plan_keep_segments()の結果（元の録音時刻）
+        """
+        self.pieces = []  # [(カット後の開始秒, 元の開始秒, 長さ), ...]
+        trimmed = 0.0
+        for start, end in keep_segments:
+            self.pieces.append((trimmed, start, end - start))
+            trimmed += end - start
+        self.kept_seconds = trimmed
+        self._starts = [piece[0] for piece in self.pieces]
+
+    def to_original(self, seconds: float) -> float:
+        """カット後の時刻（秒）を元の録音時刻に変換"""
+        if not self.pieces:
+            return seconds
+        index = max(0, bisect.bisect_right(self._starts, seconds) - 1)
+        trimmed_start, original_start, length = self.pieces[index]
+        return original_start + min(max(0.0, seconds - trimmed_start), length)
+
+    def remap_timestamp(self, timestamp):
+        """"MM:SS"形式のタイムスタンプを元の録音時刻に変換（解析できない値はそのまま返す）"""
+        seconds = audio_chunking.parse_timestamp(timestamp)
+        if seconds is None:
+            return timestamp
+        return audio_chunking.format_timestamp(self.to_original(seconds))
+
+    def remap_segments(self, segments: List[Dict]) -> List[Dict]:
+        """セグメントの"timestamp"を元の録音時刻に書き換え（その場で変更して返す）"""
+        for seg in segments:
+            if "timestamp" in seg:
+                seg["timestamp"] = self.remap_timestamp(seg["timestamp"])
+        return segments
+
+
+def prepare_trimmed_audio(file_path) -> Optional[Dict]:
+    """
+    無音をカットした送信用の一時ファイルを作成
+
+    無効化されている場合・削除できる無音が少ない場合・処理に失敗した場合はNoneを返し、
+    呼び出し側は通常の正規化（audio_normalization）に進む。
+
+    Args:
+        file_path: 音声ファイルパス
+
+    Returns:
+        dict: {"path": 一時ファイル（呼び出し側が削除）, "mime_type", "offset_map": OffsetMap,
+               "original_seconds", "kept_seconds"} or None
+    """
+    if not TRIM_ENABLED:
+        return None
+
+    frame_length = int(VAD_SAMPLE_RATE * VAD_FRAME_SECONDS)
+    try:
+        energy_db, zcr, sample_count = stream_frame_features(
+            iter_pcm_blocks(file_path, frame_length * VAD_BLOCK_FRAMES), frame_length
+        )
+        duration = sample_count / VAD_SAMPLE_RATE
+        mask, threshold = detect_speech(energy_db, zcr)
+        keep = plan_keep_segments(mask, frame_length / VAD_SAMPLE_RATE, duration)
+    except Exception as e:
+        print(f"  ⚠️ Silence detection failed, sending untrimmed audio: {e}")
+        return None
+
+    offset_map = OffsetMap(keep)
+    if not worth_trimming(duration, offset_map.kept_seconds):
+        return None
+    removed = duration - offset_map.kept_seconds
+
+    try:
+        spec = audio_normalization.get_codec()
+        fd, temp_path = tempfile.mkstemp(prefix=f"{Path(file_path).stem}_trimmed_", suffix=spec["suffix"])
+        os.close(fd)
+    except (ValueError, OSError) as e:
+        print(f"  ⚠️ Silence trimming skipped: {e}")
+        return None
+
+    try:
+        encoded = cut_keep_segments(file_path, temp_path, keep)
+    except Exception as e:
+        Path(temp_path).unlink(missing_ok=True)
+        print(f"  ⚠️ Silence trimming failed, sending untrimmed audio: {e}")
+        return None
+
+    input_bytes = os.path.getsize(file_path)
+    print(f"  ✂️ Trimmed silence: {audio_chunking.format_timestamp(duration)} → "
+          f"{audio_chunking.format_timestamp(offset_map.kept_seconds)} "
+          f"({removed / duration * 100:.0f}% removed, {len(keep)} speech spans, threshold {threshold:.0f}dBFS), "
+          f"{input_bytes / 1024 / 1024:.1f}MB → {encoded['output_bytes'] / 1024 / 1024:.1f}MB", flush=True)
+
+    return {
+        **encoded,
+        "offset_map": offset_map,
+        "original_seconds": duration,
+        "kept_seconds": offset_map.kept_seconds,
+    }
@@ -1,47 +1,140 @@
 #!/usr/bin/env python3
 """
 Structured Transcription with Metadata (Phase 7 Stage 7-1)
-使い方: python structured_transcribe.py <音声ファイルパス>
+使い方: python structured_transcribe.py <音声ファイルパス> [--no-cache]
 機能: Gemini Audio API (話者識別付き) + JSON構造化
+      20MB超過の音声は File API に1回アップロードしてハンドルを参照（失敗時はインライン + 分割）
 注意: Word-level/Segment-level timestampsは非対応（Geminiの制約）
+
+プロセス内から呼ぶ場合:
+    config = TranscriptionConfig.from_env()
+    result = transcribe_file("downloads/foo.m4a", config)   # 構造化された結果dict
+（監視プロセスからは src/transcription/transcription_worker.py の常駐ワーカープール経由で呼ぶ）
 """
 
 import os
 import sys
 import json
+import hashlib
 import subprocess
+import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+from src.shared.gemini_client import GeminiModel, get_gemini_client, resolve_api_key
+from src.transcription import audio_chunking, audio_normalization, silence_trimming, transcription_cache
 
 # .envファイルを読み込み
 load_dotenv()
 
-# Gemini API Key選択（デフォルト: 無料枠）
+# Gemini API Tier（デフォルト: 無料枠）
 USE_PAID_TIER = os.getenv("USE_PAID_TIER", "false").lower() == "true"
-if USE_PAID_TIER:
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY_PAID")
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY_PAID not set but USE_PAID_TIER=true")
-    print("ℹ️  Using PAID tier API key")
-else:
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY_FREE")
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY_FREE not set")
-    print("ℹ️  Using FREE tier API key")
+
+
+def get_gemini_api_key(use_paid_tier=None):
+    """
+    Tierに対応するGemini APIキーを取得（呼び出し時に環境変数を参照）
+
+    Args:
+        use_paid_tier: 有料枠を使うか（Noneなら環境変数USE_PAID_TIER）
+
+    Raises:
+        ValueError: APIキーが未設定
+    """
+    return resolve_api_key(use_paid_tier)
 
 # Gemini API inline file size limit (20MB)
 MAX_FILE_SIZE = 20 * 1024 * 1024  # 20MB in bytes
 
+# File API アップロード（auto: 20MB超過時のみ / always: 常に / never: 従来のインライン + 分割のみ）
+# アップロードに失敗した場合はインライン + 分割にフォールバック
+FILE_UPLOAD_MODE = os.getenv("GEMINI_FILE_UPLOAD", "auto").lower()
+# アップロード時の1リクエストあたりの最大区間（出力トークン上限対策、これ以下の録音は1リクエスト）
+UPLOAD_WINDOW_SECONDS = float(os.getenv("TRANSCRIBE_UPLOAD_WINDOW_SECONDS", "3600"))
+
+# 文字起こしモデル
+TRANSCRIPTION_MODEL = "gemini-2.5-flash"
+
+# チャンク並列文字起こし設定（レート制限はsrc.shared.rate_limiterのトークンバケットで制御）
+MAX_CHUNK_WORKERS = int(os.getenv("TRANSCRIBE_MAX_WORKERS", "4"))
+MAX_CHUNK_RETRIES = int(os.getenv("TRANSCRIBE_MAX_RETRIES", "5"))
+
+TRANSCRIPTION_PROMPT = """この音声ファイルを文字起こしし、JSON形式で出力してください。
+
+【出力形式】
+{
+  "segments": [
+    {
+      "speaker": "Speaker 1",
+      "text": "発言内容",
+      "timestamp": "MM:SS"
+    }
+  ]
+}
+
+【要件】
+1. 話者を識別し、Speaker 1, Speaker 2などのラベルを付与
+2. セグメントごとに話者とテキストを記載
+3. タイムスタンプはMM:SS形式で推定
+4. 日本語の文字起こし"""
+
+# File API で長時間録音を区間ごとに文字起こしする場合の追加指示（format: start, end は "MM:SS"）
+UPLOAD_WINDOW_PROMPT = """
+5. この音声の {start} から {end} までの区間のみを文字起こし（区間外の発言は含めない）
+6. タイムスタンプは音声全体の先頭からの時刻（MM:SS、60分以降は "75:30" のように分を繰り上げない）"""
+
+# プロンプト変更時にキャッシュを自動的に無効化するためのバージョン
+TRANSCRIPTION_PROMPT_VERSION = hashlib.sha256(TRANSCRIPTION_PROMPT.encode("utf-8")).hexdigest()[:12]
+
+
+def transcription_cache_version() -> str:
+    """
+    キャッシュキー用のバージョン（プロンプト + 送信音声・分割方法を変える設定）
+
+    無音カット・正規化コーデック・アップロード方式などの設定を変えると
+    モデルに送る音声とタイムスタンプが変わるため、別のキャッシュエントリとして扱う。
+    """
+    codec = audio_normalization.CODECS.get(audio_normalization.NORMALIZE_CODEC, {})
+    settings = {
+        "trim": [silence_trimming.TRIM_ENABLED, silence_trimming.TRIM_MIN_SILENCE, silence_trimming.TRIM_PADDING,
+                 silence_trimming.TRIM_MIN_SAVING, silence_trimming.VAD_ENERGY_MARGIN_DB],
+        "normalize": [audio_normalization.NORMALIZE_ENABLED, audio_normalization.NORMALIZE_CODEC,
+                      codec.get("bitrate"), audio_normalization.NORMALIZE_SAMPLE_RATE],
+        "upload": [FILE_UPLOAD_MODE, UPLOAD_WINDOW_SECONDS],
+        "chunk": [audio_chunking.CHUNK_TARGET_SECONDS, audio_chunking.CHUNK_OVERLAP_SECONDS],
+    }
+    fingerprint = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return f"{TRANSCRIPTION_PROMPT_VERSION}-{fingerprint}"
+
+
+def _chunk_dir(file_path):
+    """チャンク出力ディレクトリ（<stem>_chunks/）"""
+    file_path = Path(file_path)
+    return file_path.parent / f"{file_path.stem}_chunks"
+
+
+def _cleanup_chunk_dir(output_dir):
+    """チャンクファイルとディレクトリを削除"""
+    output_dir = Path(output_dir)
+    if not output_dir.exists():
+        return
+    for chunk in output_dir.glob("chunk_*"):
+        chunk.unlink(missing_ok=True)
+    try:
+        output_dir.rmdir()
+    except OSError:
+        pass
+
 
 def split_audio_file(file_path, chunk_duration=600):
     """
     Split large audio file into chunks using ffmpeg
     """
     file_path = Path(file_path)
-    output_dir = file_path.parent / f"{file_path.stem}_chunks"
+    output_dir = _chunk_dir(file_path)
     output_dir.mkdir(exist_ok=True)
 
     output_pattern = str(output_dir / f"chunk_%03d{file_path.suffix}")
@@ -64,10 +157,300 @@ def split_audio_file(file_path, chunk_duration=600):
     return chunks
 
 
-def transcribe_audio_with_gemini(file_path):
+def stream_audio_chunks(file_path, chunk_duration=600, poll_interval=0.5):
+    """
+    ffmpegで分割しながら、書き込みが完了したチャンクから順にyieldする
+
+    ffmpegのsegment muxerは次のチャンクを開く前に現在のチャンクを閉じるため、
+    chunk_{k+1}が出現した時点でchunk_kは完成している。最後のチャンクはffmpeg終了時に確定する。
+    これによりチャンク1の文字起こしとチャンクNの切り出しが並行する。
+
+    Args:
+        file_path: 音声ファイルパス
+        chunk_duration: チャンク長（秒）
+        poll_interval: 出力ディレクトリの確認間隔（秒）
+
+    Yields:
+        dict: {"index", "start", "end", "overlap", "path"}（startは分割長からの概算）
+    """
+    file_path = Path(file_path)
+    output_dir = _chunk_dir(file_path)
+    _cleanup_chunk_dir(output_dir)  # 前回異常終了時の残骸を削除
+    output_dir.mkdir(exist_ok=True)
+
+    def chunk_path(index):
+        return output_dir / f"chunk_{index:03d}{file_path.suffix}"
+
+    def fixed_chunk(index):
+        return {
+            "index": index,
+            "start": float(index * chunk_duration),
+            "end": None,
+            "overlap": 0.0,
+            "path": chunk_path(index)
+        }
+
+    cmd = [
+        'ffmpeg',
+        '-loglevel', 'error',
+        '-i', str(file_path),
+        '-f', 'segment',
+        '-segment_time', str(chunk_duration),
+        '-c', 'copy',
+        str(output_dir / f"chunk_%03d{file_path.suffix}")
+    ]
+
+    # stderrはパイプ詰まりを避けるため一時ファイルへ
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=stderr_file)
+        next_index = 0
+
+        try:
+            while True:
+                finished = process.poll() is not None
+
+                # 次のチャンクが作られていれば、現在のチャンクは書き込み完了
+                while chunk_path(next_index + 1).exists():
+                    yield fixed_chunk(next_index)
+                    next_index += 1
+
+                if finished:
+                    if process.returncode != 0:
+                        stderr_file.seek(0)
+                        stderr = stderr_file.read().decode("utf-8", errors="replace")
+                        raise Exception(f"ffmpeg failed: {stderr}")
+
+                    if chunk_path(next_index).exists():
+                        yield fixed_chunk(next_index)
+                    return
+
+                time.sleep(poll_interval)
+
+        finally:
+            # 消費側が途中で止めた場合（文字起こしエラー等）はffmpegを停止
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+
+def _generate_with_retry(model, contents, rate_limiter, label="", api_key=None):
+    """
+    レート制限を守りつつgenerate_contentを呼び出す（429は共通クライアントが指数バックオフで再試行）
+
+    Args:
+        model: GeminiModel（共通クライアント経由でgenerate_contentを呼ぶ）
+        contents: generate_contentに渡すコンテンツ
+        rate_limiter: TokenBucketRateLimiter（Noneなら共通クライアントがTierを選択）
+        label: ログ表示用ラベル
+        api_key: APIキー（File API のハンドルを使う場合はアップロードに使ったキー）
+
+    Returns:
+        generate_contentのレスポンス
+    """
+    options = {"api_key": api_key} if api_key else {}
+    # 音声入力は文字起こしキャッシュ側で管理するため応答キャッシュは使わない
+    return model.generate_content(
+        contents,
+        generation_config={
+            "response_mime_type": "application/json"
+        },
+        rate_limiter=rate_limiter,
+        label=label,
+        max_retries=MAX_CHUNK_RETRIES,
+        use_cache=False,
+        **options
+    )
+
+
+def _parse_segments_json(response_text, label=""):
+    """
+    GeminiのJSONレスポンスからセグメントリストを取得（途中で切れたJSONは修復を試みる）
+
+    Args:
+        response_text: レスポンステキスト
+        label: ログ表示用ラベル
+
+    Returns:
+        list: セグメントリスト（生データ）
+
+    Raises:
+        ValueError: JSONの修復に失敗した場合
+    """
+    try:
+        return json.loads(response_text).get("segments", [])
+    except json.JSONDecodeError as e:
+        print(f"\n  Warning: JSON parse error{label}: {e}")
+        print(f"  Attempting to repair truncated JSON...")
+
+    # JSON修復試行: 最後のセグメントが不完全な場合、それを削除して閉じる
+    last_complete = response_text.rfind('},')
+    if last_complete <= 0:
+        raise ValueError("Cannot find valid segment boundary")
+
+    repaired = response_text[:last_complete + 1] + '\n  ]\n}'
+    segments = json.loads(repaired).get("segments", [])
+    print(f"  ✓ JSON repaired successfully{label}. Recovered {len(segments)} segments.")
+    return segments
+
+
+def _build_transcription_result(chunk_segments, text_parts):
+    """
+    チャンク順のセグメントリストから文字起こし結果を組み立てる（IDはチャンク順に1から連番）
+
+    Args:
+        chunk_segments: [[チャンク1のセグメント], [チャンク2のセグメント], ...]
+        text_parts: 全文テキストのパーツ（チャンク順）
+
+    Returns:
+        dict: transcribe_audio_with_geminiの戻り値形式
+    """
+    segments = []
+    speakers_dict = {}
+
+    for raw_segments in chunk_segments:
+        for seg in raw_segments:
+            speaker = seg.get("speaker", "Unknown")
+            segments.append({
+                "id": len(segments) + 1,
+                "speaker": speaker,
+                "text": seg.get("text", ""),
+                "timestamp": seg.get("timestamp", "00:00")
+            })
+
+            # 話者カウント
+            speakers_dict[speaker] = speakers_dict.get(speaker, 0) + 1
+
+    # 話者リスト生成
+    speakers = [
+        {"id": speaker, "segment_count": count}
+        for speaker, count in speakers_dict.items()
+    ]
+
+    return {
+        "text": "\n\n".join(text_parts),
+        "segments": segments,
+        "words": None,  # Geminiは非対応
+        "speakers": speakers
+    }
+
+
+def transcribe_chunk(model, chunk_path, mime_type, rate_limiter, index=1, total=None, delete_after=False):
+    """
+    1チャンクを文字起こし
+
+    Args:
+        model: GeminiModel
+        chunk_path: チャンクファイルパス
+        mime_type: 音声のMIMEタイプ
+        rate_limiter: TokenBucketRateLimiter（Noneなら共通クライアントがTierを選択）
+        index: チャンク番号（1始まり、ログ用）
+        total: 総チャンク数（ログ用、ストリーミング時は不明なのでNone）
+        delete_after: 読み込み後にチャンクファイルを削除する
+
+    Returns:
+        dict: {"segments": [生セグメント], "text": チャンク全文}
+    """
+    label = f" in chunk {index}/{total}" if total else f" in chunk {index}"
+
+    with open(chunk_path, "rb") as audio_file:
+        audio_bytes = audio_file.read()
+
+    if delete_after:
+        Path(chunk_path).unlink(missing_ok=True)
+
+    response = _generate_with_retry(
+        model,
+        [TRANSCRIPTION_PROMPT, {"mime_type": mime_type, "data": audio_bytes}],
+        rate_limiter,
+        label
+    )
+
+    try:
+        segments = _parse_segments_json(response.text, label)
+    except Exception:
+        # 修復失敗時は生テキストを使用
+        return {"segments": [], "text": response.text}
+
+    return {
+        "segments": segments,
+        "text": " ".join([s.get("text", "") for s in segments])
+    }
+
+
+def transcribe_chunks_parallel(model, chunks, mime_type, rate_limiter, max_workers=None, delete_after=False):
+    """
+    チャンクをスレッドプールで並列文字起こし（トークンバケットでRPM/RPDを制御）
+
+    chunksにはリストだけでなくstream_audio_chunks()/stream_planned_chunks()のジェネレータも渡せる。
+    その場合は切り出し完了したチャンクから順に投入されるため、分割と文字起こしが重なる。
+    音声バイト列はワーカー内で読み込むため、メモリ上のチャンクは最大max_workers個。
+
+    Args:
+        model: GeminiModel（スレッド間で共有）
+        chunks: チャンクのイテラブル（順序通り）。ファイルパス、または"path"を持つチャンク情報dict
+        mime_type: 音声のMIMEタイプ
+        rate_limiter: TokenBucketRateLimiter（Noneなら共通クライアントがTierを選択）
+        max_workers: 最大並列数（デフォルト: TRANSCRIBE_MAX_WORKERS）
+        delete_after: 各チャンクを読み込み後に削除する
+
+    Returns:
+        list: チャンク順に並んだtranscribe_chunkの結果（"chunk"にチャンク情報を付与）
+    """
+    total = len(chunks) if hasattr(chunks, "__len__") else None
+    max_workers = max(1, max_workers or MAX_CHUNK_WORKERS)
+    if total:
+        max_workers = min(max_workers, total)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {}
+    completed = 0
+
+    try:
+        chunk_infos = []
+        for i, chunk in enumerate(chunks, 1):
+            if not isinstance(chunk, dict):
+                chunk = {"index": i - 1, "path": Path(chunk)}
+            chunk_infos.append(chunk)
+
+            future = executor.submit(
+                transcribe_chunk, model, chunk["path"], mime_type, rate_limiter, i, total, delete_after
+            )
+            futures[future] = i - 1
+
+            # 失敗したチャンクがあれば分割の完了を待たずに中断
+            for done in [f for f in futures if f.done()]:
+                done.result()
+
+        results = [None] * len(futures)
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = {**future.result(), "chunk": chunk_infos[index]}
+            completed += 1
+            print(f"  Transcribed {completed}/{len(futures)} chunks...", end='\r', flush=True)
+
+    except BaseException:
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+
+    executor.shutdown(wait=True)
+    print()  # 改行
+    return results
+
+
+def transcribe_audio_with_gemini(file_path, model=None, rate_limiter=None, max_workers=None, use_cache=None):
     """
     Gemini Audio APIで音声ファイルを文字起こし（話者識別付き）
 
+    API呼び出し前に文字起こしキャッシュ（音声SHA-256 + モデル + プロンプトバージョン）を参照し、
+    ヒットした場合はAPIを呼ばずにキャッシュ結果を返す。
+
+    Args:
+        file_path: 音声ファイルパス
+        model: GeminiModel（Noneなら gemini-2.5-flash を使用）
+        rate_limiter: TokenBucketRateLimiter（Noneなら共通クライアントが選んだTierの共有リミッター）
+        max_workers: チャンク並列数（20MB超過時のみ使用）
+        use_cache: キャッシュ使用有無（Noneなら環境変数TRANSCRIPTION_CACHEに従う）
+
     戻り値:
         dict: {
             "text": 全文,
@@ -76,284 +459,269 @@ def transcribe_audio_with_gemini(file_path):
             "speakers": [話者リスト]
         }
     """
-    genai.configure(api_key=GEMINI_API_KEY)
-    # Use Gemini 2.5 Flash
-    model = genai.GenerativeModel("gemini-2.5-flash")
+    if use_cache is None:
+        use_cache = transcription_cache.is_cache_enabled()
+
+    cache_key = None
+    if use_cache:
+        model_name = getattr(model, "model_name", TRANSCRIPTION_MODEL) if model is not None else TRANSCRIPTION_MODEL
+        # "models/" 付きで指定された場合もキャッシュキーは同じにする
+        if model_name.startswith("models/"):
+            model_name = model_name[len("models/"):]
+        cache_key = transcription_cache.make_cache_key(
+            transcription_cache.hash_audio_file(file_path),
+            model_name,
+            transcription_cache_version()
+        )
+        cached = transcription_cache.get_cached_result(cache_key)
+        if cached is not None:
+            print(f"  ✓ Transcription cache hit ({len(cached.get('segments', []))} segments), skipping API call")
+            return cached
 
-    file_size = os.path.getsize(file_path)
-    file_path_obj = Path(file_path)
-    mime_type = f"audio/{file_path_obj.suffix[1:]}" if file_path_obj.suffix else "audio/mpeg"
+    result = _transcribe_audio(file_path, model, rate_limiter, max_workers)
 
-    # ファイルサイズチェック（20MB超過の場合は分割）
-    if file_size > MAX_FILE_SIZE:
-        print(f"  File size: {file_size / 1024 / 1024:.1f}MB (exceeds 20MB limit)")
-        print(f"  Splitting into chunks...")
+    # セグメントが取得できた結果のみキャッシュ（JSON修復失敗時のフォールバックは保存しない）
+    if cache_key and result.get("segments"):
+        transcription_cache.put_cached_result(cache_key, result)
 
-        chunks = split_audio_file(file_path)
-        print(f"  Created {len(chunks)} chunks")
+    return result
 
-        # 各チャンクを文字起こし
-        all_segments = []
-        all_speakers = {}
-        full_text_parts = []
-        segment_id_offset = 0
 
-        for i, chunk_path in enumerate(chunks, 1):
-            print(f"  Transcribing chunk {i}/{len(chunks)}...", end='\r')
+def _transcribe_audio(file_path, model=None, rate_limiter=None, max_workers=None):
+    """
+    文字起こし本体（キャッシュなし）。引数・戻り値はtranscribe_audio_with_geminiと同じ
+    """
+    if model is None:
+        model = GeminiModel(TRANSCRIPTION_MODEL)
 
-            # Rate limiting: 2 RPM = 30 seconds per request
-            if i > 1:
-                time.sleep(30)
+    # 長い無音をカットして送信（音声トークン削減）、タイムスタンプは元の録音時刻に書き換える
+    trimmed = silence_trimming.prepare_trimmed_audio(file_path)
+    if trimmed is not None:
+        try:
+            result = _transcribe_prepared(trimmed["path"], trimmed["mime_type"], model, rate_limiter, max_workers)
+        finally:
+            trimmed["path"].unlink(missing_ok=True)
+        trimmed["offset_map"].remap_segments(result["segments"])
+        return result
+
+    # モノラル・16kHz・低ビットレートに正規化してから送信（送信サイズを削減し、多くの録音を20MB以下に収める）
+    normalized = audio_normalization.prepare_for_transcription(file_path)
+    if normalized is None:
+        file_path_obj = Path(file_path)
+        mime_type = f"audio/{file_path_obj.suffix[1:]}" if file_path_obj.suffix else "audio/mpeg"
+        return _transcribe_prepared(file_path, mime_type, model, rate_limiter, max_workers)
 
-            with open(chunk_path, "rb") as audio_file:
-                audio_bytes = audio_file.read()
+    try:
+        return _transcribe_prepared(normalized["path"], normalized["mime_type"], model, rate_limiter, max_workers)
+    finally:
+        normalized["path"].unlink(missing_ok=True)
 
-            prompt = """この音声ファイルを文字起こしし、JSON形式で出力してください。
 
-【出力形式】
-{
-  "segments": [
-    {
-      "speaker": "Speaker 1",
-      "text": "発言内容",
-      "timestamp": "MM:SS"
-    }
-  ]
-}
+def _transcribe_prepared(file_path, mime_type, model, rate_limiter=None, max_workers=None):
+    """
+    送信用ファイル（正規化済みまたは元ファイル）を文字起こし
+
+    Args:
+        file_path: 送信する音声ファイルパス
+        mime_type: 送信時のMIMEタイプ
+        model: GeminiModel
+        rate_limiter: TokenBucketRateLimiter（Noneなら共通クライアントがTierを選択）
+        max_workers: チャンク並列数
+    """
+    file_size = os.path.getsize(file_path)
 
-【要件】
-1. 話者を識別し、Speaker 1, Speaker 2などのラベルを付与
-2. セグメントごとに話者とテキストを記載
-3. タイムスタンプはMM:SS形式で推定
-4. 日本語の文字起こし"""
+    # File API: 1回アップロードしてハンドルを参照（20MB超過でも分割・インライン送信しない）
+    if FILE_UPLOAD_MODE == "always" or (FILE_UPLOAD_MODE == "auto" and file_size > MAX_FILE_SIZE):
+        handle = _upload_for_transcription(file_path, mime_type, model)
+        if handle is not None:
+            return _transcribe_uploaded(file_path, handle, model, rate_limiter, max_workers)
 
-            response = model.generate_content(
-                [prompt, {"mime_type": mime_type, "data": audio_bytes}],
-                generation_config={
-                    "response_mime_type": "application/json"
-                }
-            )
+    # ファイルサイズチェック（20MB超過の場合は分割）
+    if file_size > MAX_FILE_SIZE:
+        print(f"  File size: {file_size / 1024 / 1024:.1f}MB (exceeds 20MB limit)")
+        print(f"  Splitting into chunks (streaming)...")
 
-            # JSONパース
-            try:
-                chunk_data = json.loads(response.text)
-
-                # セグメント追加（ID調整）
-                for seg in chunk_data.get("segments", []):
-                    segment = {
-                        "id": len(all_segments) + 1,
-                        "speaker": seg.get("speaker", "Unknown"),
-                        "text": seg.get("text", ""),
-                        "timestamp": seg.get("timestamp", "00:00")
-                    }
-                    all_segments.append(segment)
-
-                    # 話者カウント
-                    speaker = segment["speaker"]
-                    if speaker not in all_speakers:
-                        all_speakers[speaker] = 0
-                    all_speakers[speaker] += 1
-
-                # テキスト追加
-                full_text_parts.append(" ".join([s.get("text", "") for s in chunk_data.get("segments", [])]))
-
-            except json.JSONDecodeError as e:
-                print(f"\n  Warning: JSON parse error in chunk {i}: {e}")
-                print(f"  Attempting to repair...")
-
-                # JSON修復試行
-                try:
-                    text = response.text
-                    last_complete = text.rfind('},')
-                    if last_complete > 0:
-                        repaired = text[:last_complete + 1] + '\n  ]\n}'
-                        chunk_data = json.loads(repaired)
-
-                        for seg in chunk_data.get("segments", []):
-                            segment = {
-                                "id": len(all_segments) + 1,
-                                "speaker": seg.get("speaker", "Unknown"),
-                                "text": seg.get("text", ""),
-                                "timestamp": seg.get("timestamp", "00:00")
-                            }
-                            all_segments.append(segment)
-
-                            speaker = segment["speaker"]
-                            if speaker not in all_speakers:
-                                all_speakers[speaker] = 0
-                            all_speakers[speaker] += 1
-
-                        full_text_parts.append(" ".join([s.get("text", "") for s in chunk_data.get("segments", [])]))
-                        print(f"  ✓ Chunk {i} JSON repaired successfully.")
-                    else:
-                        raise ValueError("Cannot repair")
-                except Exception:
-                    # 修復失敗時は生テキストを使用
-                    full_text_parts.append(response.text)
-
-        print()  # 改行
-
-        # チャンクを削除
-        for chunk in chunks:
-            chunk.unlink()
-        chunks[0].parent.rmdir()
-
-        # 話者リスト生成
-        speakers = [
-            {"id": speaker, "segment_count": count}
-            for speaker, count in all_speakers.items()
-        ]
+        # 無音位置でのチャンク分割計画（音声長が取れない場合は固定長分割）
+        plan = audio_chunking.plan_chunks_for_file(file_path, MAX_FILE_SIZE)
+        if plan:
+            chunks = audio_chunking.stream_planned_chunks(file_path, plan, _chunk_dir(file_path))
+        else:
+            chunks = stream_audio_chunks(file_path)
 
-        return {
-            "text": "\n\n".join(full_text_parts),
-            "segments": all_segments,
-            "words": None,  # Geminiは非対応
-            "speakers": speakers
-        }
+        # 切り出しと並行して、完成したチャンクから文字起こし
+        try:
+            chunk_results = transcribe_chunks_parallel(
+                model, chunks, mime_type, rate_limiter, max_workers, delete_after=True
+            )
+            print(f"  Transcribed {len(chunk_results)} chunks")
+        finally:
+            # ffmpeg停止とチャンク削除
+            chunks.close()
+            _cleanup_chunk_dir(_chunk_dir(file_path))
+
+        # タイムスタンプを録音全体の絶対時刻に変換し、オーバーラップ区間の重複を除去
+        merged_segments = audio_chunking.merge_chunk_segments(chunk_results)
+
+        return _build_transcription_result(
+            merged_segments,
+            [
+                " ".join([s.get("text", "") for s in segments]) if result["segments"] else result["text"]
+                for segments, result in zip(merged_segments, chunk_results)
+            ]
+        )
 
     else:
         # ファイルサイズが20MB以下の場合は通常処理
         with open(file_path, "rb") as audio_file:
             audio_bytes = audio_file.read()
 
-        prompt = """この音声ファイルを文字起こしし、JSON形式で出力してください。
+        response = _generate_with_retry(
+            model,
+            [TRANSCRIPTION_PROMPT, {"mime_type": mime_type, "data": audio_bytes}],
+            rate_limiter
+        )
+        return _result_from_response(response)
 
-【出力形式】
-{
-  "segments": [
-    {
-      "speaker": "Speaker 1",
-      "text": "発言内容",
-      "timestamp": "MM:SS"
-    }
-  ]
-}
 
-【要件】
-1. 話者を識別し、Speaker 1, Speaker 2などのラベルを付与
-2. セグメントごとに話者とテキストを記載
-3. タイムスタンプはMM:SS形式で推定
-4. 日本語の文字起こし"""
+def _result_from_response(response):
+    """
+    音声全体を1リクエストで文字起こしした応答から結果を組み立てる
 
-        response = model.generate_content(
-            [prompt, {"mime_type": mime_type, "data": audio_bytes}],
-            generation_config={
-                "response_mime_type": "application/json"
-            }
+    Raises:
+        ValueError: 応答がブロックされた
+    """
+    # エラーハンドリング：finish_reasonをチェック
+    if not response.text:
+        print(f"⚠️ Gemini API response error: finish_reason={response.candidates[0].finish_reason}")
+        print(f"Safety ratings: {response.candidates[0].safety_ratings}")
+        raise ValueError(f"Gemini blocked response: finish_reason={response.candidates[0].finish_reason}")
+
+    # JSONパース
+    try:
+        segments = _parse_segments_json(response.text)
+    except Exception as repair_error:
+        print(f"  Warning: JSON repair failed: {repair_error}")
+        print(f"  Response preview: {response.text[:200]}...")
+        # エラー時はフォールバック
+        return {
+            "text": response.text,
+            "segments": [],
+            "words": None,
+            "speakers": []
+        }
+
+    # 全文テキスト生成
+    full_text = " ".join([s.get("text", "") for s in segments])
+    return _build_transcription_result([segments], [full_text])
+
+
+def _upload_for_transcription(file_path, mime_type, model):
+    """
+    File API にアップロード（失敗時はNoneを返し、呼び出し側はインライン + 分割にフォールバック）
+
+    Returns:
+        GeminiFile or None
+    """
+    file_size = os.path.getsize(file_path)
+    try:
+        handle = get_gemini_client().upload_file(
+            str(file_path), mime_type,
+            api_key=getattr(model, "api_key", None),
+            model=getattr(model, "model_name", TRANSCRIPTION_MODEL),
+            label=f" [{Path(file_path).name}]"
         )
+    except Exception as e:
+        print(f"  ⚠️ File API upload failed ({type(e).__name__}: {e}), falling back to inline requests")
+        return None
 
-        # JSONパース
-        try:
-            # エラーハンドリング：finish_reasonをチェック
-            if not response.text:
-                print(f"⚠️ Gemini API response error: finish_reason={response.candidates[0].finish_reason}")
-                print(f"Safety ratings: {response.candidates[0].safety_ratings}")
-                raise ValueError(f"Gemini blocked response: finish_reason={response.candidates[0].finish_reason}")
-
-            data = json.loads(response.text)
-
-            segments = []
-            speakers_dict = {}
-
-            for i, seg in enumerate(data.get("segments", []), 1):
-                speaker = seg.get("speaker", "Unknown")
-                segment = {
-                    "id": i,
-                    "speaker": speaker,
-                    "text": seg.get("text", ""),
-                    "timestamp": seg.get("timestamp", "00:00")
-                }
-                segments.append(segment)
-
-                # 話者カウント
-                if speaker not in speakers_dict:
-                    speakers_dict[speaker] = 0
-                speakers_dict[speaker] += 1
-
-            # 話者リスト生成
-            speakers = [
-                {"id": speaker, "segment_count": count}
-                for speaker, count in speakers_dict.items()
-            ]
+    print(f"  ✓ {'Reusing uploaded file' if handle.reused else 'Uploaded via File API'}: {handle.name} "
+          f"({file_size / 1024 / 1024:.1f}MB)")
+    return handle
 
-            # 全文テキスト生成
-            full_text = " ".join([s.get("text", "") for s in data.get("segments", [])])
 
-            return {
-                "text": full_text,
-                "segments": segments,
-                "words": None,  # Geminiは非対応
-                "speakers": speakers
-            }
+def transcribe_window(model, handle, window, rate_limiter, index=1, total=None):
+    """
+    アップロード済み音声の1区間を文字起こし（音声は再送せずハンドルを参照）
+
+    Args:
+        model: GeminiModel
+        handle: GeminiFile
+        window: plan_chunks()の1要素（"start", "end" 秒）
+        rate_limiter: TokenBucketRateLimiter（Noneなら共通クライアントがTierを選択）
+        index: 区間番号（1始まり、ログ用）
+        total: 総区間数（ログ用）
+
+    Returns:
+        dict: transcribe_chunk() と同じ形式（タイムスタンプは区間先頭からの相対時刻）
+    """
+    label = f" in window {index}/{total}" if total else f" in window {index}"
+    start, end = window["start"], window["end"]
+    prompt = TRANSCRIPTION_PROMPT + UPLOAD_WINDOW_PROMPT.format(
+        start=audio_chunking.format_timestamp(start), end=audio_chunking.format_timestamp(end)
+    )
+
+    response = _generate_with_retry(model, [prompt, handle.as_part()], rate_limiter, label, api_key=handle.api_key)
 
-        except json.JSONDecodeError as e:
-            print(f"  Warning: JSON parse error: {e}")
-            print(f"  Attempting to repair truncated JSON...")
-
-            # JSON修復試行: 最後のセグメントが不完全な場合、それを削除して閉じる
-            try:
-                text = response.text
-                # 最後の完全なセグメントを見つける
-                last_complete = text.rfind('},')
-                if last_complete > 0:
-                    # そこまでを取り、配列とオブジェクトを閉じる
-                    repaired = text[:last_complete + 1] + '\n  ]\n}'
-                    data = json.loads(repaired)
-
-                    segments = []
-                    speakers_dict = {}
-
-                    for i, seg in enumerate(data.get("segments", []), 1):
-                        speaker = seg.get("speaker", "Unknown")
-                        segment = {
-                            "id": i,
-                            "speaker": speaker,
-                            "text": seg.get("text", ""),
-                            "timestamp": seg.get("timestamp", "00:00")
-                        }
-                        segments.append(segment)
-
-                        if speaker not in speakers_dict:
-                            speakers_dict[speaker] = 0
-                        speakers_dict[speaker] += 1
-
-                    speakers = [
-                        {"id": speaker, "segment_count": count}
-                        for speaker, count in speakers_dict.items()
-                    ]
-
-                    full_text = " ".join([s.get("text", "") for s in data.get("segments", [])])
-
-                    print(f"  ✓ JSON repaired successfully. Recovered {len(segments)} segments.")
-
-                    return {
-                        "text": full_text,
-                        "segments": segments,
-                        "words": None,
-                        "speakers": speakers
-                    }
-                else:
-                    raise ValueError("Cannot find valid segment boundary")
-
-            except Exception as repair_error:
-                print(f"  Warning: JSON repair failed: {repair_error}")
-                print(f"  Response preview: {response.text[:200]}...")
-                # エラー時はフォールバック
-                return {
-                    "text": response.text,
-                    "segments": [],
-                    "words": None,
-                    "speakers": []
-                }
-
-
-def summarize_text(text):
+    try:
+        segments = _parse_segments_json(response.text, label)
+    except Exception:
+        return {"segments": [], "text": response.text}
+
+    # 音声全体の時刻で返るため、merge_chunk_segments() 用に区間先頭からの相対時刻に直す
+    # （区間先頭より前の時刻が返った場合は区間相対で返したものとみなす）
+    for seg in segments:
+        seconds = audio_chunking.parse_timestamp(seg.get("timestamp"))
+        if seconds is not None and seconds >= start - 1.0:
+            seg["timestamp"] = audio_chunking.format_timestamp(max(0.0, seconds - start))
+
+    return {
+        "segments": segments,
+        "text": " ".join([s.get("text", "") for s in segments])
+    }
+
+
+def _transcribe_uploaded(file_path, handle, model, rate_limiter=None, max_workers=None):
+    """
+    アップロード済み音声を文字起こし（UPLOAD_WINDOW_SECONDS 以下なら1リクエスト、
+    それより長い録音は無音位置で区切った区間ごとに同じハンドルを参照して並列リクエスト）
+    """
+    duration = audio_chunking.probe_duration(file_path)
+    if not duration or duration <= UPLOAD_WINDOW_SECONDS:
+        response = _generate_with_retry(
+            model, [TRANSCRIPTION_PROMPT, handle.as_part()], rate_limiter, api_key=handle.api_key
+        )
+        return _result_from_response(response)
+
+    windows = audio_chunking.plan_windows_for_file(file_path, duration, UPLOAD_WINDOW_SECONDS)
+    total = len(windows)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers or MAX_CHUNK_WORKERS, total))) as executor:
+        futures = [
+            executor.submit(transcribe_window, model, handle, window, rate_limiter, i, total)
+            for i, window in enumerate(windows, 1)
+        ]
+        window_results = [{**future.result(), "chunk": window} for future, window in zip(futures, windows)]
+    print(f"  Transcribed {total} windows from one upload")
+
+    merged_segments = audio_chunking.merge_chunk_segments(window_results)
+    return _build_transcription_result(
+        merged_segments,
+        [
+            " ".join([s.get("text", "") for s in segments]) if result["segments"] else result["text"]
+            for segments, result in zip(merged_segments, window_results)
+        ]
+    )
+
+
+def summarize_text(text, api_key=None):
     """
     Gemini APIでテキストを要約（詳細ログ付き）
     失敗時はNoneを返す（例外を上げない）
+
+    Args:
+        text: 要約対象テキスト
+        api_key: Gemini APIキー（Noneなら環境変数から取得）
     """
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel("gemini-2.5-flash")
+    model = GeminiModel("gemini-2.5-flash", api_key=api_key)
 
     prompt = f"""以下の文字起こしテキストを要約してください。
 
@@ -504,226 +872,372 @@ def save_json(data, output_path):
     print(f"✅ JSON保存完了: {output_path}")
 
 
-def main():
-    # コマンドライン引数チェック
-    if len(sys.argv) < 2:
-        print("使い方: python structured_transcribe.py <音声ファイルパス>")
-        sys.exit(1)
+class TranscriptionError(Exception):
+    """文字起こし結果が得られなかった"""
 
-    audio_path = sys.argv[1]
 
-    # ファイル存在チェック
-    if not os.path.exists(audio_path):
-        print(f"❌ エラー: ファイルが見つかりません: {audio_path}")
-        sys.exit(1)
+class TranscriptionConfig:
+    """
+    文字起こし〜後続処理（リネーム・カレンダー連携・Docs出力・Phase 11-3・Vector DB）の設定
 
-    try:
-        print(f"🎙️ 構造化文字起こし開始: {audio_path}")
-        print("[1/3] 文字起こし中（Gemini Audio API + 話者識別）...")
+    import時の環境変数ではなく、呼び出し側で明示的に渡す（from_env() で環境変数から生成）。
+    ワーカープロセスに渡せるよう、値はすべてpickle可能な基本型。
+    """
 
-        # 文字起こし実行（Gemini Audio API）
-        transcription_result = transcribe_audio_with_gemini(audio_path)
+    def __init__(self, api_key=None, use_paid_tier=False, model=TRANSCRIPTION_MODEL,
+                 use_cache=True, max_workers=MAX_CHUNK_WORKERS, auto_rename=False,
+                 calendar_integration=False, calendar_id='primary', docs_export=False,
+                 integrated_pipeline=True, vector_db=True):
+        """
+        Args:
+            api_key: Gemini APIキー（Noneなら use_paid_tier に応じて環境変数から取得）
+            use_paid_tier: 有料枠のAPIキーを使うか
+            model: 文字起こしモデル
+            use_cache: 文字起こしキャッシュを使うか
+            max_workers: チャンク並列数（20MB超過時）
+            auto_rename: [Phase 10-1] 内容に基づく自動ファイル名変更
+            calendar_integration: [Phase 11-1] カレンダー予定マッチング + 要約生成
+            calendar_id: カレンダーID
+            docs_export: [Phase 10-4] Google Docs作成
+            integrated_pipeline: [Phase 11-3] 統合パイプライン実行
+            vector_db: [Phase 11-4] Vector DB構築
+        """
+        self.api_key = api_key
+        self.use_paid_tier = use_paid_tier
+        self.model = model
+        self.use_cache = use_cache
+        self.max_workers = max_workers
+        self.auto_rename = auto_rename
+        self.calendar_integration = calendar_integration
+        self.calendar_id = calendar_id
+        self.docs_export = docs_export
+        self.integrated_pipeline = integrated_pipeline
+        self.vector_db = vector_db
+
+    @classmethod
+    def from_env(cls, **overrides):
+        """環境変数（.env）から設定を生成（overridesで個別に上書き）"""
+        def flag(name, default):
+            return os.getenv(name, default).lower() == 'true'
+
+        values = {
+            "use_paid_tier": flag("USE_PAID_TIER", "false"),
+            "use_cache": transcription_cache.is_cache_enabled(),
+            "max_workers": int(os.getenv("TRANSCRIBE_MAX_WORKERS", "4")),
+            "auto_rename": flag('AUTO_RENAME_FILES', 'false'),
+            "calendar_integration": flag('ENABLE_CALENDAR_INTEGRATION', 'false'),
+            "calendar_id": os.getenv('CALENDAR_ID', 'primary'),
+            "docs_export": flag('ENABLE_DOCS_EXPORT', 'false'),
+            "integrated_pipeline": flag('ENABLE_INTEGRATED_PIPELINE', 'true'),
+            "vector_db": flag('ENABLE_VECTOR_DB', 'true'),
+        }
+        values.update(overrides)
+        return cls(**values)
 
-        # セグメントが取得できなかった場合はエラー
-        if not transcription_result.get("segments"):
-            print(f"❌ エラー: 文字起こしに失敗しました（セグメントが空です）", file=sys.stderr)
-            sys.exit(1)
+    def resolve_api_key(self):
+        """
+        APIキー（未指定ならTierに応じて環境変数から取得）
 
-        print("[2/3] 要約生成中...")
+        キー不要のバックエンド、または GEMINI_TIER_MODE=auto（リクエストごとに quota_scheduler が
+        キーを選ぶ）の場合はNone。
+        """
+        if self.api_key:
+            return self.api_key
+        client = get_gemini_client()
+        if not client.backend.requires_api_key or client.scheduler.mode == "auto":
+            return None
+        return get_gemini_api_key(self.use_paid_tier)
 
-        # 要約生成（失敗時はNone）
-        summary = summarize_text(transcription_result["text"])
 
-        if summary is None:
-            print("  ⚠️  要約生成に失敗しましたが、文字起こし結果は保存されます（summary: null）", flush=True)
+def transcribe_file(audio_path, config=None):
+    """
+    音声ファイルを文字起こしして構造化JSONを保存し、有効な後続処理を実行
 
-        print("[3/3] JSON構造化中...")
+    Args:
+        audio_path: 音声ファイルパス
+        config: TranscriptionConfig（Noneなら TranscriptionConfig.from_env()）
 
-        # 構造化JSON生成（summaryがNoneでも問題なし）
-        structured_data = create_structured_json(audio_path, transcription_result, summary)
+    Returns:
+        dict: {
+            "success": True,
+            "audio_path": 音声ファイルパス（リネーム後）,
+            "json_path": 構造化JSONパス（リネーム後）,
+            "enhanced_json_path": str or None（Phase 11-3実行時）,
+            "segment_count": int, "speaker_count": int, "duration_seconds": float or None,
+            "summary_generated": bool, "renamed": bool,
+            "meeting_id": str or None, "vector_db_updated": bool,
+            "elapsed_seconds": float
+        }
 
-        # 出力ファイル名を生成
-        base_path = audio_path.rsplit(".", 1)[0]
-        json_path = base_path + "_structured.json"
+    Raises:
+        TranscriptionError: セグメントが取得できなかった
+        ValueError: APIキー未設定
+    """
+    config = config or TranscriptionConfig.from_env()
+    api_key = config.resolve_api_key()
+    audio_path = str(audio_path)
+    started = time.perf_counter()
+
+    result = {
+        "success": False,
+        "audio_path": audio_path,
+        "json_path": None,
+        "enhanced_json_path": None,
+        "segment_count": 0,
+        "speaker_count": 0,
+        "duration_seconds": None,
+        "summary_generated": False,
+        "renamed": False,
+        "meeting_id": None,
+        "vector_db_updated": False,
+        "elapsed_seconds": 0.0,
+    }
 
-        # JSON保存
-        save_json(structured_data, json_path)
+    print(f"🎙️ 構造化文字起こし開始: {audio_path}")
+    print("[1/3] 文字起こし中（Gemini Audio API + 話者識別）...")
 
-        # 統計情報表示
-        print("\n📊 処理統計:")
-        print(f"  文字数: {structured_data['metadata']['transcription']['char_count']}")
-        print(f"  単語数: {structured_data['metadata']['transcription']['word_count']}")
-        print(f"  セグメント数: {structured_data['metadata']['transcription']['segment_count']}")
+    # 文字起こし実行（Gemini Audio API）
+    transcription_result = transcribe_audio_with_gemini(
+        audio_path,
+        model=GeminiModel(config.model, api_key=api_key),
+        max_workers=config.max_workers,
+        use_cache=config.use_cache
+    )
 
-        # 要約状態表示
-        if structured_data['summary']:
-            print(f"  要約: 生成済み ({len(structured_data['summary'])}文字)")
-        else:
-            print(f"  要約: null（生成失敗）")
+    # セグメントが取得できなかった場合はエラー
+    if not transcription_result.get("segments"):
+        raise TranscriptionError("文字起こしに失敗しました（セグメントが空です）")
 
-        # 話者情報表示
-        if 'speakers' in structured_data and structured_data['speakers']:
-            print(f"  話者数: {len(structured_data['speakers'])}")
-            for speaker in structured_data['speakers']:
-                print(f"    - {speaker['id']}: {speaker['segment_count']}セグメント")
+    print("[2/3] 要約生成中...")
 
-        # Note: Word-level timestampsは非対応（Geminiの制約）
-        if structured_data['words']:
-            print(f"  単語タイムスタンプ数: {len(structured_data['words'])}")
-        else:
-            print(f"  単語タイムスタンプ: 非対応（Gemini API制約）")
-
-        if structured_data['metadata']['file']['duration_seconds']:
-            duration = structured_data['metadata']['file']['duration_seconds']
-            print(f"  音声長: {duration:.1f}秒 ({duration/60:.1f}分)")
-
-        # [Phase 10-1] 自動ファイル名変更（Phase 10-4の前に実行）
-        if os.getenv('AUTO_RENAME_FILES', 'false').lower() == 'true':
-            try:
-                from src.file_management.generate_smart_filename import (
-                    generate_filename_from_transcription,
-                    rename_local_files
-                )
-
-                print("\n📝 最適なファイル名を生成中...")
-                new_name = generate_filename_from_transcription(json_path)
-                print(f"✨ 提案ファイル名: {new_name}")
-
-                # ローカルファイルリネーム
-                rename_map = rename_local_files(audio_path, new_name)
-
-                # パス更新（以降のPhase 10-4で使用するため必須）
-                audio_path = str(rename_map[Path(audio_path)])
-                json_path = str(rename_map[Path(json_path)])
-                print(f"✅ ファイルをリネームしました: {new_name}")
-
-            except Exception as e:
-                print(f"⚠️  自動リネームエラー: {e}")
-                print("  元のファイル名のまま後続処理を続行します")
-
-        # [Phase 10-4] Google Driveアップロード - JSONは不要（Docsのみ）
-        # Note: JSONファイルはGoogle Driveにアップロードしない（Docsで閲覧可能なため）
-        # if os.getenv('ENABLE_DRIVE_UPLOAD', 'false').lower() == 'true':
-        #     try:
-        #         from drive_upload import upload_transcription_results
-        #
-        #         print("\n📤 Google Driveへアップロード中...")
-        #         upload_success = upload_transcription_results(json_path)
-        #
-        #         if not upload_success:
-        #             print("⚠️  Google Driveアップロード失敗（文字起こし結果はローカルに保存済み）")
-        #
-        #     except Exception as e:
-        #         print(f"⚠️  Google Driveアップロードエラー: {e}")
-        #         print("  文字起こし結果はローカルに保存されています")
-
-        # [Phase 11-1] Googleカレンダー連携（予定マッチング + 要約生成統合）
-        if os.getenv('ENABLE_CALENDAR_INTEGRATION', 'false').lower() == 'true':
-            try:
-                from src.shared.calendar_integration import get_file_date, get_events_for_file_date, match_event_with_transcript
-                from src.shared.summary_generator import generate_summary_with_calendar
-
-                print("\n📅 Googleカレンダー連携開始...")
-
-                # Stage 2: 音声ファイル作成日を取得
-                file_date = get_file_date(audio_path)
-
-                # Stage 1: その日の予定を全件取得
-                calendar_id = os.getenv('CALENDAR_ID', 'primary')
-                calendar_events = get_events_for_file_date(file_date, calendar_id)
-
-                # Stage 4: 予定マッチング
-                full_text = "\n".join([seg['text'] for seg in structured_data['segments']])
-                match_result = match_event_with_transcript(full_text, calendar_events)
-
-                # Stage 5: 予定情報を統合した要約生成
-                summary = generate_summary_with_calendar(
-                    structured_data['segments'],
-                    matched_event=match_result['matched_event']
-                )
-
-                # JSONメタデータに追加
-                structured_data['matched_calendar_event'] = {
-                    "event": match_result['matched_event'],
-                    "confidence_score": match_result['confidence_score'],
-                    "reasoning": match_result['reasoning']
-                }
-                structured_data['summary'] = summary
-
-                # JSONファイルを更新
-                with open(json_path, 'w', encoding='utf-8') as f:
-                    json.dump(structured_data, f, ensure_ascii=False, indent=2)
-                print(f"✅ カレンダー連携完了（予定マッチング + 要約生成）")
-
-            except Exception as e:
-                print(f"⚠️  カレンダー連携エラー: {e}")
-                print("  エラーが発生しましたが、後続処理を続行します")
-                import traceback
-                traceback.print_exc()
-
-        # [Phase 10-4 拡張] Google Docs作成（モバイルフレンドリー、リネーム後のファイル名を使用）
-        if os.getenv('ENABLE_DOCS_EXPORT', 'false').lower() == 'true':
-            try:
-                from tools.drive_docs_export import export_json_to_docs
-
-                print("\n📄 Google Docs作成中（モバイル表示用）...")
-                docs_success = export_json_to_docs(json_path)
-
-                if not docs_success:
-                    print("⚠️  Google Docs作成失敗（JSONファイルはアップロード済み）")
-
-            except Exception as e:
-                print(f"⚠️  Google Docs作成エラー: {e}")
-                print("  JSONファイルはアップロードされています")
-
-        # [Phase 11-3] 統合パイプライン自動実行（参加者DB統合・話者推論）
-        enhanced_json_path = None
-        if os.getenv('ENABLE_INTEGRATED_PIPELINE', 'true').lower() == 'true':
-            try:
-                from src.pipeline.integrated_pipeline import run_phase_11_3_pipeline
-
-                print("\n" + "=" * 70)
-                print("🔄 Phase 11-3統合パイプライン自動実行")
-                print("=" * 70)
-
-                pipeline_result = run_phase_11_3_pipeline(json_path)
-
-                if pipeline_result.get('success'):
-                    print(f"✅ 統合パイプライン完了")
-                    print(f"   Meeting ID: {pipeline_result.get('meeting_id')}")
-                    print(f"   参加者: {pipeline_result.get('participant_count', 0)}名")
-
-                    # enhanced JSONパスを保存（Phase 11-4で使用）
-                    enhanced_json_path = json_path.replace('_structured.json', '_structured_enhanced.json')
-                else:
-                    print(f"⚠️  統合パイプライン実行中にエラーが発生しましたが、処理を続行します")
-
-            except Exception as e:
-                print(f"⚠️  統合パイプライン自動実行エラー: {e}")
-                print("  文字起こしは完了しています")
-
-        # [Phase 11-4] Vector DB構築（自動実行）
-        if os.getenv('ENABLE_VECTOR_DB', 'true').lower() == 'true' and enhanced_json_path:
-            try:
-                from src.vector_db.build_unified_vector_index import main as build_vector_db
-
-                print("\n" + "=" * 70)
-                print("🔄 Phase 11-4: Vector DB構築自動実行")
-                print("=" * 70)
-
-                # enhanced JSONファイルが存在する場合のみ実行
-                if os.path.exists(enhanced_json_path):
-                    build_vector_db([enhanced_json_path])
-                    print(f"✅ Vector DB構築完了")
-                else:
-                    print(f"⚠️  Enhanced JSONファイルが見つかりません: {enhanced_json_path}")
-
-            except Exception as e:
-                print(f"⚠️  Vector DB構築エラー: {e}")
-                print("  Phase 11-3までの処理は完了しています")
-
-        print("\n🎉 完了!")
+    # 要約生成（失敗時はNone）
+    summary = summarize_text(transcription_result["text"], api_key=api_key)
+
+    if summary is None:
+        print("  ⚠️  要約生成に失敗しましたが、文字起こし結果は保存されます（summary: null）", flush=True)
+
+    print("[3/3] JSON構造化中...")
+
+    # 構造化JSON生成（summaryがNoneでも問題なし）
+    structured_data = create_structured_json(audio_path, transcription_result, summary)
+
+    # 出力ファイル名を生成
+    base_path = audio_path.rsplit(".", 1)[0]
+    json_path = base_path + "_structured.json"
+
+    # JSON保存
+    save_json(structured_data, json_path)
+    result.update({
+        "json_path": json_path,
+        "segment_count": structured_data['metadata']['transcription']['segment_count'],
+        "speaker_count": len(transcription_result.get("speakers") or []),
+        "duration_seconds": structured_data['metadata']['file']['duration_seconds'],
+        "summary_generated": bool(structured_data['summary']),
+    })
+
+    # 統計情報表示
+    print("\n📊 処理統計:")
+    print(f"  文字数: {structured_data['metadata']['transcription']['char_count']}")
+    print(f"  単語数: {structured_data['metadata']['transcription']['word_count']}")
+    print(f"  セグメント数: {structured_data['metadata']['transcription']['segment_count']}")
+
+    # 要約状態表示
+    if structured_data['summary']:
+        print(f"  要約: 生成済み ({len(structured_data['summary'])}文字)")
+    else:
+        print(f"  要約: null（生成失敗）")
+
+    # 話者情報表示
+    if transcription_result.get('speakers'):
+        print(f"  話者数: {len(transcription_result['speakers'])}")
+        for speaker in transcription_result['speakers']:
+            print(f"    - {speaker['id']}: {speaker['segment_count']}セグメント")
+
+    # Note: Word-level timestampsは非対応（Geminiの制約）
+    if structured_data['words']:
+        print(f"  単語タイムスタンプ数: {len(structured_data['words'])}")
+    else:
+        print(f"  単語タイムスタンプ: 非対応（Gemini API制約）")
+
+    if structured_data['metadata']['file']['duration_seconds']:
+        duration = structured_data['metadata']['file']['duration_seconds']
+        print(f"  音声長: {duration:.1f}秒 ({duration/60:.1f}分)")
+
+    # [Phase 10-1] 自動ファイル名変更（Phase 10-4の前に実行）
+    if config.auto_rename:
+        try:
+            from src.file_management.generate_smart_filename import (
+                generate_filename_from_transcription,
+                rename_local_files
+            )
+
+            print("\n📝 最適なファイル名を生成中...")
+            new_name = generate_filename_from_transcription(json_path)
+            print(f"✨ 提案ファイル名: {new_name}")
+
+            # ローカルファイルリネーム
+            rename_map = rename_local_files(audio_path, new_name)
+
+            # パス更新（以降のPhase 10-4で使用するため必須）
+            audio_path = str(rename_map[Path(audio_path)])
+            json_path = str(rename_map[Path(json_path)])
+            result.update({"audio_path": audio_path, "json_path": json_path, "renamed": True})
+            print(f"✅ ファイルをリネームしました: {new_name}")
+
+        except Exception as e:
+            print(f"⚠️  自動リネームエラー: {e}")
+            print("  元のファイル名のまま後続処理を続行します")
+
+    # [Phase 10-4] Google Driveアップロード - JSONは不要（Docsのみ）
+    # Note: JSONファイルはGoogle Driveにアップロードしない（Docsで閲覧可能なため）
+    # if os.getenv('ENABLE_DRIVE_UPLOAD', 'false').lower() == 'true':
+    #     try:
+    #         from drive_upload import upload_transcription_results
+    #
+    #         print("\n📤 Google Driveへアップロード中...")
+    #         upload_success = upload_transcription_results(json_path)
+    #
+    #         if not upload_success:
+    #             print("⚠️  Google Driveアップロード失敗（文字起こし結果はローカルに保存済み）")
+    #
+    #     except Exception as e:
+    #         print(f"⚠️  Google Driveアップロードエラー: {e}")
+    #         print("  文字起こし結果はローカルに保存されています")
+
+    # [Phase 11-1] Googleカレンダー連携（予定マッチング + 要約生成統合）
+    if config.calendar_integration:
+        try:
+            from src.shared.calendar_integration import get_file_date, get_events_for_file_date, match_event_with_transcript
+            from src.shared.summary_generator import generate_summary_with_calendar
+
+            print("\n📅 Googleカレンダー連携開始...")
+
+            # Stage 2: 音声ファイル作成日を取得
+            file_date = get_file_date(audio_path)
+
+            # Stage 1: その日の予定を全件取得
+            calendar_events = get_events_for_file_date(file_date, config.calendar_id)
+
+            # Stage 4: 予定マッチング
+            full_text = "\n".join([seg['text'] for seg in structured_data['segments']])
+            match_result = match_event_with_transcript(full_text, calendar_events)
 
+            # Stage 5: 予定情報を統合した要約生成
+            summary = generate_summary_with_calendar(
+                structured_data['segments'],
+                matched_event=match_result['matched_event']
+            )
+
+            # JSONメタデータに追加
+            structured_data['matched_calendar_event'] = {
+                "event": match_result['matched_event'],
+                "confidence_score": match_result['confidence_score'],
+                "reasoning": match_result['reasoning']
+            }
+            structured_data['summary'] = summary
+
+            # JSONファイルを更新
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(structured_data, f, ensure_ascii=False, indent=2)
+            print(f"✅ カレンダー連携完了（予定マッチング + 要約生成）")
+
+        except Exception as e:
+            print(f"⚠️  カレンダー連携エラー: {e}")
+            print("  エラーが発生しましたが、後続処理を続行します")
+            import traceback
+            traceback.print_exc()
+
+    # [Phase 10-4 拡張] Google Docs作成（モバイルフレンドリー、リネーム後のファイル名を使用）
+    if config.docs_export:
+        try:
+            from tools.drive_docs_export import export_json_to_docs
+
+            print("\n📄 Google Docs作成中（モバイル表示用）...")
+            docs_success = export_json_to_docs(json_path)
+
+            if not docs_success:
+                print("⚠️  Google Docs作成失敗（JSONファイルはアップロード済み）")
+
+        except Exception as e:
+            print(f"⚠️  Google Docs作成エラー: {e}")
+            print("  JSONファイルはアップロードされています")
+
+    # [Phase 11-3] 統合パイプライン自動実行（参加者DB統合・話者推論）
+    enhanced_json_path = None
+    if config.integrated_pipeline:
+        try:
+            from src.pipeline.integrated_pipeline import run_phase_11_3_pipeline
+
+            print("\n" + "=" * 70)
+            print("🔄 Phase 11-3統合パイプライン自動実行")
+            print("=" * 70)
+
+            pipeline_result = run_phase_11_3_pipeline(json_path)
+
+            if pipeline_result.get('success'):
+                print(f"✅ 統合パイプライン完了")
+                print(f"   Meeting ID: {pipeline_result.get('meeting_id')}")
+                print(f"   参加者: {len(pipeline_result.get('calendar_participants') or [])}名")
+                result["meeting_id"] = pipeline_result.get('meeting_id')
+
+                # enhanced JSONパスを保存（Phase 11-4で使用）
+                enhanced_json_path = json_path.replace('_structured.json', '_structured_enhanced.json')
+                result["enhanced_json_path"] = enhanced_json_path
+            else:
+                print(f"⚠️  統合パイプライン実行中にエラーが発生しましたが、処理を続行します")
+
+        except Exception as e:
+            print(f"⚠️  統合パイプライン自動実行エラー: {e}")
+            print("  文字起こしは完了しています")
+
+    # [Phase 11-4] Vector DB構築（自動実行）
+    if config.vector_db and enhanced_json_path:
+        try:
+            from src.vector_db.build_unified_vector_index import main as build_vector_db
+
+            print("\n" + "=" * 70)
+            print("🔄 Phase 11-4: Vector DB構築自動実行")
+            print("=" * 70)
+
+            # enhanced JSONファイルが存在する場合のみ実行
+            if os.path.exists(enhanced_json_path):
+                build_vector_db([enhanced_json_path])
+                result["vector_db_updated"] = True
+                print(f"✅ Vector DB構築完了")
+            else:
+                print(f"⚠️  Enhanced JSONファイルが見つかりません: {enhanced_json_path}")
+
+        except Exception as e:
+            print(f"⚠️  Vector DB構築エラー: {e}")
+            print("  Phase 11-3までの処理は完了しています")
+
+    result["success"] = True
+    result["elapsed_seconds"] = time.perf_counter() - started
+    print("\n🎉 完了!")
+    return result
+
+
+def main():
+    # コマンドライン引数チェック（--no-cache: 文字起こしキャッシュを使わずAPIを再実行）
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+
+    if not args:
+        print("使い方: python structured_transcribe.py <音声ファイルパス> [--no-cache]")
+        sys.exit(1)
+
+    audio_path = args[0]
+
+    # ファイル存在チェック
+    if not os.path.exists(audio_path):
+        print(f"❌ エラー: ファイルが見つかりません: {audio_path}")
+        sys.exit(1)
+
+    config = TranscriptionConfig.from_env()
+    if "--no-cache" in sys.argv[1:]:
+        config.use_cache = False
+
+    try:
+        transcribe_file(audio_path, config)
     except Exception as e:
         print(f"\n❌ エラー: 処理中に例外が発生しました: {e}", file=sys.stderr)
         import traceback
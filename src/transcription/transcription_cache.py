@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+文字起こし結果キャッシュ（音声ハッシュによるコンテンツアドレス方式）
+
+同じ音声の再処理（クラッシュ後の再実行、Webhook/iCloud両方での検知、
+下流プロンプト調整後の再実行）でGemini Audio APIを再呼び出ししないためのキャッシュ。
+
+- キー: SHA-256(音声バイト列) + モデル名 + プロンプトバージョン
+- 値: transcribe_audio_with_geminiの戻り値（JSON）
+- 保存先: TRANSCRIPTION_CACHE_DIR（デフォルト: .transcription_cache/）
+- 合計サイズがTRANSCRIPTION_CACHE_MAX_MBを超えたら最終アクセスが古い順に削除（LRU）
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+# 設定
+CACHE_DIR = Path(os.getenv('TRANSCRIPTION_CACHE_DIR', '.transcription_cache'))
+CACHE_MAX_BYTES = int(float(os.getenv('TRANSCRIPTION_CACHE_MAX_MB', '200')) * 1024 * 1024)
+HASH_BLOCK_SIZE = 1024 * 1024  # 1MBずつ読み込み
+
+
+def is_cache_enabled() -> bool:
+    """環境変数TRANSCRIPTION_CACHEでキャッシュが無効化されていないか"""
+    return os.getenv('TRANSCRIPTION_CACHE', 'true').lower() == 'true'
+
+
+def hash_audio_file(file_path) -> str:
+    """
+    音声ファイルのSHA-256ハッシュを計算（ストリーミング読み込み）
+
+    Args:
+        file_path: 音声ファイルパス
+
+    Returns:
+        str: 16進ハッシュ文字列
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def make_cache_key(audio_hash: str, model_name: str, prompt_version: str) -> str:
+    """
+    キャッシュキーを生成
+
+    Args:
+        audio_hash: 音声のSHA-256
+        model_name: 文字起こしモデル名
+        prompt_version: プロンプトバージョン
+
+    Returns:
+        str: キャッシュキー（ファイル名として使用可能）
+    """
+    raw = f"{audio_hash}:{model_name}:{prompt_version}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _cache_path(key: str) -> Path:
+    return CACHE_DIR / f"{key}.json"
+
+
+def get_cached_result(key: str) -> Optional[Dict[str, Any]]:
+    """
+    キャッシュから文字起こし結果を取得（ヒット時は最終アクセス時刻を更新）
+
+    Args:
+        key: make_cache_key()で生成したキー
+
+    Returns:
+        dict or None: キャッシュされた文字起こし結果
+    """
+    path = _cache_path(key)
+    if not path.exists():
+        return None
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        # LRU用に最終アクセス時刻を更新
+        os.utime(path, None)
+        return result
+    except Exception as e:
+        print(f"  ⚠️ Transcription cache read error (ignored): {e}")
+        return None
+
+
+def put_cached_result(key: str, result: Dict[str, Any]):
+    """
+    文字起こし結果をキャッシュに保存（一時ファイル経由でアトミックに書き込み）
+
+    Args:
+        key: make_cache_key()で生成したキー
+        result: transcribe_audio_with_geminiの戻り値
+    """
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_path, _cache_path(key))
+        evict_if_needed()
+    except Exception as e:
+        print(f"  ⚠️ Transcription cache write error (ignored): {e}")
+
+
+def evict_if_needed(max_bytes: int = None):
+    """
+    合計サイズが上限を超えていれば、最終アクセスが古いエントリから削除
+
+    Args:
+        max_bytes: サイズ上限（デフォルト: CACHE_MAX_BYTES）
+    """
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not CACHE_DIR.exists():
+        return
+
+    entries = []
+    for path in CACHE_DIR.glob('*.json'):
+        try:
+            stat = path.stat()
+            entries.append((stat.st_mtime, stat.st_size, path))
+        except FileNotFoundError:
+            continue  # 他プロセスが削除済み
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+常駐文字起こしワーカープール
+
+監視プロセス（webhook_server / icloud_monitor）から structured_transcribe をサブプロセスで
+毎回起動する代わりに、起動済みのワーカープロセスへ文字起こしを依頼する。
+ワーカーは起動時に1回だけ dotenv・google SDK・structured_transcribe をインポートし、
+以降のファイルではインタプリタ起動とインポートのコストがかからない。
+
+- 結果は transcribe_file() の構造化dict（stdoutの解析は不要）
+- ワーカーの標準出力は親プロセスにそのまま流れる（メモリにバッファしない）
+- ワーカーが異常終了した場合はプールを作り直して以降の依頼を受け付ける
+
+使い方:
+    pool = get_transcription_pool()
+    result = pool.transcribe("downloads/foo.m4a")   # 失敗時は TranscriptionFailed
+"""
+
+import multiprocessing
+import os
+import threading
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+# 設定
+TRANSCRIBE_POOL_WORKERS = int(os.getenv('TRANSCRIBE_POOL_WORKERS', '1'))
+TRANSCRIBE_TIMEOUT = float(os.getenv('TRANSCRIBE_TIMEOUT', '3600'))  # 秒
+
+
+class TranscriptionFailed(Exception):
+    """ワーカーでの文字起こしが失敗した"""
+
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__(result.get("error") or "transcription failed")
+        self.result = result
+
+
+def _init_worker():
+    """ワーカープロセス起動時に1回だけ実行（重いインポートをここで済ませる）"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    import src.transcription.structured_transcribe  # noqa: F401  google SDKを含む
+
+
+def _run_transcription(audio_path: str, config) -> Dict[str, Any]:
+    """ワーカープロセス内で実行されるタスク（例外も構造化結果として返す）"""
+    from src.transcription.structured_transcribe import TranscriptionConfig, transcribe_file
+
+    try:
+        return transcribe_file(audio_path, config or TranscriptionConfig.from_env())
+    except Exception as e:
+        return {
+            "success": False,
+            "audio_path": audio_path,
+            "error": f"{type(e).__name__}: {e}",
+            "traceback": traceback.format_exc(),
+        }
+
+
+class TranscriptionWorkerPool:
+    """長寿命のワーカープロセスプール"""
+
+    def __init__(self, max_workers: int = TRANSCRIBE_POOL_WORKERS, config=None):
+        """
+        Args:
+            max_workers: ワーカープロセス数（同時に文字起こしできるファイル数）
+            config: デフォルトの TranscriptionConfig（Noneならワーカー内で環境変数から生成）
+        """
+        self.max_workers = max_workers
+        self.config = config
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # fork はスレッド（FastAPI / watchdog / ジョブワーカー）を持つ親では安全でないため spawn
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+            return self._executor
+
+    def _reset(self, broken: ProcessPoolExecutor):
+        """異常終了したプールを破棄（次回の依頼で作り直す）"""
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False)
+
+    def _terminate(self, executor: ProcessPoolExecutor):
+        """応答しないワーカープロセスを強制終了してプールを破棄（同じプールで実行中の他の依頼も失敗する）"""
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            if process.is_alive():
+                process.terminate()
+        self._reset(executor)
+
+    def warm_up(self):
+        """ワーカープロセスを先に起動しておく（最初のファイルの待ち時間を減らす）"""
+        executor = self._get_executor()
+        for _ in range(self.max_workers):
+            executor.submit(int)
+
+    def submit(self, audio_path: str, config=None) -> Future:
+        """
+        文字起こしを依頼（非同期）
+
+        Returns:
+            Future: 結果は transcribe_file() の構造化dict（失敗時は success=False と error）
+        """
+        executor = self._get_executor()
+        try:
+            return executor.submit(_run_transcription, str(audio_path), config or self.config)
+        except BrokenProcessPool:
+            self._reset(executor)
+            return self._get_executor().submit(_run_transcription, str(audio_path), config or self.config)
+
+    def transcribe(self, audio_path: str, config=None, timeout: Optional[float] = TRANSCRIBE_TIMEOUT) -> Dict[str, Any]:
+        """
+        文字起こしを依頼して完了を待つ
+
+        Returns:
+            dict: transcribe_file() の結果
+
+        Raises:
+            TranscriptionFailed: 文字起こし失敗・ワーカー異常終了・timeout 秒以内に完了しなかった
+                                 （タイムアウト時は実行中のワーカーを終了させ、プールを作り直す）
+        """
+        future = self.submit(audio_path, config)
+        executor = self._executor
+        try:
+            result = future.result(timeout=timeout)
+        except BrokenProcessPool as e:
+            if executor is not None:
+                self._reset(executor)
+            raise TranscriptionFailed({"success": False, "audio_path": str(audio_path),
+                                       "error": f"worker process died: {e}"})
+        except FutureTimeoutError:
+            # 待ち行列にあるだけなら取り消す。実行中のタスクは取り消せないためワーカーごと終了する
+            if not future.cancel() and executor is not None:
+                self._terminate(executor)
+            raise TranscriptionFailed({"success": False, "audio_path": str(audio_path),
+                                       "error": f"transcription timed out after {timeout:.0f}s"})
+
+        if not result.get("success"):
+            raise TranscriptionFailed(result)
+        return result
+
+    def shutdown(self, wait: bool = True):
+        """ワーカープロセスを終了"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_pool: Optional[TranscriptionWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_transcription_pool() -> TranscriptionWorkerPool:
+    """プロセス内共有のワーカープールを取得"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TranscriptionWorkerPool()
+        return _pool
@@ -8,8 +8,14 @@ Phase 8-3: Unified Vector Index Builder
 - 統一されたentity_idでベクトル化
 - メタデータにsource_file追加
 - 1クエリで5ファイル横断検索
+- 差分更新（デフォルト）: content_hashが変化したセグメントのみ再ベクトル化してupsert、
+  消えたセグメント・削除されたファイルのセグメントはコレクションから削除（--rebuildで全再構築）
+- 型付きメタデータ（start_seconds/end_seconds、meeting_date、人物・組織・トピックの真偽値フィールド）
+  → 人物・日付・時間範囲の絞り込みをwhere句の完全一致・範囲条件で実行（src/vector_db/metadata_schema.py）
+- ハイブリッド検索用のBM25インデックス（chroma_db/bm25_<collection>.pkl）をコレクションと同期して更新
 """
 
+import hashlib
 import json
 import os
 import sys
@@ -17,23 +23,42 @@ import time
 from pathlib import Path
 from typing import List, Dict, Any
 from dotenv import load_dotenv
-import google.generativeai as genai
 import chromadb
 from chromadb.config import Settings
 
+from src.search.lexical_index import BM25Index, lexical_index_path, load_lexical_index
+from src.shared.embedding_service import EMBEDDING_MODEL, get_embedding_service
+from src.shared.gemini_client import get_gemini_client, resolve_api_key
+from src.shared.rate_limiter import get_tier
+from src.transcription.audio_chunking import parse_timestamp
+from src.vector_db.metadata_schema import (
+    entity_keys,
+    extract_meeting_date,
+    global_topic_key,
+    topic_key,
+)
+from src.vector_db.embedding_executor import EmbeddingExecutor
+
 # 環境変数の読み込み
 load_dotenv()
 
-# Gemini APIキー選択（FREE/PAID tier）
-use_paid_tier = os.getenv("USE_PAID_TIER", "").lower() == "true"
-api_key = os.getenv("GEMINI_API_KEY_PAID") if use_paid_tier else os.getenv("GEMINI_API_KEY_FREE")
+def compute_content_hash(text: str, metadata: Dict[str, Any]) -> str:
+    """
+    セグメントのテキスト・メタデータ・埋め込みモデルからハッシュを計算（差分検知用）
 
-if not api_key:
-    print("❌ Error: GEMINI_API_KEY_FREE or GEMINI_API_KEY_PAID not found in environment variables")
-    sys.exit(1)
+    Args:
+        text: セグメントテキスト
+        metadata: メタデータ（content_hash自身は除外）
 
-genai.configure(api_key=api_key)
-print(f"✅ Using Gemini API: {'PAID' if use_paid_tier else 'FREE'} tier")
+    Returns:
+        str: SHA-256（16進）
+    """
+    payload = {
+        "model": EMBEDDING_MODEL,
+        "text": text,
+        "metadata": {k: v for k, v in metadata.items() if k != 'content_hash'}
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
 
 
 class UnifiedVectorIndexBuilder:
@@ -106,7 +131,16 @@ class UnifiedVectorIndexBuilder:
             # トピックIDからトピック名へのマッピング
             topic_map = {topic['id']: topic['name'] for topic in topics}
 
-            for segment in segments:
+            # 型付きメタデータ（ファイル単位）: 会議日・エンティティの真偽値フィールド
+            meeting_date = extract_meeting_date(file_metadata.get('file', {}), json_file)
+            entity_fields = entity_keys(entities)
+            global_topic_fields = {global_topic_key(t['name']): True for t in topics[:3]}
+
+            # セグメントの開始秒（終了秒 = 次のセグメントの開始秒、最後のセグメントは録音長）
+            start_times = [parse_timestamp(segment.get('timestamp')) for segment in segments]
+            duration = file_metadata.get('file', {}).get('duration_seconds')
+
+            for index, segment in enumerate(segments):
                 text = segment.get('text', '').strip()
                 if not text:
                     continue
@@ -120,6 +154,7 @@ class UnifiedVectorIndexBuilder:
                 metadata = {
                     'segment_id': str(segment_id),
                     'source_file': source_file,
+                    'source_json': str(Path(json_file).resolve()),
                     'speaker': segment.get('speaker', 'Unknown'),
                     'timestamp': segment.get('timestamp', '00:00'),
                 }
@@ -164,6 +199,20 @@ class UnifiedVectorIndexBuilder:
 
                 metadata['organizations'] = ', '.join(org_list[:5])  # 上位5組織
 
+                # 型付きフィールド（whereの完全一致・範囲条件で絞り込み可能）
+                start_seconds = start_times[index]
+                if start_seconds is not None:
+                    end_seconds = next((t for t in start_times[index + 1:] if t is not None and t >= start_seconds),
+                                       duration if duration and duration >= start_seconds else start_seconds)
+                    metadata['start_seconds'] = float(start_seconds)
+                    metadata['end_seconds'] = float(end_seconds)
+                if meeting_date is not None:
+                    metadata['meeting_date'] = meeting_date
+                metadata.update(entity_fields)
+                metadata.update(global_topic_fields)
+                for tid in segment_topics:
+                    metadata[topic_key(topic_map.get(tid, tid))] = True
+
                 all_texts.append(text)
                 all_metadatas.append(metadata)
                 all_ids.append(unique_id)
@@ -172,101 +221,165 @@ class UnifiedVectorIndexBuilder:
 
         return all_texts, all_metadatas, all_ids
 
+    def _get_existing_entries(self, collection, page_size: int = 5000) -> Dict[str, Dict[str, Any]]:
+        """
+        コレクション内の既存ドキュメントのメタデータを取得（ベクトル・本文は取得しない）
+
+        Returns:
+            {id: metadata}
+        """
+        existing = {}
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            page_ids = page.get('ids', [])
+            for doc_id, metadata in zip(page_ids, page.get('metadatas') or []):
+                existing[doc_id] = metadata or {}
+            if len(page_ids) < page_size:
+                break
+            offset += page_size
+        return existing
+
+    def _find_stale_ids(self, existing: Dict[str, Dict[str, Any]], ids: List[str],
+                        metadatas: List[Dict[str, Any]]) -> List[str]:
+        """
+        削除対象IDを抽出
+
+        - 今回投入したファイルに属するが、今回のセグメントに存在しないID（再文字起こし等で消えたセグメント）
+        - 元のJSONファイルが存在しなくなったID（削除されたファイル）
+        """
+        incoming_ids = set(ids)
+        incoming_sources = {m.get('source_json') for m in metadatas}
+
+        stale = []
+        for doc_id, metadata in existing.items():
+            if doc_id in incoming_ids:
+                continue
+            if metadata.get('source_json') in incoming_sources:
+                stale.append(doc_id)
+            elif metadata.get('source_json') and not os.path.exists(metadata['source_json']):
+                stale.append(doc_id)
+        return stale
+
     def build_unified_index(self, texts: List[str], metadatas: List[Dict[str, Any]],
-                           ids: List[str], collection_name: str = "transcripts_unified") -> None:
+                           ids: List[str], collection_name: str = "transcripts_unified",
+                           incremental: bool = True) -> List[str]:
         """
         統合ベクトルインデックスを構築してChromaDBに保存
 
+        incremental=Trueの場合、既存コレクションとcontent_hashを比較し、
+        新規・変更セグメントのみベクトル化してupsertする（変更のないセグメントはAPIを呼ばない）。
+
         Args:
             texts: ベクトル化するテキストのリスト
             metadatas: 各テキストに対応するメタデータのリスト
             ids: 各ドキュメントのユニークID
             collection_name: ChromaDBコレクション名
+            incremental: 差分更新（Falseならコレクションを削除して全再構築）
+
+        Returns:
+            List[str]: ベクトル化に失敗し保存されなかったドキュメントID
         """
-        print(f"\n🔄 Building unified vector index...")
+        print(f"\n🔄 Building unified vector index ({'incremental' if incremental else 'full rebuild'})...")
         print(f"   Collection: {collection_name}")
         print(f"   Total documents: {len(texts)}")
 
-        # 既存のコレクションを削除（クリーンスタート）
-        try:
-            self.client.delete_collection(name=collection_name)
-            print(f"   Deleted existing collection: {collection_name}")
-        except Exception:
-            pass
+        if not incremental:
+            # 既存のコレクションを削除（クリーンスタート）
+            try:
+                self.client.delete_collection(name=collection_name)
+                print(f"   Deleted existing collection: {collection_name}")
+            except Exception:
+                pass
 
-        # 新しいコレクション作成
-        collection = self.client.create_collection(
+        collection = self.client.get_or_create_collection(
             name=collection_name,
             metadata={"description": "Unified transcription segments across all files"}
         )
 
-        # バッチ処理でベクトル化と保存
-        # Gemini batch embedding: 最大100テキスト/リクエスト
-        batch_size = 100
-        total_batches = (len(texts) + batch_size - 1) // batch_size
-
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            batch_metadatas = metadatas[i:i + batch_size]
-            batch_ids = ids[i:i + batch_size]
-
-            print(f"   Batch {i//batch_size + 1}/{total_batches}: Generating embeddings for {len(batch_texts)} docs...")
-
-            # Gemini Embeddings APIでバッチベクトル化
-            try:
-                result = genai.embed_content(
-                    model="models/text-embedding-004",
-                    content=batch_texts,  # リスト全体を渡す
-                    task_type="retrieval_document"
-                )
-
-                # 結果の取得: result['embedding'] = [[[emb1]], [[emb2]], ...] の形式
-                # 最初の次元を取り除く: [[[emb]]] -> [[emb]] -> [emb]
-                embeddings_data = result['embedding']
-                batch_embeddings = [emb[0] if isinstance(emb, list) and isinstance(emb[0], list) else emb
-                                   for emb in embeddings_data]
-
-                print(f"      ✓ Generated {len(batch_embeddings)} embeddings")
-
-            except Exception as e:
-                print(f"\n   ⚠️  Batch embedding failed: {e}")
-                print(f"   Falling back to individual calls...")
-                # フォールバック: 個別にベクトル化
-                batch_embeddings = []
-                for j, text in enumerate(batch_texts, 1):
-                    try:
-                        result = genai.embed_content(
-                            model="models/text-embedding-004",
-                            content=text,
-                            task_type="retrieval_document"
-                        )
-                        batch_embeddings.append(result['embedding'])
-                        if j % 10 == 0:
-                            print(f"      Progress: {j}/{len(batch_texts)}", end='\r')
-                    except Exception as e2:
-                        print(f"\n      Error on doc {j}: {e2}")
-                        batch_embeddings.append([0.0] * 768)
-                print(f"      Progress: {len(batch_texts)}/{len(batch_texts)} ✓")
-
-            # ChromaDBに保存
-            collection.add(
-                documents=batch_texts,
-                embeddings=batch_embeddings,
-                metadatas=batch_metadatas,
-                ids=batch_ids
+        # 差分検知用ハッシュ
+        for text, metadata in zip(texts, metadatas):
+            metadata['content_hash'] = compute_content_hash(text, metadata)
+
+        # BM25インデックス（ChromaDBに保存済みのドキュメントのみ収録）
+        lexical_path = lexical_index_path(self.chroma_path, collection_name)
+        lexical = load_lexical_index(lexical_path) if incremental else BM25Index()
+
+        if incremental:
+            existing = self._get_existing_entries(collection)
+            pending = [
+                i for i, doc_id in enumerate(ids)
+                if existing.get(doc_id, {}).get('content_hash') != metadatas[i]['content_hash']
+            ]
+            stale_ids = self._find_stale_ids(existing, ids, metadatas)
+
+            print(f"   Existing documents: {len(existing)}")
+            print(f"   Unchanged: {len(ids) - len(pending)}, New/changed: {len(pending)}, Stale: {len(stale_ids)}")
+
+            if stale_ids:
+                collection.delete(ids=stale_ids)
+                print(f"   Deleted {len(stale_ids)} stale documents")
+            lexical.remove_many(stale_ids)
+
+            # 変更のないドキュメントをBM25側にも反映（BM25インデックス新規作成時のバックフィル）
+            pending_set = set(pending)
+            for i, doc_id in enumerate(ids):
+                if i not in pending_set:
+                    lexical.upsert(doc_id, texts[i], metadatas[i]['content_hash'])
+        else:
+            pending = list(range(len(ids)))
+
+        if not pending:
+            lexical.save(lexical_path)
+            print(f"✅ Unified vector index is up to date")
+            print(f"   Total documents: {collection.count()}")
+            return []
+
+        # 並列バッチでベクトル化し、完了したバッチから順にChromaDBへ保存（既存IDは上書き）
+        # ベクトル化に失敗したセグメントは保存しない → 次回の差分更新で再度対象になる
+        pending_texts = [texts[j] for j in pending]
+        executor = EmbeddingExecutor()
+        progress = {"done": 0}
+
+        def upsert_batch(indices: List[int], embeddings: List[List[float]]):
+            collection.upsert(
+                documents=[pending_texts[k] for k in indices],
+                embeddings=embeddings,
+                metadatas=[metadatas[pending[k]] for k in indices],
+                ids=[ids[pending[k]] for k in indices]
             )
+            for k in indices:
+                lexical.upsert(ids[pending[k]], pending_texts[k], metadatas[pending[k]]['content_hash'])
+            progress["done"] += len(indices)
+            print(f"   ✅ Upserted {progress['done']}/{len(pending)} docs")
 
-            print(f"   ✅ Batch {i//batch_size + 1}/{total_batches} completed")
-
-            # Rate limit対策（FREE tier: 1500 requests/day = 約1.04 req/min）
-            # 安全のため2秒待機
-            if i + batch_size < len(texts):
-                time.sleep(2)
+        started = time.time()
+        try:
+            _, failures = executor.run(pending_texts, on_result=upsert_batch)
+        finally:
+            # 途中で中断してもChromaDBに保存済みの分はBM25にも残す
+            lexical.save(lexical_path)
+        elapsed = time.time() - started
+
+        stats = executor.stats
+        print(f"   Embedding: {stats['embedded']} embedded, {stats['cached']} from cache, "
+              f"{stats['requests']} requests, {stats['retries']} retries, {stats['splits']} splits "
+              f"({elapsed:.1f}s)")
+
+        if failures:
+            print(f"   ⚠️  {len(failures)} docs failed to embed and were NOT indexed "
+                  f"(they will be retried on the next incremental run):")
+            for failure in failures[:20]:
+                print(f"      - {ids[pending[failure['index']]]}: {failure['error']}")
+            if len(failures) > 20:
+                print(f"      ... and {len(failures) - 20} more")
 
         print(f"✅ Unified vector index built successfully")
-        print(f"   Total documents: {collection.count()}")
+        print(f"   Total documents: {collection.count()} (lexical: {len(lexical)})")
         print(f"   Collection: {collection_name}")
 
+        return [ids[pending[failure['index']]] for failure in failures]
+
     def verify_unified_index(self, collection_name: str = "transcripts_unified") -> None:
         """統合インデックスの検証（サンプルクエリ実行）"""
         print(f"\n🔍 Verifying unified index...")
@@ -277,12 +390,7 @@ class UnifiedVectorIndexBuilder:
         test_query = "起業"
         print(f"   Test query: '{test_query}'")
 
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=test_query,
-            task_type="retrieval_query"
-        )
-        query_embedding = result['embedding']
+        query_embedding = get_embedding_service().embed_query(test_query)
 
         results = collection.query(
             query_embeddings=[query_embedding],
@@ -298,14 +406,35 @@ class UnifiedVectorIndexBuilder:
             print(f"      Topics: {metadata.get('segment_topics', 'N/A')}")
 
 
-def main():
-    """メイン処理"""
-    if len(sys.argv) < 2:
-        print("Usage: python build_unified_vector_index.py <enhanced_json1> <enhanced_json2> ...")
+def main(json_files: List[str] = None, incremental: bool = True):
+    """
+    メイン処理
+
+    Args:
+        json_files: enhanced JSONファイルのリスト（Noneならコマンドライン引数）
+        incremental: 差分更新（コマンドラインでは--rebuildで全再構築）
+
+    Returns:
+        List[str]: 埋め込みに失敗して登録されなかったドキュメントID
+    """
+    if json_files is None:
+        args = sys.argv[1:]
+        incremental = '--rebuild' not in args
+        json_files = [arg for arg in args if not arg.startswith('--')]
+
+    if not json_files:
+        print("Usage: python build_unified_vector_index.py <enhanced_json1> <enhanced_json2> ... [--rebuild]")
         print("Example: python build_unified_vector_index.py downloads/*_enhanced.json")
         sys.exit(1)
 
-    json_files = sys.argv[1:]
+    # Gemini APIキー確認（キー不要のバックエンドでは確認しない）
+    if get_gemini_client().backend.requires_api_key:
+        try:
+            resolve_api_key()
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        print(f"✅ Using Gemini API: {get_tier().upper()} tier")
 
     print("=" * 70)
     print("Phase 8-3: Unified Vector Index Builder")
@@ -318,7 +447,8 @@ def main():
     texts, metadatas, ids = builder.prepare_unified_documents(json_files)
 
     # 統合ベクトルインデックス構築
-    builder.build_unified_index(texts, metadatas, ids, collection_name="transcripts_unified")
+    failed_ids = builder.build_unified_index(texts, metadatas, ids, collection_name="transcripts_unified",
+                                             incremental=incremental)
 
     # 検証
     builder.verify_unified_index(collection_name="transcripts_unified")
@@ -327,9 +457,13 @@ def main():
     print("✅ Unified vector index building completed!")
     print(f"   Total files: {len(json_files)}")
     print(f"   Total documents: {len(texts)}")
+    if failed_ids:
+        print(f"   ⚠️  Not indexed (embedding failed): {len(failed_ids)}")
     print(f"   Collection: transcripts_unified")
     print("=" * 70)
 
+    return failed_ids
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+並列バッチ埋め込み実行器（Vector DB構築用）
+
+使い方:
+    from src.vector_db.embedding_executor import EmbeddingExecutor
+
+    executor = EmbeddingExecutor()
+    vectors, failures = executor.run(texts, on_result=lambda indices, vecs: ...)
+
+機能:
+- 複数バッチを並列にAPIへ送信（共有レートリミッターでRPM/RPDを制御、固定sleepなし）
+- 429 / 5xx は指数バックオフで再試行（429時はリミッターにペナルティを与え全ワーカーを減速）
+- 再試行で回復しないエラーのバッチは二分割して再投入し、不正な入力を1件に絞り込む
+- 分割が発生したらバッチサイズを縮小、成功が続けば元のサイズまで拡大
+- 失敗したテキストにダミーベクトル（ゼロ埋め等）は絶対に割り当てない
+  一時的エラーで失敗した分は最後にもう1パス再試行し、それでも失敗した分は failures として返す
+"""
+
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.shared.embedding_service import API_BATCH_SIZE, get_embedding_service
+from src.shared.rate_limiter import (
+    DailyQuotaExceeded,
+    get_rate_limiter,
+    is_rate_limit_error,
+    is_transient_error,
+)
+
+# 設定
+EMBED_MAX_WORKERS = int(os.getenv('EMBED_MAX_WORKERS', '4'))
+EMBED_MAX_RETRIES = int(os.getenv('EMBED_MAX_RETRIES', '5'))
+EMBED_BACKOFF_BASE = float(os.getenv('EMBED_BACKOFF_BASE', '2.0'))
+EMBED_RETRY_PASSES = int(os.getenv('EMBED_RETRY_PASSES', '1'))
+
+
+class EmbeddingExecutor:
+    """レート制限下で埋め込みバッチを並列実行し、部分失敗を切り分ける"""
+
+    def __init__(self, service=None, rate_limiter=None, task_type: str = "retrieval_document",
+                 max_workers: int = EMBED_MAX_WORKERS, batch_size: int = API_BATCH_SIZE,
+                 max_retries: int = EMBED_MAX_RETRIES, backoff_base: float = EMBED_BACKOFF_BASE,
+                 retry_passes: int = EMBED_RETRY_PASSES, sleep=time.sleep):
+        """
+        Args:
+            service: EmbeddingService（Noneなら共有インスタンス）
+            rate_limiter: レートリミッター（Noneなら埋め込みモデルの共有リミッター）
+            task_type: 埋め込みのtask_type
+            max_workers: 同時に実行するバッチ数
+            batch_size: 1リクエストあたりの最大テキスト数（上限: API_BATCH_SIZE）
+            max_retries: 一時的エラー時の最大再試行回数
+            backoff_base: 指数バックオフの基準秒数（base * 2^attempt）
+            retry_passes: 一時的エラーで失敗した分を最後に再試行するパス数
+            sleep: 待機関数（テスト用に差し替え可能）
+        """
+        self.service = service or get_embedding_service()
+        self.rate_limiter = rate_limiter or get_rate_limiter(self.service.model)
+        self.task_type = task_type
+        self.max_workers = max(1, max_workers)
+        self.max_batch_size = max(1, min(batch_size, API_BATCH_SIZE))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.retry_passes = retry_passes
+        self._sleep = sleep
+
+        self.batch_size = self.max_batch_size
+        self.stats = {"requests": 0, "retries": 0, "splits": 0, "cached": 0, "embedded": 0, "failed": 0}
+
+    def _backoff(self, attempt: int) -> float:
+        """指数バックオフの待機秒数（ジッター付き）"""
+        delay = self.backoff_base * (2 ** attempt)
+        return delay + random.uniform(0, delay * 0.1)
+
+    def _embed_batch(self, batch: List[str]) -> Tuple[str, object]:
+        """
+        1バッチをベクトル化（ワーカースレッドで実行）
+
+        Returns:
+            ("ok", vectors): 成功
+            ("split", error): 一時的でないエラー（呼び出し側で二分割して再投入）
+            ("failed", error): 再試行上限に達した一時的エラー / 日次上限到達
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.rate_limiter.acquire()
+            except DailyQuotaExceeded as e:
+                return "failed", e
+
+            try:
+                self.stats["requests"] += 1
+                return "ok", self.service.embed_texts(batch, task_type=self.task_type)
+            except Exception as e:
+                if not is_transient_error(e):
+                    return "split", e
+                if attempt == self.max_retries:
+                    return "failed", e
+
+                delay = self._backoff(attempt)
+                if is_rate_limit_error(e):
+                    # 他のワーカーも同時に待機させる
+                    self.rate_limiter.penalize(delay)
+                self.stats["retries"] += 1
+                print(f"      ⚠️  Embedding batch ({len(batch)} docs) failed ({e}), "
+                      f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                self._sleep(delay)
+
+        return "failed", RuntimeError("unreachable")
+
+    def _run_pass(self, texts: List[str], on_vectors: Callable[[List[str], List[List[float]]], None]
+                  ) -> Dict[str, Exception]:
+        """
+        ユニークなテキスト群を1パス処理
+
+        Returns:
+            {text: error}: 失敗したテキスト
+        """
+        queue = deque([texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)])
+        failures: Dict[str, Exception] = {}
+        quota_error: Optional[Exception] = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            running = {}
+            while queue or running:
+                # 空いているワーカーに次のバッチを投入（バッチサイズは適応的に変化）
+                while queue and len(running) < self.max_workers and quota_error is None:
+                    batch = queue.popleft()
+                    if len(batch) > self.batch_size:
+                        queue.appendleft(batch[self.batch_size:])
+                        batch = batch[:self.batch_size]
+                    running[pool.submit(self._embed_batch, batch)] = batch
+
+                if quota_error is not None:
+                    # 日次上限到達: 未送信分は全て失敗扱い
+                    while queue:
+                        for text in queue.popleft():
+                            failures[text] = quota_error
+                    if not running:
+                        break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = running.pop(future)
+                    status, payload = future.result()
+
+                    if status == "ok":
+                        self.stats["embedded"] += len(batch)
+                        on_vectors(batch, payload)
+                        self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+                    elif status == "split" and len(batch) > 1:
+                        # 不正な入力を含むバッチ: 二分割して優先的に再投入
+                        self.stats["splits"] += 1
+                        self.batch_size = max(1, self.batch_size // 2)
+                        mid = len(batch) // 2
+                        queue.appendleft(batch[mid:])
+                        queue.appendleft(batch[:mid])
+                    else:
+                        if isinstance(payload, DailyQuotaExceeded):
+                            quota_error = payload
+                        for text in batch:
+                            failures[text] = payload
+
+        return failures
+
+    def run(self, texts: List[str],
+            on_result: Optional[Callable[[List[int], List[List[float]]], None]] = None
+            ) -> Tuple[List[Optional[List[float]]], List[Dict[str, object]]]:
+        """
+        テキストをまとめてベクトル化
+
+        Args:
+            texts: テキストのリスト
+            on_result: バッチ完了ごとに (インデックスのリスト, ベクトルのリスト) で呼ばれるコールバック
+                       （呼び出し元スレッドで実行されるため、ChromaDBへの書き込みをここで行える）
+
+        Returns:
+            vectors: テキストと同順のベクトルリスト（失敗分はNone）
+            failures: [{"index": int, "error": str}, ...]
+        """
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        positions: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            positions.setdefault(text, []).append(i)
+
+        def on_vectors(batch_texts: List[str], batch_vectors: List[List[float]]):
+            indices, out = [], []
+            for text, vector in zip(batch_texts, batch_vectors):
+                for i in positions[text]:
+                    vectors[i] = vector
+                    indices.append(i)
+                    out.append(vector)
+            if on_result and indices:
+                on_result(indices, out)
+
+        # キャッシュ済みの分はAPI・リミッターを通さずに返す
+        cached = self.service.lookup(list(positions), self.task_type)
+        hit_texts = [text for text, vector in zip(positions, cached) if vector is not None]
+        pending = [text for text, vector in zip(positions, cached) if vector is None]
+        if hit_texts:
+            self.stats["cached"] += len(hit_texts)
+            on_vectors(hit_texts, [vector for vector in cached if vector is not None])
+
+        failures = self._run_pass(pending, on_vectors) if pending else {}
+
+        # 一時的エラーで失敗した分は最後にもう一度（バッチサイズを戻して）再試行
+        for _ in range(self.retry_passes):
+            retryable = [text for text, error in failures.items()
+                         if is_transient_error(error) and not isinstance(error, DailyQuotaExceeded)]
+            if not retryable:
+                break
+            print(f"   🔁 Retrying {len(retryable)} failed docs...")
+            self.batch_size = self.max_batch_size
+            retried = self._run_pass(retryable, on_vectors)
+            for text in retryable:
+                failures.pop(text)
+            failures.update(retried)
+
+        report = [{"index": i, "error": str(error)} for text, error in failures.items() for i in positions[text]]
+        report.sort(key=lambda item: item["index"])
+        self.stats["failed"] = len(report)
+        return vectors, report
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+統合ベクトルインデックスの型付きメタデータ定義
+
+ChromaDBのメタデータは str / int / float / bool のみ保持でき、where句は完全一致・数値比較で
+インデックスを使って評価される。カンマ区切り文字列（"田中(person_001), ..."）への部分一致ではなく、
+以下の型付きフィールドに対する完全一致・範囲条件で絞り込めるようにする。
+
+- start_seconds / end_seconds (float): 録音先頭からのセグメント開始・終了秒
+- meeting_date (int): 会議日 YYYYMMDD（例: 20251015）
+- "person:<entity_id>" / "person:<canonical_name>" (bool): 人物エンティティ
+- "org:<entity_id>" / "org:<canonical_name>" (bool): 組織エンティティ
+- "topic:<トピック名>" (bool): セグメントのトピック
+- "global_topic:<トピック名>" (bool): ファイル全体の主要トピック（上位3件）
+
+表示用の people / organizations / segment_topics / global_topics 文字列も従来どおり保持する。
+"""
+
+import re
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+PERSON_PREFIX = "person:"
+ORG_PREFIX = "org:"
+TOPIC_PREFIX = "topic:"
+GLOBAL_TOPIC_PREFIX = "global_topic:"
+
+# ファイル名先頭の日付（generate_smart_filename.py の "20251015_タイトル" 形式）
+_FILENAME_DATE_RE = re.compile(r'^(\d{8})_')
+
+
+def person_key(value: str) -> str:
+    """人物フィルター用のメタデータキー（entity_id または canonical_name）"""
+    return f"{PERSON_PREFIX}{value}"
+
+
+def org_key(value: str) -> str:
+    """組織フィルター用のメタデータキー（entity_id または canonical_name）"""
+    return f"{ORG_PREFIX}{value}"
+
+
+def topic_key(name: str) -> str:
+    """セグメントトピックのメタデータキー"""
+    return f"{TOPIC_PREFIX}{name}"
+
+
+def global_topic_key(name: str) -> str:
+    """ファイル全体トピックのメタデータキー"""
+    return f"{GLOBAL_TOPIC_PREFIX}{name}"
+
+
+def date_to_int(value: Union[str, date, datetime, int, None]) -> Optional[int]:
+    """
+    日付をYYYYMMDD形式の整数に変換
+
+    Args:
+        value: "2025-10-15" / "20251015" / ISO日時文字列 / date / datetime / int
+
+    Returns:
+        int or None: 変換できない場合はNone
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value if 19000101 <= value <= 29991231 else None
+    if isinstance(value, (date, datetime)):
+        return int(value.strftime('%Y%m%d'))
+
+    text = str(value).strip()
+    if re.fullmatch(r'\d{8}', text):
+        return int(text)
+    try:
+        return int(datetime.fromisoformat(text).strftime('%Y%m%d'))
+    except ValueError:
+        return None
+
+
+def extract_meeting_date(file_metadata: Dict[str, Any], json_path: Union[str, Path]) -> Optional[int]:
+    """
+    会議日をYYYYMMDD整数で取得（録音日時 → ファイル名先頭の日付の順）
+
+    Args:
+        file_metadata: 構造化JSONの metadata.file
+        json_path: JSONファイルパス
+
+    Returns:
+        int or None
+    """
+    meeting_date = date_to_int(file_metadata.get('recorded_at'))
+    if meeting_date is not None:
+        return meeting_date
+
+    match = _FILENAME_DATE_RE.match(Path(json_path).name)
+    return date_to_int(match.group(1)) if match else None
+
+
+def entity_keys(entities: Dict[str, Any]) -> Dict[str, bool]:
+    """
+    エンティティ（人物・組織）から真偽値フィールドを生成
+
+    Args:
+        entities: 構造化JSONの entities（{"people": [...], "organizations": [...]}）
+
+    Returns:
+        {"person:person_001": True, "person:田中太郎": True, "org:org_001": True, ...}
+    """
+    fields = {}
+    for kind, make_key in (("people", person_key), ("organizations", org_key)):
+        for entity in entities.get(kind, []):
+            if isinstance(entity, dict):
+                values = [entity.get('entity_id'), entity.get('canonical_name', entity.get('name'))]
+            else:
+                values = [entity]
+            for value in values:
+                if isinstance(value, str) and value.strip():
+                    fields[make_key(value.strip())] = True
+    return fields
+
+
+def build_where(
+    speaker: Optional[str] = None,
+    person: Optional[str] = None,
+    organization: Optional[str] = None,
+    topic: Optional[str] = None,
+    source_file: Optional[str] = None,
+    date_from: Union[str, date, int, None] = None,
+    date_to: Union[str, date, int, None] = None,
+    start_seconds: Optional[float] = None,
+    end_seconds: Optional[float] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    型付きフィールドに対するChromaDBのwhere句を組み立てる
+
+    Args:
+        speaker: 話者名（完全一致）
+        person: 人物のentity_idまたはcanonical_name
+        organization: 組織のentity_idまたはcanonical_name
+        topic: トピック名（セグメントトピック or ファイル全体トピック）
+        source_file: 元の音声ファイル名（完全一致）
+        date_from / date_to: 会議日の範囲（両端含む）
+        start_seconds / end_seconds: 録音内の時間範囲（セグメントが範囲と重なれば該当）
+
+    Returns:
+        dict or None: 条件がなければNone
+    """
+    conditions: List[Dict[str, Any]] = []
+
+    if speaker:
+        conditions.append({"speaker": speaker})
+    if person:
+        conditions.append({person_key(person): True})
+    if organization:
+        conditions.append({org_key(organization): True})
+    if topic:
+        conditions.append({"$or": [{topic_key(topic): True}, {global_topic_key(topic): True}]})
+    if source_file:
+        conditions.append({"source_file": source_file})
+
+    date_from_int = date_to_int(date_from)
+    date_to_int_ = date_to_int(date_to)
+    if date_from_int is not None:
+        conditions.append({"meeting_date": {"$gte": date_from_int}})
+    if date_to_int_ is not None:
+        conditions.append({"meeting_date": {"$lte": date_to_int_}})
+
+    if start_seconds is not None:
+        conditions.append({"end_seconds": {"$gte": float(start_seconds)}})
+    if end_seconds is not None:
+        conditions.append({"start_seconds": {"$lte": float(end_seconds)}})
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
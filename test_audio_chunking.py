@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Table tests for audio chunk planning and chunk segment merging (no ffmpeg needed)
+
+    venv/bin/python3 -m pytest -q test_audio_chunking.py
+    venv/bin/python3 test_audio_chunking.py
+"""
+
+from src.transcription import audio_chunking
+from src.transcription.audio_chunking import (
+    _drop_overlap_duplicates, format_timestamp, merge_chunk_segments, parse_timestamp, plan_chunks
+)
+
+
+def _spans(plan):
+    return [(c["start"], c["end"], c["overlap"]) for c in plan]
+
+
+def test_plan_chunks():
+    cases = [
+        # (説明, duration, silences, max_seconds, 期待する (start, end, overlap))
+        ("longest silence inside [0.75·max, max], then forced cut",
+         100.0, [(28.0, 29.0), (32.0, 36.0), (39.5, 40.5)], 40.0,
+         [(0.0, 34.0, 0.0), (34.0, 74.0, 0.0), (71.0, 100.0, 3.0)]),
+        ("no silence: forced cuts with overlap",
+         90.0, [], 30.0,
+         [(0.0, 30.0, 0.0), (27.0, 57.0, 3.0), (54.0, 84.0, 3.0), (81.0, 90.0, 3.0)]),
+        ("silence before the search window is ignored",
+         50.0, [(10.0, 20.0)], 40.0,
+         [(0.0, 40.0, 0.0), (37.0, 50.0, 3.0)]),
+        ("equal-length silences: the later one wins",
+         100.0, [(31.0, 32.0), (37.0, 38.0)], 40.0,
+         [(0.0, 37.5, 0.0), (37.5, 77.5, 0.0), (74.5, 100.0, 3.0)]),
+        ("shorter than max: single chunk",
+         20.0, [(5.0, 8.0)], 40.0,
+         [(0.0, 20.0, 0.0)]),
+    ]
+    for name, duration, silences, max_seconds, expected in cases:
+        plan = plan_chunks(duration, silences, max_seconds, overlap=3.0)
+        assert _spans(plan) == expected, name
+        assert [c["index"] for c in plan] == list(range(len(plan))), name
+        assert all(c["end"] - c["start"] <= max_seconds for c in plan), name
+
+
+def test_parse_and_format_timestamp():
+    parse_cases = [
+        ("01:30", 90.0),
+        ("1:02:03", 3723.0),
+        ("0:05.5", 5.5),
+        (" 75:30 ", 4530.0),
+        ("42", 42.0),
+        ("abc", None),
+        ("約5分", None),
+        ("", None),
+        ("1:2:3:4", None),
+        (None, None),
+    ]
+    for timestamp, expected in parse_cases:
+        assert parse_timestamp(timestamp) == expected, timestamp
+
+    format_cases = [(0, "00:00"), (59.6, "01:00"), (4530, "75:30"), (-3, "00:00")]
+    for seconds, expected in format_cases:
+        assert format_timestamp(seconds) == expected, seconds
+
+
+def test_merge_chunk_segments_drops_overlap_duplicates():
+    chunk_results = [
+        {"chunk": {"start": 0.0, "overlap": 0.0}, "segments": [
+            {"speaker": "Speaker 1", "text": "それでは始めます", "timestamp": "00:10"},
+            {"speaker": "Speaker 2", "text": "今日はよろしくお願いします", "timestamp": "00:55"},
+        ]},
+        {"chunk": {"start": 57.0, "overlap": 3.0}, "segments": [
+            {"speaker": "Speaker 2", "text": "今日は、よろしくお願いします。", "timestamp": "00:00"},
+            {"speaker": "Speaker 1", "text": "はい", "timestamp": "00:02"},
+            {"speaker": "Speaker 2", "text": "今日はよろしくお願いします", "timestamp": "00:40"},
+            {"speaker": "Speaker 1", "text": "時刻なし", "timestamp": "不明"},
+        ]},
+    ]
+    merged = merge_chunk_segments(chunk_results)
+
+    assert [s["timestamp"] for s in merged[0]] == ["00:10", "00:55"]
+    # オーバーラップ内の重複のみ除去（区間外の同じ発言と相槌は残す）、解析できない時刻はそのまま
+    assert [(s["text"], s["timestamp"]) for s in merged[1]] == [
+        ("はい", "00:59"),
+        ("今日はよろしくお願いします", "01:37"),
+        ("時刻なし", "不明"),
+    ]
+    # 入力のセグメントは変更しない
+    assert chunk_results[1]["segments"][0]["timestamp"] == "00:00"
+
+
+def test_drop_overlap_duplicates_without_timestamps():
+    previous = [(None, {"text": "最初の発言です"}), (None, {"text": "前のチャンクの最後の発言"})]
+    current = [
+        (None, {"text": "前のチャンクの最後の発言"}),
+        (None, {"text": "新しい発言"}),
+        (None, {"text": "うん"}),
+        (None, {"text": "前のチャンクの最後の発言"}),  # 先頭3件より後ろは比較しない
+    ]
+    kept = _drop_overlap_duplicates(current, previous, offset=57.0, overlap=3.0)
+    assert [seg["text"] for _, seg in kept] == ["新しい発言", "うん", "前のチャンクの最後の発言"]
+
+
+def test_duplicate_text_rules():
+    cases = [
+        ("今日はよろしくお願いします", "今日は、よろしくお願いします。", True),
+        ("はい", "はい、", True),
+        ("はい", "はいはい", False),  # 4文字未満は部分一致しない
+        ("会議を始めましょう", "では会議を始めましょう", True),
+        ("予算の話", "天気の話題", False),
+        ("", "", False),
+    ]
+    for a, b, expected in cases:
+        assert audio_chunking._is_duplicate_text(a, b) is expected, (a, b)
+
+
+def main():
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"  ✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"  ✗ {test.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the shared Gemini client (FakeBackend, no API calls)
+
+Covers FakeBackend error injection, _call_with_retry backoff and the SQLite response cache.
+
+    venv/bin/python3 -m pytest -q test_gemini_client.py
+    venv/bin/python3 test_gemini_client.py
+"""
+
+import os
+import tempfile
+
+# 共有リミッターは初回利用時に環境変数から作られるため、インポート前に設定する
+os.environ["GEMINI_BACKEND"] = "fake"
+os.environ["GEMINI_TIER_MODE"] = "static"
+os.environ["USE_PAID_TIER"] = "false"
+os.environ["GEMINI_FREE_RPM"] = "6000"
+os.environ["GEMINI_FREE_RPD"] = "100000"
+
+from src.shared.gemini_client import FakeAPIError, FakeBackend, GeminiClient
+from src.shared.quota_scheduler import QuotaScheduler, UsageLedger
+from src.shared.rate_limiter import is_rate_limit_error, is_transient_error
+
+MODEL = "gemini-2.5-flash"
+
+
+class SleepRecorder:
+    """GeminiClient の sleep 差し替え（待機せずに秒数を記録）"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, seconds):
+        self.calls.append(seconds)
+
+
+def make_client(backend, cache_db=None, backoff_base=0.01, backoff_max=0.05, sleep=None):
+    scheduler = QuotaScheduler(mode="static", ledger=UsageLedger(None))
+    return GeminiClient(backend=backend, cache_db=cache_db, use_cache=cache_db is not None,
+                        backoff_base=backoff_base, backoff_max=backoff_max,
+                        scheduler=scheduler, sleep=sleep or SleepRecorder())
+
+
+def test_fake_backend_error_injection():
+    backend = FakeBackend(errors=[
+        {"match": "hello", "status": 429, "times": 2},
+        {"match": "server", "status": 503, "kind": "generate"},
+        {"match": "bad", "status": 400, "times": 1},
+    ])
+
+    for _ in range(2):
+        try:
+            backend.generate(MODEL, "hello", None, None)
+            raise AssertionError("expected 429")
+        except FakeAPIError as e:
+            assert e.code == 429 and is_rate_limit_error(e)
+    assert backend.response_text(backend.generate(MODEL, "hello", None, None))
+
+    try:
+        backend.generate(MODEL, "server", None, None)
+        raise AssertionError("expected 503")
+    except FakeAPIError as e:
+        assert is_transient_error(e) and not is_rate_limit_error(e)
+
+    try:
+        backend.embed("text-embedding-004", ["bad input"], "retrieval_document", None)
+        raise AssertionError("expected 400")
+    except FakeAPIError as e:
+        assert not is_transient_error(e)
+
+    assert [e["status"] for e in backend.injected] == [429, 429, 503, 400]
+
+
+def test_call_with_retry_backoff():
+    backend = FakeBackend(errors=[
+        {"match": "flaky", "status": 503, "times": 3},
+        {"match": "always", "status": 500},
+        {"match": "invalid", "status": 400},
+    ])
+    sleep = SleepRecorder()
+    client = make_client(backend, backoff_base=1.0, backoff_max=3.0, sleep=sleep)
+
+    response = client.generate("flaky prompt", MODEL, max_retries=5)
+    assert response.attempts == 4
+    # 指数バックオフ（1, 2, 4→上限3）に±20%のジッター
+    for waited, expected in zip(sleep.calls, [1.0, 2.0, 3.0]):
+        assert expected * 0.8 <= waited <= expected * 1.2
+    assert len(sleep.calls) == 3
+
+    calls_before = len(backend.calls)
+    try:
+        client.generate("always failing", MODEL, max_retries=2)
+        raise AssertionError("expected 500 after retries")
+    except FakeAPIError as e:
+        assert e.code == 500
+    assert len(backend.calls) - calls_before == 3
+
+    calls_before = len(backend.calls)
+    try:
+        client.generate("invalid request", MODEL, max_retries=5)
+        raise AssertionError("expected 400")
+    except FakeAPIError as e:
+        assert e.code == 400
+    assert len(backend.calls) - calls_before == 1  # 再試行対象外
+    assert client.get_metrics()["models"][MODEL]["errors"] == 2
+
+
+def test_response_cache():
+    backend = FakeBackend(rules=[{"match": "summarize", "response": "cached summary"}])
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_db = os.path.join(tmp, "gemini_cache.db")
+        client = make_client(backend, cache_db=cache_db)
+
+        first = client.generate("summarize this", MODEL)
+        second = client.generate("summarize this", MODEL)
+        assert first.text == second.text == "cached summary"
+        assert not first.cached and second.cached
+        assert len(backend.calls) == 1
+
+        # 別インスタンス（プロセス再起動相当）でも同じDBからヒット
+        restarted = make_client(backend, cache_db=cache_db)
+        assert restarted.generate("summarize this", MODEL).cached
+        assert len(backend.calls) == 1
+
+        # キャッシュ無効化・設定違いは呼び出す
+        restarted.generate("summarize this", MODEL, use_cache=False)
+        restarted.generate("summarize this", MODEL, {"temperature": 0.1})
+        assert len(backend.calls) == 3
+        assert client.get_metrics()["models"][MODEL]["cache_hits"] == 1
+
+
+def main():
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"  ✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"  ✗ {test.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(0 if main() else 1)
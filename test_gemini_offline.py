@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Offline tests for parallel chunk transcription (FakeBackend, no API calls)
+
+Drives transcribe_chunks_parallel through the real rate limiter / quota scheduler
+against FakeBackend with injected 429 / 5xx errors.
+
+    venv/bin/python3 -m pytest -q test_gemini_offline.py
+    venv/bin/python3 test_gemini_offline.py
+"""
+
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# 共有リミッターは初回利用時に環境変数から作られるため、インポート前に設定する
+os.environ["GEMINI_BACKEND"] = "fake"
+os.environ["GEMINI_TIER_MODE"] = "static"
+os.environ["USE_PAID_TIER"] = "false"
+os.environ["GEMINI_FREE_RPM"] = "6000"
+os.environ["GEMINI_FREE_RPD"] = "100000"
+os.environ["TRANSCRIPTION_CACHE"] = "false"
+
+from src.shared.gemini_client import (
+    FakeBackend, GeminiClient, GeminiModel, set_gemini_client
+)
+from src.shared.quota_scheduler import QuotaScheduler, UsageLedger
+from src.transcription import audio_chunking
+from src.transcription import structured_transcribe as st
+
+MODEL = "gemini-2.5-flash"
+
+
+class SleepRecorder:
+    """GeminiClient の sleep 差し替え（待機せずに秒数を記録）"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, seconds):
+        self.calls.append(seconds)
+
+
+def make_client(backend, cache_db=None, backoff_base=0.01, backoff_max=0.05, sleep=None):
+    scheduler = QuotaScheduler(mode="static", ledger=UsageLedger(None))
+    return GeminiClient(backend=backend, cache_db=cache_db, use_cache=cache_db is not None,
+                        backoff_base=backoff_base, backoff_max=backoff_max,
+                        scheduler=scheduler, sleep=sleep or SleepRecorder())
+
+
+def chunk_responder(model, prompt_text, generation_config):
+    """擬似音声ファイルに書いた "chunk-N" からチャンクごとのセグメントを返す（先頭チャンクほど遅く返す）"""
+    for line in prompt_text.splitlines():
+        if line.startswith("chunk-"):
+            index = int(line.split("-")[1])
+            time.sleep(0.02 * (5 - index) if index < 5 else 0)
+            return json.dumps({"segments": [
+                {"speaker": "Speaker 1", "text": f"chunk {index} first", "timestamp": "00:01"},
+                {"speaker": "Speaker 2", "text": f"chunk {index} second", "timestamp": "00:30"},
+            ]})
+    return None
+
+
+def test_transcribe_chunks_parallel_with_injected_429s():
+    backend = FakeBackend(responder=chunk_responder, errors=[
+        {"match": "chunk-2", "status": 429, "times": 2},
+        {"match": "chunk-4", "status": 503, "times": 1},
+    ])
+    client = make_client(backend)
+    set_gemini_client(client)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            chunks = []
+            for i in range(6):
+                path = Path(tmp) / f"chunk_{i:03d}.ogg"
+                path.write_bytes(f"chunk-{i}\n".encode("utf-8"))
+                chunks.append({"index": i, "start": i * 60.0, "end": (i + 1) * 60.0, "overlap": 0.0, "path": path})
+
+            model = GeminiModel(MODEL, client=client)
+            results = st.transcribe_chunks_parallel(model, chunks, "audio/ogg", None, max_workers=3)
+    finally:
+        set_gemini_client(None)
+
+    # 完了順に関係なくチャンク順
+    assert [r["chunk"]["index"] for r in results] == list(range(6))
+    assert [r["segments"][0]["text"] for r in results] == [f"chunk {i} first" for i in range(6)]
+
+    merged = audio_chunking.merge_chunk_segments(results)
+    result = st._build_transcription_result(merged, [r["text"] for r in results])
+    assert [s["id"] for s in result["segments"]] == list(range(1, 13))
+    assert [s["timestamp"] for s in result["segments"][:4]] == ["00:01", "00:30", "01:01", "01:30"]
+    assert result["segments"][-1]["text"] == "chunk 5 second"
+    assert {s["id"]: s["segment_count"] for s in result["speakers"]} == {"Speaker 1": 6, "Speaker 2": 6}
+
+    # 429 ×2 と 503 ×1 は再試行され、全試行がリミッター経由で記録される
+    assert sorted(e["status"] for e in backend.injected) == [429, 429, 503]
+    stats = client.get_metrics()["models"][MODEL]
+    assert stats["calls"] == 6 and stats["retries"] == 3 and stats["errors"] == 0
+    assert client.scheduler.ledger.used_today("free", MODEL) == 9
+    assert len(backend.calls) == 9
+
+
+def main():
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"  ✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"  ✗ {test.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Offline tests for File API upload reuse (FakeBackend, no API calls)
+
+    venv/bin/python3 -m pytest -q test_gemini_upload.py
+    venv/bin/python3 test_gemini_upload.py
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+# 共有リミッターは初回利用時に環境変数から作られるため、インポート前に設定する
+os.environ["GEMINI_BACKEND"] = "fake"
+os.environ["GEMINI_TIER_MODE"] = "static"
+os.environ["USE_PAID_TIER"] = "false"
+os.environ["GEMINI_FREE_RPM"] = "6000"
+os.environ["GEMINI_FREE_RPD"] = "100000"
+os.environ["TRANSCRIPTION_CACHE"] = "false"
+
+from src.shared.gemini_client import FakeBackend, GeminiClient
+from src.shared.quota_scheduler import QuotaScheduler, UsageLedger
+from src.transcription import structured_transcribe as st
+
+MODEL = "gemini-2.5-flash"
+
+
+class SleepRecorder:
+    """GeminiClient の sleep 差し替え（待機せずに秒数を記録）"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, seconds):
+        self.calls.append(seconds)
+
+
+def make_client(backend, cache_db=None, backoff_base=0.01, backoff_max=0.05, sleep=None):
+    scheduler = QuotaScheduler(mode="static", ledger=UsageLedger(None))
+    return GeminiClient(backend=backend, cache_db=cache_db, use_cache=cache_db is not None,
+                        backoff_base=backoff_base, backoff_max=backoff_max,
+                        scheduler=scheduler, sleep=sleep or SleepRecorder())
+
+
+def test_upload_reuse_round_trip():
+    backend = FakeBackend(default='{"segments": []}', errors=[
+        {"match": "retry_me", "status": 503, "times": 1, "kind": "upload"},
+    ])
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_db = os.path.join(tmp, "gemini_cache.db")
+        audio = Path(tmp) / "meeting.ogg"
+        audio.write_bytes(b"fake audio " * 1000)
+
+        client = make_client(backend, cache_db=cache_db)
+        handle = client.upload_file(str(audio), "audio/ogg", model=MODEL)
+        assert not handle.reused and len(backend.files) == 1
+
+        response = client.generate([st.TRANSCRIPTION_PROMPT, handle.as_part()], MODEL, use_cache=False)
+        assert response.text == '{"segments": []}'
+        assert backend.calls[-1]["files"] == [handle.uri]
+
+        # 同じ内容は再アップロードしない（別インスタンスでも）
+        again = client.upload_file(str(audio), "audio/ogg", model=MODEL)
+        restarted = make_client(backend, cache_db=cache_db)
+        after_restart = restarted.upload_file(str(audio), "audio/ogg", model=MODEL)
+        assert again.reused and after_restart.reused
+        assert again.name == after_restart.name == handle.name
+        assert len(backend.files) == 1
+
+        # アップロードの一時的エラーは再試行
+        retried = Path(tmp) / "retry_me.ogg"
+        retried.write_bytes(b"other audio")
+        client.upload_file(str(retried), "audio/ogg", model=MODEL)
+        assert [e["status"] for e in backend.injected] == [503]
+        assert len(client._sleep.calls) == 1 and len(backend.files) == 2
+
+        # 削除後は参照できず、次回は再アップロード
+        client.delete_file(handle)
+        try:
+            client.generate([st.TRANSCRIPTION_PROMPT, handle.as_part()], MODEL, use_cache=False)
+            raise AssertionError("expected missing file error")
+        except ValueError:
+            pass
+        uploaded = client.upload_file(str(audio), "audio/ogg", model=MODEL)
+        assert not uploaded.reused and uploaded.name != handle.name
+
+
+def main():
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"  ✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"  ✗ {test.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(0 if main() else 1)
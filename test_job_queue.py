@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Tests for the durable SQLite job queue (dedupe, leases, retries, dead-letter)
+
+    venv/bin/python3 -m pytest -q test_job_queue.py
+    venv/bin/python3 test_job_queue.py
+"""
+
+import os
+import tempfile
+
+from src.monitoring.job_queue import JobQueue, JobWorkerPool, retry_delay
+
+
+class FakeClock:
+    """JobQueue の clock 差し替え（手動で進める）"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def make_queue(tmp):
+    clock = FakeClock()
+    return JobQueue(os.path.join(tmp, "job_queue.db"), clock=clock), clock
+
+
+def test_enqueue_dedupe():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue, _ = make_queue(tmp)
+
+        first = queue.enqueue("download", {"file_id": "a"}, dedupe_key="file:a")
+        assert queue.enqueue("download", {"file_id": "a"}, dedupe_key="file:a") == first
+        other = queue.enqueue("download", {"file_id": "b"}, dedupe_key="file:b")
+        no_key = [queue.enqueue("cleanup", {}) for _ in range(2)]
+        assert len({first, other, *no_key}) == 4
+
+        # 実行中も重複排除（dedupe_running=False なら新規登録して実行後の変更を取りこぼさない）
+        assert queue.claim("w1", kinds=["download"])["id"] == first
+        assert queue.enqueue("download", {"file_id": "a"}, dedupe_key="file:a") == first
+        follow_up = queue.enqueue("download", {"file_id": "a"}, dedupe_key="file:a", dedupe_running=False)
+        assert follow_up != first
+        assert queue.enqueue("download", {"file_id": "a"}, dedupe_key="file:a", dedupe_running=False) == follow_up
+
+        # 完了後は新しいジョブとして登録
+        queue.complete(first, "w1")
+        while True:
+            job = queue.claim("w1", kinds=["download"])
+            if job is None:
+                break
+            queue.complete(job["id"], "w1")
+        assert queue.get(follow_up)["status"] == "done"
+        assert queue.enqueue("download", {"file_id": "a"}, dedupe_key="file:a") not in (first, follow_up)
+
+
+def test_claim_delay_and_lease_reclaim():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue, clock = make_queue(tmp)
+        job_id = queue.enqueue("transcribe", {"path": "a.m4a"}, delay=10, max_attempts=2)
+
+        assert queue.claim("w1") is None
+        clock.advance(10)
+        job = queue.claim("w1", visibility_timeout=60)
+        assert job["id"] == job_id and job["attempts"] == 1 and job["payload"] == {"path": "a.m4a"}
+        assert queue.claim("w2") is None  # リース中は他ワーカーに見えない
+
+        # 延長中は再取得されない
+        clock.advance(50)
+        assert queue.extend(job_id, "w1", visibility_timeout=60)
+        clock.advance(50)
+        assert queue.claim("w2") is None
+
+        # 延長が途絶えたら期限後に別ワーカーが再取得し、元のワーカーの完了・延長は無効
+        clock.advance(11)
+        job = queue.claim("w2", visibility_timeout=60)
+        assert job["id"] == job_id and job["attempts"] == 2 and job["worker_id"] == "w2"
+        assert not queue.extend(job_id, "w1")
+        queue.complete(job_id, "w1")
+        assert queue.get(job_id)["status"] == "running"
+
+        # 試行回数を使い切ったままリースが切れたジョブは dead
+        clock.advance(61)
+        assert queue.claim("w3") is None
+        dead = queue.get(job_id)
+        assert dead["status"] == "dead" and "lease expired" in dead["last_error"]
+
+
+def test_claim_filters_kinds_and_orders_by_availability():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue, clock = make_queue(tmp)
+        late = queue.enqueue("download", {}, delay=5)
+        early = queue.enqueue("download", {})
+        cleanup = queue.enqueue("cleanup", {})
+
+        assert queue.claim("w1", kinds=["cleanup"])["id"] == cleanup
+        assert queue.claim("w1", kinds=["download"])["id"] == early
+        assert queue.claim("w1", kinds=["download"]) is None
+        clock.advance(5)
+        assert queue.claim("w1")["id"] == late
+
+
+def test_fail_backoff_dead_letter_and_superseded():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue, clock = make_queue(tmp)
+        job_id = queue.enqueue("download", {"file_id": "a"}, dedupe_key="file:a", max_attempts=2)
+
+        queue.claim("w1")
+        assert queue.fail(job_id, "w1", "HTTP 503", retry_delay=30) == "queued"
+        job = queue.get(job_id)
+        assert job["available_at"] == clock.now + 30 and job["last_error"] == "HTTP 503"
+        assert queue.claim("w1") is None
+        clock.advance(30)
+
+        assert queue.claim("w1")["attempts"] == 2
+        assert queue.fail(job_id, "w1", "HTTP 503", retry_delay=60) == "dead"
+        assert queue.get(job_id)["status"] == "dead"
+        clock.advance(60)
+        assert queue.claim("w1") is None
+
+        # 実行中に同じキーのジョブが登録されていれば再キューせず done（再試行は新しいジョブが兼ねる）
+        running = queue.enqueue("watch", {}, dedupe_key="watch:folder")
+        queue.claim("w1")
+        newer = queue.enqueue("watch", {}, dedupe_key="watch:folder", dedupe_running=False)
+        assert queue.fail(running, "w1", "timeout", retry_delay=30) == "superseded"
+        superseded = queue.get(running)
+        assert superseded["status"] == "done" and f"superseded by job {newer}" in superseded["last_error"]
+        assert queue.get(newer)["status"] == "queued"
+
+        assert queue.fail(9999, "w1", "missing", retry_delay=1) == "dead"
+
+
+def test_retry_dead():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue, clock = make_queue(tmp)
+        ids = [queue.enqueue("download", {"n": i}, dedupe_key=f"file:{i}", max_attempts=1) for i in range(3)]
+        for job_id in ids:
+            assert queue.claim("w1")["id"] == job_id
+            assert queue.fail(job_id, "w1", "boom", retry_delay=0) == "dead"
+
+        assert queue.retry_dead(ids[0]) == 1
+        job = queue.get(ids[0])
+        assert job["status"] == "queued" and job["attempts"] == 0
+        assert queue.retry_dead(ids[0]) == 0  # dead ではない
+
+        # 同じ dedupe_key の未実行ジョブがあるものだけスキップし、残りは再キューする
+        blocker = queue.enqueue("download", {"n": 1}, dedupe_key="file:1")
+        clock.advance(1)
+        assert queue.retry_dead() == 1
+        assert queue.get(ids[1])["status"] == "dead"
+        assert queue.get(ids[2])["status"] == "queued"
+        assert queue.get(blocker)["status"] == "queued"
+        assert queue.stats() == {"queued": 3, "running": 0, "done": 0, "dead": 1}
+
+
+def test_retry_delay_backoff():
+    for attempts, base in [(1, 30.0), (2, 60.0), (3, 120.0), (20, 3600.0)]:
+        delay = retry_delay(attempts)
+        assert base <= delay <= base * 1.1, attempts
+
+
+def test_worker_pool_records_failure():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue, clock = make_queue(tmp)
+        seen = []
+
+        def handler(payload):
+            seen.append(payload["n"])
+            if payload["n"] == 2:
+                raise RuntimeError("boom")
+
+        pool = JobWorkerPool(queue, {"task": handler}, num_workers=1, visibility_timeout=60)
+        ok = queue.enqueue("task", {"n": 1})
+        failing = queue.enqueue("task", {"n": 2}, max_attempts=3)
+        for _ in range(2):
+            pool._execute(queue.claim("w1", kinds=["task"]), "w1")
+
+        assert seen == [1, 2]
+        assert queue.get(ok)["status"] == "done"
+        job = queue.get(failing)
+        assert job["status"] == "queued" and job["last_error"] == "RuntimeError: boom"
+        assert job["available_at"] >= clock.now + 30
+
+
+def main():
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"  ✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"  ✗ {test.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Tests for the BM25 lexical index and hybrid (dense + BM25) RRF fusion
+
+    venv/bin/python3 -m pytest -q test_lexical_index.py
+    venv/bin/python3 test_lexical_index.py
+"""
+
+import os
+import tempfile
+
+import pytest
+
+from src.search.lexical_index import (
+    BM25Index, load_lexical_index, reciprocal_rank_fusion, tokenize
+)
+
+
+def make_index():
+    index = BM25Index()
+    index.upsert("doc_1", "田中さんがABC-123の見積もりを説明した", content_hash="h1")
+    index.upsert("doc_2", "佐藤さんと来期の予算について相談", content_hash="h2")
+    index.upsert("doc_3", "ABC-124の不具合は田中さんが調査中", content_hash="h3")
+    index.upsert("doc_4", "雑談：週末の天気と旅行の話", content_hash="h4")
+    return index
+
+
+def test_tokenize():
+    cases = [
+        ("田中さん", ["田中", "中さ", "さん"]),
+        # NFKC（全角→半角）+ 小文字化、記号・空白で区切る
+        ("ＡＢＣ－１２３", ["ab", "bc", "12", "23"]),
+        ("abc-123", ["ab", "bc", "12", "23"]),
+        ("X 1", ["x", "1"]),
+        ("会議、予算。", ["会議", "予算"]),
+        ("", []),
+    ]
+    for text, expected in cases:
+        assert tokenize(text) == expected, text
+    assert tokenize("田中", n=1) == ["田", "中"]
+
+
+def test_search_ranks_exact_matches():
+    index = make_index()
+
+    hits = index.search("ABC-123", n_results=10)
+    assert hits[0][0] == "doc_1"
+    # "ab"/"bc"/"12" が一致する型番違いの文書は下位
+    assert [doc_id for doc_id, _ in hits] == ["doc_1", "doc_3"]
+    assert hits[0][1] > hits[1][1] > 0
+
+    assert [doc_id for doc_id, _ in index.search("予算", n_results=10)] == ["doc_2"]
+    assert index.search("存在しない語句", n_results=10) == []
+    assert len(index.search("さん", n_results=1)) == 1
+
+
+def test_search_allowed_ids():
+    index = make_index()
+    hits = index.search("田中さん", n_results=10, allowed_ids={"doc_3", "doc_4"})
+    assert [doc_id for doc_id, _ in hits] == ["doc_3"]
+    assert index.search("田中さん", n_results=10, allowed_ids=set()) == []
+
+
+def test_upsert_remove_compact():
+    index = make_index()
+
+    # 同じcontent_hashの再登録はスキップ、変わっていれば置き換え
+    assert not index.upsert("doc_1", "別の本文", content_hash="h1")
+    assert index.upsert("doc_1", "山田さんが議事録を共有", content_hash="h1b")
+    assert index.get_hash("doc_1") == "h1b"
+    assert "doc_1" not in [doc_id for doc_id, _ in index.search("ABC-123")]
+    assert [doc_id for doc_id, _ in index.search("山田")] == ["doc_1"]
+
+    assert index.remove("doc_2") and not index.remove("doc_2")
+    assert "doc_2" not in index and len(index) == 3
+    assert index.search("予算") == []
+
+    # 墓標が閾値を超えると自動で詰め直す
+    assert index.remove_many(["doc_3", "doc_4", "missing"]) == 2
+    assert index._deleted == 0 and index._doc_ids == ["doc_1"]
+    assert [doc_id for doc_id, _ in index.search("山田")] == ["doc_1"]
+
+
+def test_save_load_round_trip():
+    index = make_index()
+    index.remove("doc_4")
+    expected = index.search("田中さん ABC-123", n_results=10)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bm25_transcripts_unified.pkl")
+        index.save(path)
+        loaded = load_lexical_index(path)
+
+        assert len(loaded) == 3 and "doc_4" not in loaded
+        assert loaded.get_hash("doc_2") == "h2"
+        assert loaded.search("田中さん ABC-123", n_results=10) == expected
+
+        # 読み込んだインデックスも差分更新できる
+        assert loaded.upsert("doc_5", "ABC-123の追加資料", content_hash="h5")
+        assert "doc_5" in [doc_id for doc_id, _ in loaded.search("ABC-123")]
+
+        # 存在しない・壊れたファイルは空のインデックス
+        assert len(load_lexical_index(os.path.join(tmp, "missing.pkl"))) == 0
+        broken = os.path.join(tmp, "broken.pkl")
+        with open(broken, "wb") as f:
+            f.write(b"not a pickle")
+        assert len(load_lexical_index(broken)) == 0
+
+
+def test_reciprocal_rank_fusion_ordering():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], k=60)
+    assert [doc_id for doc_id, _ in fused] == ["a", "c", "b", "d"]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[-1][1] == pytest.approx(1 / 63)
+    assert reciprocal_rank_fusion([]) == []
+
+
+class FakeCollection:
+    """_fuse_hybrid が使う collection.get の差し替え（where は metadata の完全一致のみ）"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.get_calls = []
+
+    def get(self, ids, include, where=None):
+        self.get_calls.append({"ids": ids, "where": where})
+        matched = [doc_id for doc_id in ids if doc_id in self.docs and all(
+            self.docs[doc_id]["metadata"].get(key) == value for key, value in (where or {}).items()
+        )]
+        return {
+            "ids": matched,
+            "documents": [self.docs[doc_id]["text"] for doc_id in matched],
+            "metadatas": [self.docs[doc_id]["metadata"] for doc_id in matched],
+        }
+
+
+def test_fuse_hybrid_rrf():
+    semantic_search = pytest.importorskip("src.search.semantic_search")
+
+    index = make_index()
+    engine = semantic_search.SemanticSearchEngine.__new__(semantic_search.SemanticSearchEngine)
+    engine.get_lexical_index = lambda collection_name: index
+
+    collection = FakeCollection({
+        "doc_1": {"text": "田中さんがABC-123の見積もりを説明した", "metadata": {"person": "p1"}},
+        "doc_3": {"text": "ABC-124の不具合は田中さんが調査中", "metadata": {"person": "p2"}},
+    })
+    dense = [
+        {"id": "doc_4", "text": "雑談", "metadata": {"person": "p1"}, "similarity_score": 0.9, "distance": 0.1},
+        {"id": "doc_1", "text": "田中さんが…", "metadata": {"person": "p1"}, "similarity_score": 0.8, "distance": 0.2},
+    ]
+
+    results = engine._fuse_hybrid(collection, "transcripts_unified", "ABC-123", dense,
+                                  n_results=3, n_candidates=10)
+    # 両方に出る doc_1 が首位、BM25のみの doc_3 は本文を取得して追加
+    assert [r["id"] for r in results] == ["doc_1", "doc_4", "doc_3"]
+    assert [r["rank"] for r in results] == [1, 2, 3]
+    assert results[0]["bm25_score"] > 0 and results[1]["bm25_score"] == 0.0
+    assert results[2]["text"].startswith("ABC-124") and results[2]["similarity_score"] == 0.0
+    assert collection.get_calls == [{"ids": ["doc_3"], "where": None}]
+
+    # フィルター指定時はBM25候補もallowed_idsとwhereで絞り込む
+    collection.get_calls.clear()
+    results = engine._fuse_hybrid(collection, "transcripts_unified", "ABC-123", dense[1:],
+                                  n_results=3, n_candidates=10,
+                                  filter_metadata={"person": "p1"}, allowed_ids={"doc_1"})
+    assert [r["id"] for r in results] == ["doc_1"]
+    assert collection.get_calls == []
+
+
+def main():
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"  ✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"  ✗ {test.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(0 if main() else 1)
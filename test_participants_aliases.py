@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for participant alias normalization and alias-based resolution in ParticipantsDB
+
+    venv/bin/python3 -m pytest -q test_participants_aliases.py
+    venv/bin/python3 test_participants_aliases.py
+"""
+
+import os
+import tempfile
+
+from src.participants.name_normalization import alias_keys, bigrams, fold_romaji, kana_to_romaji
+from src.participants.participants_db import ParticipantsDB
+
+
+def count_participants(db):
+    return db._conn().execute("SELECT COUNT(*) FROM participants").fetchone()[0]
+
+
+def test_alias_keys():
+    cases = [
+        ("さとう", {"さとう", "sato"}),
+        ("サトウさん", {"さとう", "sato"}),
+        ("Satoh", {"satoh", "sato"}),
+        ("Satō", {"satō", "sato"}),
+        ("Sato-san", {"sato"}),
+        ("ＳＡＴＯ　様", {"sato"}),
+        ("佐藤", {"佐藤"}),  # 漢字は読みが分からないので正規化名のみ
+        ("田中部長", {"田中"}),
+        ("Mr. Tanaka", {"tanaka"}),
+        ("なんば", {"なんば", "nanba"}),
+        ("Namba", {"namba", "nanba"}),
+        # 敬称・役職のみ、空文字はキーなし
+        ("さん", set()),
+        ("部長", set()),
+        ("", set()),
+    ]
+    for name, expected in cases:
+        assert alias_keys(name) == expected, name
+
+
+def test_romaji_helpers():
+    assert kana_to_romaji("きょうこ") == "kyouko"
+    assert kana_to_romaji("はっとり") == "hattori"
+    assert kana_to_romaji("しゅんすけ") == "shunsuke"
+    assert fold_romaji("ohno") == fold_romaji("ōno") == fold_romaji("oono") == "ono"
+    assert bigrams("田中") == ["^田", "中$", "田中"]
+
+
+def test_spelling_variants_resolve_to_one_participant():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ParticipantsDB(os.path.join(tmp, "participants.db"))
+        participant_id = db.upsert_participant("佐藤", display_names=["さとう"], organization="営業部")
+
+        ids = db.upsert_participants([
+            {"canonical_name": "Satoh"},
+            {"canonical_name": "Satō"},
+            {"canonical_name": "サトウさん", "role": "課長"},
+        ])
+        assert set(ids.values()) == {participant_id}
+        assert count_participants(db) == 1
+
+        info = db.get_participant_info("佐藤")
+        assert info["display_names"] == ["さとう", "Satoh", "Satō", "サトウさん"]
+        assert info["organization"] == "営業部" and info["role"] == "課長"
+        # 追加された表記でも検索できる
+        assert [p["canonical_name"] for p in db.find_participants("satou", threshold=1.0)] == ["佐藤"]
+        db.close()
+
+
+def test_ambiguous_alias_creates_new_participant():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ParticipantsDB(os.path.join(tmp, "participants.db"))
+        hanako = db.upsert_participant("佐藤花子", display_names=["さとうさん"])
+        ichiro = db.upsert_participant("佐藤一郎", display_names=["Sato"])
+
+        # "sato" が2人に一致するので既存参加者には寄せない
+        new_id = db.upsert_participant("Satoh")
+        assert new_id not in (hanako, ichiro)
+        assert count_participants(db) == 3
+        assert db.get_participant_info("佐藤花子")["display_names"] == ["さとうさん"]
+
+        # canonical_name の完全一致は曖昧でも優先
+        assert db.upsert_participant("佐藤一郎", notes="再登録") == ichiro
+        db.close()
+
+
+def test_honorific_only_names_do_not_match():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ParticipantsDB(os.path.join(tmp, "participants.db"))
+        tanaka = db.upsert_participant("田中", display_names=["田中部長", "タナカさん"])
+
+        assert db.find_participants("部長") == []
+        assert db.find_participants("さん") == []
+        # 敬称のみの名前は別名キーを持たないため、既存参加者に寄せず別の行になる
+        assert db.upsert_participant("部長") != tanaka
+        assert count_participants(db) == 2
+        assert [p["canonical_name"] for p in db.find_participants("田中課長")] == ["田中"]
+        db.close()
+
+
+def test_find_participants_threshold_and_limit():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ParticipantsDB(os.path.join(tmp, "participants.db"))
+        for name in ["田中太郎", "田中次郎", "田中花子", "鈴木一郎"]:
+            db.upsert_participant(name)
+
+        # "田中太郎" の bigram（^田 田中 中太 太郎 郎$）との Dice係数: 次郎 0.6、花子 0.4
+        results = db.find_participants("田中太郎", threshold=0.3)
+        assert [(p["canonical_name"], p["score"]) for p in results] == [
+            ("田中太郎", 1.0), ("田中次郎", 0.6), ("田中花子", 0.4)
+        ]
+        assert results[0]["matched_alias"] == "田中太郎"
+
+        assert [p["canonical_name"] for p in db.find_participants("田中太郎", threshold=0.6)] == ["田中太郎", "田中次郎"]
+        assert [p["canonical_name"] for p in db.find_participants("田中太郎", threshold=1.0)] == ["田中太郎"]
+        assert len(db.find_participants("田中太郎", threshold=0.3, limit=2)) == 2
+        assert [p["canonical_name"] for p in db.find_participants("田中太郎さん", threshold=0.3, limit=1)] == ["田中太郎"]
+        assert db.find_participants("山本", threshold=0.3) == []
+        db.close()
+
+
+def main():
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"  ✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"  ✗ {test.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Tests for pipeline step checkpoints (CheckpointStore + StepGraph restore / force / only-step)
+
+    venv/bin/python3 -m pytest -q test_pipeline_checkpoints.py
+    venv/bin/python3 test_pipeline_checkpoints.py
+"""
+
+import os
+import tempfile
+from collections import Counter
+
+from src.participants.participants_db import ParticipantsDB
+from src.pipeline.checkpoints import CheckpointStore
+from src.pipeline.step_graph import PipelineStep, PipelineStepError, StepGraph
+
+
+def make_graph(calls):
+    """
+    x ── a ── b ─┬─ c（cacheableでない）
+                 └─ d
+    """
+    def step(name, source, target):
+        def run(inputs):
+            calls[name] += 1
+            return {target: f"{name}({inputs[source]})"}
+        return run
+
+    return StepGraph([
+        PipelineStep("a", step("a", "x", "A"), inputs=("x",), outputs=("A",), cacheable=True),
+        PipelineStep("b", step("b", "A", "B"), inputs=("A",), outputs=("B",), cacheable=True),
+        PipelineStep("c", step("c", "B", "C"), inputs=("B",), outputs=("C",)),
+        PipelineStep("d", step("d", "B", "D"), inputs=("B",), outputs=("D",), cacheable=True),
+    ])
+
+
+def test_checkpoint_store_input_hash():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CheckpointStore(os.path.join(tmp, "meeting_structured.json"), root=tmp)
+        key = store.hash_inputs("summary", "1", {"segments": [1, 2]})
+
+        assert store.load("summary", key) is None
+        store.save("summary", key, {"summary_data": {"title": "定例"}})
+        assert store.load("summary", key) == {"summary_data": {"title": "定例"}}
+
+        # 入力・バージョンが変わればヒットしない
+        assert store.load("summary", store.hash_inputs("summary", "1", {"segments": [1, 3]})) is None
+        assert store.load("summary", store.hash_inputs("summary", "2", {"segments": [1, 2]})) is None
+        # 入力ファイルごとに別ディレクトリ
+        other = CheckpointStore(os.path.join(tmp, "other_structured.json"), root=tmp)
+        assert other.directory != store.directory and other.load("summary", key) is None
+
+        # 壊れたチェックポイントは無視
+        (store.directory / "summary.json").write_text("{broken", encoding="utf-8")
+        assert store.load("summary", key) is None
+
+        store.clear()
+        assert not store.directory.exists()
+
+
+def test_rerun_restores_cacheable_steps():
+    calls = Counter()
+    graph = make_graph(calls)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CheckpointStore(os.path.join(tmp, "meeting.json"), root=tmp)
+
+        context, _ = graph.run({"x": 1}, checkpoints=store)
+        assert context["D"] == "d(b(a(1)))"
+        assert calls == Counter(a=1, b=1, c=1, d=1)
+
+        context, timings = graph.run({"x": 1}, checkpoints=store)
+        assert context["C"] == "c(b(a(1)))" and context["D"] == "d(b(a(1)))"
+        assert calls == Counter(a=1, b=1, c=2, d=1)  # cacheableでないステップのみ再実行
+        assert [name for name in graph.order if timings[name]["cached"]] == ["a", "b", "d"]
+
+        # 入力が変わると入力ハッシュが一致せず、そのステップと下流が再実行される
+        context, _ = graph.run({"x": 2}, checkpoints=store)
+        assert context["D"] == "d(b(a(2)))"
+        assert calls == Counter(a=2, b=2, c=3, d=2)
+
+
+def test_force_from_step_reruns_descendants():
+    calls = Counter()
+    graph = make_graph(calls)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CheckpointStore(os.path.join(tmp, "meeting.json"), root=tmp)
+        graph.run({"x": 1}, checkpoints=store)
+
+        # --from-step b: b とその下流を強制再実行、上流は復元
+        assert graph.descendants("b") == ["c", "d"]
+        _, timings = graph.run({"x": 1}, checkpoints=store, force=["b"] + graph.descendants("b"))
+        assert calls == Counter(a=1, b=2, c=2, d=2)
+        assert timings["a"]["cached"] and not timings["b"]["cached"] and not timings["d"]["cached"]
+
+
+def test_only_step_requires_upstream_checkpoints():
+    calls = Counter()
+    graph = make_graph(calls)
+    require = [dep for dep in graph.ancestors("b") if graph.steps[dep].cacheable]
+    assert require == ["a"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CheckpointStore(os.path.join(tmp, "meeting.json"), root=tmp)
+
+        # 上流のチェックポイントがなければ実行せずにエラー
+        try:
+            graph.run({"x": 1}, checkpoints=store, force=["b"], targets=["b"], require_checkpoint=require)
+            raise AssertionError("expected PipelineStepError")
+        except PipelineStepError as e:
+            assert e.step_name == "a"
+        assert sum(calls.values()) == 0
+
+        graph.run({"x": 1}, checkpoints=store)
+        calls.clear()
+
+        # --only-step b: 上流は復元、b のみ再実行、下流は実行しない
+        context, timings = graph.run({"x": 1}, checkpoints=store, force=["b"], targets=["b"],
+                                     require_checkpoint=require)
+        assert calls == Counter(b=1)
+        assert context["B"] == "b(a(1))" and "C" not in context and "D" not in context
+        assert set(timings) == {"a", "b"}
+
+        # 入力が変わった場合も上流の再実行はせずエラー
+        try:
+            graph.run({"x": 2}, checkpoints=store, force=["b"], targets=["b"], require_checkpoint=require)
+            raise AssertionError("expected PipelineStepError")
+        except PipelineStepError as e:
+            assert e.step_name == "a"
+
+
+def test_participants_update_rerun_keeps_notes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ParticipantsDB(os.path.join(tmp, "participants.db"))
+        participant = {"canonical_name": "田中太郎", "display_names": ["田中さん"], "notes": "会議: 定例"}
+
+        # Step 9 はチェックポイント対象外のため、パイプラインを再実行するたびに同じnotesでUPSERTされる
+        for _ in range(3):
+            db.upsert_participants([participant])
+        assert db.get_participant_info("田中太郎")["notes"] == "会議: 定例"
+
+        db.upsert_participants([dict(participant, notes="会議: 予算レビュー")])
+        db.upsert_participants([dict(participant, notes="会議: 予算レビュー")])
+        db.upsert_participants([participant])
+        notes = db.get_participant_info("田中太郎")["notes"].splitlines()
+        assert len(notes) == 2
+        assert notes[0] == "会議: 定例" and notes[1].endswith("] 会議: 予算レビュー")
+        db.close()
+
+
+def main():
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"  ✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"  ✗ {test.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(0 if main() else 1)
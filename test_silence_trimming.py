@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Tests for silence trimming (keep-span planning, timestamp remapping, streaming VAD, ffmpeg cut)
+
+The end-to-end test needs ffmpeg on PATH and is skipped otherwise.
+
+    venv/bin/python3 -m pytest -q test_silence_trimming.py
+    venv/bin/python3 test_silence_trimming.py
+"""
+
+import os
+import shutil
+import tempfile
+import wave
+
+import numpy as np
+import pytest
+
+from src.transcription import audio_normalization, silence_trimming
+from src.transcription.silence_trimming import (
+    OffsetMap, build_trim_command, build_trim_filter, detect_speech, frame_features,
+    plan_keep_segments, stream_frame_features, worth_trimming
+)
+
+FRAME_SECONDS = 0.5  # 計画のテストでは1フレーム0.5秒として読みやすくする
+
+
+def speech_mask(pattern):
+    """"S"（発話）/ "."（無音）の文字列からフレームのマスクを作る"""
+    return np.array([c == "S" for c in pattern], dtype=bool)
+
+
+def test_plan_keep_segments():
+    cases = [
+        # (説明, マスク, duration, 期待する残す区間)
+        ("all speech", "SSSS", 2.0, [(0.0, 2.0)]),
+        ("no speech", "....", 2.0, []),
+        ("short silences are kept", "SS....SS", 4.0, [(0.0, 4.0)]),
+        ("long silence trimmed with padding", "SS........SS", 6.0, [(0.0, 1.5), (4.5, 6.0)]),
+        ("leading/trailing silence trimmed without padding",
+         "........SS........", 9.0, [(3.5, 5.5)]),
+        ("partial trailing frame counts as silence",
+         "SS........", 5.2, [(0.0, 1.5)]),
+        ("two long silences", "S........SS........S", 10.0,
+         [(0.0, 1.0), (4.0, 6.0), (9.0, 10.0)]),
+    ]
+    for name, pattern, duration, expected in cases:
+        keep = plan_keep_segments(speech_mask(pattern), FRAME_SECONDS, duration, min_silence=3.0, padding=0.5)
+        assert keep == expected, name
+
+
+def test_worth_trimming_min_saving_cutoff():
+    cases = [
+        # (duration, kept_seconds, 期待)
+        (600.0, 500.0, True),     # 100秒削除（>= max(3, 30)）
+        (600.0, 580.0, False),    # 20秒削除は録音長の5%（30秒）未満
+        (600.0, 570.0, True),     # ちょうど5%
+        (40.0, 38.0, False),      # 2秒削除は min_silence 未満
+        (40.0, 37.0, True),
+        (40.0, 0.0, False),       # 発話なし（全て削除になる）はカットしない
+    ]
+    for duration, kept, expected in cases:
+        assert worth_trimming(duration, kept, min_silence=3.0, min_saving=0.05) is expected, (duration, kept)
+
+
+def test_offset_map_to_original():
+    offset_map = OffsetMap([(0.0, 10.0), (40.0, 50.0), (100.0, 130.0)])
+    assert offset_map.kept_seconds == 50.0
+    cases = [
+        (0.0, 0.0),
+        (9.5, 9.5),
+        (10.0, 40.0),   # 区間の境目はカット後の次の区間の先頭
+        (15.0, 45.0),
+        (20.0, 100.0),
+        (49.0, 129.0),
+        (60.0, 130.0),  # 末尾を超えた時刻は最後の区間の終端に丸める
+        (-1.0, 0.0),
+    ]
+    for trimmed, original in cases:
+        assert offset_map.to_original(trimmed) == original, trimmed
+
+    # 区間なし（カットしていない）なら恒等変換
+    assert OffsetMap([]).to_original(12.3) == 12.3
+
+
+def test_offset_map_remap_segments():
+    offset_map = OffsetMap([(0.0, 60.0), (180.0, 300.0), (3900.0, 3960.0)])
+    segments = [
+        {"speaker": "Speaker 1", "text": "a", "timestamp": "00:30"},
+        {"speaker": "Speaker 2", "text": "b", "timestamp": "01:10"},
+        {"speaker": "Speaker 1", "text": "c", "timestamp": "3:00"},
+        {"speaker": "Speaker 2", "text": "d", "timestamp": "不明"},
+        {"speaker": "Speaker 1", "text": "e"},
+    ]
+    result = offset_map.remap_segments(segments)
+    assert result is segments
+    assert [seg.get("timestamp") for seg in segments] == ["00:30", "03:10", "65:00", "不明", None]
+
+
+def test_stream_frame_features_matches_whole_array():
+    rng = np.random.default_rng(0)
+    samples = (rng.standard_normal(48000 + 123) * 3000).astype('<i2')
+    frame_length = 480
+
+    expected_energy, expected_zcr = frame_features(samples, frame_length)
+    # ブロック境界がフレーム境界と揃わない分割でも同じ結果
+    blocks = [samples[:1000], samples[1000:1001], samples[1001:30000], samples[30000:]]
+    energy, zcr, sample_count = stream_frame_features(iter(blocks), frame_length)
+
+    assert sample_count == len(samples)
+    assert len(energy) == len(samples) // frame_length
+    np.testing.assert_allclose(energy, expected_energy, rtol=1e-5)
+    np.testing.assert_allclose(zcr, expected_zcr)
+
+    energy, zcr, sample_count = stream_frame_features(iter([]), frame_length)
+    assert len(energy) == len(zcr) == sample_count == 0
+
+
+def test_detect_speech_on_tone_and_silence():
+    sample_rate = 16000
+    t = np.arange(sample_rate) / sample_rate
+    tone = (np.sin(2 * np.pi * 220 * t) * 8000).astype('<i2')
+    noise = (np.random.default_rng(1).standard_normal(sample_rate) * 20).astype('<i2')
+    samples = np.concatenate([noise, tone, noise, noise, tone])
+
+    energy, zcr = frame_features(samples, 480)
+    mask, threshold = detect_speech(energy, zcr)
+    per_second = [mask[i * 33 + 2:(i + 1) * 33 - 2].mean() for i in range(5)]
+    assert per_second[1] == per_second[4] == 1.0
+    assert per_second[0] == per_second[2] == per_second[3] == 0.0
+    assert threshold >= silence_trimming.VAD_MIN_THRESHOLD_DB
+
+
+def test_build_trim_filter_and_command():
+    graph = build_trim_filter([(0.0, 1.5), (4.5, 6.0)], frame_seconds=0.01)
+    assert graph == (
+        "aresample=16000,asetnsamples=n=160:p=0,"
+        "aselect='between(t,-0.0050,1.4950)+between(t,4.4950,5.9950)',"
+        "asetpts=N/SR/TB"
+    )
+
+    cmd = build_trim_command("in.m4a", "out.ogg", [(0.0, 1.5), (4.5, 6.0)], codec="opus")
+    assert cmd[cmd.index('-i') + 1] == "in.m4a"
+    assert cmd[cmd.index('-af') + 1] == build_trim_filter([(0.0, 1.5), (4.5, 6.0)])
+    assert cmd[-1] == "out.ogg"
+    assert cmd[-1 - len(audio_normalization._encode_options("opus")):-1] == audio_normalization._encode_options("opus")
+
+
+def write_wav(path, samples, sample_rate=16000):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.astype('<i2').tobytes())
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_prepare_trimmed_audio_end_to_end():
+    sample_rate = 16000
+    t = np.arange(sample_rate * 5) / sample_rate
+    tone = np.sin(2 * np.pi * 220 * t) * 8000
+    silence = np.random.default_rng(2).standard_normal(sample_rate * 20) * 10
+    samples = np.concatenate([tone, silence, tone])  # 5秒 + 20秒 + 5秒
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "memo.wav")
+        write_wav(path, samples)
+
+        trimmed = silence_trimming.prepare_trimmed_audio(path)
+        assert trimmed is not None
+        try:
+            assert trimmed["original_seconds"] == 30.0
+            assert abs(trimmed["kept_seconds"] - 11.0) < 0.1  # 発話10秒 + 前後の余白0.5秒ずつ
+            assert trimmed["output_bytes"] > 0 and trimmed["path"].exists()
+
+            decoded = list(silence_trimming.iter_pcm_blocks(trimmed["path"], sample_rate))
+            decoded_seconds = sum(len(block) for block in decoded) / sample_rate
+            assert abs(decoded_seconds - trimmed["kept_seconds"]) < 0.1
+
+            assert trimmed["offset_map"].remap_timestamp("00:07") == "00:26"
+        finally:
+            trimmed["path"].unlink(missing_ok=True)
+
+        # 無音が少ない録音はカットしない
+        write_wav(path, np.concatenate([tone, silence[:sample_rate], tone]))
+        assert silence_trimming.prepare_trimmed_audio(path) is None
+
+
+def main():
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"  ✓ {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"  ✗ {test.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(0 if main() else 1)
@@ -9,28 +9,14 @@ import json
 import sys
 import os
 from pathlib import Path
-import google.generativeai as genai
 from datetime import datetime
 from dotenv import load_dotenv
 
+from src.shared.gemini_client import GeminiModel
+
 # .envファイルを読み込み
 load_dotenv()
 
-# Gemini API Key選択（デフォルト: 無料枠）
-USE_PAID_TIER = os.getenv("USE_PAID_TIER", "false").lower() == "true"
-if USE_PAID_TIER:
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY_PAID")
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY_PAID not set but USE_PAID_TIER=true")
-    print("ℹ️  Using PAID tier API key")
-else:
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY_FREE")
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY_FREE not set")
-    print("ℹ️  Using FREE tier API key")
-
-genai.configure(api_key=GEMINI_API_KEY)
-
 # Gemini 2.5 Pro
 MODEL_NAME = 'gemini-2.5-pro'
 
@@ -38,7 +24,7 @@ def llm_compare_summaries(original_segments, baseline_summary, new_pipeline_summ
     """
     LLMを使って2つの要約を比較評価
     """
-    model = genai.GenerativeModel(MODEL_NAME)
+    model = GeminiModel(MODEL_NAME)
 
     # 元の会話（最初の50セグメント）
     sample_size = min(50, len(original_segments))
@@ -102,7 +88,7 @@ def llm_compare_filenames(original_filename, baseline_filename, new_pipeline_fil
     """
     LLMを使って2つのファイル名を比較評価
     """
-    model = genai.GenerativeModel(MODEL_NAME)
+    model = GeminiModel(MODEL_NAME)
 
     prompt = f"""以下の2つのファイル名を比較評価してください。
 